@@ -49,6 +49,7 @@ from .messaging import (
 )
 
 from .billing import (
+    build_billing_summary,
     fetch_billing_entries,
     fetch_billing_types,
     get_order_billing_summary,
@@ -166,6 +167,7 @@ __all__ = [
     "find_thread_id_for_login",
     "send_discussion_message",
     # Billing
+    "build_billing_summary",
     "fetch_billing_entries",
     "fetch_billing_types",
     "get_order_billing_summary",
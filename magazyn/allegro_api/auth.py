@@ -3,8 +3,7 @@ Autoryzacja OAuth dla Allegro API.
 """
 from typing import Optional
 
-import requests
-
+from .. import http_transport
 from .core import ALLEGRO_USER_AGENT, AUTH_URL, DEFAULT_TIMEOUT
 from ..settings_store import SettingsPersistenceError, settings_store
 
@@ -38,7 +37,7 @@ def get_access_token(
     if redirect_uri:
         data["redirect_uri"] = redirect_uri
 
-    response = requests.post(
+    response = http_transport.get_session(http_transport.ALLEGRO).post(
         AUTH_URL, data=data, auth=(client_id, client_secret),
         timeout=DEFAULT_TIMEOUT,
         headers={"User-Agent": ALLEGRO_USER_AGENT},
@@ -74,7 +73,7 @@ def refresh_token(refresh_token: str) -> dict:
         )
 
     data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-    response = requests.post(
+    response = http_transport.get_session(http_transport.ALLEGRO).post(
         AUTH_URL,
         data=data,
         auth=(store_client_id, store_client_secret),
@@ -23,6 +23,7 @@ def fetch_billing_entries(
     occurred_at_gte: Optional[str] = None,
     occurred_at_lte: Optional[str] = None,
     limit: int = 100,
+    offset: int = 0,
 ) -> dict:
     """
     Pobierz wpisy billingowe z Allegro API.
@@ -37,6 +38,7 @@ def fetch_billing_entries(
         occurred_at_gte: Data od (ISO 8601), np. "2024-01-01T00:00:00Z" (opcjonalnie)
         occurred_at_lte: Data do (ISO 8601) (opcjonalnie)
         limit: Maksymalna liczba wynikow (domyslnie 100)
+        offset: Przesuniecie stronicowania (domyslnie 0)
     
     Returns:
         dict: Slownik z kluczem "billingEntries" zawierajacy liste wpisow billingowych.
@@ -70,6 +72,8 @@ def fetch_billing_entries(
     }
     
     params = {"limit": limit}
+    if offset:
+        params["offset"] = offset
     
     if order_id:
         params["order.id"] = order_id
@@ -181,46 +185,18 @@ LISTING_TYPES = {
 }
 
 
-def get_order_billing_summary(
-    access_token: str, 
-    order_id: str,
+def build_billing_summary(
+    entries: list,
     delivery_method: Optional[str] = None,
-    order_value: Optional[Decimal] = None
+    order_value: Optional[Decimal] = None,
+    error: Optional[str] = None,
 ) -> dict:
     """
-    Pobierz podsumowanie kosztow billingowych dla zamowienia.
-    
-    Agreguje wszystkie wpisy billingowe dla danego zamowienia i zwraca
-    podsumowanie z podzilem na typy oplat. Jesli API nie zwroci kosztu wysylki,
-    a podano delivery_method i order_value, szacuje koszt na podstawie tabeli Allegro Smart.
-    
-    Args:
-        access_token: Token dostepu Allegro OAuth
-        order_id: UUID zamowienia (format: "29738e61-7f6a-11e8-ac45-09db60ede9d6")
-        delivery_method: Opcjonalna nazwa metody dostawy do szacowania
-        order_value: Opcjonalna wartosc zamowienia do szacowania
-    
-    Returns:
-        dict: Slownik z podsumowaniem kosztow:
-        {
-            "success": True/False,
-            "commission": Decimal - prowizja od sprzedazy,
-            "listing_fee": Decimal - oplata za wystawienie,
-            "shipping_fee": Decimal - koszty wysylki,
-            "promo_fee": Decimal - oplaty promocyjne,
-            "other_fees": Decimal - pozostale oplaty,
-            "total_fees": Decimal - suma wszystkich oplat,
-            "refunds": Decimal - zwroty (wartosci dodatnie),
-            "entries": list - surowe wpisy billingowe,
-            "fee_details": list - szczegoly oplat z nazwami,
-            "error": str - komunikat bledu (jesli success=False)
-        }
-    
-    Example:
-        >>> summary = get_order_billing_summary(token, "29738e61-7f6a-11e8-ac45-09db60ede9d6")
-        >>> if summary["success"]:
-        ...     print(f"Prowizja: {summary['commission']} PLN")
-        ...     print(f"Suma oplat: {summary['total_fees']} PLN")
+    Zagreguj wpisy billingowe jednego zamowienia do podsumowania oplat.
+
+    Wspolne dla odczytu z API (``get_order_billing_summary``) i z lokalnej
+    ksiegi ``billing_entries``. Struktura wyniku jak w
+    ``get_order_billing_summary``; ``error`` oznacza nieudane pobranie wpisow.
     """
     result = {
         "success": False,
@@ -239,11 +215,9 @@ def get_order_billing_summary(
         "fee_details": [],
         "error": None,
     }
-    started_at = time.perf_counter()
-    
-    try:
-        data = fetch_billing_entries(access_token, order_id=order_id)
-        entries = data.get("billingEntries", [])
+    if error is not None:
+        result["error"] = error
+    else:
         result["entries"] = entries
         
         for entry in entries:
@@ -316,26 +290,6 @@ def get_order_billing_summary(
         )
         
         result["success"] = True
-        logger.info(
-            "Allegro billing summary success: order_id=%s entries=%s commission=%s shipping=%s promo=%s other=%s total_fees=%s elapsed_ms=%.1f",
-            order_id,
-            len(entries),
-            result["commission"],
-            result["shipping_fee"],
-            result["promo_fee"],
-            result["other_fees"],
-            result["total_fees"],
-            (time.perf_counter() - started_at) * 1000,
-        )
-        
-    except Exception as e:
-        result["error"] = str(e)
-        logger.warning(
-            "Allegro billing summary failed: order_id=%s error=%s elapsed_ms=%.1f",
-            order_id,
-            e,
-            (time.perf_counter() - started_at) * 1000,
-        )
     
     if result["shipping_fee"] == Decimal("0") and delivery_method and order_value:
         estimate = estimate_allegro_shipping_cost(delivery_method, order_value)
@@ -353,6 +307,85 @@ def get_order_billing_summary(
         result["shipping_fee_estimated"] = None
         result["total_fees_with_estimate"] = result["total_fees"]
 
+    return result
+
+
+def get_order_billing_summary(
+    access_token: str, 
+    order_id: str,
+    delivery_method: Optional[str] = None,
+    order_value: Optional[Decimal] = None
+) -> dict:
+    """
+    Pobierz podsumowanie kosztow billingowych dla zamowienia.
+    
+    Agreguje wszystkie wpisy billingowe dla danego zamowienia i zwraca
+    podsumowanie z podzilem na typy oplat. Jesli API nie zwroci kosztu wysylki,
+    a podano delivery_method i order_value, szacuje koszt na podstawie tabeli Allegro Smart.
+    
+    Args:
+        access_token: Token dostepu Allegro OAuth
+        order_id: UUID zamowienia (format: "29738e61-7f6a-11e8-ac45-09db60ede9d6")
+        delivery_method: Opcjonalna nazwa metody dostawy do szacowania
+        order_value: Opcjonalna wartosc zamowienia do szacowania
+    
+    Returns:
+        dict: Slownik z podsumowaniem kosztow:
+        {
+            "success": True/False,
+            "commission": Decimal - prowizja od sprzedazy,
+            "listing_fee": Decimal - oplata za wystawienie,
+            "shipping_fee": Decimal - koszty wysylki,
+            "promo_fee": Decimal - oplaty promocyjne,
+            "other_fees": Decimal - pozostale oplaty,
+            "total_fees": Decimal - suma wszystkich oplat,
+            "refunds": Decimal - zwroty (wartosci dodatnie),
+            "entries": list - surowe wpisy billingowe,
+            "fee_details": list - szczegoly oplat z nazwami,
+            "error": str - komunikat bledu (jesli success=False)
+        }
+    
+    Example:
+        >>> summary = get_order_billing_summary(token, "29738e61-7f6a-11e8-ac45-09db60ede9d6")
+        >>> if summary["success"]:
+        ...     print(f"Prowizja: {summary['commission']} PLN")
+        ...     print(f"Suma oplat: {summary['total_fees']} PLN")
+    """
+    started_at = time.perf_counter()
+    entries: list = []
+    error = None
+
+    try:
+        data = fetch_billing_entries(access_token, order_id=order_id)
+        entries = data.get("billingEntries", [])
+    except Exception as e:
+        error = str(e)
+        logger.warning(
+            "Allegro billing summary failed: order_id=%s error=%s elapsed_ms=%.1f",
+            order_id,
+            e,
+            (time.perf_counter() - started_at) * 1000,
+        )
+
+    result = build_billing_summary(
+        entries,
+        delivery_method=delivery_method,
+        order_value=order_value,
+        error=error,
+    )
+    if result["success"]:
+        logger.info(
+            "Allegro billing summary success: order_id=%s entries=%s commission=%s shipping=%s promo=%s other=%s total_fees=%s elapsed_ms=%.1f",
+            order_id,
+            len(entries),
+            result["commission"],
+            result["shipping_fee"],
+            result["promo_fee"],
+            result["other_fees"],
+            result["total_fees"],
+            (time.perf_counter() - started_at) * 1000,
+        )
+
     logger.info(
         "Allegro billing summary finalized: order_id=%s success=%s entries=%s total_fees=%s total_fees_with_estimate=%s shipping_estimated=%s total_elapsed_ms=%.1f",
         order_id,
@@ -12,6 +12,7 @@ from typing import Optional
 from requests import Response
 from requests.exceptions import HTTPError, RequestException
 
+from .. import http_transport
 from ..env_tokens import empty_allegro_token_values
 from ..settings_store import settings_store
 from ..metrics import (
@@ -141,6 +142,8 @@ def _request_with_retry(method, url: str, *, endpoint: str, **kwargs) -> Respons
     attempt = 0
     backoff = 1.0
     method_name = getattr(method, "__name__", str(method)).upper()
+    # Funkcje modulu requests trafiaja do wspolnej sesji z pula keep-alive.
+    method = http_transport.resolve(http_transport.ALLEGRO, method)
     expected_statuses = set(kwargs.pop("expected_statuses", ()) or ())
     # Wstrzyknij User-Agent do kazdego requestu do API Allegro
     headers = kwargs.get("headers") or {}
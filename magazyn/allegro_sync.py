@@ -4,17 +4,21 @@ import re
 import unicodedata
 from decimal import Decimal, InvalidOperation
 from collections.abc import Mapping
+from typing import Optional
 from urllib.parse import urlparse, parse_qs
 
 from requests.exceptions import HTTPError
-from sqlalchemy import or_
 
 from . import allegro_api
 from .models.allegro import AllegroOffer
-from .models.products import Product, ProductSize
+from .models.products import ProductSize
 from .db import get_session
 from .parsing import parse_offer_title, normalize_color
-from .services.order_sync import match_product_to_warehouse
+from .services.product_match_index import (
+    IndexedProductSize,
+    ProductMatchIndex,
+    get_product_match_index,
+)
 from .env_tokens import clear_allegro_tokens, empty_allegro_token_values, update_allegro_tokens
 from .metrics import ALLEGRO_SYNC_ERRORS_TOTAL
 from .domain import allegro_prices
@@ -76,6 +80,52 @@ def _invalidate_access_token():
         _raise_settings_store_read_only(exc)
 
 
+def _match_offer(
+    match_index: ProductMatchIndex, offer_id, title: str, offer_ean: Optional[str]
+) -> Optional[IndexedProductSize]:
+    """Dopasuj oferte do rozmiaru: EAN, dokladna nazwa, seria/kolor/rozmiar."""
+    # Try to match by EAN first (most reliable)
+    if offer_ean:
+        matched = match_index.by_barcode(offer_ean)
+        if matched:
+            logger.debug(f"Matched offer {offer_id} by EAN {offer_ean}")
+            return matched
+
+    # If no EAN match, try by name/color/size
+    name, color, size = parse_offer_title(title)
+    color = normalize_color(color)
+    normalized_offer_color_key = _normalize_color_key(color)
+    candidates = match_index.by_name_and_size(name, size)
+
+    if color:
+        for candidate in candidates:
+            if not candidate.color.strip():
+                continue
+            normalized_product_color = normalize_color(candidate.color)
+            if _normalize_color_key(normalized_product_color) == normalized_offer_color_key:
+                return candidate
+        if normalized_offer_color_key:
+            for candidate in candidates:
+                component_keys = _normalized_product_color_components(candidate.color)
+                if normalized_offer_color_key in component_keys:
+                    return candidate
+    else:
+        uncolored = [candidate for candidate in candidates if not candidate.color]
+        if uncolored:
+            return uncolored[0]
+
+    if name and size:
+        matched = match_index.match(name, color or "", size)
+        if matched:
+            logger.debug(
+                "Matched offer %s by series/color/size: %s",
+                offer_id,
+                title[:80],
+            )
+        return matched
+    return None
+
+
 def sync_offers():
     """Synchronize offers from Allegro with local database.
 
@@ -127,6 +177,7 @@ def sync_offers():
     synced_offer_ids: set[str] = set()  # Zbior ID ofert z API
 
     with get_session() as session:
+        match_index = get_product_match_index(session, check_version=True)
         while True:
             try:
                 data = allegro_api.fetch_offers(token, offset=offset, limit=limit)
@@ -236,73 +287,11 @@ def sync_offers():
 
                 title = offer.get("name") or offer.get("title", "")
                 
-                # Try to match by EAN first (most reliable)
-                product_size = None
                 offer_ean = offer.get("ean", "").strip() or None
-                if offer_ean:
-                    product_size = (
-                        session.query(ProductSize)
-                        .filter(ProductSize.barcode == offer_ean)
-                        .first()
-                    )
-                    if product_size:
-                        logger.debug(f"Matched offer {offer.get('id')} by EAN {offer_ean}")
-                
-                # If no EAN match, try by name/color/size
-                if not product_size:
-                    name, color, size = parse_offer_title(title)
-                    color = normalize_color(color)
-                    normalized_offer_color_key = _normalize_color_key(color)
-
-                    base_query = (
-                        session.query(ProductSize)
-                        .join(Product)
-                        .filter(Product.name == name, ProductSize.size == size)
-                    )
-
-                    if color:
-                        product_sizes = base_query.all()
-                    else:
-                        product_sizes = (
-                            base_query.filter(
-                                or_(Product.color == "", Product.color.is_(None))
-                            ).all()
-                        )
-
-                    if color:
-                        for candidate in product_sizes:
-                            product_color_value = candidate.product.color or ""
-                            if not product_color_value.strip():
-                                continue
-                            normalized_product_color = normalize_color(product_color_value)
-                            if (
-                                _normalize_color_key(normalized_product_color)
-                                == normalized_offer_color_key
-                            ):
-                                product_size = candidate
-                                break
-                        if not product_size and normalized_offer_color_key:
-                            for candidate in product_sizes:
-                                product_color_value = candidate.product.color or ""
-                                component_keys = _normalized_product_color_components(
-                                    product_color_value
-                                )
-                                if normalized_offer_color_key in component_keys:
-                                    product_size = candidate
-                                    break
-                    else:
-                        product_size = product_sizes[0] if product_sizes else None
-
-                if not product_size and name and size:
-                    product_size = match_product_to_warehouse(
-                        session, name, color or "", size
-                    )
-                    if product_size:
-                        logger.debug(
-                            "Matched offer %s by series/color/size: %s",
-                            offer.get("id"),
-                            title[:80],
-                        )
+                matched = _match_offer(match_index, offer.get("id"), title, offer_ean)
+                product_size = (
+                    session.get(ProductSize, matched.ps_id) if matched else None
+                )
 
                 product_id = product_size.product_id if product_size else None
                 product_size_id = product_size.id if product_size else None
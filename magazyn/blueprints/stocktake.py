@@ -4,11 +4,13 @@ Blueprint remanentu - inwentaryzacja z ciąglym skanowaniem kodow kreskowych.
 Funkcjonalnosc:
 - Rozpoczecie nowej sesji remanentu
 - Ciagly skan EAN z potwierdzeniem TTS
+- Wsadowe przyjecie skanow zbuforowanych offline (klucze idempotencji)
 - Cofnij ostatni skan
 - Zakonczenie remanentu i generowanie raportu
 - Eksport raportu do PDF
 """
 import logging
+from collections import Counter, defaultdict
 from datetime import datetime
 
 from flask import (
@@ -22,17 +24,153 @@ from flask import (
     session,
     make_response,
 )
-from sqlalchemy import func
+from sqlalchemy import case, func, insert, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
 
 from ..db import get_session
 from ..auth import login_required
 from ..models.products import ProductSize
-from ..models.stocktakes import Stocktake, StocktakeItem
+from ..models.stocktakes import Stocktake, StocktakeItem, StocktakeScan
 
 logger = logging.getLogger(__name__)
 
 bp = Blueprint("stocktake", __name__)
 
+# Gorny limit skanow w jednym wsadzie z terminala (dluzsza kolejka -> kilka wsadow).
+MAX_BATCH_SCANS = 500
+
+
+def _summary(st):
+    """Podsumowanie remanentu z licznikow przyrostowych."""
+    return {
+        "total_products": st.total_products,
+        "scanned_products": st.scanned_products,
+        "total_scanned": st.total_scanned,
+    }
+
+
+def _bump_counters(db, st, tally):
+    """Przesun liczniki remanentu atomowym UPDATE w transakcji skanu."""
+    if not any(tally.values()):
+        return
+    db.flush()
+    db.execute(
+        update(Stocktake)
+        .where(Stocktake.id == st.id)
+        .values(
+            total_products=Stocktake.total_products + tally["products"],
+            scanned_products=Stocktake.scanned_products + tally["scanned_products"],
+            total_scanned=Stocktake.total_scanned + tally["scans"],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.refresh(st, ["total_products", "scanned_products", "total_scanned"])
+
+
+def _new_item(db, stocktake_id, ps, tally):
+    """Pozycja dla produktu spoza listy startowej (bez kodu w momencie startu)."""
+    item = StocktakeItem(
+        stocktake_id=stocktake_id,
+        product_size_id=ps.id,
+        expected_qty=ps.quantity,
+        scanned_qty=0,
+    )
+    db.add(item)
+    tally["products"] += 1
+    return item
+
+
+def _increment_item(db, item, count, scanned_at, tally):
+    """Dolicz ``count`` skanow atomowym UPDATE; zwraca stan pozycji sprzed skanow.
+
+    Licznik rosnie w bazie (nie read-modify-write w ORM), wiec dwa terminale
+    skanujace te sama pozycje nie gubia skanu, a liczniki remanentu wynikaja
+    z wartosci zwroconej przez baze.
+    """
+    scanned_qty, latest = db.execute(
+        update(StocktakeItem)
+        .where(StocktakeItem.id == item.id)
+        .values(
+            scanned_qty=StocktakeItem.scanned_qty + count,
+            scanned_at=case(
+                (
+                    or_(StocktakeItem.scanned_at.is_(None), StocktakeItem.scanned_at < scanned_at),
+                    scanned_at,
+                ),
+                else_=StocktakeItem.scanned_at,
+            ),
+        )
+        .returning(StocktakeItem.scanned_qty, StocktakeItem.scanned_at)
+        .execution_options(synchronize_session=False)
+    ).one()
+    set_committed_value(item, "scanned_qty", scanned_qty)
+    set_committed_value(item, "scanned_at", latest)
+    before = scanned_qty - count
+    if before <= 0 < scanned_qty:
+        tally["scanned_products"] += 1
+    tally["scans"] += count
+    return before
+
+
+def _claim_scan_keys(db, stocktake_id, claims):
+    """Zapisz klucze skanow ``(klucz, kod, czas)``; zwraca przyjete skany po kluczu.
+
+    Klucz zapisany juz przez rownolegle zapytanie (ponowienie tego samego
+    skanu) konczy sie naruszeniem ``uq_stocktake_scans_key`` - taki skan jest
+    duplikatem, a nie bledem. Klucz jest zapisywany przed utworzeniem pozycji,
+    wiec pozycje przypina wywolujacy (``stocktake_item_id``) dopiero dla skanow
+    przyjetych.
+    """
+    def scan(key, barcode, scanned_at):
+        return StocktakeScan(
+            stocktake_id=stocktake_id,
+            scan_key=key,
+            barcode=barcode,
+            scanned_at=scanned_at,
+        )
+
+    if not claims:
+        return {}
+    try:
+        with db.begin_nested():
+            scans = {claim[0]: scan(*claim) for claim in claims}
+            db.add_all(scans.values())
+            db.flush()
+        return scans
+    except IntegrityError:
+        pass
+    claimed = {}
+    for claim in claims:
+        try:
+            with db.begin_nested():
+                row = scan(*claim)
+                db.add(row)
+                db.flush()
+        except IntegrityError:
+            continue
+        claimed[claim[0]] = row
+    return claimed
+
+
+def _scan_key(data):
+    """Klucz idempotencji skanu nadany przez terminal (``scan_id``)."""
+    key = data.get("scan_id")
+    if key is None:
+        return None
+    return str(key).strip() or None
+
+
+def _scan_time(value):
+    """Czas skanu z terminala (ISO 8601); brak lub bledna wartosc -> teraz."""
+    try:
+        scanned_at = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return datetime.now()
+    if scanned_at.tzinfo is not None:
+        scanned_at = scanned_at.astimezone().replace(tzinfo=None)
+    return scanned_at
+
 
 @bp.route("/stocktake")
 @login_required
@@ -44,19 +182,21 @@ def stocktake_list():
             .order_by(Stocktake.started_at.desc())
             .all()
         )
+        discrepancies = dict(
+            db.query(StocktakeItem.stocktake_id, func.count(StocktakeItem.id))
+            .filter(StocktakeItem.scanned_qty != StocktakeItem.expected_qty)
+            .group_by(StocktakeItem.stocktake_id)
+            .all()
+        )
         items = []
         for st in stocktakes:
-            total_items = len(st.items)
-            discrepancies = sum(
-                1 for item in st.items if item.scanned_qty != item.expected_qty
-            )
             items.append({
                 "id": st.id,
                 "started_at": st.started_at,
                 "finished_at": st.finished_at,
                 "status": st.status,
-                "total_items": total_items,
-                "discrepancies": discrepancies,
+                "total_items": st.total_products,
+                "discrepancies": discrepancies.get(st.id, 0),
                 "notes": st.notes,
             })
     return render_template("stocktake_list.html", stocktakes=items)
@@ -87,19 +227,25 @@ def stocktake_new():
 
         # Zapisz oczekiwane ilosci ze stanu magazynowego
         sizes = (
-            db.query(ProductSize)
+            db.query(ProductSize.id, ProductSize.quantity)
             .filter(ProductSize.barcode.isnot(None))
             .filter(ProductSize.barcode != "")
             .all()
         )
-        for ps in sizes:
-            item = StocktakeItem(
-                stocktake_id=st.id,
-                product_size_id=ps.id,
-                expected_qty=ps.quantity,
-                scanned_qty=0,
+        if sizes:
+            db.execute(
+                insert(StocktakeItem),
+                [
+                    {
+                        "stocktake_id": st.id,
+                        "product_size_id": ps_id,
+                        "expected_qty": quantity,
+                        "scanned_qty": 0,
+                    }
+                    for ps_id, quantity in sizes
+                ],
             )
-            db.add(item)
+        st.total_products = len(sizes)
 
         stocktake_id = st.id
 
@@ -118,17 +264,12 @@ def stocktake_scan(stocktake_id):
         if st.status != "in_progress":
             return redirect(url_for("stocktake.stocktake_report", stocktake_id=stocktake_id))
 
-        # Zbierz podsumowanie
-        total_products = len(st.items)
-        scanned_products = sum(1 for item in st.items if item.scanned_qty > 0)
-        total_scanned = sum(item.scanned_qty for item in st.items)
+        summary = _summary(st)
 
     return render_template(
         "stocktake_scan.html",
         stocktake_id=stocktake_id,
-        total_products=total_products,
-        scanned_products=scanned_products,
-        total_scanned=total_scanned,
+        **summary,
         barcode_endpoint=url_for('stocktake.stocktake_barcode_scan', stocktake_id=stocktake_id),
         barcode_mode='product',
     )
@@ -137,9 +278,14 @@ def stocktake_scan(stocktake_id):
 @bp.route("/stocktake/<int:stocktake_id>/barcode_scan", methods=["POST"])
 @login_required
 def stocktake_barcode_scan(stocktake_id):
-    """Endpoint skanowania kodu EAN podczas remanentu."""
+    """Endpoint skanowania kodu EAN podczas remanentu.
+
+    Opcjonalny ``scan_id`` czyni skan idempotentnym - ponowienie tego samego
+    zapytania zwraca stan pozycji bez ponownego doliczenia.
+    """
     data = request.get_json(silent=True) or {}
     barcode = (data.get("barcode") or "").strip()
+    scan_key = _scan_key(data)
 
     if not barcode:
         return jsonify({"error": "Brak kodu kreskowego"}), 400
@@ -163,26 +309,33 @@ def stocktake_barcode_scan(stocktake_id):
 
         product = ps.product
 
+        # Klucz skanu przed pozycja: ponowiony skan nie tworzy pozycji ani nie
+        # podbija licznika produktow.
+        scanned_at = datetime.now()
+        claimed = {}
+        if scan_key is not None:
+            claimed = _claim_scan_keys(db, stocktake_id, [(scan_key, barcode, scanned_at)])
+        duplicate = scan_key is not None and not claimed
+
         # Znajdz lub stworz pozycje remanentu
         item = (
             db.query(StocktakeItem)
             .filter_by(stocktake_id=stocktake_id, product_size_id=ps.id)
             .first()
         )
-        if not item:
-            # Produkt bez kodu w momencie startu remanentu - dodaj
-            item = StocktakeItem(
-                stocktake_id=stocktake_id,
-                product_size_id=ps.id,
-                expected_qty=ps.quantity,
-                scanned_qty=0,
-            )
-            db.add(item)
+        tally = Counter()
+        if item is None:
+            if duplicate:
+                # Pozycje zalozylo pierwsze, przyjete zapytanie - takiego stanu
+                # nie ma, tylko gdy pozycje usunieto od tamtej pory.
+                return jsonify({"error": "Skan juz przyjety, brak pozycji remanentu"}), 409
+            item = _new_item(db, stocktake_id, ps, tally)
             db.flush()
-
-        item.scanned_qty += 1
-        item.scanned_at = datetime.now()
-        db.flush()
+        if not duplicate:
+            _increment_item(db, item, 1, scanned_at, tally)
+            for scan in claimed.values():
+                scan.stocktake_item_id = item.id
+        _bump_counters(db, st, tally)
 
         scanned = item.scanned_qty
         expected = item.expected_qty
@@ -207,20 +360,6 @@ def stocktake_barcode_scan(stocktake_id):
         else:
             tts_message = f"{tts_name}. {scanned} z {expected}"
 
-        # Zbierz podsumowanie
-        total_products = db.query(StocktakeItem).filter_by(stocktake_id=stocktake_id).count()
-        scanned_products = (
-            db.query(StocktakeItem)
-            .filter_by(stocktake_id=stocktake_id)
-            .filter(StocktakeItem.scanned_qty > 0)
-            .count()
-        )
-        total_scanned = (
-            db.query(func.sum(StocktakeItem.scanned_qty))
-            .filter_by(stocktake_id=stocktake_id)
-            .scalar() or 0
-        )
-
         logger.info("[STOCKTAKE_SCAN] id=%s EAN: %s -> %s %s %s, scanned=%s expected=%s",
                     stocktake_id, barcode, product.series or product.name, ps.size or "", product.color or "", scanned, expected)
         return jsonify({
@@ -235,9 +374,130 @@ def stocktake_barcode_scan(stocktake_id):
             "scanned_qty": scanned,
             "expected_qty": expected,
             "item_id": item.id,
-            "total_products": total_products,
-            "scanned_products": scanned_products,
-            "total_scanned": total_scanned,
+            "duplicate": duplicate,
+            **_summary(st),
+        })
+
+
+@bp.route("/stocktake/<int:stocktake_id>/barcode_scan/batch", methods=["POST"])
+@login_required
+def stocktake_barcode_scan_batch(stocktake_id):
+    """Wsadowe przyjecie skanow zbuforowanych na terminalu bez sieci.
+
+    Oczekuje ``{"scans": [{"scan_id", "barcode", "scanned_at"}, ...]}``.
+    Skan o kluczu juz przyjetym jest pomijany, wiec terminal moze bezpiecznie
+    ponowic wysylke calej kolejki po zerwanym polaczeniu. Liczba zapytan nie
+    zalezy od liczby pozycji remanentu - jeden UPDATE na skanowana pozycje.
+    """
+    data = request.get_json(silent=True) or {}
+    scans = data.get("scans")
+    if not isinstance(scans, list) or not scans:
+        return jsonify({"error": "Brak skanow"}), 400
+    if len(scans) > MAX_BATCH_SCANS:
+        return jsonify({
+            "error": f"Maksymalnie {MAX_BATCH_SCANS} skanow w jednym wsadzie"
+        }), 400
+
+    entries = []
+    for scan in scans:
+        scan = scan if isinstance(scan, dict) else {}
+        entries.append((
+            _scan_key(scan),
+            (scan.get("barcode") or "").strip(),
+            _scan_time(scan.get("scanned_at")),
+        ))
+
+    with get_session() as db:
+        st = db.get(Stocktake, stocktake_id)
+        if not st or st.status != "in_progress":
+            return jsonify({"error": "Remanent nie jest aktywny"}), 400
+
+        keys = {key for key, _, _ in entries if key}
+        seen = set()
+        if keys:
+            seen.update(
+                key for (key,) in db.query(StocktakeScan.scan_key)
+                .filter(StocktakeScan.stocktake_id == stocktake_id)
+                .filter(StocktakeScan.scan_key.in_(keys))
+            )
+        sizes = {}
+        barcodes = {barcode for _, barcode, _ in entries if barcode}
+        if barcodes:
+            for ps in db.query(ProductSize).filter(ProductSize.barcode.in_(barcodes)):
+                sizes.setdefault(ps.barcode, ps)
+        items = {}
+        if sizes:
+            items = {
+                item.product_size_id: item
+                for item in db.query(StocktakeItem)
+                .filter(StocktakeItem.stocktake_id == stocktake_id)
+                .filter(StocktakeItem.product_size_id.in_([ps.id for ps in sizes.values()]))
+            }
+
+        results = []
+        candidates = []
+        for key, barcode, scanned_at in entries:
+            result = {"scan_id": key, "barcode": barcode}
+            results.append(result)
+            if not key or not barcode:
+                result["status"] = "invalid"
+                continue
+            if key in seen:
+                result["status"] = "duplicate"
+                continue
+            seen.add(key)
+            ps = sizes.get(barcode)
+            if ps is None:
+                # Bez zapisu klucza - po dodaniu kodu ponowiony skan zostanie przyjety.
+                result["status"] = "not_found"
+                continue
+            candidates.append((result, key, barcode, scanned_at, ps))
+
+        claimed = _claim_scan_keys(db, stocktake_id, [
+            (key, barcode, scanned_at)
+            for _, key, barcode, scanned_at, _ in candidates
+        ])
+
+        # Pozycje spoza listy startowej tylko dla przyjetych skanow.
+        tally = Counter()
+        by_item = defaultdict(list)
+        for result, key, _, scanned_at, ps in candidates:
+            if key not in claimed:
+                result["status"] = "duplicate"
+                continue
+            if ps.id not in items:
+                items[ps.id] = _new_item(db, stocktake_id, ps, tally)
+            by_item[ps.id].append((result, key, scanned_at))
+        db.flush()
+
+        # Jeden UPDATE na pozycje, niezaleznie od liczby jej skanow we wsadzie.
+        for ps_id, scans in by_item.items():
+            item = items[ps_id]
+            before = _increment_item(
+                db, item, len(scans), max(scanned_at for _, _, scanned_at in scans), tally
+            )
+            for offset, (result, key, _) in enumerate(scans, 1):
+                claimed[key].stocktake_item_id = item.id
+                result.update(
+                    status="ok",
+                    item_id=item.id,
+                    scanned_qty=before + offset,
+                    expected_qty=item.expected_qty,
+                )
+        _bump_counters(db, st, tally)
+
+        statuses = Counter(result["status"] for result in results)
+        logger.info(
+            "[STOCKTAKE_BATCH] id=%s scans=%s ok=%s duplicate=%s not_found=%s invalid=%s",
+            stocktake_id, len(entries), statuses["ok"], statuses["duplicate"],
+            statuses["not_found"], statuses["invalid"],
+        )
+        return jsonify({
+            "success": True,
+            "accepted": statuses["ok"],
+            "duplicates": statuses["duplicate"],
+            "results": results,
+            **_summary(st),
         })
 
 
@@ -262,8 +522,21 @@ def stocktake_undo(stocktake_id):
         if not last_item:
             return jsonify({"error": "Brak skanow do cofniecia"}), 400
 
-        last_item.scanned_qty -= 1
-        db.flush()
+        scanned_qty = db.execute(
+            update(StocktakeItem)
+            .where(StocktakeItem.id == last_item.id, StocktakeItem.scanned_qty > 0)
+            .values(scanned_qty=StocktakeItem.scanned_qty - 1)
+            .returning(StocktakeItem.scanned_qty)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+        if scanned_qty is None:
+            # Rownolegle cofniecie zdjelo juz ostatni skan tej pozycji.
+            return jsonify({"error": "Brak skanow do cofniecia"}), 400
+        set_committed_value(last_item, "scanned_qty", scanned_qty)
+        tally = Counter(scans=-1)
+        if not scanned_qty:
+            tally["scanned_products"] -= 1
+        _bump_counters(db, st, tally)
 
         ps = db.get(ProductSize, last_item.product_size_id)
         product = ps.product if ps else None
@@ -285,20 +558,6 @@ def stocktake_undo(stocktake_id):
         scanned = last_item.scanned_qty
         expected = last_item.expected_qty
 
-        # Podsumowanie
-        total_products = db.query(StocktakeItem).filter_by(stocktake_id=stocktake_id).count()
-        scanned_products = (
-            db.query(StocktakeItem)
-            .filter_by(stocktake_id=stocktake_id)
-            .filter(StocktakeItem.scanned_qty > 0)
-            .count()
-        )
-        total_scanned = (
-            db.query(func.sum(StocktakeItem.scanned_qty))
-            .filter_by(stocktake_id=stocktake_id)
-            .scalar() or 0
-        )
-
         return jsonify({
             "success": True,
             "message": f"Cofnieto skan: {product_name} {size} {color}",
@@ -306,9 +565,7 @@ def stocktake_undo(stocktake_id):
             "tts_name": tts_name,
             "scanned_qty": scanned,
             "expected_qty": expected,
-            "total_products": total_products,
-            "scanned_products": scanned_products,
-            "total_scanned": total_scanned,
+            **_summary(st),
         })
 
 
@@ -399,17 +656,20 @@ def stocktake_apply(stocktake_id):
 
         from ..services.stock_adjust import apply_stock_adjustment
 
-        updated = 0
-        for item in st.items:
-            if item.scanned_qty != item.expected_qty:
-                ps = db.get(ProductSize, item.product_size_id)
-                if ps:
-                    # Nadwyzka -> doksiegowanie po biezacej sredniej; brak ->
-                    # zdjecie po sredniej. Remanent to korekta liczby, nie zakup.
-                    apply_stock_adjustment(
-                        ps, set_to=item.scanned_qty, reason="stocktake"
-                    )
-                    updated += 1
+        # Tylko rozbieznosci, razem z rozmiarami jednym zapytaniem; zmiany
+        # stanow ida do bazy wspolnym flushem przy zamknieciu sesji.
+        differences = (
+            db.query(StocktakeItem.scanned_qty, ProductSize)
+            .join(ProductSize, ProductSize.id == StocktakeItem.product_size_id)
+            .filter(StocktakeItem.stocktake_id == stocktake_id)
+            .filter(StocktakeItem.scanned_qty != StocktakeItem.expected_qty)
+            .all()
+        )
+        for scanned_qty, ps in differences:
+            # Nadwyzka -> doksiegowanie po biezacej sredniej; brak ->
+            # zdjecie po sredniej. Remanent to korekta liczby, nie zakup.
+            apply_stock_adjustment(ps, set_to=scanned_qty, reason="stocktake")
+        updated = len(differences)
 
         st.status = "applied"
 
@@ -7,6 +7,7 @@ __all__ = [
     "invoice_import",
     "allegro_prices",
     "financial",
+    "profit_batch",
     "dashboard",
     "exceptions",
     "price_report_profit",
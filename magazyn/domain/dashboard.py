@@ -11,14 +11,14 @@ import logging
 import time
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import desc, func, or_, select
+from sqlalchemy import desc, func
 from sqlalchemy.orm import Session, joinedload
 
-from ..db import is_postgres
 from ..models.allegro import AllegroOffer
 from ..models.orders import Order, OrderProduct
 from ..models.products import Product, ProductSize, PurchaseBatch
 from ..models.returns import Return
+from ..services import order_rollup
 from .financial import FinancialCalculator
 
 
@@ -129,6 +129,82 @@ class SalesRecordsStats:
     max_profit_month: Optional[str] = None
 
 
+_IN_CHUNK_SIZE = 500
+
+
+class ProductResolver:
+    """Cache wariantow, produktow i ofert wspoldzielony przez widgety zadania.
+
+    Widget zbiera wszystkie potrzebne identyfikatory, a brakujace w cache
+    laduje jednym zapytaniem IN z dolaczonym produktem (joinedload). Brak
+    rekordu tez jest zapamietywany, wiec kolejne widgety nie pytaja ponownie.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._sizes: Dict[int, Optional[ProductSize]] = {}
+        self._sizes_by_barcode: Dict[str, Optional[ProductSize]] = {}
+        self._offers: Dict[str, Optional[AllegroOffer]] = {}
+
+    def _load(self, cache: Dict[Any, Any], keys, query, key_of) -> Dict[Any, Any]:
+        keys = [key for key in dict.fromkeys(keys) if key is not None]
+        missing = [key for key in keys if key not in cache]
+        for start in range(0, len(missing), _IN_CHUNK_SIZE):
+            chunk = missing[start:start + _IN_CHUNK_SIZE]
+            for obj in query(chunk):
+                cache.setdefault(key_of(obj), obj)
+            for key in chunk:
+                cache.setdefault(key, None)
+        return {key: cache[key] for key in keys}
+
+    def sizes(self, size_ids) -> Dict[int, Optional[ProductSize]]:
+        """Warianty (z produktem) po ``ProductSize.id``."""
+        return self._load(
+            self._sizes,
+            size_ids,
+            lambda chunk: self.db.query(ProductSize)
+            .options(joinedload(ProductSize.product))
+            .filter(ProductSize.id.in_(chunk))
+            .all(),
+            lambda size: size.id,
+        )
+
+    def sizes_by_barcode(self, barcodes) -> Dict[str, Optional[ProductSize]]:
+        """Warianty (z produktem) po kodzie EAN."""
+        found = self._load(
+            self._sizes_by_barcode,
+            barcodes,
+            lambda chunk: self.db.query(ProductSize)
+            .options(joinedload(ProductSize.product))
+            .filter(ProductSize.barcode.in_(chunk))
+            .all(),
+            lambda size: size.barcode,
+        )
+        for size in found.values():
+            if size is not None:
+                self._sizes.setdefault(size.id, size)
+        return found
+
+    def offers(self, offer_ids) -> Dict[str, Optional[AllegroOffer]]:
+        """Oferty Allegro z wariantem i produktem po ``offer_id``."""
+        found = self._load(
+            self._offers,
+            offer_ids,
+            lambda chunk: self.db.query(AllegroOffer)
+            .options(
+                joinedload(AllegroOffer.product_size).joinedload(ProductSize.product),
+                joinedload(AllegroOffer.product),
+            )
+            .filter(AllegroOffer.offer_id.in_(chunk))
+            .all(),
+            lambda offer: offer.offer_id,
+        )
+        for offer in found.values():
+            if offer is not None and offer.product_size is not None:
+                self._sizes.setdefault(offer.product_size.id, offer.product_size)
+        return found
+
+
 class DashboardService:
     """
     Serwis do pobierania danych dashboardu.
@@ -143,69 +219,48 @@ class DashboardService:
         self.db = db
         self.settings = settings_store
         self.time_ranges = TimeRanges.create()
+        self.products = ProductResolver(db)
     
+    def _rollup_days(self):
+        """Dni poczatku zakresow (dzis, tydzien, miesiac, poprzedni tydzien)."""
+        today = self.time_ranges.now.date()
+        week_start = today - timedelta(days=today.weekday())
+        return today, week_start, today.replace(day=1), week_start - timedelta(days=7)
+
     def get_order_stats(self) -> OrderStats:
-        """Pobiera statystyki zamowien."""
-        tr = self.time_ranges
-        now_ts = int(tr.now.timestamp())
-        
-        orders_today = self.db.query(Order).filter(
-            Order.date_add >= tr.today_start,
-            Order.date_add <= now_ts,
-        ).count()
-        
-        orders_week = self.db.query(Order).filter(
-            Order.date_add >= tr.week_start_ts,
-            Order.date_add <= now_ts,
-        ).count()
-        
-        orders_month = self.db.query(Order).filter(
-            Order.date_add >= tr.month_start_ts,
-            Order.date_add <= now_ts,
-        ).count()
-        
-        pending_orders = self.db.query(Order).filter(
-            Order.delivery_package_nr.is_(None),
-            Order.date_add >= tr.month_start_ts,
-            Order.date_add <= now_ts,
-        ).count()
-        
+        """Pobiera statystyki zamowien (z dziennego rollupu)."""
+        today, week_start, month_start, _prev_week_start = self._rollup_days()
+        days = order_rollup.daily_totals(self.db, min(week_start, month_start), today)
+
+        def orders_since(day, measure="orders"):
+            return sum(getattr(item, measure) for key, item in days.items() if key >= day)
+
         return OrderStats(
-            today=orders_today,
-            week=orders_week,
-            month=orders_month,
-            pending=pending_orders
+            today=orders_since(today),
+            week=orders_since(week_start),
+            month=orders_since(month_start),
+            pending=orders_since(month_start, "awaiting_label"),
         )
     
     def get_revenue_stats(self) -> RevenueStats:
         """Pobiera statystyki przychodow.
         
         Uzywa payment_done (rzeczywiscie zaplacona kwota) zamiast price_brutto,
-        aby byc spojny z kalkulacja zysku. Wyklucza zwroty (completed).
+        aby byc spojny z kalkulacja zysku. Wyklucza zwroty (completed) - koszyk
+        ``paid`` rollupu.
         """
-        from sqlalchemy import select as sa_select
-        tr = self.time_ranges
-        
-        # Wyklucz zamowienia ze zwrotem completed (refundacja zrealizowana)
-        return_order_ids = sa_select(Return.order_id).where(
-            Return.status == 'completed'
-        ).distinct()
-        
-        def calc_revenue(from_timestamp: int) -> float:
-            result = self.db.query(
-                func.sum(Order.payment_done)
-            ).filter(
-                Order.date_add >= from_timestamp,
-                Order.date_add <= int(tr.now.timestamp()),
-                Order.payment_done > 0,
-                ~Order.order_id.in_(return_order_ids)
-            ).scalar()
-            return float(result or 0)
-        
+        today, week_start, month_start, _prev_week_start = self._rollup_days()
+        days = order_rollup.daily_totals(
+            self.db, min(week_start, month_start), today, (order_rollup.BUCKET_PAID,)
+        )
+
+        def revenue_since(day):
+            return float(sum(item.revenue for key, item in days.items() if key >= day))
+
         return RevenueStats(
-            today=calc_revenue(tr.today_start),
-            week=calc_revenue(tr.week_start_ts),
-            month=calc_revenue(tr.month_start_ts)
+            today=revenue_since(today),
+            week=revenue_since(week_start),
+            month=revenue_since(month_start),
         )
     
     def get_profit_stats(self, access_token: Optional[str] = None) -> Dict[str, Any]:
@@ -434,23 +489,26 @@ class DashboardService:
         .limit(limit)\
         .all()
         
-        latest_deliveries = []
-        for date, invoice, supplier, batch_count, total_qty, total_value in delivery_groups:
-            if not total_qty or total_qty == 0 or not total_value or total_value == 0:
-                continue
-            if not date or date == '0000-00-00':
-                continue
-            
-            # Szczegoly produktow w dostawie
-            products_in_delivery = self.db.query(PurchaseBatch, Product)\
+        groups = [
+            row for row in delivery_groups
+            if row.total_quantity and row.total_value
+            and row.purchase_date and row.purchase_date != '0000-00-00'
+        ]
+
+        # Szczegoly produktow wszystkich dostaw jednym zapytaniem
+        batches_by_group: Dict[tuple, list] = {}
+        if groups:
+            products_in_deliveries = self.db.query(PurchaseBatch, Product)\
                 .join(Product)\
-                .filter(
-                    PurchaseBatch.purchase_date == date,
-                    PurchaseBatch.invoice_number == invoice,
-                    PurchaseBatch.supplier == supplier
-                )\
+                .filter(PurchaseBatch.purchase_date.in_({row.purchase_date for row in groups}))\
+                .order_by(PurchaseBatch.id)\
                 .all()
-            
+            for batch, product in products_in_deliveries:
+                key = (batch.purchase_date, batch.invoice_number, batch.supplier)
+                batches_by_group.setdefault(key, []).append((batch, product))
+
+        latest_deliveries = []
+        for date, invoice, supplier, batch_count, total_qty, total_value in groups:
             product_details = [
                 {
                     'product_id': product.id,
@@ -461,7 +519,7 @@ class DashboardService:
                     'price': batch.price,
                     'value': batch.quantity * batch.price
                 }
-                for batch, product in products_in_delivery
+                for batch, product in batches_by_group.get((date, invoice, supplier), [])
             ]
             
             latest_deliveries.append({
@@ -504,11 +562,22 @@ class DashboardService:
             *date_filter
         ).group_by(OrderProduct.product_size_id).all()
 
-        for ps_id, qty, revenue, order_cnt in matched_q:
-            ps = self.db.query(ProductSize).filter(ProductSize.id == ps_id).first()
-            if not ps:
-                continue
-            prod = self.db.query(Product).filter(Product.id == ps.product_id).first()
+        # Do wyniku moze trafic najwyzej ``limit`` najlepszych wariantow, wiec
+        # rozwiazujemy tylko je (paczkami, gdy czesci wariantow juz nie ma).
+        ranked = sorted(matched_q, key=lambda row: int(row[1] or 0), reverse=True)
+        selected = []
+        for start in range(0, len(ranked), limit):
+            batch = ranked[start:start + limit]
+            sizes = self.products.sizes(ps_id for ps_id, *_rest in batch)
+            selected.extend((row, sizes[row[0]]) for row in batch if sizes[row[0]])
+            if len(selected) >= limit:
+                break
+        # Kolejnosc jak w zapytaniu - stabilne sortowanie nizej rozstrzyga remisy.
+        order = {row[0]: index for index, row in enumerate(matched_q)}
+        selected.sort(key=lambda item: order[item[0][0]])
+
+        for (ps_id, qty, revenue, order_cnt), ps in selected:
+            prod = ps.product
             series = prod.series if prod else None
             color = prod.color if prod else None
             size = ps.size
@@ -566,50 +635,67 @@ class DashboardService:
         ean: Optional[str]
     ) -> tuple:
         """Rozwiazuje informacje o produkcie na podstawie nazwy/EAN."""
-        product_id = None
-        series = None
-        color = None
-        size = None
-        
+        return self._resolve_product_infos([(order_name, ean)])[(order_name, ean)]
+
+    def _resolve_product_infos(self, pairs) -> Dict[tuple, tuple]:
+        """Wersja zbiorcza ``_resolve_product_info`` dla par (nazwa, EAN).
+
+        Zwraca ``{(nazwa, ean): (product_id, series, color, size)}``; stala
+        liczba zapytan niezaleznie od liczby par.
+        """
+        pairs = list(dict.fromkeys(pairs))
+        resolved: Dict[tuple, tuple] = {}
+
         # 1. Szukaj przez barcode/EAN
-        if ean:
-            ps = self.db.query(ProductSize).filter(ProductSize.barcode == ean).first()
+        by_barcode = self.products.sizes_by_barcode(ean for _name, ean in pairs if ean)
+        for pair in pairs:
+            ps = by_barcode.get(pair[1]) if pair[1] else None
             if ps:
-                product_id = ps.product_id
-                size = ps.size
-                prod = self.db.query(Product).filter(Product.id == ps.product_id).first()
-                if prod:
-                    series = prod.series
-                    color = prod.color
-        
+                prod = ps.product
+                resolved[pair] = (
+                    ps.product_id,
+                    prod.series if prod else None,
+                    prod.color if prod else None,
+                    ps.size,
+                )
+
         # 2. Fallback: znajdz auction_id i szukaj przez AllegroOffer
-        if not product_id:
-            op_with_auction = self.db.query(OrderProduct.auction_id)\
-                .filter(OrderProduct.name == order_name, OrderProduct.ean == ean)\
+        pending = [pair for pair in pairs if pair not in resolved]
+        auctions: Dict[tuple, str] = {}
+        names = list({name for name, _ean in pending})
+        for start in range(0, len(names), _IN_CHUNK_SIZE):
+            rows = self.db.query(OrderProduct.name, OrderProduct.ean, OrderProduct.auction_id)\
+                .filter(OrderProduct.name.in_(names[start:start + _IN_CHUNK_SIZE]))\
                 .filter(OrderProduct.auction_id.isnot(None))\
-                .first()
-            
-            if op_with_auction and op_with_auction.auction_id:
-                offer = self.db.query(AllegroOffer).filter(
-                    AllegroOffer.offer_id == op_with_auction.auction_id
-                ).first()
-                if offer and offer.product_size_id:
-                    ps = self.db.query(ProductSize).filter(ProductSize.id == offer.product_size_id).first()
-                    if ps:
-                        product_id = ps.product_id
-                        size = ps.size
-                        prod = self.db.query(Product).filter(Product.id == ps.product_id).first()
-                        if prod:
-                            series = prod.series
-                            color = prod.color
-                elif offer and offer.product_id:
-                    product_id = offer.product_id
-                    prod = self.db.query(Product).filter(Product.id == offer.product_id).first()
-                    if prod:
-                        series = prod.series
-                        color = prod.color
-        
-        return product_id, series, color, size
+                .order_by(OrderProduct.id)\
+                .all()
+            for name, ean, auction_id in rows:
+                auctions.setdefault((name, ean), auction_id)
+
+        offers = self.products.offers(auctions.get(pair) for pair in pending)
+        for pair in pending:
+            offer = offers.get(auctions.get(pair))
+            ps = offer.product_size if offer and offer.product_size_id else None
+            if ps:
+                prod = ps.product
+                resolved[pair] = (
+                    ps.product_id,
+                    prod.series if prod else None,
+                    prod.color if prod else None,
+                    ps.size,
+                )
+            elif offer and not offer.product_size_id and offer.product_id:
+                prod = offer.product
+                resolved[pair] = (
+                    offer.product_id,
+                    prod.series if prod else None,
+                    prod.color if prod else None,
+                    None,
+                )
+            else:
+                resolved[pair] = (None, None, None, None)
+
+        return resolved
     
     def get_slow_movers(self, limit: int = 10) -> List[Dict[str, Any]]:
         """Pobiera wolnoobrotowe produkty (duzy stan, mala sprzedaz)."""
@@ -651,25 +737,6 @@ class DashboardService:
             for name, color, size, qty, sold in slow_movers
         ]
     
-    def _paid_order_filter(self):
-        return or_(
-            Order.payment_done > 0,
-            Order.payment_method_cod.is_(True),
-        )
-
-    def _completed_return_order_ids(self):
-        return select(Return.order_id).where(Return.status == 'completed').distinct()
-
-    def _day_bucket_expr(self):
-        if is_postgres():
-            return func.to_char(func.to_timestamp(Order.date_add), 'YYYY-MM-DD')
-        return func.strftime('%Y-%m-%d', func.datetime(Order.date_add, 'unixepoch'))
-
-    def _month_bucket_expr(self):
-        if is_postgres():
-            return func.to_char(func.to_timestamp(Order.date_add), 'YYYY-MM')
-        return func.strftime('%Y-%m', func.datetime(Order.date_add, 'unixepoch'))
-
     @staticmethod
     def _format_day_label(day_key: str) -> str:
         year, month, day = day_key.split('-')
@@ -706,59 +773,27 @@ class DashboardService:
 
     def get_sales_records(self) -> SalesRecordsStats:
         """Pobiera rekordy sprzedazy dziennej i miesiecznej oraz najlepszy miesiac zysku."""
-        return_ids = self._completed_return_order_ids()
-        day_bucket = self._day_bucket_expr()
-        month_bucket = self._month_bucket_expr()
-        base_filters = (
-            Order.date_add.isnot(None),
-            self._paid_order_filter(),
-            ~Order.order_id.in_(return_ids),
-        )
+        days = order_rollup.daily_totals(self.db, buckets=(order_rollup.BUCKET_PAID,))
 
-        daily_rows = self.db.query(
-            day_bucket.label('day_key'),
-            func.sum(OrderProduct.quantity).label('qty'),
-        ).join(
-            Order, Order.order_id == OrderProduct.order_id
-        ).filter(
-            *base_filters
-        ).group_by(
-            day_bucket
-        ).all()
-
-        monthly_rows = self.db.query(
-            month_bucket.label('month_key'),
-            func.sum(OrderProduct.quantity).label('qty'),
-        ).join(
-            Order, Order.order_id == OrderProduct.order_id
-        ).filter(
-            *base_filters
-        ).group_by(
-            month_bucket
-        ).all()
-
-        profit_rows = self.db.query(
-            month_bucket.label('month_key'),
-            func.sum(Order.real_profit_amount).label('profit'),
-        ).filter(
-            Order.date_add.isnot(None),
-            Order.real_profit_amount.isnot(None),
-            self._paid_order_filter(),
-            ~Order.order_id.in_(return_ids),
-        ).group_by(
-            month_bucket
-        ).all()
+        daily_quantity_rows = []
+        monthly_quantity: Dict[str, int] = {}
+        monthly_profit: Dict[str, float] = {}
+        for day, item in sorted(days.items()):
+            month_key = day.strftime('%Y-%m')
+            daily_quantity_rows.append((day.isoformat(), item.units))
+            monthly_quantity[month_key] = monthly_quantity.get(month_key, 0) + item.units
+            monthly_profit[month_key] = monthly_profit.get(month_key, 0.0) + float(item.profit)
 
         daily_date, daily_quantity = self._resolve_tied_record(
-            [(row.day_key, int(row.qty or 0)) for row in daily_rows],
+            daily_quantity_rows,
             self._format_day_label,
         )
-        monthly_label, monthly_quantity = self._resolve_tied_record(
-            [(row.month_key, int(row.qty or 0)) for row in monthly_rows],
+        monthly_label, monthly_quantity_value = self._resolve_tied_record(
+            list(monthly_quantity.items()),
             self._format_month_label,
         )
         max_profit_month, max_profit_amount = self._resolve_tied_record(
-            [(row.month_key, float(row.profit or 0)) for row in profit_rows],
+            [(key, round(value, 2)) for key, value in monthly_profit.items()],
             self._format_month_label,
         )
 
@@ -766,46 +801,31 @@ class DashboardService:
             daily_date=daily_date,
             daily_quantity=int(daily_quantity or 0),
             monthly_label=monthly_label,
-            monthly_quantity=int(monthly_quantity or 0),
+            monthly_quantity=int(monthly_quantity_value or 0),
             max_profit_amount=float(max_profit_amount or 0),
             max_profit_month=max_profit_month,
         )
 
     def get_trends(self) -> TrendStats:
         """Pobiera trendy (porownanie z poprzednim tygodniem)."""
-        tr = self.time_ranges
-        
-        prev_week_orders = self.db.query(Order).filter(
-            Order.date_add >= tr.prev_week_start_ts,
-            Order.date_add < tr.week_start_ts
-        ).count()
-        
-        prev_week_revenue = self.db.query(
-            func.sum(OrderProduct.price_brutto * OrderProduct.quantity)
-        ).join(Order).filter(
-            Order.date_add >= tr.prev_week_start_ts,
-            Order.date_add < tr.week_start_ts
-        ).scalar() or 0
-        
-        # Biezacy tydzien
-        current_week_orders = self.db.query(Order).filter(
-            Order.date_add >= tr.week_start_ts
-        ).count()
-        
-        current_week_revenue = self.db.query(
-            func.sum(OrderProduct.price_brutto * OrderProduct.quantity)
-        ).join(Order).filter(
-            Order.date_add >= tr.week_start_ts
-        ).scalar() or 0
+        _today, week_start, _month_start, prev_week_start = self._rollup_days()
+        prev_week = order_rollup.RollupTotals()
+        current_week = order_rollup.RollupTotals()
+        for day, item in order_rollup.daily_totals(self.db, prev_week_start).items():
+            (current_week if day >= week_start else prev_week).add(item)
+        prev_week_orders = prev_week.orders
+        prev_week_revenue = float(prev_week.items_value)
+        current_week_orders = current_week.orders
+        current_week_revenue = float(current_week.items_value)
         
         orders_change = ((current_week_orders - prev_week_orders) / max(prev_week_orders, 1)) * 100
-        revenue_change = ((float(current_week_revenue) - float(prev_week_revenue)) / max(float(prev_week_revenue), 1)) * 100
+        revenue_change = ((current_week_revenue - prev_week_revenue) / max(prev_week_revenue, 1)) * 100
         
         return TrendStats(
             orders_change=round(orders_change, 1),
             revenue_change=round(revenue_change, 1),
             prev_week_orders=prev_week_orders,
-            prev_week_revenue=float(prev_week_revenue)
+            prev_week_revenue=prev_week_revenue
         )
     
     def get_recent_activity(
@@ -14,7 +14,7 @@ from datetime import datetime, timezone
 from decimal import Decimal
 import logging
 import time
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from sqlalchemy import desc
 from sqlalchemy import or_ as db_or
@@ -168,7 +168,7 @@ class FinancialCalculator:
                 PurchaseBatch.product_id == product_id,
                 PurchaseBatch.size == size
             )
-            .order_by(desc(PurchaseBatch.purchase_date))
+            .order_by(desc(PurchaseBatch.purchase_date), desc(PurchaseBatch.id))
             .first()
         )
 
@@ -297,15 +297,17 @@ class FinancialCalculator:
         )
         return (snapshot["fees"], snapshot["fee_source"])
 
-    def _get_sale_price(self, order) -> Decimal:
+    def _get_sale_price(self, order, products=None) -> Decimal:
         payment_method_cod = getattr(order, 'payment_method_cod', False)
         payment_method_str = str(getattr(order, 'payment_method', '') or '')
         is_cod = bool(payment_method_cod) or 'pobranie' in payment_method_str.lower()
-        if is_cod and hasattr(order, 'products'):
+        if is_cod and products is None:
+            products = getattr(order, 'products', None)
+        if is_cod and products is not None:
             try:
                 products_total = sum(
                     Decimal(str(p.price_brutto or 0)) * p.quantity
-                    for p in order.products
+                    for p in products
                 )
                 delivery = Decimal(str(getattr(order, 'delivery_price', None) or 0))
                 return products_total + delivery
@@ -477,7 +479,7 @@ class FinancialCalculator:
         use_allegro = order is None or is_allegro_order(order)
         if access_token and external_order_id and use_allegro:
             try:
-                from ..allegro_api import get_order_billing_summary
+                from ..services.billing_ledger import get_order_billing_summary
                 billing = get_order_billing_summary(access_token, external_order_id)
                 if billing and billing.get("success") and billing.get("total_fees") is not None:
                     snapshot = self._snapshot_from_billing(billing)
@@ -543,9 +545,13 @@ class FinancialCalculator:
         fee_snapshot: Dict[str, Any],
         trace_label: Optional[str] = None,
         started_at: Optional[float] = None,
+        purchase_cost: Optional[Decimal] = None,
+        packaging_cost: Optional[Decimal] = None,
     ) -> ProfitBreakdown:
-        purchase_cost = self.get_purchase_cost_for_order(order.order_id)
-        packaging_cost = self.get_packaging_cost()
+        if purchase_cost is None:
+            purchase_cost = self.get_purchase_cost_for_order(order.order_id)
+        if packaging_cost is None:
+            packaging_cost = self.get_packaging_cost()
         profit = sale_price - fee_snapshot["fees"] - purchase_cost - packaging_cost
 
         elapsed_ms = ((time.perf_counter() - started_at) * 1000) if started_at else 0
@@ -688,29 +694,60 @@ class FinancialCalculator:
             started_at=order_started_at,
         )
 
+    def calculate_order_profits(
+        self,
+        orders: List[Any],
+        order_scope=None,
+        trace_label: Optional[str] = None,
+    ) -> Dict[str, ProfitBreakdown]:
+        """
+        Oblicza rozklad zysku dla wielu zamowien stala liczba zapytan.
+
+        Wyniki sa takie same jak ``calculate_order_profit`` bez tokenu
+        Allegro - patrz domain/profit_batch.py.
+
+        Args:
+            orders: Lista obiektow Order
+            order_scope: Opcjonalne zapytanie ``select(Order.order_id)``
+                obejmujace zamowienia (zamiast listy identyfikatorow)
+
+        Returns:
+            Slownik order_id -> ProfitBreakdown
+        """
+        from .profit_batch import BatchProfitEngine
+
+        return BatchProfitEngine(self).calculate(
+            orders,
+            order_scope=order_scope,
+            trace_label=trace_label,
+        )
+
     def _prefetch_order_billing_summaries(
         self,
         orders: List[Any],
         access_token: Optional[str],
         trace_label: Optional[str] = None,
     ) -> Dict[str, Dict[str, Any]]:
-        if not access_token:
-            return {}
-
         order_ids = []
         for order in orders:
             external_order_id = getattr(order, 'external_order_id', None)
             if external_order_id:
                 order_ids.append(external_order_id)
 
-        if len(order_ids) < 2:
-            return {}
+        # Najpierw lokalna ksiega billing_entries (jedno zapytanie), API tylko
+        # dla zamowien, ktorych w niej brak.
+        from ..services.billing_ledger import load_order_billing_summaries
+
+        summaries: Dict[str, Dict[str, Any]] = load_order_billing_summaries(order_ids)
+        order_ids = [order_id for order_id in order_ids if order_id not in summaries]
+
+        if not access_token or len(order_ids) < 2:
+            return summaries
 
         from ..allegro_api import get_order_billing_summary
 
         max_workers = min(8, len(order_ids))
         started_at = time.perf_counter()
-        summaries: Dict[str, Dict[str, Any]] = {}
         failed = 0
 
         logger.info(
@@ -749,6 +786,20 @@ class FinancialCalculator:
         )
         return summaries
     
+    def get_fixed_costs(self) -> Tuple[Decimal, List[Dict[str, Any]]]:
+        """Suma i lista aktywnych kosztow stalych."""
+        from ..models.settings import FixedCost
+
+        total = Decimal("0")
+        items = []
+        for fc in self.db.query(FixedCost).filter(FixedCost.is_active.is_(True)).all():
+            total += Decimal(str(fc.amount))
+            items.append({
+                'name': fc.name,
+                'amount': float(fc.amount)
+            })
+        return total, items
+
     def get_period_summary(
         self,
         start_timestamp: int,
@@ -771,7 +822,6 @@ class FinancialCalculator:
         """
         from ..models.orders import Order, OrderProduct
         from ..models.returns import Return
-        from ..models.settings import FixedCost
         from sqlalchemy import func, select
 
         total_started_at = time.perf_counter()
@@ -789,18 +839,19 @@ class FinancialCalculator:
             Return.status == 'completed'
         ).distinct()
 
-        orders_query_started_at = time.perf_counter()
-        orders = self.db.query(Order).filter(
+        period_filters = (
             Order.date_add >= start_timestamp,
             Order.date_add < end_timestamp,
-            ~Order.order_id.in_(return_order_ids)
-        ).filter(
+            ~Order.order_id.in_(return_order_ids),
             # Zamowienia z platnoscia LUB za pobraniem (payment_done=0 ale COD)
             db_or(
                 Order.payment_done > 0,
                 Order.payment_method_cod.is_(True),
-            )
-        ).all()
+            ),
+        )
+
+        orders_query_started_at = time.perf_counter()
+        orders = self.db.query(Order).filter(*period_filters).all()
         orders_query_ms = (time.perf_counter() - orders_query_started_at) * 1000
 
         # Zlicz produkty
@@ -868,16 +919,31 @@ class FinancialCalculator:
         api_fee_orders = 0
         estimated_fee_orders = 0
         loop_started_at = time.perf_counter()
-        
+
+        cached = {order.order_id: self.get_cached_order_profit(order) for order in orders}
+        uncached_orders = [order for order in orders if cached[order.order_id] is None]
+        # Zamowienia bez zapisanego zysku liczone zbiorczo; zakres jako
+        # podzapytanie, zeby liczba zapytan nie zalezala od dlugosci okresu.
+        calculated = self.calculate_order_profits(
+            uncached_orders,
+            order_scope=select(Order.order_id).where(
+                *period_filters,
+                db_or(
+                    Order.real_profit_sale_price.is_(None),
+                    Order.real_profit_purchase_cost.is_(None),
+                    Order.real_profit_packaging_cost.is_(None),
+                    Order.real_profit_allegro_fees.is_(None),
+                    Order.real_profit_amount.is_(None),
+                ),
+            ),
+            trace_label=trace_label,
+        )
+
         for order in orders:
-            breakdown = self.get_cached_order_profit(order)
+            breakdown = cached[order.order_id]
             if breakdown is None:
                 cache_misses += 1
-                breakdown = self.calculate_order_profit(
-                    order,
-                    access_token=None,
-                    trace_label=trace_label,
-                )
+                breakdown = calculated[order.order_id]
             else:
                 cache_hits += 1
             total_revenue += breakdown.sale_price
@@ -926,17 +992,11 @@ class FinancialCalculator:
         
         if include_fixed_costs:
             fixed_costs_started_at = time.perf_counter()
-            fc_query = self.db.query(FixedCost).filter(FixedCost.is_active.is_(True)).all()
-            for fc in fc_query:
-                fixed_costs += Decimal(str(fc.amount))
-                fixed_costs_list.append({
-                    'name': fc.name,
-                    'amount': float(fc.amount)
-                })
+            fixed_costs, fixed_costs_list = self.get_fixed_costs()
             logger.info(
                 "Profit period summary fixed costs loaded: trace=%s count=%s total=%s elapsed_ms=%.1f",
                 trace_label or '-',
-                len(fc_query),
+                len(fixed_costs_list),
                 fixed_costs,
                 (time.perf_counter() - fixed_costs_started_at) * 1000,
             )
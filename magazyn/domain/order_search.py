@@ -0,0 +1,83 @@
+"""Normalizacja tekstu wyszukiwania zamowien (dokument i zapytanie).
+
+Male litery, bez polskich znakow, telefon takze jako same cyfry - ta sama
+funkcja dla dokumentu i zapytania, wiec "Łódź", "lodz" i "LODZ" trafiaja
+w ten sam tekst, a "+48 600 100 200" w "600100200".
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional
+
+SEPARATOR = " | "
+_PHONE_RE = re.compile(r"^\+?[\d\s().-]+$")
+_PHONE_MIN_DIGITS = 6
+# Znaki, ktorych NFKD nie rozklada na litere + znak diakrytyczny.
+_TRANSLITERATION = str.maketrans({"ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "ß": "ss"})
+
+# Pola zamowienia skladajace sie na dokument (kolejnosc = kolejnosc w tekscie).
+DOCUMENT_FIELDS = (
+    "order_id",
+    "external_order_id",
+    "shop_order_id",
+    "customer_name",
+    "user_login",
+    "email",
+    "phone",
+    "delivery_method",
+    "delivery_package_nr",
+)
+
+
+def normalize_text(value: Any) -> str:
+    """Male litery, bez znakow diakrytycznych, pojedyncze spacje."""
+    if value is None:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value).translate(_TRANSLITERATION))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.lower().replace("|", " ").split())
+
+
+def _phone_digits(value: str) -> Optional[str]:
+    """Telefon jako same cyfry, bez kierunkowego Polski; ``None`` gdy to nie telefon."""
+    if not _PHONE_RE.match(value):
+        return None
+    digits = re.sub(r"\D", "", value)
+    if len(digits) < _PHONE_MIN_DIGITS:
+        return None
+    if digits.startswith("0048"):
+        digits = digits[4:]
+    elif len(digits) == 11 and digits.startswith("48"):
+        digits = digits[2:]
+    return digits
+
+
+def build_document(values: Dict[str, Any], product_names: Iterable[Optional[str]] = ()) -> str:
+    """Tekst dokumentu z pol zamowienia i nazw pozycji."""
+    parts: List[str] = []
+    for name in DOCUMENT_FIELDS:
+        part = normalize_text(values.get(name))
+        if not part:
+            continue
+        parts.append(part)
+        if name == "phone":
+            digits = _phone_digits(part)
+            if digits and digits != part:
+                parts.append(digits)
+    parts.extend(part for part in map(normalize_text, product_names) if part)
+    # Separator takze na brzegach - "| wartosc |" oznacza cale pole.
+    return f"| {SEPARATOR.join(parts)} |" if parts else ""
+
+
+def search_terms(query: str) -> List[str]:
+    """Slowa zapytania po normalizacji; numer telefonu zostaje jednym slowem."""
+    normalized = normalize_text(query)
+    if not normalized:
+        return []
+    digits = _phone_digits(normalized)
+    return [digits] if digits else normalized.split()
+
+
+__all__ = ["DOCUMENT_FIELDS", "SEPARATOR", "build_document", "normalize_text", "search_terms"]
@@ -0,0 +1,283 @@
+"""
+Zbiorcza kalkulacja zysku dla wielu zamowien.
+
+Odpowiednik ``FinancialCalculator.calculate_order_profit`` dla N zamowien
+naraz: zamiast zapytan per zamowienie (OrderProduct, agregacja Sale,
+fallback przez AllegroOffer, ProductSize, PurchaseBatch) laduje dane stala
+liczba zapytan zbiorczych i liczy te same wartosci w pamieci.
+
+Zakres zamowien podaje sie lista ``order_id`` (zapytania w paczkach po
+``_IN_CHUNK_SIZE``) albo zapytaniem ``select(Order.order_id)`` - wtedy kazda
+tabela jest czytana jednym zapytaniem niezaleznie od liczby zamowien.
+
+Reguly musza pozostac zgodne z ``get_purchase_cost_for_order`` i
+``get_purchase_cost_for_product`` - zgodnosc pilnuje
+``tests/test_profit_batch.py``.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import Select, desc, func, select
+from sqlalchemy.orm import Session, aliased
+
+logger = logging.getLogger(__name__)
+
+_IN_CHUNK_SIZE = 500
+
+OrderScope = Union[Sequence[str], Select]
+ProductKey = Tuple[int, str]
+
+
+@dataclass(frozen=True)
+class OrderLine:
+    """Pozycja zamowienia z rozwiazanym wariantem magazynowym."""
+    order_id: str
+    quantity: Any
+    price_brutto: Any
+    # (product_id, size) wariantu - None, gdy pozycja nie jest powiazana
+    # z magazynem (ani bezposrednio, ani przez oferte Allegro).
+    product_key: Optional[ProductKey]
+
+
+@dataclass
+class OrderCostInputs:
+    """Dane potrzebne do policzenia kosztu zakupu zamowien z zakresu."""
+    lines_by_order: Dict[str, List[OrderLine]] = field(default_factory=dict)
+    actual_costs: Dict[str, Dict[ProductKey, Decimal]] = field(default_factory=dict)
+    # (product_id, size) -> (quantity, stock_value) pierwszego wariantu
+    stock_by_key: Dict[ProductKey, Tuple[Any, Any]] = field(default_factory=dict)
+    latest_price_by_key: Dict[ProductKey, Decimal] = field(default_factory=dict)
+
+    def purchase_cost(self, order_id: str) -> Tuple[Decimal, bool]:
+        """Koszt zakupu zamowienia i czy w calosci pochodzi z realnych Sale."""
+        lines = self.lines_by_order.get(order_id, [])
+        actual_by_key = dict(self.actual_costs.get(order_id, {}))
+
+        total_cost = Decimal("0")
+        is_fully_actual = bool(actual_by_key) or not lines
+
+        for line in lines:
+            if line.product_key is None:
+                continue
+            if line.product_key in actual_by_key:
+                total_cost += actual_by_key.pop(line.product_key)
+            else:
+                total_cost += self.estimated_cost(line.product_key, line.quantity)
+                is_fully_actual = False
+
+        for remaining_cost in actual_by_key.values():
+            total_cost += remaining_cost
+        return total_cost, is_fully_actual
+
+    def estimated_cost(self, key: ProductKey, quantity) -> Decimal:
+        """Szacunek jak ``get_purchase_cost_for_product``: srednia wazona,
+        a bez stanu - cena najnowszej dostawy."""
+        stock_quantity, stock_value = self.stock_by_key.get(key, (None, None))
+        if stock_quantity and stock_value:
+            avg = Decimal(str(stock_value)) / Decimal(stock_quantity)
+            return avg * quantity
+
+        latest_price = self.latest_price_by_key.get(key)
+        if latest_price is not None:
+            return latest_price * quantity
+        return Decimal("0")
+
+
+def _scoped_rows(db: Session, build_query, column, order_scope: OrderScope) -> List[Any]:
+    """Wykonuje zapytanie dla calego zakresu: jednym IN (select) albo paczkami."""
+    if isinstance(order_scope, Select):
+        return db.execute(build_query(column.in_(order_scope))).all()
+
+    ids = [str(order_id) for order_id in dict.fromkeys(order_scope) if order_id]
+    rows: List[Any] = []
+    for start in range(0, len(ids), _IN_CHUNK_SIZE):
+        chunk = ids[start:start + _IN_CHUNK_SIZE]
+        rows.extend(db.execute(build_query(column.in_(chunk))).all())
+    return rows
+
+
+def _chunks(values: Iterable[Any]) -> Iterable[List[Any]]:
+    values = list(values)
+    for start in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[start:start + _IN_CHUNK_SIZE]
+
+
+def load_order_cost_inputs(db: Session, order_scope: OrderScope) -> OrderCostInputs:
+    """Laduje pozycje, realne koszty Sale i ceny wariantow dla zakresu zamowien."""
+    from ..models.allegro import AllegroOffer
+    from ..models.orders import OrderProduct
+    from ..models.products import Product, ProductSize, PurchaseBatch, Sale
+
+    inputs = OrderCostInputs()
+
+    # Pozycje z wariantem bezposrednim i wariantem z oferty Allegro w jednym
+    # zapytaniu; fallback przez oferte tylko, gdy brak wariantu bezposredniego.
+    direct_size = aliased(ProductSize)
+    direct_product = aliased(Product)
+    offer_size = aliased(ProductSize)
+    offer_product = aliased(Product)
+
+    def lines_query(condition):
+        return (
+            select(
+                OrderProduct.order_id,
+                OrderProduct.quantity,
+                OrderProduct.price_brutto,
+                OrderProduct.auction_id,
+                direct_size.id,
+                direct_size.product_id,
+                direct_size.size,
+                direct_product.id,
+                offer_size.id,
+                offer_size.product_id,
+                offer_size.size,
+                offer_product.id,
+            )
+            .outerjoin(direct_size, direct_size.id == OrderProduct.product_size_id)
+            .outerjoin(direct_product, direct_product.id == direct_size.product_id)
+            .outerjoin(AllegroOffer, AllegroOffer.offer_id == OrderProduct.auction_id)
+            .outerjoin(offer_size, offer_size.id == AllegroOffer.product_size_id)
+            .outerjoin(offer_product, offer_product.id == offer_size.product_id)
+            .where(condition)
+            .order_by(OrderProduct.id)
+        )
+
+    for (
+        order_id, quantity, price_brutto, auction_id,
+        direct_id, direct_product_id, direct_size_name, direct_product_exists,
+        offer_ps_id, offer_product_id, offer_size_name, offer_product_exists,
+    ) in _scoped_rows(db, lines_query, OrderProduct.order_id, order_scope):
+        product_key = None
+        if direct_id is not None:
+            if direct_product_exists is not None:
+                product_key = (direct_product_id, direct_size_name)
+        elif auction_id and offer_ps_id is not None:
+            if offer_product_exists is not None:
+                product_key = (offer_product_id, offer_size_name)
+        inputs.lines_by_order.setdefault(order_id, []).append(
+            OrderLine(order_id, quantity, price_brutto, product_key)
+        )
+
+    def sales_query(condition):
+        return (
+            select(Sale.order_id, Sale.product_id, Sale.size, func.sum(Sale.purchase_cost))
+            .where(condition)
+            .group_by(Sale.order_id, Sale.product_id, Sale.size)
+        )
+
+    for order_id, product_id, size, cost_sum in _scoped_rows(
+        db, sales_query, Sale.order_id, order_scope
+    ):
+        inputs.actual_costs.setdefault(order_id, {})[(product_id, size)] = Decimal(
+            str(cost_sum or 0)
+        )
+
+    needed_keys = {
+        line.product_key
+        for order_id, lines in inputs.lines_by_order.items()
+        for line in lines
+        if line.product_key is not None
+    }
+    product_ids = sorted({product_id for product_id, _size in needed_keys})
+
+    for chunk in _chunks(product_ids):
+        for product_id, size, quantity, stock_value in db.execute(
+            select(
+                ProductSize.product_id,
+                ProductSize.size,
+                ProductSize.quantity,
+                ProductSize.stock_value,
+            )
+            .where(ProductSize.product_id.in_(chunk))
+            .order_by(ProductSize.id)
+        ):
+            inputs.stock_by_key.setdefault((product_id, size), (quantity, stock_value))
+
+    fallback_product_ids = sorted({
+        product_id
+        for product_id, size in needed_keys
+        if not all(inputs.stock_by_key.get((product_id, size), (None, None)))
+    })
+    for chunk in _chunks(fallback_product_ids):
+        for product_id, size, price in db.execute(
+            select(PurchaseBatch.product_id, PurchaseBatch.size, PurchaseBatch.price)
+            .where(PurchaseBatch.product_id.in_(chunk))
+            .order_by(desc(PurchaseBatch.purchase_date), desc(PurchaseBatch.id))
+        ):
+            inputs.latest_price_by_key.setdefault((product_id, size), Decimal(str(price)))
+
+    return inputs
+
+
+class BatchProfitEngine:
+    """Rozbicie zysku dla wielu zamowien ze stala liczba zapytan."""
+
+    def __init__(self, calculator):
+        self.calculator = calculator
+
+    def calculate(
+        self,
+        orders: Sequence[Any],
+        *,
+        order_scope: Optional[OrderScope] = None,
+        trace_label: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Zwraca ``{order_id: ProfitBreakdown}`` jak ``calculate_order_profit``
+        bez tokenu Allegro.
+
+        Args:
+            orders: Zaladowane obiekty Order
+            order_scope: Zapytanie ``select(Order.order_id)`` obejmujace co
+                najmniej ``orders``; domyslnie lista ich identyfikatorow
+            trace_label: Etykieta do logow
+        """
+        if not orders:
+            return {}
+
+        started_at = time.perf_counter()
+        calculator = self.calculator
+        if order_scope is None:
+            order_scope = [order.order_id for order in orders]
+        inputs = load_order_cost_inputs(calculator.db, order_scope)
+        inputs_ms = (time.perf_counter() - started_at) * 1000
+        packaging_cost = calculator.get_packaging_cost()
+
+        breakdowns = {}
+        for order in orders:
+            order_started_at = time.perf_counter()
+            sale_price = calculator._get_sale_price(
+                order,
+                products=inputs.lines_by_order.get(order.order_id, []),
+            )
+            fee_snapshot = calculator._resolve_fee_snapshot(
+                sale_price=sale_price,
+                access_token=None,
+                delivery_method=getattr(order, "delivery_method", None),
+                order=order,
+            )
+            purchase_cost, _is_actual = inputs.purchase_cost(order.order_id)
+            breakdowns[order.order_id] = calculator._build_profit_breakdown(
+                order,
+                sale_price,
+                fee_snapshot,
+                trace_label=trace_label,
+                started_at=order_started_at,
+                purchase_cost=purchase_cost,
+                packaging_cost=packaging_cost,
+            )
+
+        logger.info(
+            "Profit batch calculated: trace=%s orders=%s lines=%s inputs_ms=%.1f elapsed_ms=%.1f",
+            trace_label or '-',
+            len(orders),
+            sum(len(lines) for lines in inputs.lines_by_order.values()),
+            inputs_ms,
+            (time.perf_counter() - started_at) * 1000,
+        )
+        return breakdowns
@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 import os
+import select
+import threading
 from collections import OrderedDict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Iterable, Mapping, Optional
+from typing import Callable, Iterable, Mapping, Optional
 
 from sqlalchemy import text
 
@@ -19,6 +21,10 @@ CREATE TABLE IF NOT EXISTS app_settings (
 )
 """
 
+# Kanal LISTEN/NOTIFY (PostgreSQL), na ktorym zapis ustawien budzi
+# pozostale procesy (workery gunicorna, agent etykiet).
+SETTINGS_CHANGE_CHANNEL = "app_settings_changed"
+
 
 class SettingsDatabaseGateway:
     def __init__(self, *, logger, engine_factory) -> None:
@@ -175,6 +181,55 @@ class SettingsDatabaseGateway:
             if should_dispose:
                 runtime_engine.dispose()
 
+    def runtime_url(self):
+        """Zwroc URL bazy runtime bez tworzenia tymczasowego engine."""
+        from sqlalchemy.engine import make_url
+
+        from ..db import engine as configured_engine
+
+        if configured_engine is not None:
+            return configured_engine.url
+        database_url = os.environ.get("DATABASE_URL", "")
+        if database_url.startswith("postgresql"):
+            return make_url(database_url)
+        return None
+
+    def change_marker(self, db_path: Optional[Path]) -> Optional[tuple]:
+        """Zwroc tani znacznik zmian pliku SQLite bez zapytania do bazy.
+
+        Znacznik to (mtime_ns, rozmiar) pliku bazy i pliku WAL. Dla
+        PostgreSQL (lub gdy plik nie istnieje) zwraca ``None`` - wtedy o
+        zmianach informuje :class:`SettingsChangeListener`.
+        """
+        url = self.runtime_url()
+        if url is not None and url.get_backend_name() != "sqlite":
+            return None
+        if db_path is None:
+            return None
+        marker = []
+        for path in (Path(db_path), Path(f"{db_path}-wal")):
+            try:
+                stat = path.stat()
+            except OSError:
+                marker.append(None)
+                continue
+            marker.append((stat.st_mtime_ns, stat.st_size))
+        if marker[0] is None:
+            return None
+        return tuple(marker)
+
+    def start_listener(
+        self, callback: Callable[[], None]
+    ) -> Optional["SettingsChangeListener"]:
+        """Uruchom nasluch NOTIFY dla PostgreSQL; dla SQLite zwraca ``None``."""
+        url = self.runtime_url()
+        if url is None or url.get_backend_name() != "postgresql":
+            return None
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        listener = SettingsChangeListener(dsn, callback, logger=self._logger)
+        listener.start()
+        return listener
+
     def persist_many(self, values: Mapping[str, str]) -> Optional[str]:
         if not values:
             return None
@@ -238,6 +293,10 @@ def _mutate_with_engine(engine, rows, statement) -> Optional[str]:
 def _mutate_connection(conn, rows, statement) -> Optional[str]:
     conn.execute(text(APP_SETTINGS_SCHEMA))
     conn.execute(statement, rows)
+    if conn.dialect.name == "postgresql":
+        # NOTIFY jest dostarczany dopiero po COMMIT, wiec sluchacze zobacza
+        # juz zapisane wartosci.
+        conn.execute(text(f"NOTIFY {SETTINGS_CHANGE_CHANNEL}"))
     conn.commit()
     try:
         row = conn.execute(text("SELECT MAX(updated_at) FROM app_settings")).fetchone()
@@ -252,6 +311,71 @@ def _mutate_connection(conn, rows, statement) -> Optional[str]:
     return latest if isinstance(latest, str) else str(latest)
 
 
+class SettingsChangeListener:
+    """Watek nasluchujacy ``NOTIFY app_settings_changed`` na PostgreSQL.
+
+    Trzyma jedno dedykowane polaczenie poza pula SQLAlchemy. Po kazdym
+    powiadomieniu (oraz po ponownym polaczeniu, gdy mogly zostac zgubione
+    powiadomienia) wywoluje ``callback``.
+    """
+
+    RECONNECT_DELAY = 5.0
+    POLL_TIMEOUT = 30.0
+
+    def __init__(self, dsn: str, callback: Callable[[], None], *, logger) -> None:
+        self._dsn = dsn
+        self._callback = callback
+        self._logger = logger
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.connected = threading.Event()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, daemon=True, name="settings-listener"
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.POLL_TIMEOUT + 1)
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        import psycopg2
+
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self._dsn)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {SETTINGS_CHANGE_CHANNEL}")
+                self.connected.set()
+                self._callback()
+                while not self._stop.is_set():
+                    ready, _, _ = select.select([conn], [], [], self.POLL_TIMEOUT)
+                    if not ready:
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self._callback()
+            except Exception as exc:
+                self._logger.warning("Settings change listener error: %s", exc)
+            finally:
+                self.connected.clear()
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stop.wait(self.RECONNECT_DELAY)
+
+
 def _latest_value(current: Optional[str], value) -> Optional[str]:
     if value is None:
         return current
@@ -265,4 +389,9 @@ def _utc_now() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
 
 
-__all__ = ["APP_SETTINGS_SCHEMA", "SettingsDatabaseGateway"]
\ No newline at end of file
+__all__ = [
+    "APP_SETTINGS_SCHEMA",
+    "SETTINGS_CHANGE_CHANNEL",
+    "SettingsChangeListener",
+    "SettingsDatabaseGateway",
+]
\ No newline at end of file
@@ -10,6 +10,22 @@ ENV_INFO = {
     "PRINTER_NAME": ("Nazwa drukarki", "Nazwa używanej drukarki CUPS"),
     "CUPS_SERVER": ("Serwer CUPS", "Nazwa hosta zdalnego serwera CUPS"),
     "CUPS_PORT": ("Port CUPS", "Port zdalnego serwera CUPS"),
+    "PRINT_TRANSPORT": (
+        "Transport wydruku",
+        "lp - polecenie lp, ipp - zlecenia wysyłane bezpośrednio przez IPP",
+    ),
+    "PRINT_MAX_IN_FLIGHT": (
+        "Limit zleceń w drodze",
+        "Maksymalna liczba niezakończonych zleceń IPP",
+    ),
+    "LABEL_STORE_DIR": (
+        "Katalog etykiet",
+        "Katalog plików etykiet PDF (domyślnie labels obok bazy danych)",
+    ),
+    "LABEL_STORE_MAX_MB": (
+        "Limit magazynu etykiet (MB)",
+        "Po przekroczeniu usuwane są najdawniej używane etykiety; 0 wyłącza magazyn",
+    ),
     "POLL_INTERVAL": (
         "Interwał sprawdzania",
         "Liczba sekund między sprawdzeniami zamówień",
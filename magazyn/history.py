@@ -1,6 +1,8 @@
 from .auth import login_required
 from flask import Blueprint, render_template, redirect, url_for, flash
+from .services.order_labels import fetch_order_labels
 from .services.print_agent_runtime import agent as label_agent
+from .services.print_agent_storage import QUEUE_STATUS_PRINTED
 
 logger = label_agent.logger
 
@@ -47,21 +49,15 @@ def reprint_label(order_id):
                     item.get("ext", "pdf"),
                     order_id,
                 )
+                item["status"] = QUEUE_STATUS_PRINTED
             label_agent.save_queue(remaining)
             label_agent.mark_as_printed(
                 order_id,
                 queue[0].get("last_order_data", printed_data),
             )
         else:
-            packages = label_agent.get_order_packages(order_id)
-            for p in packages:
-                pid = p.get("shipment_id") or p.get("package_id")
-                code = p.get("courier_code") or p.get("carrier_id") or ""
-                if not pid:
-                    continue
-                label_data, ext = label_agent.get_label(code, pid)
-                if label_data:
-                    label_agent.print_label(label_data, ext, order_id)
+            for label_data, ext in fetch_order_labels(order_id, label_agent):
+                label_agent.print_label(label_data, ext, order_id)
             label_agent.mark_as_printed(order_id, printed_data)
         flash("Etykieta została ponownie wysłana do drukarki.", "success")
     except Exception as exc:
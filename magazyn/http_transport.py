@@ -0,0 +1,192 @@
+"""Wspolny transport HTTP z pula polaczen keep-alive dla integracji.
+
+Kazda integracja (Allegro, WooCommerce, wFirma, InPost) dostaje jedna
+dostrojona ``requests.Session`` na proces: pula polaczen dopasowana do liczby
+watkow roboczych, keep-alive oraz adapter ponawiajacy wylacznie nieudane
+nawiazanie polaczenia (zadanie nie zostalo jeszcze wyslane, wiec ponowienie
+jest bezpieczne takze dla POST). Logika ponawiania na poziomie odpowiedzi
+(429/5xx, rate limity) zostaje w klientach integracji.
+
+Klienci wolaja sesje wprost: ``get_session(ALLEGRO).get(url, ...)``.
+Wyjatkiem jest ``_request_with_retry`` API Allegro, ktory od zawsze dostaje
+funkcje modulu ``requests`` (``requests.get`` itp.) - :func:`resolve`
+podmienia je na metode wspolnej sesji, a inne callable (np. atrapy w testach)
+zostawia bez zmian.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from functools import partial
+from http.cookiejar import DefaultCookiePolicy
+from typing import Any, Callable, Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from .metrics import HTTP_TRANSPORT_REQUESTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_MAXSIZE = 16
+DEFAULT_CONNECT_RETRIES = 2
+
+ALLEGRO = "allegro"
+WOOCOMMERCE = "woocommerce"
+WFIRMA = "wfirma"
+INPOST = "inpost"
+
+# Oryginalne funkcje modulu requests - zapamietane przy imporcie, zeby
+# rozpoznac je takze wtedy, gdy test podmieni atrybut modulu.
+_MODULE_METHODS: Dict[Callable[..., Any], str] = {
+    requests.request: "",
+    requests.get: "GET",
+    requests.post: "POST",
+    requests.put: "PUT",
+    requests.patch: "PATCH",
+    requests.delete: "DELETE",
+    requests.head: "HEAD",
+    requests.options: "OPTIONS",
+}
+
+_lock = threading.Lock()
+_sessions: Dict[Tuple[int, str], requests.Session] = {}
+
+
+def _pool_maxsize() -> int:
+    try:
+        return max(1, int(os.environ.get("HTTP_POOL_MAXSIZE", DEFAULT_POOL_MAXSIZE)))
+    except (TypeError, ValueError):
+        return DEFAULT_POOL_MAXSIZE
+
+
+# Liczba polaczen nawiazanych przez biezacy watek. Zadanie requests wykonuje
+# sie w calosci w watku wywolujacym, wiec roznica licznika przed i po send()
+# mowi dokladnie, czy to zadanie otworzylo polaczenie.
+_opened = threading.local()
+
+
+def _count_opened() -> None:
+    _opened.count = getattr(_opened, "count", 0) + 1
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self) -> None:
+        super().connect()
+        _count_opened()
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self) -> None:
+        super().connect()
+        _count_opened()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    """Adapter liczacy zadania na nowych i ponownie uzytych polaczeniach."""
+
+    def __init__(self, integration: str, **kwargs: Any) -> None:
+        self.integration = integration
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        before = getattr(_opened, "count", 0)
+        response = super().send(request, *args, **kwargs)
+        connection = "new" if getattr(_opened, "count", 0) > before else "reused"
+        HTTP_TRANSPORT_REQUESTS_TOTAL.labels(
+            integration=self.integration, connection=connection
+        ).inc()
+        return response
+
+
+def _build_session(integration: str) -> requests.Session:
+    pool_size = _pool_maxsize()
+    retry = Retry(
+        total=DEFAULT_CONNECT_RETRIES,
+        connect=DEFAULT_CONNECT_RETRIES,
+        read=0,
+        status=0,
+        other=0,
+        backoff_factor=0.2,
+        raise_on_status=False,
+    )
+    adapter = InstrumentedAdapter(
+        integration,
+        pool_connections=4,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # Klienci integracji sami ustawiaja autoryzacje; nie chcemy, zeby sesja
+    # przenosila ciasteczka miedzy zadaniami roznych watkow.
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session(integration: str) -> requests.Session:
+    """Zwroc wspoldzielona sesje integracji (jedna na proces)."""
+    key = (os.getpid(), integration)
+    session = _sessions.get(key)
+    if session is not None:
+        return session
+    with _lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _build_session(integration)
+            _sessions[key] = session
+    return session
+
+
+def resolve(integration: str, method: Callable[..., Any]) -> Callable[..., Any]:
+    """Podmien funkcje modulu ``requests`` na metode wspolnej sesji."""
+    verb = _MODULE_METHODS.get(method)
+    if verb is None:
+        return method
+    session = get_session(integration)
+    if not verb:
+        return session.request
+    return partial(session.request, verb)
+
+
+def close_all() -> None:
+    """Zamknij wszystkie sesje biezacego procesu (np. przy shutdown)."""
+    pid = os.getpid()
+    with _lock:
+        for key in [key for key in _sessions if key[0] == pid]:
+            try:
+                _sessions.pop(key).close()
+            except Exception as exc:  # pragma: no cover - defensywnie
+                logger.debug("Failed to close HTTP session %s: %s", key[1], exc)
+
+
+__all__ = [
+    "ALLEGRO",
+    "INPOST",
+    "WFIRMA",
+    "WOOCOMMERCE",
+    "close_all",
+    "get_session",
+    "resolve",
+]
@@ -10,8 +10,7 @@ import logging
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, Optional
 
-import requests
-
+from .. import http_transport
 from ..settings_store import settings_store
 
 logger = logging.getLogger(__name__)
@@ -53,7 +52,7 @@ def get_access_token() -> str:
     client_secret = (settings_store.get("INPOST_RETURNS_CLIENT_SECRET") or "").strip()
     if not client_id or not client_secret:
         raise InpostReturnsError("Brak INPOST_RETURNS_CLIENT_ID / INPOST_RETURNS_CLIENT_SECRET")
-    response = requests.post(
+    response = http_transport.get_session(http_transport.INPOST).post(
         LOGIN_URL,
         data={
             "grant_type": "client_credentials",
@@ -111,7 +110,7 @@ def create_return_ticket(
     if description:
         payload["description"] = description[:255]
 
-    response = requests.post(
+    response = http_transport.get_session(http_transport.INPOST).post(
         f"{API_BASE}/v1/returns/tickets",
         headers={
             "Authorization": f"Bearer {token}",
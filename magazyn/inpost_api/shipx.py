@@ -6,8 +6,7 @@ import logging
 import time
 from typing import Any, Callable, Optional
 
-import requests
-
+from .. import http_transport
 from ..settings_store import settings_store
 
 logger = logging.getLogger(__name__)
@@ -44,7 +43,7 @@ class InpostShipxClient:
 
     def request(self, method: str, path: str, **kwargs) -> Any:
         url = f"{SHIPX_BASE}{path}"
-        response = requests.request(
+        response = http_transport.get_session(http_transport.INPOST).request(
             method,
             url,
             headers=self._headers(),
@@ -89,7 +88,7 @@ class InpostShipxClient:
 
     def get_label_pdf(self, shipment_id: str | int) -> bytes:
         url = f"{SHIPX_BASE}/v1/shipments/{shipment_id}/label"
-        response = requests.get(
+        response = http_transport.get_session(http_transport.INPOST).get(
             url,
             headers={
                 "Authorization": f"Bearer {self.token}",
@@ -22,7 +22,12 @@ from .services.print_agent_lifecycle import (
 )
 from .services.print_agent_notifications import PrintAgentNotifier, notify_messenger
 from .services.print_agent_retry import enforce_rate_limit, new_call_window, retry_call
-from .services.print_agent_storage import PrintAgentStorage, SuccessMarker
+from .services.print_agent_storage import (
+    QUEUE_STATUS_PRINTING,
+    QUEUE_STATUS_QUEUED,
+    PrintAgentStorage,
+    SuccessMarker,
+)
 from .services.print_agent_tracking import PrintAgentTrackingService
 from .services.printing import CupsPrinter
 from .services.runtime import BackgroundThreadRuntime, HeartbeatFileLock
@@ -39,7 +44,7 @@ from .allegro_api.fulfillment import (
     add_shipment_tracking,
     update_fulfillment_status,
 )
-from .workers import TrackingWorker, MessagingWorker, ReportWorker
+from .workers import TrackingWorker, MessagingWorker, PrintWakeupWorker, ReportWorker
 from .metrics import (
     PRINT_AGENT_DOWNTIME_SECONDS,
     PRINT_AGENT_RETRIES_TOTAL,
@@ -51,9 +56,6 @@ from .metrics import (
 T = TypeVar("T")
 
 
-# Uzywamy short_preview z modulu utils
-
-
 class LabelAgent:
     """Encapsulates the state and behaviour of the label printing agent."""
 
@@ -93,11 +95,7 @@ class LabelAgent:
             now=lambda: datetime.now(),
             handle_readonly_error=self._handle_readonly_error,
         )
-        self.printer = CupsPrinter(
-            printer_name=config.printer_name,
-            cups_server=config.cups_server,
-            cups_port=config.cups_port,
-        )
+        self.printer = CupsPrinter.from_config(config)
         self._configure_logging(initial=True)
         self._configure_db_engine()
 
@@ -176,8 +174,8 @@ class LabelAgent:
     def _restore_in_progress(self, queue: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         restored = False
         for item in queue:
-            if item.get("status") == "in_progress":
-                item["status"] = "queued"
+            if item.get("status") == QUEUE_STATUS_PRINTING and not self.storage.is_lease_active(item):
+                item["status"] = QUEUE_STATUS_QUEUED
                 restored = True
         if restored:
             self.save_queue(queue)
@@ -228,6 +226,9 @@ class LabelAgent:
     def load_printed_orders(self) -> List[Dict[str, Any]]:
         return self.storage.load_printed_orders()
 
+    def printed_orders(self) -> Dict[str, datetime]:
+        return self.storage.printed_orders_map()
+
     def mark_as_printed(
         self, order_id: str, last_order_data: Optional[Dict[str, Any]] = None
     ) -> None:
@@ -438,7 +439,7 @@ class LabelAgent:
     def start_agent_thread(self) -> bool:
         return _start_agent_thread(
             self,
-            worker_factories=(TrackingWorker, MessagingWorker, ReportWorker),
+            worker_factories=(TrackingWorker, MessagingWorker, ReportWorker, PrintWakeupWorker),
         )
 
     def _notify_messenger(self, data: Dict[str, Any], print_success: bool) -> None:
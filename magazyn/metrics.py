@@ -24,6 +24,12 @@ PRINT_AGENT_ITERATION_SECONDS = Histogram(
     "magazyn_print_iteration_duration_seconds",
     "Duration of a single agent processing loop in seconds.",
 )
+PRINT_SHIPMENT_STAGE_SECONDS = Histogram(
+    "magazyn_print_shipment_stage_seconds",
+    "Duration of shipment creation stages (submit, confirm, complete, label) in seconds.",
+    ["stage"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
 PRINT_AGENT_RETRIES_TOTAL = Counter(
     "magazyn_print_retries_total",
     "Total number of retry attempts performed by the print agent.",
@@ -67,6 +73,64 @@ ALLEGRO_TOKEN_REFRESH_LAST_SUCCESS = Gauge(
     "Unix timestamp of the last successful automatic Allegro token refresh.",
 )
 
+HTTP_TRANSPORT_REQUESTS_TOTAL = Counter(
+    "magazyn_http_requests_total",
+    "Total number of outgoing integration HTTP requests by connection reuse.",
+    ["integration", "connection"],
+)
+
+STATS_CACHE_REQUESTS_TOTAL = Counter(
+    "magazyn_stats_cache_requests_total",
+    "Total number of stats cache lookups grouped by endpoint and result.",
+    ["endpoint", "result"],
+)
+STATS_CACHE_COMPUTE_SECONDS = Histogram(
+    "magazyn_stats_cache_compute_seconds",
+    "Time spent computing a stats payload after a cache miss.",
+    ["endpoint"],
+)
+STATS_CACHE_EVICTIONS_TOTAL = Counter(
+    "magazyn_stats_cache_evictions_total",
+    "Total number of stats cache entries evicted by the size limits.",
+    ["backend"],
+)
+STATS_CACHE_INVALIDATIONS_TOTAL = Counter(
+    "magazyn_stats_cache_invalidations_total",
+    "Total number of stats cache invalidations grouped by tag.",
+    ["tag"],
+)
+
+SYNC_JOB_RUNS_TOTAL = Counter(
+    "magazyn_sync_job_runs_total",
+    "Total number of background sync job runs grouped by job and result.",
+    ["job", "result"],
+)
+SYNC_JOB_DURATION_SECONDS = Histogram(
+    "magazyn_sync_job_duration_seconds",
+    "Duration of a single background sync job run in seconds.",
+    ["job"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+SYNC_JOB_ITEMS_TOTAL = Counter(
+    "magazyn_sync_job_items_total",
+    "Total number of items processed by background sync jobs.",
+    ["job"],
+)
+SYNC_JOB_ABANDONED_THREADS = Gauge(
+    "magazyn_sync_job_abandoned_threads",
+    "Threads of timed out sync jobs that are still running in the background.",
+    ["job"],
+)
+
+PROFIT_REFRESH_QUEUE_DEPTH = Gauge(
+    "magazyn_profit_refresh_queue_depth",
+    "Number of orders whose stored profit is due for a refresh.",
+)
+PROFIT_REFRESH_LAG_SECONDS = Gauge(
+    "magazyn_profit_refresh_lag_seconds",
+    "Seconds since the oldest due order profit refresh became due.",
+)
+
 PRINT_QUEUE_SIZE.set(0)
 PRINT_QUEUE_OLDEST_AGE_SECONDS.set(0)
 PRINT_LABEL_ERRORS_TOTAL.labels(stage="print")
@@ -89,4 +153,6 @@ ALLEGRO_TOKEN_REFRESH_ATTEMPTS_TOTAL.labels(result="error").inc(0)
 ALLEGRO_TOKEN_REFRESH_ATTEMPTS_TOTAL.labels(result="skipped").inc(0)
 ALLEGRO_TOKEN_REFRESH_RETRIES_TOTAL.inc(0)
 ALLEGRO_TOKEN_REFRESH_LAST_SUCCESS.set(0)
+PROFIT_REFRESH_QUEUE_DEPTH.set(0)
+PROFIT_REFRESH_LAG_SECONDS.set(0)
 
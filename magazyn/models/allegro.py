@@ -74,6 +74,32 @@ class AllegroBillingType(Base):
     last_seen_at = Column(DateTime, nullable=False, server_default=func.now())
 
 
+class BillingEntry(Base):
+    """Wpis billingowy Allegro zapisany lokalnie (ksiega z /billing/billing-entries)."""
+
+    __tablename__ = "billing_entries"
+    __table_args__ = (
+        Index("idx_billing_entries_order_id", "order_id"),
+        Index("idx_billing_entries_occurred_at", "occurred_at"),
+        Index("idx_billing_entries_type_occurred_at", "type_id", "occurred_at"),
+    )
+
+    entry_id = Column(String(64), primary_key=True)
+    occurred_at = Column(DateTime, nullable=False)
+    type_id = Column(String(32), nullable=False)
+    type_name = Column(String(255), nullable=True)
+    # UUID zamowienia Allegro (Order.external_order_id), puste dla oplat kontowych
+    order_id = Column(String(64), nullable=True)
+    offer_id = Column(String(64), nullable=True)
+    offer_name = Column(Text, nullable=True)
+    campaign_id = Column(String(64), nullable=True)
+    campaign_name = Column(Text, nullable=True)
+    amount = Column(Numeric(12, 2), nullable=False)
+    currency = Column(String(8), nullable=True)
+    raw = Column(Text, nullable=True)  # JSON wpisu z API
+    synced_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
 class AllegroRepliedThread(Base):
     __tablename__ = "allegro_replied_threads"
 
@@ -94,4 +120,5 @@ __all__ = [
     "AllegroPriceHistory",
     "AllegroRepliedDiscussion",
     "AllegroRepliedThread",
+    "BillingEntry",
 ]
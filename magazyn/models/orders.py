@@ -1,6 +1,6 @@
 """Modele zamowien i statusow."""
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, func
+from sqlalchemy import DDL, Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, Numeric, String, Text, event, func
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -13,6 +13,9 @@ class Order(Base):
     __table_args__ = (
         Index("idx_orders_date_add", "date_add"),
         Index("idx_orders_platform", "platform"),
+        Index("idx_orders_next_profit_check_at", "next_profit_check_at"),
+        Index("idx_orders_updated_at", "updated_at"),
+        Index("idx_orders_current_status_date_add", "current_status", "date_add"),
     )
 
     order_id = Column(String, primary_key=True)
@@ -79,6 +82,11 @@ class Order(Base):
     real_profit_is_final = Column(Boolean, nullable=True)
     real_profit_error = Column(Text, nullable=True)
     real_profit_updated_at = Column(DateTime, nullable=True)
+    # Kiedy odswiezyc zapisany zysk (services/profit_schedule.py); NULL = od razu.
+    next_profit_check_at = Column(DateTime, nullable=True)
+    # Ostatni wpis order_status_logs (services/order_current_status.py); NULL = brak historii.
+    current_status = Column(String, nullable=True)
+    current_status_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, nullable=False, server_default=func.now())
     updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
 
@@ -161,4 +169,72 @@ class OrderEvent(Base):
     order = relationship("Order", back_populates="events")
 
 
-__all__ = ["Order", "OrderEvent", "OrderProduct", "OrderStatusLog"]
+class OrderDailyRollup(Base):
+    """Dzienne agregaty zamowien (dzien x platforma x koszyk statusu).
+
+    Utrzymywane przyrostowo przez services/order_rollup.py; dzien liczony
+    w lokalnej strefie czasu aplikacji.
+    """
+
+    __tablename__ = "order_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    platform = Column(String, primary_key=True, default="")
+    status_bucket = Column(String, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    # Zamowienia bez numeru przesylki (delivery_package_nr).
+    awaiting_label = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    # Suma payment_done > 0.
+    revenue = Column(Numeric(12, 2), nullable=False, default=0)
+    # Suma price_brutto * quantity pozycji.
+    items_value = Column(Numeric(12, 2), nullable=False, default=0)
+    # Skladniki zapisanego zysku (real_profit_*) zamowien z pelnym cache.
+    sale_price = Column(Numeric(12, 2), nullable=False, default=0)
+    cost = Column(Numeric(12, 2), nullable=False, default=0)
+    fees = Column(Numeric(12, 2), nullable=False, default=0)
+    packaging = Column(Numeric(12, 2), nullable=False, default=0)
+    profit = Column(Numeric(12, 2), nullable=False, default=0)
+    # Zamowienia bez pelnego cache zysku (do doliczenia kalkulatorem).
+    profit_pending = Column(Integer, nullable=False, default=0)
+
+
+class OrderSearchDocument(Base):
+    """Znormalizowany tekst wyszukiwania zamowienia.
+
+    Utrzymywany przez services/order_search.py. Na PostgreSQL kolumne
+    ``document`` indeksuje GIN pg_trgm (migracja), na SQLite tabela FTS5
+    ``order_search_fts`` z tokenizerem trigram, aktualizowana triggerami.
+    """
+
+    __tablename__ = "order_search"
+
+    order_id = Column(String, primary_key=True)
+    document = Column(Text, nullable=False, default="")
+
+
+# FTS5 dla SQLite (external content - tekst trzyma tylko order_search).
+for _statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS order_search_fts "
+    "USING fts5(document, content='order_search', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS order_search_ai AFTER INSERT ON order_search BEGIN "
+    "INSERT INTO order_search_fts(rowid, document) VALUES (new.rowid, new.document); END",
+    "CREATE TRIGGER IF NOT EXISTS order_search_ad AFTER DELETE ON order_search BEGIN "
+    "INSERT INTO order_search_fts(order_search_fts, rowid, document) "
+    "VALUES ('delete', old.rowid, old.document); END",
+    "CREATE TRIGGER IF NOT EXISTS order_search_au AFTER UPDATE ON order_search BEGIN "
+    "INSERT INTO order_search_fts(order_search_fts, rowid, document) "
+    "VALUES ('delete', old.rowid, old.document); "
+    "INSERT INTO order_search_fts(rowid, document) VALUES (new.rowid, new.document); END",
+):
+    event.listen(
+        OrderSearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite")
+    )
+event.listen(
+    OrderSearchDocument.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS order_search_fts").execute_if(dialect="sqlite"),
+)
+
+
+__all__ = ["Order", "OrderDailyRollup", "OrderEvent", "OrderProduct", "OrderSearchDocument", "OrderStatusLog"]
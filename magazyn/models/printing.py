@@ -1,6 +1,17 @@
 """Modele drukowania, kolejek etykiet i logow skanowania."""
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+    func,
+)
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -8,23 +19,79 @@ from .base import Base
 
 class PrintedOrder(Base):
     __tablename__ = "printed_orders"
+    __table_args__ = (Index("idx_printed_orders_printed_at", "printed_at"),)
 
     order_id = Column(String, primary_key=True)
     printed_at = Column(String)
     last_order_data = Column(Text)
 
 
+class AgentState(Base):
+    """Stan agenta drukowania (klucz -> wartosc), np. ostatni sukces."""
+
+    __tablename__ = "agent_state"
+
+    key = Column(String, primary_key=True)
+    value = Column(Text)
+
+
 class LabelQueue(Base):
+    """Wpis kolejki etykiet.
+
+    Etykieta w magazynie etykiet (``label_sha256``), a bez niego w ``label_pdf``
+    (``label_data`` - stare wiersze).
+    """
+
     __tablename__ = "label_queue"
+    __table_args__ = (
+        Index("idx_label_queue_status", "status"),
+        Index("idx_label_queue_order_id", "order_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     order_id = Column(String)
     label_data = Column(Text)
+    label_pdf = Column(LargeBinary)
+    label_sha256 = Column(String)
     ext = Column(String)
     last_order_data = Column(Text)
     queued_at = Column(String)
     status = Column(String, default="queued")
     retry_count = Column(Integer, default=0)
+    claimed_by = Column(String)
+    lease_until = Column(String)
+    updated_at = Column(String)
+
+
+class LabelFile(Base):
+    """Indeks magazynu etykiet na dysku: klucz etykiety -> plik ``<sha256>.<ext>``."""
+
+    __tablename__ = "label_files"
+    __table_args__ = (
+        Index("idx_label_files_sha256", "sha256"),
+        Index("idx_label_files_order_id", "order_id"),
+        Index("idx_label_files_last_used_at", "last_used_at"),
+    )
+
+    label_key = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=False)
+    ext = Column(String, nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    order_id = Column(String)
+    created_at = Column(String, nullable=False)
+    last_used_at = Column(String, nullable=False)
+
+
+class OrderBarcode(Base):
+    """Znormalizowany indeks kodow z etykiet (kod -> zamowienie) dla skanera."""
+
+    __tablename__ = "order_barcodes"
+    __table_args__ = (Index("idx_order_barcodes_order_id", "order_id"),)
+
+    barcode = Column(String, primary_key=True)
+    order_id = Column(String, nullable=False)
+    kind = Column(String, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
 
 
 class ScanLog(Base):
@@ -48,4 +115,4 @@ class ScanLog(Base):
     user = relationship("User")
 
 
-__all__ = ["LabelQueue", "PrintedOrder", "ScanLog"]
+__all__ = ["AgentState", "LabelFile", "LabelQueue", "OrderBarcode", "PrintedOrder", "ScanLog"]
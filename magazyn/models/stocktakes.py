@@ -1,6 +1,16 @@
 """Modele remanentu."""
 
-from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, Text, func
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    UniqueConstraint,
+    func,
+)
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -18,6 +28,11 @@ class Stocktake(Base):
     status = Column(String, nullable=False, default="in_progress")
     notes = Column(Text, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    # Liczniki podsumowania aktualizowane przyrostowo w transakcji skanu,
+    # zeby skan nie liczyl agregatow po wszystkich pozycjach remanentu.
+    total_products = Column(Integer, nullable=False, default=0, server_default="0")
+    scanned_products = Column(Integer, nullable=False, default=0, server_default="0")
+    total_scanned = Column(Integer, nullable=False, default=0, server_default="0")
 
     user = relationship("User")
     items = relationship("StocktakeItem", back_populates="stocktake", cascade="all, delete-orphan")
@@ -51,4 +66,29 @@ class StocktakeItem(Base):
     product_size = relationship("ProductSize")
 
 
-__all__ = ["Stocktake", "StocktakeItem"]
+class StocktakeScan(Base):
+    """Przyjety skan z kluczem idempotencji (ponowienie nie liczy sie drugi raz)."""
+
+    __tablename__ = "stocktake_scans"
+    __table_args__ = (
+        UniqueConstraint("stocktake_id", "scan_key", name="uq_stocktake_scans_key"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    stocktake_id = Column(
+        Integer,
+        ForeignKey("stocktakes.id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    scan_key = Column(String, nullable=False)
+    stocktake_item_id = Column(
+        Integer,
+        ForeignKey("stocktake_items.id", ondelete="CASCADE"),
+        nullable=True,
+    )
+    barcode = Column(String, nullable=False)
+    scanned_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+__all__ = ["Stocktake", "StocktakeItem", "StocktakeScan"]
@@ -31,12 +31,15 @@ def _sync_from_allegro_events(app):
 
 
 def _refresh_order_profit_cache(app):
-    """Odswieza zapisany realny zysk dla zamowien bez finalnych danych billingowych."""
-    from sqlalchemy import or_ as db_or
+    """Odswieza zapisany realny zysk zamowien, ktorych termin sprawdzenia minal.
 
+    Kolejnosc i terminy wyznacza services/profit_schedule.py - kazdy cykl
+    przelicza tylko zalegle zamowienia, a po przeliczeniu ustawia kolejny
+    termin wg wieku i statusu zamowienia.
+    """
     from .db import get_session
     from .domain.financial import FinancialCalculator
-    from .models.orders import Order
+    from .services import profit_schedule
     from .settings_store import settings_store
 
     stats = {"checked": 0, "updated": 0, "finalized": 0, "pending": 0, "errors": 0}
@@ -46,27 +49,20 @@ def _refresh_order_profit_cache(app):
 
         with get_session() as db:
             calculator = FinancialCalculator(db, settings_store)
+            now = datetime.utcnow()
+            due_orders = profit_schedule.load_due_orders(db, now=now)
+            statuses = profit_schedule.load_current_statuses(
+                db, [order.order_id for order in due_orders]
+            )
+            allegro_orders = [o for o in due_orders if o.order_id.startswith("allegro_")]
+            woo_orders = [o for o in due_orders if o.order_id.startswith("woo_")]
 
-            # --- Allegro: billing API ---
-            allegro_orders = (
-                db.query(Order)
-                .filter(Order.order_id.like("allegro_%"))
-                .filter(
-                    db_or(
-                        Order.real_profit_amount.is_(None),
-                        Order.real_profit_is_final.is_(False),
-                        Order.real_profit_is_final.is_(None),
-                    )
-                )
-                .filter(
-                    db_or(
-                        Order.payment_done > 0,
-                        Order.payment_method_cod.is_(True),
-                    )
+            def schedule(order, final: bool) -> None:
+                order.next_profit_check_at = profit_schedule.next_check_at(
+                    order, statuses.get(order.order_id), final=final, now=now
                 )
-                .all()
-            )
 
+            # --- Allegro: billing API ---
             prefetched_billings = calculator._prefetch_order_billing_summaries(
                 allegro_orders,
                 access_token,
@@ -92,8 +88,10 @@ def _refresh_order_profit_cache(app):
                         stats["finalized"] += 1
                     else:
                         stats["pending"] += 1
+                    schedule(order, breakdown.billing_complete)
                 except Exception as exc:
                     stats["errors"] += 1
+                    schedule(order, False)
                     logger.warning(
                         "Profit cache refresh error: order_id=%s external_order_id=%s error=%s",
                         order.order_id,
@@ -102,25 +100,6 @@ def _refresh_order_profit_cache(app):
                     )
 
             # --- Woo: WooPayments + InPost shipping ---
-            woo_orders = (
-                db.query(Order)
-                .filter(Order.order_id.like("woo_%"))
-                .filter(
-                    db_or(
-                        Order.real_profit_amount.is_(None),
-                        Order.real_profit_is_final.is_(False),
-                        Order.real_profit_is_final.is_(None),
-                    )
-                )
-                .filter(
-                    db_or(
-                        Order.payment_done > 0,
-                        Order.payment_method_cod.is_(True),
-                    )
-                )
-                .all()
-            )
-
             logger.info(
                 "Profit cache refresh: woo=%s zamowien do odswiezenia",
                 len(woo_orders),
@@ -139,8 +118,10 @@ def _refresh_order_profit_cache(app):
                         stats["finalized"] += 1
                     else:
                         stats["pending"] += 1
+                    schedule(order, breakdown.billing_complete)
                 except Exception as exc:
                     stats["errors"] += 1
+                    schedule(order, False)
                     logger.warning(
                         "Profit cache refresh error (woo): order_id=%s error=%s",
                         order.order_id,
@@ -148,6 +129,7 @@ def _refresh_order_profit_cache(app):
                     )
 
             db.commit()
+            stats.update(profit_schedule.update_queue_metrics(db, now=now))
     except Exception as exc:
         stats["errors"] += 1
         logger.error("Krytyczny blad odswiezania cache realnego zysku: %s", exc, exc_info=True)
@@ -378,20 +360,26 @@ def _run_order_sync_cycle(app) -> None:
 
 
 def _sync_worker(app):
-    """Background worker that syncs orders and parcel statuses every 10 minutes."""
-    logger.info("Order sync scheduler started - will sync every 10 minutes")
+    """Background worker running the order sync job graph.
+
+    Kroki cyklu maja wlasne interwaly (patrz OrderSyncCycle.jobs); watek
+    budzi sie, gdy ktorys z nich jest zalegly, i uruchamia go w tle - dlugie
+    zadanie nie wstrzymuje kolejnych przebiegow krotkich.
+    """
+    logger.info("Order sync scheduler started - job graph with per-step intervals")
+    executor = _order_sync_cycle().executor(app)
 
     while not _stop_event.is_set():
         try:
-            _run_order_sync_cycle(app)
+            executor.submit_due()
         except Exception as e:
             logger.error(f"Error in automatic sync: {e}", exc_info=True)
-        
-        # Wait 10 minutes (600 seconds) or until stop event
-        _stop_event.wait(600)
-    
-    logger.info("Order sync scheduler stopped")
 
+        _stop_event.wait(min(max(executor.seconds_until_next_due(), 1.0), 60.0))
+
+    executor.shutdown()
+
+    logger.info("Order sync scheduler stopped")
 
 
 def start_sync_scheduler(app):
@@ -312,6 +312,16 @@ def download_label(order_id: str):
     
     try:
         prepared_label = prepare_order_label_download(order_id, label_agent)
+        if prepared_label and not prepared_label.temporary:
+            # Plik z magazynu etykiet - ETag z SHA-256, odpowiedzi 304/206 obsluguje send_file.
+            return send_file(
+                prepared_label.path,
+                as_attachment=True,
+                download_name=prepared_label.filename,
+                mimetype=prepared_label.mimetype,
+                conditional=True,
+                etag=prepared_label.etag,
+            )
         if prepared_label:
             @after_this_request
             def remove_file(response):
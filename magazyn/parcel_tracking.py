@@ -4,10 +4,8 @@ import logging
 from typing import Optional, Dict, List, Tuple
 from collections import defaultdict
 
-from sqlalchemy import and_, func
-
 from .db import get_session
-from .models.orders import Order, OrderStatusLog
+from .models.orders import Order
 from .services.return_core import create_return_from_order
 from .settings_store import settings_store
 from . import allegro_api
@@ -207,33 +205,13 @@ def sync_parcel_statuses() -> Dict[str, int]:
             # Szukamy zamówień gdzie OSTATNI status to: wydrukowano, w_drodze lub w_punkcie
             # (nie sprawdzamy "dostarczono" ani starszych)
             
-            # Subquery: znajdź ID ostatniego wpisu statusu dla każdego zamówienia
-            latest_status_subq = (
-                db.query(
-                    OrderStatusLog.order_id,
-                    func.max(OrderStatusLog.timestamp).label("max_timestamp")
-                )
-                .group_by(OrderStatusLog.order_id)
-                .subquery()
-            )
-            
-            # Główne zapytanie: zamówienia z ostatnim statusem w określonych statusach
             orders = (
                 db.query(Order)
-                .join(OrderStatusLog, OrderStatusLog.order_id == Order.order_id)
-                .join(
-                    latest_status_subq,
-                    and_(
-                        OrderStatusLog.order_id == latest_status_subq.c.order_id,
-                        OrderStatusLog.timestamp == latest_status_subq.c.max_timestamp,
-                    ),
-                )
                 .filter(
-                    OrderStatusLog.status.in_(["wydrukowano", "spakowano", "wyslano", "w_transporcie", "w_punkcie"]),
+                    Order.current_status.in_(["wydrukowano", "spakowano", "wyslano", "w_transporcie", "w_punkcie"]),
                     Order.delivery_package_nr.isnot(None),
                     Order.delivery_package_nr != "",
                 )
-                .distinct()
                 .all()
             )
 
@@ -295,12 +273,8 @@ def sync_parcel_statuses() -> Dict[str, int]:
                                 new_status = ALLEGRO_TRACKING_MAP.get(allegro_status)
 
                             if new_status:
-                                # Pobierz obecny status zamówienia
-                                current_log = db.query(OrderStatusLog).filter(
-                                    OrderStatusLog.order_id == order.order_id
-                                ).order_by(OrderStatusLog.timestamp.desc()).first()
-
-                                current_status = current_log.status if current_log else None
+                                # Obecny status zamówienia (orders.current_status)
+                                current_status = order.current_status
 
                                 # Aktualizuj tylko jeśli status się zmienił
                                 if current_status != new_status:
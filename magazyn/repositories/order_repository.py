@@ -3,13 +3,17 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta
-from sqlalchemy import desc, func, or_
+from sqlalchemy import and_, case, desc, exists, func, literal_column, or_, select, text
 from sqlalchemy.orm import Session
 
-from ..models.orders import Order, OrderProduct, OrderStatusLog
+from ..domain.order_search import search_terms
+from ..models.orders import Order, OrderProduct, OrderSearchDocument, OrderStatusLog
 from ..models.returns import Return
 from ..status_config import STATUS_FILTER_GROUPS
 
+# Trigram FTS5 dopasowuje tylko fragmenty od 3 znakow.
+_FTS_MIN_LENGTH = 3
+
 
 class OrderRepository:
     """Centralizuje zapytania uzywane przez widoki i serwisy zamowien."""
@@ -31,52 +35,181 @@ class OrderRepository:
         query = self._apply_search(query, search)
         query = self._apply_date_range(query, date_from, date_to)
         query = self._apply_status_filter(query, status_filter)
-        return self._apply_sorting(query, sort_by, sort_dir)
+        return self._apply_sorting(query, sort_by, sort_dir, search=search)
 
-    def chronological_order_ids(self, *, search: str = "") -> list[str]:
-        query = self.db.query(Order.order_id)
-        query = self._apply_search(query, search)
-        return [row.order_id for row in query.order_by(Order.date_add.asc()).all()]
+    def order_ordinals(self, order_ids: list[str], *, search: str = "") -> dict[str, int]:
+        """Numer porzadkowy "lp" (kolejnosc chronologiczna) dla zamowien ze strony.
+
+        ROW_NUMBER liczy baza - do aplikacji trafiaja tylko wiersze strony.
+        """
+        if not order_ids:
+            return {}
+        ordinal_query = self.db.query(
+            Order.order_id.label("order_id"),
+            func.row_number()
+            .over(order_by=(Order.date_add.asc().nulls_first(), Order.order_id.asc()))
+            .label("lp"),
+        )
+        ordinals = self._apply_search(ordinal_query, search).subquery()
+        rows = self.db.query(ordinals.c.order_id, ordinals.c.lp).filter(
+            ordinals.c.order_id.in_(order_ids)
+        )
+        return {row.order_id: row.lp for row in rows}
 
-    def latest_status(self, order_id: str) -> OrderStatusLog | None:
-        return (
+    def latest_statuses(self, order_ids: list[str]) -> dict[str, OrderStatusLog]:
+        if not order_ids:
+            return {}
+        ranked = (
+            self.db.query(
+                OrderStatusLog.id.label("id"),
+                func.row_number()
+                .over(
+                    partition_by=OrderStatusLog.order_id,
+                    order_by=(desc(OrderStatusLog.timestamp), desc(OrderStatusLog.id)),
+                )
+                .label("rn"),
+            )
+            .filter(OrderStatusLog.order_id.in_(order_ids))
+            .subquery()
+        )
+        rows = (
             self.db.query(OrderStatusLog)
-            .filter(OrderStatusLog.order_id == order_id)
-            .order_by(desc(OrderStatusLog.timestamp))
-            .first()
+            .join(ranked, OrderStatusLog.id == ranked.c.id)
+            .filter(ranked.c.rn == 1)
         )
+        return {row.order_id: row for row in rows}
 
-    def order_products(self, order_id: str) -> list[OrderProduct]:
-        return self.db.query(OrderProduct).filter(OrderProduct.order_id == order_id).all()
+    def products_by_order(self, order_ids: list[str]) -> dict[str, list[OrderProduct]]:
+        products: dict[str, list[OrderProduct]] = {order_id: [] for order_id in order_ids}
+        if not order_ids:
+            return products
+        for product in (
+            self.db.query(OrderProduct)
+            .filter(OrderProduct.order_id.in_(order_ids))
+            .order_by(OrderProduct.id)
+        ):
+            products[product.order_id].append(product)
+        return products
 
-    def active_return(self, order_id: str) -> Return | None:
-        return (
+    def active_returns(self, order_ids: list[str]) -> dict[str, Return]:
+        if not order_ids:
+            return {}
+        returns: dict[str, Return] = {}
+        for row in (
             self.db.query(Return)
-            .filter(Return.order_id == order_id, Return.status != "cancelled")
-            .first()
-        )
+            .filter(Return.order_id.in_(order_ids), Return.status != "cancelled")
+            .order_by(Return.id)
+        ):
+            returns.setdefault(row.order_id, row)
+        return returns
+
+    @staticmethod
+    def encode_cursor(order: Order) -> str:
+        date_part = "n" if order.date_add is None else str(order.date_add)
+        return f"{date_part}:{order.order_id}"
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[int | None, str] | None:
+        date_part, sep, order_id = (cursor or "").partition(":")
+        if not sep or not order_id:
+            return None
+        if date_part == "n":
+            return None, order_id
+        try:
+            return int(date_part), order_id
+        except ValueError:
+            return None
+
+    @staticmethod
+    def apply_keyset(query, cursor: tuple[int | None, str], sort_dir: str):
+        """Wiersze po ``cursor`` w porzadku dat (NULL na koncu) - bez OFFSET."""
+        date_add, order_id = cursor
+        newer = sort_dir != "asc"
+        if date_add is None:
+            tail = Order.order_id < order_id if newer else Order.order_id > order_id
+            return query.filter(Order.date_add.is_(None), tail)
+        if newer:
+            after = or_(
+                Order.date_add < date_add,
+                (Order.date_add == date_add) & (Order.order_id < order_id),
+            )
+        else:
+            after = or_(
+                Order.date_add > date_add,
+                (Order.date_add == date_add) & (Order.order_id > order_id),
+            )
+        return query.filter(or_(after, Order.date_add.is_(None)))
 
     def _apply_search(self, query, search: str):
         if not search:
             return query
+        terms = search_terms(search)
+        if not terms:
+            return query
+        # Indeks order_search (services/order_search.py) zamiast ILIKE po kolumnach;
+        # zamowienie musi zawierac wszystkie slowa zapytania.
+        matches = select(OrderSearchDocument.order_id)
+        if self.db.get_bind().dialect.name == "sqlite":
+            fts_terms = [term for term in terms if len(term) >= _FTS_MIN_LENGTH]
+            terms = [term for term in terms if len(term) < _FTS_MIN_LENGTH]
+            if fts_terms:
+                phrases = " ".join('"' + term.replace('"', '""') + '"' for term in fts_terms)
+                fts_rowids = text(
+                    "SELECT rowid FROM order_search_fts WHERE order_search_fts MATCH :match"
+                ).bindparams(match=phrases)
+                matches = matches.where(
+                    literal_column("order_search.rowid").in_(fts_rowids.columns(literal_column("rowid")))
+                )
+        for term in terms:
+            matches = matches.where(OrderSearchDocument.document.contains(term, autoescape=True))
+        if self._search_index_complete():
+            return query.filter(Order.order_id.in_(matches))
+        # Zamowienia bez dokumentu (zaraz po migracji, przed krokiem
+        # order_search_index) szukamy po staremu, ILIKE po kolumnach.
+        has_document = exists().where(OrderSearchDocument.order_id == Order.order_id)
+        return query.filter(
+            or_(Order.order_id.in_(matches), and_(~has_document, self._column_search(search)))
+        )
+
+    def _search_index_complete(self) -> bool:
+        missing = (
+            select(Order.order_id)
+            .where(~exists().where(OrderSearchDocument.order_id == Order.order_id))
+            .exists()
+        )
+        return not self.db.query(missing).scalar()
 
+    def _column_search(self, search: str):
         search_pattern = f"%{search}%"
-        product_match_subq = (
-            self.db.query(OrderProduct.order_id)
-            .filter(OrderProduct.name.ilike(search_pattern))
-            .distinct()
-            .subquery()
+        product_matches = select(OrderProduct.order_id).where(OrderProduct.name.ilike(search_pattern))
+        return or_(
+            Order.order_id.ilike(search_pattern),
+            Order.external_order_id.ilike(search_pattern),
+            Order.customer_name.ilike(search_pattern),
+            Order.email.ilike(search_pattern),
+            Order.phone.ilike(search_pattern),
+            Order.delivery_method.ilike(search_pattern),
+            Order.order_id.in_(product_matches),
         )
-        return query.filter(
-            or_(
-                Order.order_id.ilike(search_pattern),
-                Order.external_order_id.ilike(search_pattern),
-                Order.customer_name.ilike(search_pattern),
-                Order.email.ilike(search_pattern),
-                Order.phone.ilike(search_pattern),
-                Order.delivery_method.ilike(search_pattern),
-                Order.order_id.in_(product_match_subq),
-            )
+
+    @staticmethod
+    def _relevance(search: str):
+        """Ranga dopasowania (0 = najlepsze).
+
+        Cale pole rowne zapytaniu, pole zaczynajace sie od zapytania, slowo
+        zaczynajace sie od zapytania, dowolny fragment.
+        """
+        phrase = " ".join(search_terms(search))
+        document = (
+            select(OrderSearchDocument.document)
+            .where(OrderSearchDocument.order_id == Order.order_id)
+            .scalar_subquery()
+        )
+        return case(
+            (document.contains(f"| {phrase} |", autoescape=True), 0),
+            (document.contains(f"| {phrase}", autoescape=True), 1),
+            (document.contains(f" {phrase}", autoescape=True), 2),
+            else_=3,
         )
 
     @staticmethod
@@ -103,37 +236,28 @@ class OrderRepository:
         if not status_filter or status_filter == "all":
             return query
 
-        latest_status_subq = (
-            self.db.query(
-                OrderStatusLog.order_id,
-                func.max(OrderStatusLog.timestamp).label("max_ts"),
-            )
-            .group_by(OrderStatusLog.order_id)
-            .subquery()
-        )
-        query = query.join(
-            latest_status_subq,
-            Order.order_id == latest_status_subq.c.order_id,
-        ).join(
-            OrderStatusLog,
-            (OrderStatusLog.order_id == latest_status_subq.c.order_id)
-            & (OrderStatusLog.timestamp == latest_status_subq.c.max_ts),
-        )
-
+        # orders.current_status (services/order_current_status.py) - skan indeksu
+        # (current_status, date_add) zamiast MAX(timestamp) z joinem historii.
         if status_filter in STATUS_FILTER_GROUPS:
-            return query.filter(OrderStatusLog.status.in_(STATUS_FILTER_GROUPS[status_filter]))
-        return query.filter(OrderStatusLog.status == status_filter)
+            return query.filter(Order.current_status.in_(STATUS_FILTER_GROUPS[status_filter]))
+        return query.filter(Order.current_status == status_filter)
 
-    @staticmethod
-    def _apply_sorting(query, sort_by: str, sort_dir: str):
+    @classmethod
+    def _apply_sorting(cls, query, sort_by: str, sort_dir: str, *, search: str = ""):
+        if sort_by == "relevance" and search:
+            # Najlepsze dopasowania najpierw, w obrebie rangi najnowsze.
+            return query.order_by(
+                cls._relevance(search), Order.date_add.desc().nulls_last(), Order.order_id.desc()
+            )
         if sort_by == "amount":
             sort_col = Order.payment_done
         else:
             sort_col = Order.date_add
 
+        # order_id rozstrzyga remisy - stabilna kolejnosc dla paginacji keyset.
         if sort_dir == "asc":
-            return query.order_by(sort_col.asc())
-        return query.order_by(sort_col.desc())
+            return query.order_by(sort_col.asc().nulls_last(), Order.order_id.asc())
+        return query.order_by(sort_col.desc().nulls_last(), Order.order_id.desc())
 
 
 __all__ = ["OrderRepository"]
\ No newline at end of file
@@ -27,6 +27,18 @@ from .email_service import (
 )
 from .order_status import add_order_status, dispatch_status_email
 from .order_sync import sync_order_from_data
+# Rejestruje listenery ORM przesuwajace termin przeliczenia zysku zamowien.
+from . import profit_schedule  # noqa: F401
+# Rejestruje listener sesji utrzymujacy dzienny rollup zamowien.
+from . import order_rollup  # noqa: F401
+# Rejestruje listener dotykajacy zamowien przy edycji linii (magazyn faktow statystyk).
+from . import order_facts  # noqa: F401
+# Rejestruje listener utrzymujacy orders.current_status zgodnie z historia statusow.
+from . import order_current_status  # noqa: F401
+# Rejestruje listener utrzymujacy indeks wyszukiwania zamowien.
+from . import order_search  # noqa: F401
+# Rejestruje listener budzacy agenta druku po nowych zamowieniach.
+from . import print_agent_wakeup  # noqa: F401
 
 # Re-export z domain dla kompatybilnosci wstecznej
 from ..domain.inventory import consume_order_stock
@@ -6,9 +6,9 @@ import logging
 import time
 from typing import Callable
 
-import requests
 from sqlalchemy import case, or_
 
+from .. import http_transport
 from ..allegro_api.core import ALLEGRO_USER_AGENT
 from ..allegro_helpers import build_inventory_list
 from ..db import get_session
@@ -121,7 +121,7 @@ def new_request_id() -> tuple[float, str]:
 
 
 def _get_json(url: str, headers: dict) -> dict:
-    response = requests.get(url, headers=headers, timeout=10)
+    response = http_transport.get_session(http_transport.ALLEGRO).get(url, headers=headers, timeout=10)
     if response.status_code != 200:
         return {}
     return response.json()
@@ -14,6 +14,7 @@ from typing import Any, Dict, List, Optional
 
 import requests
 
+from .. import http_transport
 from ..allegro_api.core import ALLEGRO_USER_AGENT, API_BASE_URL, DEFAULT_TIMEOUT
 from ..settings_store import settings_store
 
@@ -100,7 +101,11 @@ def fetch_offer_promo_options(access_token: str, offer_id: str) -> Optional[Dict
     headers = _get_headers(access_token)
     
     try:
-        response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response = http_transport.get_session(http_transport.ALLEGRO).get(
+            url,
+            headers=headers,
+            timeout=DEFAULT_TIMEOUT,
+        )
         if response.status_code == 200:
             return response.json()
         else:
@@ -126,7 +131,12 @@ def fetch_all_promo_options(access_token: str, limit: int = 5000) -> List[Dict[s
     
     try:
         while True:
-            response = requests.get(url, headers=headers, params=params, timeout=DEFAULT_TIMEOUT)
+            response = http_transport.get_session(http_transport.ALLEGRO).get(
+                url,
+                headers=headers,
+                params=params,
+                timeout=DEFAULT_TIMEOUT,
+            )
             if response.status_code != 200:
                 logger.error(f"Błąd pobierania promo-options: {response.status_code} - {response.text[:200]}")
                 break
@@ -154,7 +164,11 @@ def fetch_offer_info(access_token: str, offer_id: str) -> Dict[str, str]:
     headers = _get_headers(access_token)
     
     try:
-        response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response = http_transport.get_session(http_transport.ALLEGRO).get(
+            url,
+            headers=headers,
+            timeout=DEFAULT_TIMEOUT,
+        )
         if response.status_code == 200:
             data = response.json()
             return {
@@ -307,7 +321,12 @@ def disable_promotion(
     }
     
     try:
-        response = requests.post(url, headers=headers, json=body, timeout=DEFAULT_TIMEOUT)
+        response = http_transport.get_session(http_transport.ALLEGRO).post(
+            url,
+            headers=headers,
+            json=body,
+            timeout=DEFAULT_TIMEOUT,
+        )
         if response.status_code == 200:
             logger.info(f"Wyłączono wyróżnienie dla oferty {offer_id}")
             return True
@@ -7,8 +7,7 @@ import logging
 from datetime import datetime, timezone
 from typing import Any
 
-import requests
-
+from .. import http_transport
 from ..allegro_api.core import ALLEGRO_USER_AGENT
 from ..settings_store import settings_store
 
@@ -34,7 +33,7 @@ def fetch_ratings_snapshot(access_token: str | None = None) -> dict[str, Any]:
         raise RuntimeError("missing ALLEGRO_ACCESS_TOKEN")
 
     headers = _headers(token)
-    me = requests.get("https://api.allegro.pl/me", headers=headers, timeout=25)
+    me = http_transport.get_session(http_transport.ALLEGRO).get("https://api.allegro.pl/me", headers=headers, timeout=25)
     me.raise_for_status()
     me_data = me.json()
     user_id = str(me_data.get("id") or "")
@@ -42,7 +41,7 @@ def fetch_ratings_snapshot(access_token: str | None = None) -> dict[str, Any]:
     if not user_id:
         raise RuntimeError("allegro /me missing id")
 
-    summary = requests.get(
+    summary = http_transport.get_session(http_transport.ALLEGRO).get(
         f"https://api.allegro.pl/users/{user_id}/ratings-summary",
         headers=headers,
         timeout=25,
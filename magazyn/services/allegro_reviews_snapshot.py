@@ -8,8 +8,7 @@ import re
 from datetime import datetime, timezone
 from typing import Any
 
-import requests
-
+from .. import http_transport
 from ..allegro_api.core import ALLEGRO_USER_AGENT
 from ..settings_store import settings_store
 
@@ -72,7 +71,7 @@ def fetch_reviews_with_comments(
     offset = 0
 
     for _ in range(MAX_FETCH_PAGES):
-        resp = requests.get(
+        resp = http_transport.get_session(http_transport.ALLEGRO).get(
             "https://api.allegro.pl/sale/user-ratings",
             headers=headers,
             params={"recommended": "true", "limit": PAGE_SIZE, "offset": offset},
@@ -15,6 +15,7 @@ class PrintAgentStartResult:
 
 def register_shutdown_hooks() -> None:
     from .. import billing_types_scheduler, order_sync_scheduler, promo_scheduler, allegro_ads_scheduler
+    from .. import http_transport
     from .print_agent_runtime import agent as label_agent
 
     atexit.register(label_agent.stop_agent_thread)
@@ -22,6 +23,7 @@ def register_shutdown_hooks() -> None:
     atexit.register(promo_scheduler.stop_promo_scheduler)
     atexit.register(billing_types_scheduler.stop_billing_types_scheduler)
     atexit.register(allegro_ads_scheduler.stop_allegro_ads_scheduler)
+    atexit.register(http_transport.close_all)
 
 
 def start_order_sync_scheduler(app: Any) -> None:
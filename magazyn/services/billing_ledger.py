@@ -0,0 +1,428 @@
+"""Lokalna ksiega wpisow billingowych Allegro (tabela ``billing_entries``).
+
+Wpisy sa pobierane przyrostowo z ``/billing/billing-entries`` oknami
+``occurredAt`` od zapisanego kursora (``ALLEGRO_BILLING_CURSOR``). Podsumowania
+oplat zamowien i endpointy statystyk czytaja je lokalnie jednym zapytaniem,
+zamiast odpytywac API osobno dla kazdego zamowienia. Gdy ksiega nie obejmuje
+zadanego okresu (brak synchronizacji, zbyt stary kursor), wywolujacy wracaja
+do API.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Iterable, Optional
+
+from dateutil import parser as dateparser
+from sqlalchemy import case, func
+
+from ..db import get_session
+from ..models.allegro import BillingEntry
+from ..models.orders import Order
+from ..settings_store import settings_store
+from .profit_schedule import invalidate_profit_schedule
+from .stats_cache import TAG_BILLING
+from .stats_runtime import invalidate_stats_cache
+
+logger = logging.getLogger(__name__)
+
+CURSOR_KEY = "ALLEGRO_BILLING_CURSOR"
+START_KEY = "ALLEGRO_BILLING_LEDGER_START"
+BACKFILL_DAYS = 90
+SYNC_WINDOW = timedelta(days=7)
+# Allegro publikuje czesc wpisow z opoznieniem - kazdy przebieg czyta
+# ponownie koncowke poprzedniego okna (zapis jest idempotentny po entry_id).
+SYNC_OVERLAP = timedelta(hours=6)
+# Ksiega jest uznawana za aktualna, jesli kursor nie jest starszy niz to.
+MAX_CURSOR_LAG = timedelta(hours=3)
+PAGE_LIMIT = 100
+MAX_PAGES_PER_WINDOW = 200
+_IN_CHUNK_SIZE = 500
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _iso(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = dateparser.isoparse(str(value))
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _decimal(value: Any) -> Decimal:
+    try:
+        return Decimal(str(value if value is not None else 0))
+    except Exception:
+        return Decimal("0")
+
+
+def ledger_coverage() -> tuple[Optional[datetime], Optional[datetime]]:
+    """Zwroc (poczatek, kursor) okresu zsynchronizowanego do ksiegi."""
+    return (
+        _parse_datetime(settings_store.get(START_KEY)),
+        _parse_datetime(settings_store.get(CURSOR_KEY)),
+    )
+
+
+def ledger_is_fresh(*, now: Optional[datetime] = None) -> bool:
+    _start, cursor = ledger_coverage()
+    if cursor is None:
+        return False
+    return cursor >= (now or _utcnow()) - MAX_CURSOR_LAG
+
+
+def ledger_covers(
+    date_from: datetime, date_to: datetime, *, now: Optional[datetime] = None
+) -> bool:
+    """Czy ksiega zawiera wszystkie wpisy z okresu [date_from, date_to)."""
+    start, cursor = ledger_coverage()
+    if start is None or cursor is None or start > date_from:
+        return False
+    end = min(date_to, now or _utcnow())
+    return cursor >= end - MAX_CURSOR_LAG
+
+
+def _entry_row(entry: dict) -> Optional[dict]:
+    entry_id = str(entry.get("id") or "").strip()
+    occurred_at = _parse_datetime(entry.get("occurredAt"))
+    if not entry_id or occurred_at is None:
+        return None
+    type_info = entry.get("type") or {}
+    offer = entry.get("offer") or {}
+    campaign = entry.get("campaign") or {}
+    value = entry.get("value") or {}
+    return {
+        "entry_id": entry_id,
+        "occurred_at": occurred_at,
+        "type_id": str(type_info.get("id") or "UNKNOWN"),
+        "type_name": type_info.get("name"),
+        "order_id": (entry.get("order") or {}).get("id"),
+        "offer_id": str(offer.get("id")) if offer.get("id") else None,
+        "offer_name": offer.get("name"),
+        "campaign_id": str(campaign.get("id") or entry.get("campaignId") or "") or None,
+        "campaign_name": campaign.get("name") or entry.get("campaignName"),
+        "amount": _decimal(value.get("amount")),
+        "currency": value.get("currency"),
+        "raw": json.dumps(entry, ensure_ascii=False),
+    }
+
+
+def store_billing_entries(entries: Iterable[dict]) -> int:
+    """Zapisz nowe wpisy (po ``entry_id``); zwraca liczbe dodanych."""
+    rows = {}
+    for entry in entries:
+        row = _entry_row(entry)
+        if row is not None:
+            rows[row["entry_id"]] = row
+    if not rows:
+        return 0
+
+    ids = list(rows)
+    with get_session() as db:
+        existing: set[str] = set()
+        for start in range(0, len(ids), _IN_CHUNK_SIZE):
+            chunk = ids[start:start + _IN_CHUNK_SIZE]
+            existing.update(
+                entry_id
+                for (entry_id,) in db.query(BillingEntry.entry_id).filter(
+                    BillingEntry.entry_id.in_(chunk)
+                )
+            )
+        new_rows = [BillingEntry(**row) for entry_id, row in rows.items() if entry_id not in existing]
+        db.add_all(new_rows)
+        # Nowe oplaty zmieniaja zysk zamowien - przelicz je w najblizszym cyklu.
+        invalidate_profit_schedule(
+            db, external_order_ids=[row.order_id for row in new_rows]
+        )
+    return len(new_rows)
+
+
+def _fetch_window(access_token: str, window_start: datetime, window_end: datetime) -> list[dict]:
+    from ..allegro_api import fetch_billing_entries
+
+    entries: list[dict] = []
+    for page in range(MAX_PAGES_PER_WINDOW):
+        data = fetch_billing_entries(
+            access_token,
+            occurred_at_gte=_iso(window_start),
+            occurred_at_lte=_iso(window_end),
+            limit=PAGE_LIMIT,
+            offset=page * PAGE_LIMIT,
+        )
+        batch = data.get("billingEntries", [])
+        entries.extend(batch)
+        if len(batch) < PAGE_LIMIT:
+            return entries
+    logger.warning(
+        "Billing ledger: okno %s..%s przekroczylo %s stron - wpisy moga byc niepelne",
+        _iso(window_start),
+        _iso(window_end),
+        MAX_PAGES_PER_WINDOW,
+    )
+    return entries
+
+
+def sync_billing_entries(
+    access_token: Optional[str] = None,
+    *,
+    now: Optional[datetime] = None,
+    log: logging.Logger | None = None,
+) -> dict[str, int]:
+    """Dociagnij wpisy billingowe od kursora do teraz, okno po oknie."""
+    active_logger = log or logger
+    stats = {"windows": 0, "fetched": 0, "stored": 0, "errors": 0}
+    token = access_token or settings_store.get("ALLEGRO_ACCESS_TOKEN")
+    if not token:
+        return stats
+
+    now = now or _utcnow()
+    start, cursor = ledger_coverage()
+    if cursor is None:
+        window_start = now - timedelta(days=BACKFILL_DAYS)
+        if start is None or start > window_start:
+            settings_store.update({START_KEY: _iso(window_start)})
+    else:
+        window_start = cursor - SYNC_OVERLAP
+
+    while window_start < now:
+        window_end = min(window_start + SYNC_WINDOW, now)
+        try:
+            entries = _fetch_window(token, window_start, window_end)
+            stats["stored"] += store_billing_entries(entries)
+        except Exception as exc:
+            active_logger.error(
+                "Billing ledger: blad synchronizacji okna %s..%s: %s",
+                _iso(window_start),
+                _iso(window_end),
+                exc,
+            )
+            stats["errors"] += 1
+            break
+        stats["windows"] += 1
+        stats["fetched"] += len(entries)
+        settings_store.update({CURSOR_KEY: _iso(window_end)})
+        window_start = window_end
+
+    if stats["stored"]:
+        invalidate_stats_cache(TAG_BILLING)
+    return stats
+
+
+def _row_entry(row: BillingEntry) -> dict:
+    if row.raw:
+        try:
+            return json.loads(row.raw)
+        except ValueError:
+            pass
+    entry: dict[str, Any] = {
+        "id": row.entry_id,
+        "occurredAt": _iso(row.occurred_at),
+        "type": {"id": row.type_id, "name": row.type_name or row.type_id},
+        "value": {"amount": str(row.amount), "currency": row.currency},
+    }
+    if row.order_id:
+        entry["order"] = {"id": row.order_id}
+    if row.offer_id:
+        entry["offer"] = {"id": row.offer_id, "name": row.offer_name}
+    return entry
+
+
+def load_order_billing_summaries(
+    order_ids: Iterable[str],
+    *,
+    delivery_method: Optional[str] = None,
+    order_value: Optional[Decimal] = None,
+) -> dict[str, dict]:
+    """Podsumowania oplat z ksiegi dla zamowien, ktore ksiega obejmuje.
+
+    Zamowienie jest objete, gdy zlozono je po poczatku ksiegi, a kursor jest
+    aktualny - starsze zamowienia maja w ksiedze tylko czesc oplat. Brak
+    zamowienia w wyniku oznacza, ze wywolujacy pobiera dane z API.
+    """
+    from ..allegro_api import build_billing_summary
+
+    ids = [str(order_id) for order_id in dict.fromkeys(order_ids) if order_id]
+    start, _cursor = ledger_coverage()
+    if not ids or start is None or not ledger_covers(start, _utcnow()):
+        return {}
+    start_ts = int(start.replace(tzinfo=timezone.utc).timestamp())
+
+    entries_by_order: dict[str, list[dict]] = {}
+    with get_session() as db:
+        for offset in range(0, len(ids), _IN_CHUNK_SIZE):
+            chunk = [
+                order_id
+                for (order_id,) in db.query(Order.external_order_id).filter(
+                    Order.external_order_id.in_(ids[offset:offset + _IN_CHUNK_SIZE]),
+                    Order.date_add >= start_ts,
+                )
+            ]
+            if not chunk:
+                continue
+            rows = (
+                db.query(BillingEntry)
+                .filter(BillingEntry.order_id.in_(chunk))
+                .order_by(BillingEntry.occurred_at)
+                .all()
+            )
+            for row in rows:
+                entries_by_order.setdefault(row.order_id, []).append(_row_entry(row))
+
+    summaries = {}
+    for order_id, entries in entries_by_order.items():
+        summary = build_billing_summary(
+            entries,
+            delivery_method=delivery_method,
+            order_value=order_value,
+        )
+        summary["source"] = "ledger"
+        summaries[order_id] = summary
+    return summaries
+
+
+def get_order_billing_summary(
+    access_token: Optional[str],
+    order_id: str,
+    delivery_method: Optional[str] = None,
+    order_value: Optional[Decimal] = None,
+) -> dict:
+    """Podsumowanie oplat zamowienia: z ksiegi, a gdy jej brak - z API Allegro."""
+    from .. import allegro_api
+
+    local = load_order_billing_summaries(
+        [order_id],
+        delivery_method=delivery_method,
+        order_value=order_value,
+    )
+    if order_id in local:
+        return local[order_id]
+    summary = allegro_api.get_order_billing_summary(
+        access_token,
+        order_id,
+        delivery_method=delivery_method,
+        order_value=order_value,
+    )
+    if isinstance(summary, dict):
+        summary.setdefault("source", "api")
+    return summary
+
+
+def period_fees_by_type(date_from: datetime, date_to: datetime) -> dict[str, dict[str, Any]]:
+    """Suma oplat (wartosci ujemnych) per typ w okresie - jedno zapytanie."""
+    debit = func.sum(case((BillingEntry.amount < 0, -BillingEntry.amount), else_=0))
+    with get_session() as db:
+        rows = (
+            db.query(BillingEntry.type_id, func.max(BillingEntry.type_name), debit)
+            .filter(
+                BillingEntry.occurred_at >= date_from,
+                BillingEntry.occurred_at < date_to,
+            )
+            .group_by(BillingEntry.type_id)
+            .all()
+        )
+    return {
+        type_id: {"name": type_name, "amount": _decimal(amount)}
+        for type_id, type_name, amount in rows
+        if _decimal(amount) > 0
+    }
+
+
+def period_daily_costs(
+    date_from: datetime, date_to: datetime, type_ids: Iterable[str]
+) -> list[dict]:
+    """Dzienny koszt (wartosci ujemne) wybranych typow, np. NSP kampanii Ads."""
+    day = func.date(BillingEntry.occurred_at)
+    debit = func.sum(case((BillingEntry.amount < 0, -BillingEntry.amount), else_=0))
+    with get_session() as db:
+        rows = (
+            db.query(day, debit)
+            .filter(
+                BillingEntry.type_id.in_(list(type_ids)),
+                BillingEntry.occurred_at >= date_from,
+                BillingEntry.occurred_at < date_to,
+            )
+            .group_by(day)
+            .order_by(day)
+            .all()
+        )
+    return [
+        {"date": str(row_day), "amount": _decimal(amount)}
+        for row_day, amount in rows
+        if _decimal(amount) > 0
+    ]
+
+
+def period_offer_campaign_entries(
+    date_from: datetime, date_to: datetime, type_ids: Iterable[str]
+) -> list[dict]:
+    """Wpisy zagregowane po typie, ofercie i kampanii - jedno zapytanie.
+
+    Kazda grupa daje do dwoch wpisow w formacie API (suma obciazen i suma
+    uznan), wiec mozna je przetwarzac tak samo jak surowe ``billingEntries``.
+    """
+    debit = func.sum(case((BillingEntry.amount < 0, BillingEntry.amount), else_=0))
+    credit = func.sum(case((BillingEntry.amount > 0, BillingEntry.amount), else_=0))
+    columns = (
+        BillingEntry.type_id,
+        BillingEntry.offer_id,
+        BillingEntry.campaign_id,
+    )
+    with get_session() as db:
+        rows = (
+            db.query(
+                *columns,
+                func.max(BillingEntry.offer_name),
+                func.max(BillingEntry.campaign_name),
+                debit,
+                credit,
+            )
+            .filter(
+                BillingEntry.type_id.in_(list(type_ids)),
+                BillingEntry.occurred_at >= date_from,
+                BillingEntry.occurred_at < date_to,
+            )
+            .group_by(*columns)
+            .all()
+        )
+
+    entries = []
+    for type_id, offer_id, campaign_id, offer_name, campaign_name, debit_sum, credit_sum in rows:
+        base: dict[str, Any] = {"type": {"id": type_id}}
+        if offer_id:
+            base["offer"] = {"id": offer_id, "name": offer_name}
+        if campaign_id:
+            base["campaign"] = {"id": campaign_id, "name": campaign_name}
+        for amount in (_decimal(debit_sum), _decimal(credit_sum)):
+            if amount:
+                entries.append({**base, "value": {"amount": str(amount)}})
+    return entries
+
+
+__all__ = [
+    "CURSOR_KEY",
+    "START_KEY",
+    "get_order_billing_summary",
+    "ledger_coverage",
+    "ledger_covers",
+    "ledger_is_fresh",
+    "load_order_billing_summaries",
+    "period_daily_costs",
+    "period_fees_by_type",
+    "period_offer_campaign_entries",
+    "store_billing_entries",
+    "sync_billing_entries",
+]
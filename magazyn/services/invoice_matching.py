@@ -2,28 +2,34 @@
 
 from __future__ import annotations
 
-from typing import Callable, MutableMapping
+from typing import Callable, MutableMapping, Optional
 
-from ..domain.inventory import get_product_sizes
+from .product_match_index import ProductMatchIndex, get_product_match_index
 from .product_matching import _fuzzy_match_product, _match_by_tiptop_sku
 
 
 def match_invoice_rows(
     rows: list[MutableMapping],
     *,
-    product_sizes_provider: Callable = get_product_sizes,
+    product_sizes_provider: Optional[Callable] = None,
 ) -> tuple[list[MutableMapping], list]:
-    """Dopasuj wiersze faktury po EAN, SKU TipTop, a na koncu fuzzy matchingiem."""
-    product_sizes = product_sizes_provider()
-    barcode_map = {product_size.barcode: product_size for product_size in product_sizes if product_size.barcode}
+    """Dopasuj wiersze faktury po EAN, SKU TipTop, a na koncu fuzzy matchingiem.
+
+    Domyslnie korzysta ze wspolnego indeksu produktow procesu; podany
+    ``product_sizes_provider`` buduje indeks jednorazowo z jego wierszy.
+    """
+    if product_sizes_provider is None:
+        index = get_product_match_index()
+    else:
+        index = ProductMatchIndex(product_sizes_provider())
 
     for row in rows:
-        _match_invoice_row(row, product_sizes, barcode_map)
+        _match_invoice_row(row, index)
 
-    return rows, product_sizes
+    return rows, index.entries
 
 
-def _match_invoice_row(row: MutableMapping, product_sizes: list, barcode_map: dict) -> None:
+def _match_invoice_row(row: MutableMapping, index: ProductMatchIndex) -> None:
     barcode = str(row.get("Barcode") or row.get("EAN") or "").strip()
     sku = str(row.get("SKU") or "").strip()
 
@@ -31,8 +37,8 @@ def _match_invoice_row(row: MutableMapping, product_sizes: list, barcode_map: di
     row["matched_name"] = None
     row["match_type"] = None
 
-    if barcode and barcode in barcode_map:
-        product_size = barcode_map[barcode]
+    product_size = index.by_barcode(barcode)
+    if product_size:
         row["matched_ps_id"] = product_size.ps_id
         row["matched_name"] = f"{product_size.name} ({product_size.color}) {product_size.size}"
         row["match_type"] = "ean"
@@ -41,7 +47,7 @@ def _match_invoice_row(row: MutableMapping, product_sizes: list, barcode_map: di
     if sku:
         ps_id, match_name, match_type = _match_by_tiptop_sku(
             sku,
-            product_sizes,
+            index.sku_candidates(sku),
             row.get("Nazwa", ""),
         )
         if ps_id:
@@ -54,7 +60,7 @@ def _match_invoice_row(row: MutableMapping, product_sizes: list, barcode_map: di
         row.get("Nazwa", ""),
         row.get("Kolor", ""),
         row.get("Rozmiar", ""),
-        product_sizes,
+        index.fuzzy_candidates(row.get("Nazwa", "")),
     )
     if ps_id:
         row["matched_ps_id"] = ps_id
@@ -62,4 +68,4 @@ def _match_invoice_row(row: MutableMapping, product_sizes: list, barcode_map: di
         row["match_type"] = match_type
 
 
-__all__ = ["match_invoice_rows"]
\ No newline at end of file
+__all__ = ["match_invoice_rows"]
@@ -0,0 +1,285 @@
+"""Minimalny klient IPP/1.1 do wysylania zlecen wydruku bez ``lp``.
+
+Obsluguje tylko to, czego potrzebuje agent druku: Print-Job (dokument w
+tresci zapytania) i Get-Job-Attributes (stan zlecenia). Kodowanie wg RFC
+8010 - bez zaleznosci zewnetrznych. Polaczenie HTTP jest utrzymywane
+miedzy zleceniami; bez ``CUPS_SERVER`` klient laczy sie z lokalnym
+gniazdem CUPS, tak jak ``lp``.
+"""
+
+from __future__ import annotations
+
+import http.client
+import os
+import socket
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+IPP_VERSION = (1, 1)
+OP_PRINT_JOB = 0x0002
+OP_GET_JOB_ATTRIBUTES = 0x0009
+
+TAG_OPERATION = 0x01
+TAG_END = 0x03
+TAG_INTEGER = 0x21
+TAG_BOOLEAN = 0x22
+TAG_ENUM = 0x23
+TAG_TEXT = 0x41
+TAG_NAME = 0x42
+TAG_KEYWORD = 0x44
+TAG_URI = 0x45
+TAG_CHARSET = 0x47
+TAG_LANGUAGE = 0x48
+TAG_MIME_TYPE = 0x49
+
+JOB_STATE_PENDING = 3
+JOB_STATE_HELD = 4
+JOB_STATE_PROCESSING = 5
+JOB_STATE_STOPPED = 6
+JOB_STATE_CANCELED = 7
+JOB_STATE_ABORTED = 8
+JOB_STATE_COMPLETED = 9
+TERMINAL_JOB_STATES = frozenset({JOB_STATE_CANCELED, JOB_STATE_ABORTED, JOB_STATE_COMPLETED})
+
+CUPS_SOCKET_PATH = "/run/cups/cups.sock"
+DEFAULT_PORT = 631
+
+Attribute = Tuple[int, str, Any]
+
+
+class IppError(RuntimeError):
+    """Serwer IPP odrzucil zapytanie albo odpowiedz jest nieczytelna."""
+
+
+@dataclass
+class IppResponse:
+    status_code: int
+    request_id: int
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 0x0100
+
+
+def _encode_value(tag: int, value: Any) -> bytes:
+    if tag in (TAG_INTEGER, TAG_ENUM):
+        return struct.pack(">i", int(value))
+    if tag == TAG_BOOLEAN:
+        return b"\x01" if value else b"\x00"
+    return str(value).encode("utf-8")
+
+
+def encode_request(operation: int, request_id: int, attributes: Iterable[Attribute]) -> bytes:
+    """Zakoduj zapytanie z jedna grupa atrybutow operacji."""
+    parts = [struct.pack(">BBHI", *IPP_VERSION, operation, request_id), bytes([TAG_OPERATION])]
+    for tag, name, value in attributes:
+        encoded_name = name.encode("ascii")
+        encoded_value = _encode_value(tag, value)
+        parts.append(struct.pack(">BH", tag, len(encoded_name)) + encoded_name)
+        parts.append(struct.pack(">H", len(encoded_value)) + encoded_value)
+    parts.append(bytes([TAG_END]))
+    return b"".join(parts)
+
+
+def _decode_value(tag: int, raw: bytes) -> Any:
+    if tag in (TAG_INTEGER, TAG_ENUM) and len(raw) == 4:
+        return struct.unpack(">i", raw)[0]
+    if tag == TAG_BOOLEAN and len(raw) == 1:
+        return raw != b"\x00"
+    if 0x40 <= tag <= 0x4F:
+        return raw.decode("utf-8", errors="replace")
+    return raw
+
+
+def decode_message(data: bytes) -> Tuple[int, int, Dict[str, Any], bytes]:
+    """Zdekoduj komunikat IPP: (operacja/status, request-id, atrybuty, dane)."""
+    if len(data) < 9:
+        raise IppError("Za krotki komunikat IPP")
+    _, _, code, request_id = struct.unpack(">BBHI", data[:8])
+    attributes: Dict[str, Any] = {}
+    offset = 8
+    name = ""
+    while offset < len(data):
+        tag = data[offset]
+        offset += 1
+        if tag == TAG_END:
+            break
+        if tag < 0x10:
+            continue
+        try:
+            (name_length,) = struct.unpack(">H", data[offset:offset + 2])
+            offset += 2
+            if name_length:
+                name = data[offset:offset + name_length].decode("ascii")
+                offset += name_length
+            (value_length,) = struct.unpack(">H", data[offset:offset + 2])
+            offset += 2
+        except struct.error as exc:
+            raise IppError("Uszkodzony komunikat IPP") from exc
+        value = _decode_value(tag, data[offset:offset + value_length])
+        offset += value_length
+        if name_length or name not in attributes:
+            attributes[name] = value
+        else:
+            # Kolejna wartosc atrybutu wielowartosciowego.
+            previous = attributes[name]
+            attributes[name] = (previous if isinstance(previous, list) else [previous]) + [value]
+    return code, request_id, attributes, data[offset:]
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._socket_path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self._socket_path)
+        self.sock = sock
+
+
+def _stale_connection(exc: BaseException, *, reused: bool, sent: bool, idempotent: bool) -> bool:
+    """Czy blad oznacza zamkniete przez serwer polaczenie keep-alive.
+
+    Tylko wtedy zapytanie mozna powtorzyc na nowym polaczeniu. Print-Job nie
+    jest powtarzany po timeoucie ani po zerwaniu w trakcie odpowiedzi -
+    drukarka mogla juz przyjac zlecenie i etykieta wyszlaby dwa razy.
+    """
+    if not reused:
+        return False
+    if idempotent:
+        return True
+    if isinstance(exc, TimeoutError):
+        return False
+    if not sent:
+        return isinstance(exc, (BrokenPipeError, ConnectionResetError, ConnectionAbortedError))
+    # Serwer zamknal polaczenie bez jednego bajtu odpowiedzi (stare keep-alive).
+    return isinstance(exc, http.client.RemoteDisconnected)
+
+
+class IppClient:
+    """Zlecenia wydruku dla jednej drukarki przez IPP na utrzymywanym polaczeniu."""
+
+    def __init__(
+        self,
+        printer_name: str,
+        *,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        timeout: float = 30.0,
+        socket_path: str = CUPS_SOCKET_PATH,
+        user_name: str = "magazyn",
+    ):
+        self.printer_name = printer_name
+        self.host = host
+        self.port = port or DEFAULT_PORT
+        self.timeout = timeout
+        self.socket_path = socket_path
+        self.user_name = user_name
+        self._connection: Optional[http.client.HTTPConnection] = None
+        self._request_id = 0
+        self._lock = threading.Lock()
+
+    @property
+    def resource(self) -> str:
+        return f"/printers/{quote(self.printer_name)}"
+
+    @property
+    def printer_uri(self) -> str:
+        return f"ipp://{self.host or 'localhost'}:{self.port}{self.resource}"
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.host is None and os.path.exists(self.socket_path):
+            return _UnixHTTPConnection(self.socket_path, self.timeout)
+        return http.client.HTTPConnection(self.host or "localhost", self.port, timeout=self.timeout)
+
+    def _base_attributes(self) -> List[Attribute]:
+        return [
+            (TAG_CHARSET, "attributes-charset", "utf-8"),
+            (TAG_LANGUAGE, "attributes-natural-language", "pl"),
+            (TAG_URI, "printer-uri", self.printer_uri),
+            (TAG_NAME, "requesting-user-name", self.user_name),
+        ]
+
+    def _post(self, body: bytes, *, idempotent: bool) -> bytes:
+        headers = {"Content-Type": "application/ipp"}
+        for attempt in (1, 2):
+            reused = self._connection is not None
+            if not reused:
+                self._connection = self._connect()
+            sent = False
+            try:
+                self._connection.request("POST", self.resource, body=body, headers=headers)
+                sent = True
+                response = self._connection.getresponse()
+                payload = response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                self._connection.close()
+                self._connection = None
+                if attempt == 2 or not _stale_connection(exc, reused=reused, sent=sent, idempotent=idempotent):
+                    raise
+                continue
+            if response.status != 200:
+                raise IppError(f"HTTP {response.status} z serwera IPP")
+            return payload
+        raise IppError("Brak odpowiedzi serwera IPP")  # pragma: no cover
+
+    def request(self, operation: int, attributes: Iterable[Attribute], document: bytes = b"") -> IppResponse:
+        with self._lock:
+            self._request_id += 1
+            body = encode_request(operation, self._request_id, attributes) + document
+            payload = self._post(body, idempotent=operation != OP_PRINT_JOB)
+            status_code, request_id, decoded, _ = decode_message(payload)
+        response = IppResponse(status_code, request_id, decoded)
+        if not response.ok:
+            message = decoded.get("status-message") or f"0x{status_code:04x}"
+            raise IppError(f"Serwer IPP odrzucil zlecenie: {message}")
+        return response
+
+    def print_job(self, document: bytes, *, document_format: str = "application/pdf", job_name: str = "") -> int:
+        """Wyslij dokument jako jedno zlecenie; zwraca job-id."""
+        attributes = self._base_attributes() + [
+            (TAG_NAME, "job-name", job_name or "etykieta"),
+            (TAG_MIME_TYPE, "document-format", document_format),
+        ]
+        response = self.request(OP_PRINT_JOB, attributes, document)
+        job_id = response.attributes.get("job-id")
+        if not isinstance(job_id, int):
+            raise IppError("Brak job-id w odpowiedzi Print-Job")
+        return job_id
+
+    def job_state(self, job_id: int) -> int:
+        attributes = self._base_attributes() + [
+            (TAG_INTEGER, "job-id", job_id),
+            (TAG_KEYWORD, "requested-attributes", "job-state"),
+        ]
+        state = self.request(OP_GET_JOB_ATTRIBUTES, attributes).attributes.get("job-state")
+        return state if isinstance(state, int) else JOB_STATE_PENDING
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+__all__ = [
+    "IppClient",
+    "IppError",
+    "IppResponse",
+    "JOB_STATE_ABORTED",
+    "JOB_STATE_CANCELED",
+    "JOB_STATE_COMPLETED",
+    "JOB_STATE_PENDING",
+    "JOB_STATE_PROCESSING",
+    "OP_GET_JOB_ATTRIBUTES",
+    "OP_PRINT_JOB",
+    "TERMINAL_JOB_STATES",
+    "decode_message",
+    "encode_request",
+]
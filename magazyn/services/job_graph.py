@@ -0,0 +1,287 @@
+"""Wykonawca grafu zadan tla z zaleznosciami, interwalami i limitem czasu.
+
+Kazde zadanie deklaruje, po ktorych innych zadaniach moze ruszyc w tym samym
+przebiegu; niezalezne kroki (zwykle I/O do zewnetrznych API) wykonuja sie
+rownolegle na ograniczonej puli watkow. Zadanie ma wlasny interwal z
+losowym rozrzutem, limit czasu oraz ochrone przed nakladaniem sie
+przebiegow - jesli poprzednie wywolanie jeszcze trwa (np. po przekroczeniu
+limitu czasu), kolejne jest pomijane.
+
+Watku zadania nie da sie przerwac: po przekroczeniu limitu czasu zadanie
+jest raportowane jako ``timeout``, a jego watek dobiega w tle (porzucony).
+Flaga ``running`` nie pozwala uruchomic tego zadania ponownie, dopoki watek
+trwa, wiec porzuconych watkow jest najwyzej tyle, ile zadan w grafie - nawet
+gdy planista wymienia pule po kazdym przekroczeniu. Biezaca liczbe pokazuje
+``abandoned_threads`` i metryka ``magazyn_sync_job_abandoned_threads``.
+
+Planista tla uzywa ``submit_due``: kazdy takt zbiera wyniki zakonczonych
+zadan i uruchamia zalegle, ktorych zaleznosci nie trwaja, bez czekania na
+reszte - dlugie zadanie (np. dzienna synchronizacja) nie wstrzymuje
+krotkiego interwalu zadan szybkich.
+"""
+
+from __future__ import annotations
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+from ..metrics import (
+    SYNC_JOB_ABANDONED_THREADS,
+    SYNC_JOB_DURATION_SECONDS,
+    SYNC_JOB_ITEMS_TOTAL,
+    SYNC_JOB_RUNS_TOTAL,
+)
+
+RESULT_SUCCESS = "success"
+RESULT_ERROR = "error"
+RESULT_TIMEOUT = "timeout"
+RESULT_OVERLAP = "overlap"
+
+# Jak czesto planista zaglada do trwajacych zadan (wyniki, zalezne zadania).
+INFLIGHT_POLL_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class SyncJob:
+    name: str
+    run: Callable[[], Any]
+    depends_on: tuple[str, ...] = ()
+    interval: float = 600.0
+    timeout: float = 300.0
+    jitter: float = 0.0
+    # Liczba przetworzonych elementow wyliczana z wyniku (np. slownika statystyk).
+    items: Optional[Callable[[Any], int]] = None
+
+
+@dataclass
+class JobOutcome:
+    result: str
+    duration: float = 0.0
+    items: int = 0
+    error: Optional[BaseException] = None
+
+
+@dataclass
+class _JobState:
+    next_due: float = 0.0
+    running: threading.Event = field(default_factory=threading.Event)
+    # Watek przeterminowanego przebiegu nadal trwa w tle.
+    abandoned: bool = False
+
+
+class JobGraphExecutor:
+    """Uruchamia zalegle zadania grafu rownolegle, w kolejnosci zaleznosci."""
+
+    def __init__(
+        self,
+        jobs: Iterable[SyncJob],
+        *,
+        logger: logging.Logger,
+        max_workers: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.jobs = {job.name: job for job in jobs}
+        self.logger = logger
+        self.max_workers = max(1, max_workers)
+        self.clock = clock
+        self._state = {name: _JobState() for name in self.jobs}
+        self._inflight: dict[Future, tuple[str, float]] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._abandon_lock = threading.Lock()
+        for job in self.jobs.values():
+            missing = [dep for dep in job.depends_on if dep not in self.jobs]
+            if missing:
+                raise ValueError(f"Zadanie {job.name} zalezy od nieznanych: {missing}")
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        visiting: set[str] = set()
+        done: set[str] = set()
+
+        def visit(name: str) -> None:
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Cykl zaleznosci w grafie zadan przy {name}")
+            visiting.add(name)
+            for dep in self.jobs[name].depends_on:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self.jobs:
+            visit(name)
+
+    @property
+    def abandoned_threads(self) -> int:
+        """Liczba watkow przeterminowanych zadan, ktore jeszcze trwaja."""
+        with self._abandon_lock:
+            return sum(state.abandoned for state in self._state.values())
+
+    def due_jobs(self) -> list[str]:
+        now = self.clock()
+        inflight = _names(self._inflight)
+        return [
+            name for name, state in self._state.items()
+            if state.next_due <= now and name not in inflight
+        ]
+
+    def seconds_until_next_due(self) -> float:
+        now = self.clock()
+        inflight = _names(self._inflight)
+        waiting = [state.next_due for name, state in self._state.items() if name not in inflight]
+        delay = max(0.0, min(waiting, default=now) - now)
+        return min(delay, INFLIGHT_POLL_SECONDS) if self._inflight else delay
+
+    def run_due(self) -> dict[str, JobOutcome]:
+        return self.run(self.due_jobs())
+
+    def submit_due(self) -> dict[str, JobOutcome]:
+        """Jeden takt planisty: uruchom zalegle zadania i nie czekaj na nie.
+
+        Zwraca wyniki rozstrzygniete w tym takcie (zakonczone od poprzedniego
+        taktu, przeterminowane, nakladajace sie). Zadanie, ktorego zaleznosc
+        jest zalegla albo trwa, rusza w ktoryms z kolejnych taktow.
+        """
+        outcomes = self._collect(self._inflight)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync-job")
+        self._start_ready(set(self.due_jobs()), self._inflight, self._pool, outcomes)
+        return outcomes
+
+    def shutdown(self) -> None:
+        """Zwolnij pule planisty; trwajace zadania dobiegna w tle."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def run(self, names: Optional[Iterable[str]] = None) -> dict[str, JobOutcome]:
+        """Wykonaj wskazane zadania (domyslnie wszystkie) i poczekaj na koniec.
+
+        Zadanie czeka tylko na zaleznosci wybrane w tym samym przebiegu;
+        blad lub przekroczenie czasu zaleznosci nie blokuje zadan zaleznych.
+        """
+        selected = list(self.jobs) if names is None else [n for n in names if n in self.jobs]
+        pending = set(selected)
+        outcomes: dict[str, JobOutcome] = {}
+        futures: dict[Future, tuple[str, float]] = {}
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sync-job")
+        try:
+            while pending or futures:
+                self._start_ready(pending, futures, pool, outcomes)
+                if not futures:
+                    continue
+                deadline = min(start + self.jobs[name].timeout for name, start in futures.values())
+                wait(
+                    list(futures),
+                    timeout=max(0.0, deadline - self.clock()),
+                    return_when=FIRST_COMPLETED,
+                )
+                outcomes.update(self._collect(futures))
+        finally:
+            pool.shutdown(wait=False)
+        return outcomes
+
+    def _start_ready(
+        self,
+        pending: set[str],
+        futures: dict[Future, tuple[str, float]],
+        pool: ThreadPoolExecutor,
+        outcomes: dict[str, JobOutcome],
+    ) -> None:
+        """Uruchom zadania z ``pending``, ktorych zaleznosci nie czekaja ani nie trwaja."""
+        progress = True
+        while progress:
+            progress = False
+            for name in sorted(pending):
+                job = self.jobs[name]
+                if any(dep in pending or dep in _names(futures) for dep in job.depends_on):
+                    continue
+                pending.discard(name)
+                progress = True
+                state = self._state[name]
+                if state.running.is_set():
+                    self.logger.warning("Sync job %s: poprzedni przebieg nadal trwa", name)
+                    outcomes[name] = self._finish(job, JobOutcome(RESULT_OVERLAP))
+                    continue
+                state.running.set()
+                futures[pool.submit(self._execute, job)] = (name, self.clock())
+
+    def _collect(self, futures: dict[Future, tuple[str, float]]) -> dict[str, JobOutcome]:
+        """Zdejmij z ``futures`` zakonczone i przeterminowane zadania."""
+        outcomes: dict[str, JobOutcome] = {}
+        now = self.clock()
+        for future, (name, start) in list(futures.items()):
+            job = self.jobs[name]
+            if future.done():
+                futures.pop(future)
+                outcomes[name] = self._finish(job, future.result())
+            elif now - start >= job.timeout:
+                # Watku nie da sie przerwac - dobiegnie w tle, a flaga
+                # running zablokuje kolejny przebieg do tego czasu.
+                futures.pop(future)
+                self.logger.error("Sync job %s przekroczyl limit %ss", name, job.timeout)
+                self._abandon(job)
+                outcomes[name] = self._finish(job, JobOutcome(RESULT_TIMEOUT, now - start))
+                if futures is self._inflight and self._pool is not None:
+                    # Zawieszony watek nie moze zajmowac puli planisty na stale.
+                    self._pool.shutdown(wait=False)
+                    self._pool = None
+        return outcomes
+
+    def _execute(self, job: SyncJob) -> JobOutcome:
+        started = time.perf_counter()
+        try:
+            result = job.run()
+            items = job.items(result) if job.items and result is not None else 0
+            return JobOutcome(RESULT_SUCCESS, time.perf_counter() - started, int(items or 0))
+        except Exception as exc:
+            self.logger.error("Sync job %s failed: %s", job.name, exc, exc_info=True)
+            return JobOutcome(RESULT_ERROR, time.perf_counter() - started, error=exc)
+        finally:
+            state = self._state[job.name]
+            with self._abandon_lock:
+                state.running.clear()
+                if state.abandoned:
+                    state.abandoned = False
+                    SYNC_JOB_ABANDONED_THREADS.labels(job=job.name).dec()
+                    self.logger.info("Sync job %s: porzucony watek zakonczyl sie", job.name)
+
+    def _abandon(self, job: SyncJob) -> None:
+        state = self._state[job.name]
+        with self._abandon_lock:
+            # Watek mogl skonczyc miedzy sprawdzeniem future a tym miejscem.
+            if state.running.is_set() and not state.abandoned:
+                state.abandoned = True
+                SYNC_JOB_ABANDONED_THREADS.labels(job=job.name).inc()
+
+    def _finish(self, job: SyncJob, outcome: JobOutcome) -> JobOutcome:
+        if outcome.result != RESULT_OVERLAP:
+            jitter = random.uniform(0, job.jitter) if job.jitter else 0.0
+            self._state[job.name].next_due = self.clock() + job.interval + jitter
+            SYNC_JOB_DURATION_SECONDS.labels(job=job.name).observe(outcome.duration)
+        if outcome.items:
+            SYNC_JOB_ITEMS_TOTAL.labels(job=job.name).inc(outcome.items)
+        SYNC_JOB_RUNS_TOTAL.labels(job=job.name, result=outcome.result).inc()
+        return outcome
+
+
+def _names(futures: dict[Future, tuple[str, float]]) -> set[str]:
+    return {name for name, _start in futures.values()}
+
+
+__all__ = [
+    "INFLIGHT_POLL_SECONDS",
+    "JobGraphExecutor",
+    "JobOutcome",
+    "RESULT_ERROR",
+    "RESULT_OVERLAP",
+    "RESULT_SUCCESS",
+    "RESULT_TIMEOUT",
+    "SyncJob",
+]
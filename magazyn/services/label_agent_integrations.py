@@ -5,17 +5,20 @@ from __future__ import annotations
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
-from ..allegro_api import fetch_allegro_order_detail
-from ..domain.order_platform import is_woo_order
+from ..allegro_api import fetch_allegro_order_detail, get_create_command_status, get_shipment_label
+from ..domain.order_platform import is_allegro_order, is_woo_order
 from ..settings_store import settings_store
+from .label_store import get_label_store
 from .print_agent_errors import ApiError, PrintError
 from .print_agent_labels import CollectedLabels, PrintLabelService
+from .print_agent_order_processor import awaits_label
 from .print_agent_orders import collect_printable_orders
 from .print_agent_runtime_shipments import (
     get_order_packages_from_shipment_management,
     resolve_delivery_service_from_api,
 )
 from .print_agent_shipment_creation import PrintShipmentCreator
+from .print_agent_shipment_pipeline import PreparedShipments, ShipmentPipeline
 from .print_agent_shipments import resolve_carrier_id
 from .printing import PrintCommandError
 from .woo_inpost_labels import get_woo_inpost_packages
@@ -46,6 +49,10 @@ def get_order_packages(agent, order_id: str, *, get_shipment_details, create_all
     if is_woo_order(order_id):
         return get_woo_inpost_packages(agent, order_id)
 
+    prepared = getattr(agent, "_prepared_shipments", None)
+    if prepared is not None and order_id in prepared.packages:
+        return prepared.packages.pop(order_id)
+
     return get_order_packages_from_shipment_management(
         order_id,
         load_state_value=agent._load_state_value,
@@ -56,6 +63,41 @@ def get_order_packages(agent, order_id: str, *, get_shipment_details, create_all
     )
 
 
+def prepare_shipments(
+    agent,
+    orders: List[Dict[str, Any]],
+    queue: List[Dict[str, Any]],
+    printed: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """Utworz rownolegle przesylki zamowien Allegro, ktore ich jeszcze nie maja.
+
+    Zwraca zamowienia do przetworzenia w tej iteracji - bez tych, ktorych
+    komenda utworzenia czeka jeszcze na potwierdzenie.
+    """
+    candidates = [
+        order
+        for order in orders
+        if is_allegro_order(str(order["order_id"]))
+        and awaits_label(order, queue, printed)
+        and not agent._load_state_value(f"sm_shipment:{order['order_id']}")
+    ]
+    pipeline = ShipmentPipeline(
+        logger=agent.logger,
+        creator=agent._shipment_creator(),
+        get_create_command_status=get_create_command_status,
+        get_shipment_label=get_shipment_label,
+        load_state_value=agent._load_state_value,
+        wait=agent._stop_event.wait,
+    )
+    try:
+        agent._prepared_shipments = pipeline.run(candidates)
+    except Exception as exc:
+        agent.logger.error("Blad rownoleglego tworzenia przesylek: %s", exc)
+        agent._prepared_shipments = PreparedShipments()
+    deferred = agent._prepared_shipments.deferred
+    return [order for order in orders if str(order["order_id"]) not in deferred]
+
+
 def create_allegro_shipment(agent, order_id: str, checkout_form_id: str) -> List[Dict[str, Any]]:
     return agent._shipment_creator().create(order_id, checkout_form_id, agent.last_order_data)
 
@@ -81,6 +123,7 @@ def shipment_creator(
         add_shipment_tracking=add_shipment_tracking,
         update_fulfillment_status=update_fulfillment_status,
         save_state_value=agent._save_state_value,
+        load_state_value=agent._load_state_value,
     )
 
 
@@ -121,6 +164,8 @@ def label_service(
         ),
         retry=agent._retry,
         errors_total=label_errors_total,
+        prefetched_labels=getattr(getattr(agent, "_prepared_shipments", None), "labels", None),
+        label_store=get_label_store(),
     )
 
 
@@ -175,6 +220,30 @@ def print_label(agent, base64_data: str, extension: str, order_id: str, *, label
         raise PrintError(str(exc)) from exc
 
 
+def print_labels(
+    agent,
+    labels: List[Tuple[str, str]],
+    order_ids: List[str],
+    *,
+    labels_total,
+    errors_total,
+) -> None:
+    """Wydrukuj serie etykiet jednym zleceniem (PDF scalane przez CupsPrinter)."""
+    try:
+        agent.printer.print_labels_base64(labels)
+        agent.logger.info("Wydrukowano %d etykiet (%s)", len(labels), ", ".join(order_ids))
+        labels_total.inc(len(labels))
+    except PrintCommandError as exc:
+        errors_total.labels(stage="print").inc()
+        raise PrintError(str(exc)) from exc
+    except PrintError:
+        raise
+    except Exception as exc:
+        agent.logger.error("Błąd drukowania: %s", exc)
+        errors_total.labels(stage="print").inc()
+        raise PrintError(str(exc)) from exc
+
+
 def print_test_page(agent) -> bool:
     try:
         agent.printer.print_text("=== TEST PRINT ===\n")
@@ -194,6 +263,8 @@ __all__ = [
     "label_service",
     "maybe_log_api_summary",
     "print_label",
+    "prepare_shipments",
+    "print_labels",
     "print_test_page",
     "recreate_shipment_and_get_label",
     "resolve_carrier_id",
@@ -6,11 +6,14 @@ from datetime import datetime
 from typing import Any, Dict, List
 
 from ..agent.allegro_sync import AllegroSyncService
-from ..metrics import PRINT_AGENT_ITERATION_SECONDS, PRINT_LABEL_ERRORS_TOTAL
+from ..metrics import PRINT_AGENT_ITERATION_SECONDS, PRINT_LABEL_ERRORS_TOTAL, PRINT_LABELS_TOTAL
+from .label_agent_integrations import prepare_shipments, print_labels
 from .print_agent_errors import ApiError, PrintError
 from .print_agent_order_processor import PrintOrderProcessor
 from .print_agent_queue import PrintQueueProcessor
+from .print_agent_wakeup import print_wakeup
 from .print_agent_reports import PrintAgentReportService
+from .printing import check_label_document
 
 
 def report_service(agent) -> PrintAgentReportService:
@@ -42,6 +45,17 @@ def get_period_summary(agent, days: int, end_date: datetime = None, include_fixe
     )
 
 
+def merged_printer(agent):
+    """Druk serii etykiet jednym zleceniem (``PrintQueueProcessor``/``PrintOrderProcessor``)."""
+    return lambda labels, order_ids: print_labels(
+        agent,
+        labels,
+        order_ids,
+        labels_total=PRINT_LABELS_TOTAL,
+        errors_total=PRINT_LABEL_ERRORS_TOTAL,
+    )
+
+
 def process_queue(agent, queue: List[Dict[str, Any]], printed: Dict[str, Any]) -> List[Dict[str, Any]]:
     processor = PrintQueueProcessor(
         logger=agent.logger,
@@ -55,6 +69,8 @@ def process_queue(agent, queue: List[Dict[str, Any]], printed: Dict[str, Any]) -
         print_error_type=PrintError,
         errors_total=PRINT_LABEL_ERRORS_TOTAL,
         now=lambda: datetime.now(),
+        print_labels=merged_printer(agent),
+        validate_label=check_label_document,
     )
     return processor.process(queue, printed)
 
@@ -79,6 +95,7 @@ def order_processor(agent) -> PrintOrderProcessor:
         errors_total=PRINT_LABEL_ERRORS_TOTAL,
         print_error_type=PrintError,
         now=lambda: datetime.now(),
+        print_labels=merged_printer(agent),
     )
 
 
@@ -107,15 +124,15 @@ def agent_loop(agent) -> None:
         except Exception as exc:
             agent.logger.error("[BLAD ITERACJI GLOWNEJ] %s", exc, exc_info=True)
             PRINT_LABEL_ERRORS_TOTAL.labels(stage="loop").inc()
-        agent._stop_event.wait(agent.config.poll_interval)
+        # Nowe zamowienie do druku budzi petle przed uplywem poll_interval.
+        print_wakeup.wait(agent._stop_event, agent.config.poll_interval)
 
 
 def run_print_iteration(agent) -> None:
     loop_start = datetime.now()
     agent._write_heartbeat()
     agent.clean_old_printed_orders()
-    printed_entries = agent.load_printed_orders()
-    printed = {entry["order_id"]: entry["printed_at"] for entry in printed_entries}
+    printed = agent.printed_orders()
     queue = agent.load_queue()
     queue = agent._restore_in_progress(queue)
     queue = agent._process_queue(queue, printed)
@@ -132,6 +149,7 @@ def run_print_iteration(agent) -> None:
             agent.logger.error("Blad pobierania zamowien: %s", exc)
             PRINT_LABEL_ERRORS_TOTAL.labels(stage="loop").inc()
             orders = []
+        orders = prepare_shipments(agent, orders, queue, printed)
         processor = agent._order_processor()
         for order in orders:
             processor.process(order, queue, printed)
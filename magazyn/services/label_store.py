@@ -0,0 +1,331 @@
+"""Magazyn etykiet PDF na dysku adresowany trescia (SHA-256).
+
+Plik etykiety lezy w ``<katalog>/<sha[:2]>/<sha256>.<ext>`` - ta sama tresc
+to jeden plik, zapis atomowy (plik tymczasowy + ``os.replace``). Tabela
+``label_files`` mapuje klucz etykiety na plik: ``shipment_id`` przesylki
+(Allegro Shipment Management / ShipX) albo ``sha256:<hash>`` dla wpisow
+kolejki druku, z zamowieniem i czasem ostatniego uzycia.
+
+Reprint i pobieranie etykiety czytaja plik lokalnie; API przewoznika
+zostaje dla nowych etykiet. Po przekroczeniu ``LABEL_STORE_MAX_MB`` usuwane
+sa najdawniej uzywane pliki - poza etykietami aktywnych wpisow kolejki.
+Bledy dysku i indeksu nie przerywaja druku: magazyn loguje je i zachowuje sie
+jak pusty.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from .. import db as db_module
+from ..config import settings
+from ..db import db_connect
+
+logger = logging.getLogger(__name__)
+
+LABEL_STORE_DEFAULT_MAX_MB = 500
+CONTENT_KEY_PREFIX = "sha256:"
+_MIMETYPES = {"pdf": "application/pdf"}
+
+
+def content_key(sha256: str) -> str:
+    return f"{CONTENT_KEY_PREFIX}{sha256}"
+
+
+def _safe_extension(extension: Optional[str]) -> str:
+    return re.sub(r"[^A-Za-z0-9]", "", extension or "").lower() or "pdf"
+
+
+@dataclass(frozen=True)
+class StoredLabel:
+    sha256: str
+    ext: str
+    size_bytes: int
+    path: Path
+
+    @property
+    def mimetype(self) -> str:
+        return _MIMETYPES.get(self.ext, "application/octet-stream")
+
+
+class LabelStore:
+    """Pliki etykiet na dysku z indeksem ``label_files`` i limitem LRU."""
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        *,
+        max_bytes: int,
+        now: Callable[[], datetime] = datetime.now,
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._now = now
+
+    def path_for(self, sha256: str, ext: str) -> Path:
+        return self.directory / sha256[:2] / f"{sha256}.{ext}"
+
+    def _stored(self, sha256: str, ext: str, size_bytes: int) -> StoredLabel:
+        return StoredLabel(sha256, ext, int(size_bytes or 0), self.path_for(sha256, ext))
+
+    def _write_file(self, data: bytes, ext: str) -> StoredLabel:
+        sha256 = hashlib.sha256(data).hexdigest()
+        stored = self._stored(sha256, ext, len(data))
+        if not stored.path.exists():
+            stored.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = stored.path.with_name(
+                f".{stored.path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+            )
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, stored.path)
+        return stored
+
+    def put(
+        self,
+        data: bytes,
+        extension: Optional[str] = "pdf",
+        *,
+        keys: Iterable[str] = (),
+        order_id: Optional[str] = None,
+        conn=None,
+    ) -> Optional[StoredLabel]:
+        """Zapisz etykiete pod podanymi kluczami (domyslnie ``sha256:<hash>``).
+
+        ``conn`` - polaczenie trwajacej transakcji wywolujacego (zapis kolejki).
+        """
+        ext = _safe_extension(extension)
+        try:
+            stored = self._write_file(data, ext)
+        except OSError as exc:
+            logger.warning("Nie mozna zapisac etykiety w %s: %s", self.directory, exc)
+            return None
+
+        label_keys = list(dict.fromkeys(key for key in keys if key)) or [content_key(stored.sha256)]
+        if conn is not None:
+            self._index(conn, stored, label_keys, order_id)
+            return stored
+        try:
+            with db_connect() as conn:
+                self._index(conn, stored, label_keys, order_id)
+        except SQLAlchemyError as exc:
+            logger.warning("Nie mozna zapisac indeksu etykiety %s: %s", stored.sha256, exc)
+            return None
+        return stored
+
+    def _index(self, conn, stored: StoredLabel, label_keys: List[str], order_id: Optional[str]) -> None:
+        now = self._now().isoformat()
+        known = conn.execute(
+            text("SELECT 1 FROM label_files WHERE sha256 = :sha LIMIT 1"),
+            {"sha": stored.sha256},
+        ).first()
+        for key in label_keys:
+            conn.execute(
+                text(
+                    "INSERT INTO label_files(label_key, sha256, ext, size_bytes, order_id,"
+                    " created_at, last_used_at)"
+                    " VALUES (:key, :sha, :ext, :size, :oid, :now, :now)"
+                    " ON CONFLICT(label_key) DO UPDATE SET sha256 = excluded.sha256,"
+                    " ext = excluded.ext, size_bytes = excluded.size_bytes,"
+                    " order_id = COALESCE(excluded.order_id, label_files.order_id),"
+                    " last_used_at = excluded.last_used_at"
+                ),
+                {
+                    "key": key,
+                    "sha": stored.sha256,
+                    "ext": stored.ext,
+                    "size": stored.size_bytes,
+                    "oid": order_id,
+                    "now": now,
+                },
+            )
+        if known is None:
+            self._enforce_limit(conn)
+
+    def put_base64(
+        self,
+        label_data: str,
+        extension: Optional[str] = "pdf",
+        **kwargs,
+    ) -> Optional[StoredLabel]:
+        try:
+            data = base64.b64decode(label_data, validate=True)
+        except (ValueError, TypeError):
+            return None
+        return self.put(data, extension, **kwargs)
+
+    def get(self, key: str) -> Optional[StoredLabel]:
+        """Etykieta spod klucza albo None; trafienie odswieza czas uzycia."""
+        try:
+            return self._lookup(key)
+        except SQLAlchemyError as exc:
+            logger.warning("Nie mozna odczytac indeksu etykiet (%s): %s", key, exc)
+            return None
+
+    def _lookup(self, key: str) -> Optional[StoredLabel]:
+        with db_connect() as conn:
+            row = conn.execute(
+                text("SELECT sha256, ext, size_bytes FROM label_files WHERE label_key = :key"),
+                {"key": key},
+            ).first()
+            if row is None:
+                return None
+            stored = self._stored(*row)
+            if not stored.path.exists():
+                # Plik usuniety z dysku poza magazynem - indeks przestaje na niego wskazywac.
+                self._forget(conn, stored.sha256)
+                return None
+            conn.execute(
+                text("UPDATE label_files SET last_used_at = :now WHERE sha256 = :sha"),
+                {"now": self._now().isoformat(), "sha": stored.sha256},
+            )
+        return stored
+
+    def read(self, stored: StoredLabel) -> Optional[bytes]:
+        try:
+            return stored.path.read_bytes()
+        except OSError as exc:
+            logger.warning("Nie mozna odczytac etykiety %s: %s", stored.path, exc)
+            return None
+
+    def load_base64(self, key: str) -> Optional[Tuple[str, str]]:
+        """(base64, rozszerzenie) etykiety spod klucza - format ``get_label``."""
+        stored = self.get(key)
+        data = self.read(stored) if stored is not None else None
+        if data is None:
+            return None
+        return base64.b64encode(data).decode("ascii"), stored.ext
+
+    def read_content(self, sha256: str, extension: Optional[str] = "pdf") -> Optional[bytes]:
+        return self.read(self._stored(sha256, _safe_extension(extension), 0))
+
+    def assign_order(self, order_id: str, keys: Iterable[str]) -> None:
+        """Przypisz zamowieniu biezacy komplet etykiet (np. po ponownym utworzeniu przesylki)."""
+        params: Dict[str, str] = {f"k{index}": key for index, key in enumerate(dict.fromkeys(keys))}
+        if not params:
+            return
+        placeholders = ", ".join(f":{name}" for name in params)
+        try:
+            with db_connect() as conn:
+                conn.execute(
+                    text("UPDATE label_files SET order_id = NULL WHERE order_id = :oid"),
+                    {"oid": order_id},
+                )
+                conn.execute(
+                    text(f"UPDATE label_files SET order_id = :oid WHERE label_key IN ({placeholders})"),
+                    {"oid": order_id, **params},
+                )
+        except SQLAlchemyError as exc:
+            logger.warning("Nie mozna przypisac etykiet zamowieniu %s: %s", order_id, exc)
+
+    def for_order(self, order_id: str) -> List[StoredLabel]:
+        """Etykiety zamowienia w kolejnosci zapisu; brak pliku - brak etykiety."""
+        try:
+            return self._order_labels(order_id)
+        except SQLAlchemyError as exc:
+            logger.warning("Nie mozna odczytac etykiet zamowienia %s: %s", order_id, exc)
+            return []
+
+    def _order_labels(self, order_id: str) -> List[StoredLabel]:
+        with db_connect() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT sha256, ext, MAX(size_bytes), MIN(created_at) FROM label_files"
+                    " WHERE order_id = :oid GROUP BY sha256, ext ORDER BY 4, 1"
+                ),
+                {"oid": order_id},
+            ).fetchall()
+        labels = [self._stored(sha256, ext, size) for sha256, ext, size, _ in rows]
+        if not all(label.path.exists() for label in labels):
+            return []
+        now = self._now().isoformat()
+        with db_connect() as conn:
+            conn.execute(
+                text("UPDATE label_files SET last_used_at = :now WHERE order_id = :oid"),
+                {"now": now, "oid": order_id},
+            )
+        return labels
+
+    def _forget(self, conn, sha256: str) -> None:
+        conn.execute(text("DELETE FROM label_files WHERE sha256 = :sha"), {"sha": sha256})
+
+    def _enforce_limit(self, conn) -> None:
+        # Suma liczona w transakcji zapisu, nie w pamieci procesu - workery
+        # aplikacji i agent druku dziela jeden magazyn.
+        total_bytes = int(conn.execute(text(
+            "SELECT COALESCE(SUM(size_bytes), 0) FROM"
+            " (SELECT MAX(size_bytes) AS size_bytes FROM label_files GROUP BY sha256) files"
+        )).scalar_one())
+        if total_bytes > self.max_bytes:
+            self._evict(conn, total_bytes)
+
+    def _evict(self, conn, total_bytes: int) -> None:
+        """Usun najdawniej uzywane pliki do limitu; etykiety aktywnej kolejki zostaja."""
+        from .print_agent_storage import QUEUE_STATUS_PRINTING, QUEUE_STATUS_QUEUED
+
+        rows = conn.execute(
+            text(
+                "SELECT sha256, ext, MAX(size_bytes), MAX(last_used_at) FROM label_files"
+                " WHERE sha256 NOT IN (SELECT label_sha256 FROM label_queue"
+                "  WHERE label_sha256 IS NOT NULL"
+                "  AND (status IS NULL OR status IN (:queued, :printing)))"
+                " GROUP BY sha256, ext ORDER BY 4, 1"
+            ),
+            {"queued": QUEUE_STATUS_QUEUED, "printing": QUEUE_STATUS_PRINTING},
+        ).fetchall()
+        removed = 0
+        for sha256, ext, size_bytes, _ in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            self._forget(conn, sha256)
+            try:
+                self.path_for(sha256, ext).unlink(missing_ok=True)
+            except OSError as exc:
+                logger.warning("Nie mozna usunac etykiety %s: %s", sha256, exc)
+            total_bytes -= int(size_bytes or 0)
+            removed += 1
+        if removed:
+            logger.info("Magazyn etykiet: usunieto %d najdawniej uzywanych plikow", removed)
+
+
+_stores: Dict[Tuple[str, int], LabelStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_label_store() -> Optional[LabelStore]:
+    """Magazyn etykiet wg biezacych ustawien; None, gdy ``LABEL_STORE_MAX_MB=0``."""
+    if db_module.engine is None:
+        return None
+    max_mb = str(getattr(settings, "LABEL_STORE_MAX_MB", "") or "").strip()
+    max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else LABEL_STORE_DEFAULT_MAX_MB * 1024 * 1024
+    if max_bytes <= 0:
+        return None
+    directory = str(getattr(settings, "LABEL_STORE_DIR", "") or "").strip()
+    if not directory:
+        db_path = getattr(settings, "DB_PATH", None) or "/app/data/database.db"
+        directory = str(Path(db_path).with_name("labels"))
+    key = (directory, max_bytes)
+    with _stores_lock:
+        if key not in _stores:
+            _stores[key] = LabelStore(directory, max_bytes=max_bytes)
+        return _stores[key]
+
+
+__all__ = [
+    "LABEL_STORE_DEFAULT_MAX_MB",
+    "LabelStore",
+    "StoredLabel",
+    "content_key",
+    "get_label_store",
+]
@@ -5,8 +5,6 @@ from __future__ import annotations
 import logging
 import time
 
-from sqlalchemy import desc
-
 from ..db import get_session
 from ..models.orders import Order, OrderStatusLog
 from ..status_config import STATUS_EMAIL_MAP, STATUS_HIERARCHY
@@ -21,25 +19,30 @@ from .notification_delivery import is_allegro_proxy_email, was_notification_sent
 logger = logging.getLogger(__name__)
 
 _STATUS_PRIORITY = STATUS_HIERARCHY
+_IN_CHUNK_SIZE = 500
+
+
+def _reached_priorities(order_ids: list[str], db) -> dict[str, int]:
+    """Najwyzszy osiagniety priorytet statusu (bez statusow problemowych 999)."""
+    reached: dict[str, int] = {}
+    for start in range(0, len(order_ids), _IN_CHUNK_SIZE):
+        rows = (
+            db.query(OrderStatusLog.order_id, OrderStatusLog.status)
+            .filter(OrderStatusLog.order_id.in_(order_ids[start:start + _IN_CHUNK_SIZE]))
+            .distinct()
+        )
+        for order_id, status in rows:
+            prio = _STATUS_PRIORITY.get(status, -1)
+            if prio != 999 and prio > reached.get(order_id, -1):
+                reached[order_id] = prio
+    return reached
 
 
-def _order_reached_status(order_id: str, target_status: str, db) -> bool:
+def _order_reached_status(reached: dict[str, int], order_id: str, target_status: str) -> bool:
     target_prio = _STATUS_PRIORITY.get(target_status, -1)
     if target_prio < 0:
         return False
-    logs = (
-        db.query(OrderStatusLog)
-        .filter(OrderStatusLog.order_id == order_id)
-        .order_by(desc(OrderStatusLog.timestamp))
-        .all()
-    )
-    for log in logs:
-        prio = _STATUS_PRIORITY.get(log.status, -1)
-        if prio == 999:
-            continue
-        if prio >= target_prio:
-            return True
-    return False
+    return reached.get(order_id, -1) >= target_prio
 
 
 def retry_pending_allegro_notifications() -> dict:
@@ -60,16 +63,17 @@ def retry_pending_allegro_notifications() -> dict:
             )
             .all()
         )
+        orders = [order for order in orders if is_allegro_proxy_email(order.email)]
+        # Historia statusow wszystkich kandydatow jednym zapytaniem (na porcje).
+        reached = _reached_priorities([order.order_id for order in orders], db)
 
         for order in orders:
-            if not is_allegro_proxy_email(order.email):
-                continue
             stats["checked"] += 1
 
             for status, email_type in STATUS_EMAIL_MAP.items():
                 if was_notification_sent(order, email_type):
                     continue
-                if not _order_reached_status(order.order_id, status, db):
+                if not _order_reached_status(reached, order.order_id, status):
                     continue
                 if email_type == "shipment" and not order.delivery_package_nr:
                     continue
@@ -0,0 +1,272 @@
+"""Indeks kodow z etykiet (tabela order_barcodes) dla skanowania paczek.
+
+Kazdy kod, ktory moze pojawic sie na etykiecie lub w skanerze (numer
+zamowienia, ID przesylki, numer listu przewozowego, kody DHL wyciagniete z
+PDF), jest zapisywany jako wiersz ``barcode -> order_id`` z unikalnym
+indeksem. Skan etykiety to wtedy jedno zapytanie po indeksie, niezaleznie od
+liczby wydrukowanych zamowien.
+
+Dopasowania czesciowe numerow przewoznika:
+- zapisany numer jest fragmentem dluzszego skanu - zapytanie obejmuje
+  fragmenty skanu (>= 6 znakow, skan do 32 znakow albo jego ciagi
+  alfanumeryczne),
+- skan jest poczatkiem lub koncem zapisanego numeru (skaner odczytal czesc
+  kodu) - przy zapisie indeksowane sa prefiksy i sufiksy numeru jako
+  ``fragment``. Fragment ze srodka numeru nie jest rozpoznawany.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+from typing import Any, Iterable, Optional
+
+from sqlalchemy import event, inspect, text
+
+from ..models.printing import PrintedOrder
+from .label_barcode_extract import JJD_RAW_RE, ROUTING_2L_RAW_RE
+
+
+logger = logging.getLogger(__name__)
+
+KIND_ORDER_ID = "order_id"
+KIND_EXTERNAL_ID = "external_id"
+KIND_PACKAGE = "package"
+KIND_WAYBILL = "waybill"
+KIND_TRACKING = "tracking"
+KIND_EXTRACTED = "extracted"
+KIND_FRAGMENT = "fragment"
+
+# Najkrotszy fragment skanu porownywany z zapisanym numerem przewoznika.
+MIN_SUBSTRING_LENGTH = 6
+# Rodzaje kodow, ktore moga byc fragmentem dluzszego skanu (numery listow i
+# przesylek przewoznika). ID zamowien i paczek musza pasowac w calosci -
+# inaczej dowolny skan z pasujacym ciagiem cyfr trafialby w obce zamowienie.
+SUBSTRING_KINDS = frozenset({KIND_WAYBILL, KIND_TRACKING, KIND_EXTRACTED})
+# Dluzsze skany (np. kody 2D) rozbijane sa na ciagi alfanumeryczne - skan do
+# tej dlugosci to najwyzej ~380 fragmentow, czyli jedno zapytanie IN.
+MAX_SUBSTRING_SOURCE_LENGTH = 32
+_LOOKUP_CHUNK_SIZE = 500
+
+_UPSERT_SQL = text(
+    "INSERT INTO order_barcodes(barcode, order_id, kind) "
+    "VALUES (:barcode, :order_id, :kind) "
+    "ON CONFLICT(barcode) DO UPDATE SET "
+    "order_id = excluded.order_id, kind = excluded.kind "
+    "WHERE order_barcodes.order_id <> excluded.order_id "
+    "OR order_barcodes.kind <> excluded.kind"
+)
+# Fragment nie zastepuje pelnego kodu innego zamowienia - tylko inny fragment.
+_FRAGMENT_UPSERT_SQL = text(
+    "INSERT INTO order_barcodes(barcode, order_id, kind) "
+    "VALUES (:barcode, :order_id, :kind) "
+    "ON CONFLICT(barcode) DO UPDATE SET order_id = excluded.order_id "
+    f"WHERE order_barcodes.kind = '{KIND_FRAGMENT}' "
+    "AND order_barcodes.order_id <> excluded.order_id"
+)
+
+
+def barcode_scan_candidates(barcode: str) -> list[str]:
+    """Rozszerz kod skanera o warianty używane na etykietach przewoźników."""
+    barcode = barcode.strip()
+    if not barcode:
+        return []
+
+    candidates = [barcode]
+    if "+" in barcode:
+        upper = barcode.upper()
+        if upper.startswith("2L"):
+            # Routing DHL/Orlen: unikalny jest prefiks przed '+', sufiks bywa wspólny.
+            prefix = barcode.split("+", 1)[0].strip()
+            if prefix:
+                candidates.append(prefix)
+        else:
+            for part in barcode.split("+"):
+                part = part.strip()
+                if part:
+                    candidates.append(part)
+
+    if barcode.upper().startswith("JJD"):
+        digits = re.sub(r"\D", "", barcode)
+        if digits:
+            candidates.append(digits)
+            if len(digits) >= 11:
+                candidates.append(digits[-11:])
+
+    seen: set[str] = set()
+    unique: list[str] = []
+    for candidate in candidates:
+        if candidate not in seen:
+            seen.add(candidate)
+            unique.append(candidate)
+    return unique
+
+
+def _is_extracted_code(value: str) -> bool:
+    return bool(JJD_RAW_RE.fullmatch(value) or ROUTING_2L_RAW_RE.fullmatch(value))
+
+
+def order_barcode_entries(order_id: str, order_data: dict[str, Any]) -> list[tuple[str, str]]:
+    """Zwroc pary (kod, rodzaj) do zaindeksowania dla zamowienia."""
+    entries: dict[str, str] = {}
+
+    def add(value: Any, kind: str) -> None:
+        value = str(value or "").strip()
+        if value and value not in entries:
+            entries[value] = kind
+
+    add(order_id, KIND_ORDER_ID)
+    add(order_data.get("external_order_id"), KIND_EXTERNAL_ID)
+    for package_id in order_data.get("package_ids") or []:
+        add(package_id, KIND_PACKAGE)
+    add(order_data.get("delivery_package_nr"), KIND_WAYBILL)
+    for tracking_number in order_data.get("tracking_numbers") or []:
+        tracking_number = str(tracking_number or "").strip()
+        add(
+            tracking_number,
+            KIND_EXTRACTED if _is_extracted_code(tracking_number) else KIND_TRACKING,
+        )
+
+    # Warianty skanera (prefiks routingu 2L, cyfry JJD) - pozwalaja trafic
+    # takze w skan, ktory odczytal tylko czesc kodu DHL.
+    for value, kind in list(entries.items()):
+        if kind in (KIND_ORDER_ID, KIND_EXTERNAL_ID, KIND_PACKAGE):
+            continue
+        upper = value.upper()
+        if upper.startswith("2L") or upper.startswith("JJD"):
+            for derived in barcode_scan_candidates(value)[1:]:
+                add(derived, kind)
+
+    # Prefiksy i sufiksy numerow przewoznika - skan czesci kodu. Sufiks
+    # routingu 2L bywa wspolny dla wielu paczek, wiec tam tylko prefiksy.
+    for value, kind in list(entries.items()):
+        if kind not in SUBSTRING_KINDS:
+            continue
+        with_suffixes = not value.upper().startswith("2L")
+        for length in range(MIN_SUBSTRING_LENGTH, len(value)):
+            add(value[:length], KIND_FRAGMENT)
+            if with_suffixes:
+                add(value[-length:], KIND_FRAGMENT)
+
+    return list(entries.items())
+
+
+def lookup_values(barcode: str) -> list[str]:
+    """Zwroc wartosci szukane w indeksie, od najbardziej dokladnych.
+
+    Oprocz wariantow skanera obejmuje fragmenty (>= 6 znakow) - odpowiednik
+    dopasowania, w ktorym zapisany numer przewoznika jest czescia dluzszego
+    kodu (fragmenty trafiaja tylko w rodzaje z ``SUBSTRING_KINDS``).
+    """
+    candidates = barcode_scan_candidates(barcode)
+    values = list(candidates)
+    for candidate in candidates:
+        if len(candidate) <= MAX_SUBSTRING_SOURCE_LENGTH:
+            sources = [candidate]
+        else:
+            sources = [
+                token
+                for token in re.findall(r"[0-9A-Za-z]+", candidate)
+                if MIN_SUBSTRING_LENGTH <= len(token) <= MAX_SUBSTRING_SOURCE_LENGTH
+            ]
+        for source in sources:
+            for length in range(len(source), MIN_SUBSTRING_LENGTH - 1, -1):
+                for start in range(0, len(source) - length + 1):
+                    values.append(source[start:start + length])
+    return list(dict.fromkeys(values))
+
+
+def find_order_id_for_barcode(conn, barcode: str) -> Optional[str]:
+    """Znajdz zamowienie dla zeskanowanego kodu (Connection lub Session)."""
+    values = lookup_values(barcode)
+    if not values:
+        return None
+    exact = set(barcode_scan_candidates(barcode))
+
+    matches: dict[str, str] = {}
+    for start in range(0, len(values), _LOOKUP_CHUNK_SIZE):
+        chunk = values[start:start + _LOOKUP_CHUNK_SIZE]
+        params = {f"b{index}": value for index, value in enumerate(chunk)}
+        placeholders = ", ".join(f":{key}" for key in params)
+        rows = conn.execute(
+            text(
+                "SELECT barcode, order_id, kind FROM order_barcodes "
+                f"WHERE barcode IN ({placeholders})"
+            ),
+            params,
+        ).fetchall()
+        for row_barcode, order_id, kind in rows:
+            if row_barcode in exact or kind in SUBSTRING_KINDS:
+                matches[row_barcode] = order_id
+
+    for value in values:
+        if value in matches:
+            return matches[value]
+    return None
+
+
+def index_order_barcodes(conn, order_id: str, order_data: dict[str, Any]) -> int:
+    """Zapisz kody zamowienia w indeksie (upsert; nowsze zamowienie wygrywa)."""
+    if not order_id:
+        return 0
+    rows = [
+        {"barcode": barcode, "order_id": str(order_id), "kind": kind}
+        for barcode, kind in order_barcode_entries(str(order_id), order_data or {})
+    ]
+    codes = [row for row in rows if row["kind"] != KIND_FRAGMENT]
+    fragments = [row for row in rows if row["kind"] == KIND_FRAGMENT]
+    if codes:
+        conn.execute(_UPSERT_SQL, codes)
+    if fragments:
+        conn.execute(_FRAGMENT_UPSERT_SQL, fragments)
+    return len(rows)
+
+
+def backfill_order_barcodes(conn, records: Iterable[tuple[str, dict[str, Any]]]) -> int:
+    """Zaindeksuj istniejaca historie (pary order_id, last_order_data)."""
+    total = 0
+    for order_id, order_data in records:
+        total += index_order_barcodes(conn, order_id, order_data)
+    return total
+
+
+def _parse_order_data(raw: Any) -> dict[str, Any]:
+    if isinstance(raw, dict):
+        return raw
+    try:
+        data = json.loads(raw) if raw else {}
+    except (TypeError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+@event.listens_for(PrintedOrder, "after_insert")
+@event.listens_for(PrintedOrder, "after_update")
+def _index_printed_order(mapper, connection, target) -> None:
+    # Zapisy przez ORM (skrypty ops, testy) - PrintAgentStorage indeksuje
+    # swoje surowe INSERT-y sam.
+    history = inspect(target).attrs.last_order_data.history
+    if not history.has_changes():
+        return
+    index_order_barcodes(
+        connection, target.order_id, _parse_order_data(target.last_order_data)
+    )
+
+
+__all__ = [
+    "KIND_EXTERNAL_ID",
+    "KIND_EXTRACTED",
+    "KIND_FRAGMENT",
+    "KIND_ORDER_ID",
+    "KIND_PACKAGE",
+    "KIND_TRACKING",
+    "KIND_WAYBILL",
+    "SUBSTRING_KINDS",
+    "backfill_order_barcodes",
+    "barcode_scan_candidates",
+    "find_order_id_for_barcode",
+    "index_order_barcodes",
+    "lookup_values",
+    "order_barcode_entries",
+]
@@ -0,0 +1,137 @@
+"""Zdenormalizowany biezacy status zamowienia (``orders.current_status``).
+
+Ostatni wpis ``order_status_logs`` (wg ``timestamp``, remis - wyzsze ``id``)
+jest kopiowany na zamowienie razem z czasem wpisu. Filtry "zamowienia
+w statusie X" to wtedy skan indeksu ``(current_status, date_add)`` zamiast
+``MAX(timestamp)`` z joinem albo zapytania o status dla kazdego zamowienia.
+
+Listener ``after_flush`` przelicza kolumny w tej samej transakcji dla
+zamowien, ktorych wpisy statusu dodano, zmieniono lub usunieto - niezaleznie
+od tego, czy wpis dodal ``add_order_status``, widok zamowienia czy import.
+Zapisy z pominieciem ORM wylapuje ``check_current_status`` (krok cyklu
+synchronizacji), ktory opcjonalnie je naprawia.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import desc, event, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..models.orders import Order, OrderStatusLog
+
+logger = logging.getLogger(__name__)
+
+_IN_CHUNK_SIZE = 500
+_CURRENT_FIELDS = ("current_status", "current_status_at")
+
+
+@dataclass(frozen=True)
+class StatusDrift:
+    """Zamowienie, ktorego zapisany status rozjechal sie z historia."""
+
+    order_id: str
+    stored: Optional[str]
+    expected: Optional[str]
+    stored_at: Optional[datetime]
+    expected_at: Optional[datetime]
+
+
+def _latest_log(column):
+    return (
+        select(column)
+        .where(OrderStatusLog.order_id == Order.order_id)
+        .order_by(desc(OrderStatusLog.timestamp), desc(OrderStatusLog.id))
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _chunks(values: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[start:start + _IN_CHUNK_SIZE]
+
+
+def refresh_current_status(bind, order_ids: Optional[Iterable[str]] = None) -> int:
+    """Przelicz ``current_status``/``current_status_at`` z historii.
+
+    ``order_ids=None`` przelicza wszystkie zamowienia (backfill).
+    """
+    statement = update(Order.__table__).values(
+        current_status=_latest_log(OrderStatusLog.status),
+        current_status_at=_latest_log(OrderStatusLog.timestamp),
+    )
+    if order_ids is None:
+        return bind.execute(statement).rowcount
+    updated = 0
+    for chunk in _chunks(sorted(set(order_ids))):
+        updated += bind.execute(statement.where(Order.order_id.in_(chunk))).rowcount
+    return updated
+
+
+def check_current_status(bind, *, repair: bool = False, limit: int = 1000) -> List[StatusDrift]:
+    """Zamowienia z ``current_status`` innym niz ostatni wpis historii."""
+    expected = _latest_log(OrderStatusLog.status)
+    expected_at = _latest_log(OrderStatusLog.timestamp)
+    rows = bind.execute(
+        select(
+            Order.order_id,
+            Order.current_status,
+            Order.current_status_at,
+            expected.label("expected"),
+            expected_at.label("expected_at"),
+        )
+        .where(or_(
+            Order.current_status.is_distinct_from(expected),
+            Order.current_status_at.is_distinct_from(expected_at),
+        ))
+        .order_by(Order.order_id)
+        .limit(limit)
+    ).all()
+    drifts = [
+        StatusDrift(row.order_id, row.current_status, row.expected, row.current_status_at, row.expected_at)
+        for row in rows
+    ]
+    if drifts:
+        logger.warning(
+            "Order current status drift: count=%s sample=%s",
+            len(drifts),
+            [item.order_id for item in drifts[:10]],
+        )
+        if repair:
+            refresh_current_status(bind, [item.order_id for item in drifts])
+    return drifts
+
+
+def _touched_order_ids(session: Session) -> set[str]:
+    order_ids: set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if not isinstance(obj, OrderStatusLog):
+            continue
+        history = inspect(obj).attrs.order_id.history
+        order_ids.update(value for value in (*history.deleted, obj.order_id) if value)
+    return order_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_current_status(session, flush_context) -> None:
+    order_ids = _touched_order_ids(session)
+    if not order_ids:
+        return
+    refresh_current_status(session.connection(), order_ids)
+    # Wartosci policzyla baza - zamowienia w sesji doczytaja je przy dostepie.
+    for order_id in order_ids:
+        order = session.identity_map.get(session.identity_key(Order, order_id))
+        if order is not None and order not in session.deleted:
+            session.expire(order, _CURRENT_FIELDS)
+
+
+__all__ = [
+    "StatusDrift",
+    "check_current_status",
+    "refresh_current_status",
+]
@@ -203,7 +203,7 @@ class OrderDetailBuilder:
             allegro_order_id = order.external_order_id
             
             if access_token and allegro_order_id:
-                from ..allegro_api import get_order_billing_summary
+                from .billing_ledger import get_order_billing_summary
                 
                 billing_summary = get_order_billing_summary(
                     access_token, 
@@ -0,0 +1,622 @@
+"""Kolumnowy magazyn faktow zamowien w pamieci procesu dla API statystyk.
+
+Endpointy statystyk zamiast ladowac liste obiektow ``Order`` i sumowac
+``Decimal`` w Pythonie pytaja migawke ``OrderFacts``: tablice NumPy z data
+(timestamp i dzien lokalny), kodami platformy, metody dostawy i ostatniego
+statusu, flaga pobrania oraz kwotami w groszach (int64), a na poziomie linii
+- pozycja zamowienia, ilosc, wartosc i wariant produktu. Filtry, sumy,
+grupowania i kubelki dzien/tydzien/miesiac to operacje wektorowe.
+
+Migawka laduje sie leniwie przy pierwszym uzyciu w procesie (po forku
+workera i po przekonfigurowaniu silnika - osobno). Przy kazdym uzyciu jedno
+zapytanie czyta wersje danych (liczby wierszy, najnowsze ``updated_at`` i
+identyfikatory linii/statusow); gdy sie zmieni, dociagane sa tylko zmienione
+zamowienia. Zmiana i dodanie linii oraz nowy wpis statusu dotykaja
+``orders.updated_at`` (listener ``after_flush``), a pelne przeladowanie co
+``FULL_RELOAD_SECONDS`` lapie zapisy omijajace ORM.
+
+``updated_at`` to czas startu transakcji (``now()`` na PostgreSQL), wiec
+transakcja zatwierdzona po odswiezeniu moze miec znacznik starszy niz
+zapamietany. Odswiezenie przeglada dlatego zamowienia z okna
+``COMMIT_LAG_SECONDS`` przed znacznikiem i powtarza to przy kazdym uzyciu,
+dopoki najnowszy zapis jest mlodszy niz to okno.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from sqlalchemy import event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .. import db as db_module
+from ..models.orders import Order, OrderProduct, OrderStatusLog
+
+logger = logging.getLogger(__name__)
+
+# Najdluzsza spodziewana transakcja zapisu zamowien: dopoki najnowszy znacznik
+# jest mlodszy niz tyle sekund (zegar bazy), dociagamy zamowienia z tego okna,
+# nawet gdy wersja danych sie nie zmienila - lapie to transakcje zatwierdzone
+# pozniej ze starszym ``updated_at`` (i sekundowa dokladnosc SQLite).
+COMMIT_LAG_SECONDS = 300.0
+# Siatka bezpieczenstwa dla zapisow omijajacych ORM (jak checker rollupu).
+FULL_RELOAD_SECONDS = 3600.0
+_IN_CHUNK_SIZE = 500
+_NO_DATE = np.iinfo(np.int64).min
+
+
+@dataclass(frozen=True)
+class DataVersion:
+    """Tani odcisk stanu tabel zamowien; zmiana oznacza potrzebe odswiezenia."""
+
+    orders: int
+    max_updated_at: Optional[datetime]
+    lines: int
+    max_line_id: int
+    max_status_id: int
+    # Czas bazy przy odczycie - nie wchodzi do porownania wersji.
+    read_at: Optional[datetime] = field(default=None, compare=False)
+
+    @property
+    def settled(self) -> bool:
+        if self.max_updated_at is None or self.read_at is None:
+            return True
+        return (self.read_at - self.max_updated_at).total_seconds() >= COMMIT_LAG_SECONDS
+
+
+@dataclass(frozen=True)
+class FactTotals:
+    orders: int
+    items: int
+    revenue: Decimal
+    cod_orders: int
+
+
+@dataclass(frozen=True)
+class LineGroup:
+    ean: Optional[str]
+    name: Optional[str]
+    items: int
+    gross: Decimal
+    orders: int
+    cod_lines: int
+
+
+def _grosze(value) -> int:
+    if value is None:
+        return 0
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return int(value.scaleb(2).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _money(grosze) -> Decimal:
+    return Decimal(int(grosze)).scaleb(-2)
+
+
+def _is_cod(payment_method_cod, payment_method) -> bool:
+    # To samo co stats_orders.is_cod, ale na surowych kolumnach.
+    return bool(payment_method_cod) or ("pobranie" in (payment_method or "").lower())
+
+
+class _Codes:
+    """Slownik wartosci kategorycznych: etykieta -> kod int."""
+
+    def __init__(self, labels: Iterable[Any] = ()):
+        self.labels: list = list(labels)
+        self.codes = {label: code for code, label in enumerate(self.labels)}
+
+    def code(self, label) -> int:
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+    def copy(self) -> "_Codes":
+        return _Codes(self.labels)
+
+
+@dataclass(frozen=True)
+class OrderFacts:
+    """Niezmienna migawka faktow; odswiezenie tworzy nowa instancje."""
+
+    version: Optional[DataVersion]
+    order_ids: np.ndarray
+    date_add: np.ndarray
+    day: np.ndarray
+    month: np.ndarray
+    platform: np.ndarray
+    carrier: np.ndarray
+    status: np.ndarray
+    cod: np.ndarray
+    items: np.ndarray
+    gross: np.ndarray
+    revenue: np.ndarray
+    line_order: np.ndarray
+    line_qty: np.ndarray
+    line_gross: np.ndarray
+    line_size: np.ndarray
+    line_key: np.ndarray
+    platforms: _Codes
+    carriers: _Codes
+    statuses: _Codes
+    line_keys: _Codes
+    index: dict
+
+    @property
+    def order_count(self) -> int:
+        return len(self.order_ids)
+
+    @property
+    def line_count(self) -> int:
+        return len(self.line_order)
+
+    # --- zapytania ---------------------------------------------------------
+
+    def select(
+        self,
+        start_ts: int,
+        end_ts: int,
+        *,
+        platform: str = "all",
+        payment_type: str = "all",
+    ) -> np.ndarray:
+        """Maska zamowien jak ``stats_orders.fetch_orders`` dla tych filtrow."""
+        mask = (self.date_add >= start_ts) & (self.date_add < end_ts)
+        if platform != "all":
+            code = self.platforms.codes.get(platform)
+            if code is None:
+                return np.zeros(self.order_count, dtype=bool)
+            mask &= self.platform == code
+        if payment_type == "cod":
+            mask &= self.cod
+        elif payment_type != "all":
+            mask &= ~self.cod
+        return mask
+
+    def totals(self, mask: np.ndarray) -> FactTotals:
+        return FactTotals(
+            orders=int(np.count_nonzero(mask)),
+            items=int(self.items[mask].sum()),
+            revenue=_money(self.revenue[mask].sum()),
+            cod_orders=int(np.count_nonzero(self.cod & mask)),
+        )
+
+    def buckets(self, mask: np.ndarray, granularity: str) -> dict[str, FactTotals]:
+        """Sumy w kubelkach o kluczach jak ``stats_orders.bucket_key``."""
+        if granularity == "month":
+            keys = self.month[mask]
+        elif granularity == "week":
+            days = self.day[mask]
+            keys = days - (days - 1) % 7
+        else:
+            keys = self.day[mask]
+        if not len(keys):
+            return {}
+        unique, inverse = np.unique(keys, return_inverse=True)
+        size = len(unique)
+        orders = np.bincount(inverse, minlength=size)
+        items = np.bincount(inverse, weights=self.items[mask], minlength=size)
+        revenue = np.bincount(inverse, weights=self.revenue[mask], minlength=size)
+        cod = np.bincount(inverse, weights=self.cod[mask], minlength=size)
+        result = {}
+        for position, key in enumerate(unique.tolist()):
+            if granularity == "month":
+                label = f"{key // 12:04d}-{key % 12 + 1:02d}"
+            else:
+                label = date.fromordinal(key).isoformat()
+            result[label] = FactTotals(
+                orders=int(orders[position]),
+                items=int(round(items[position])),
+                revenue=_money(round(revenue[position])),
+                cod_orders=int(round(cod[position])),
+            )
+        return result
+
+    def count_by(self, mask: np.ndarray, column: str) -> dict[Any, int]:
+        """Liczba zamowien wg ``platform``, ``carrier`` albo ``status``."""
+        codes = getattr(self, column)[mask]
+        labels = getattr(self, {"platform": "platforms", "carrier": "carriers", "status": "statuses"}[column])
+        counts = np.bincount(codes, minlength=len(labels.labels))
+        return {
+            labels.labels[code]: int(count)
+            for code, count in enumerate(counts.tolist())
+            if count
+        }
+
+    def ids(self, mask: np.ndarray) -> list[str]:
+        return self.order_ids[mask].tolist()
+
+    def count_matching(self, mask: np.ndarray, order_ids: Iterable[str]) -> int:
+        """Ile pozycji ``order_ids`` (z powtorzeniami) wskazuje zamowienia z maski."""
+        positions = [self.index[order_id] for order_id in order_ids if order_id in self.index]
+        return int(np.count_nonzero(mask[np.array(positions, dtype=np.int64)]))
+
+    def line_groups(self, mask: np.ndarray) -> list[LineGroup]:
+        """Linie zamowien z maski pogrupowane po (EAN, nazwa)."""
+        line_mask = mask[self.line_order]
+        keys = self.line_key[line_mask]
+        if not len(keys):
+            return []
+        size = len(self.line_keys.labels)
+        line_orders = self.line_order[line_mask]
+        items = np.bincount(keys, weights=self.line_qty[line_mask], minlength=size)
+        gross = np.bincount(keys, weights=self.line_gross[line_mask], minlength=size)
+        cod = np.bincount(keys, weights=self.cod[line_orders], minlength=size)
+        pairs = np.unique(keys.astype(np.int64) * max(self.order_count, 1) + line_orders)
+        orders = np.bincount(pairs // max(self.order_count, 1), minlength=size)
+        groups = []
+        for code in np.unique(keys).tolist():
+            ean, name = self.line_keys.labels[code]
+            groups.append(LineGroup(
+                ean=ean,
+                name=name,
+                items=int(round(items[code])),
+                gross=_money(round(gross[code])),
+                orders=int(orders[code]),
+                cod_lines=int(round(cod[code])),
+            ))
+        # Kolejnosc jak GROUP BY ean, name w SQL (NULL pierwszy).
+        groups.sort(key=lambda g: (g.ean is not None, g.ean or "", g.name is not None, g.name or ""))
+        return groups
+
+    # --- budowanie ---------------------------------------------------------
+
+    @classmethod
+    def empty(cls) -> "OrderFacts":
+        return cls._build(None, [], [], {}, _Codes(), _Codes(), _Codes(), _Codes())
+
+    @classmethod
+    def _build(cls, version, order_rows, line_rows, statuses, platforms, carriers, status_codes, line_keys):
+        index = {row.order_id: position for position, row in enumerate(order_rows)}
+        count = len(order_rows)
+        # Listy skladane i jedno np.array na kolumne: przypisania element po
+        # elemencie do tablic NumPy dominowaly w czasie zimnego ladowania.
+        line_order = np.array([index[line.order_id] for line in line_rows], dtype=np.int64)
+        line_qty = np.array([int(line.quantity or 0) for line in line_rows], dtype=np.int64)
+        line_gross = np.array([_grosze(line.price_brutto) for line in line_rows], dtype=np.int64) * line_qty
+        line_size = np.array(
+            [-1 if line.product_size_id is None else line.product_size_id for line in line_rows],
+            dtype=np.int64,
+        )
+        line_key = np.array([line_keys.code((line.ean, line.name)) for line in line_rows], dtype=np.int64)
+        items = np.zeros(count, dtype=np.int64)
+        gross = np.zeros(count, dtype=np.int64)
+        np.add.at(items, line_order, line_qty)
+        np.add.at(gross, line_order, line_gross)
+
+        locals_ = [None if row.date_add is None else datetime.fromtimestamp(row.date_add) for row in order_rows]
+        date_add = np.array([_NO_DATE if row.date_add is None else row.date_add for row in order_rows], dtype=np.int64)
+        day = np.array([0 if local is None else local.toordinal() for local in locals_], dtype=np.int64)
+        month = np.array(
+            [0 if local is None else local.year * 12 + local.month - 1 for local in locals_], dtype=np.int64
+        )
+        cod = np.array([_is_cod(row.payment_method_cod, row.payment_method) for row in order_rows], dtype=bool)
+        # Jak stats_orders.order_revenue: pobranie = linie + dostawa.
+        delivery = np.array([_grosze(row.delivery_price) for row in order_rows], dtype=np.int64)
+        paid = np.array([_grosze(row.payment_done) for row in order_rows], dtype=np.int64)
+        revenue = np.where(cod, gross + delivery, paid)
+        platform = np.array([platforms.code(row.platform) for row in order_rows], dtype=np.int64)
+        carrier = np.array([carriers.code(row.delivery_method) for row in order_rows], dtype=np.int64)
+        status = np.array(
+            [status_codes.code(statuses.get(row.order_id)) for row in order_rows], dtype=np.int64
+        )
+
+        return cls(
+            version=version,
+            order_ids=np.array([row.order_id for row in order_rows], dtype=object),
+            date_add=date_add,
+            day=day,
+            month=month,
+            platform=platform,
+            carrier=carrier,
+            status=status,
+            cod=cod,
+            items=items,
+            gross=gross,
+            revenue=revenue,
+            line_order=line_order,
+            line_qty=line_qty,
+            line_gross=line_gross,
+            line_size=line_size,
+            line_key=line_key,
+            platforms=platforms,
+            carriers=carriers,
+            statuses=status_codes,
+            line_keys=line_keys,
+            index=index,
+        )
+
+    def merged(self, version: DataVersion, delta: "OrderFacts", touched: Iterable[str]) -> "OrderFacts":
+        """Nowa migawka z podmienionymi zamowieniami ``touched`` (dane z ``delta``)."""
+        old_positions = [self.index[order_id] for order_id in touched if order_id in self.index]
+        keep_lines = ~np.isin(self.line_order, old_positions)
+
+        index = dict(self.index)
+        order_ids = list(self.order_ids)
+        target = np.empty(delta.order_count, dtype=np.int64)
+        for position, order_id in enumerate(delta.order_ids.tolist()):
+            if order_id not in index:
+                index[order_id] = len(order_ids)
+                order_ids.append(order_id)
+            target[position] = index[order_id]
+
+        size = len(order_ids)
+        columns = {}
+        for name in ("date_add", "day", "month", "platform", "carrier", "status", "cod", "items", "gross", "revenue"):
+            current = getattr(self, name)
+            column = np.empty(size, dtype=current.dtype)
+            column[:len(current)] = current
+            column[target] = getattr(delta, name)
+            columns[name] = column
+
+        lines = {
+            name: np.concatenate([getattr(self, name)[keep_lines], getattr(delta, name)])
+            for name in ("line_qty", "line_gross", "line_size", "line_key")
+        }
+        lines["line_order"] = np.concatenate([self.line_order[keep_lines], target[delta.line_order]])
+
+        # Usuniete zamowienia zostaja w indeksie bez linii - wykrywa to
+        # porownanie liczby wierszy z wersja danych (pelne przeladowanie).
+        return replace(
+            delta,
+            version=version,
+            order_ids=np.array(order_ids, dtype=object),
+            index=index,
+            **columns,
+            **lines,
+        )
+
+
+_ORDER_COLUMNS = (
+    Order.order_id,
+    Order.date_add,
+    Order.platform,
+    Order.payment_method,
+    Order.payment_method_cod,
+    Order.payment_done,
+    Order.delivery_price,
+    Order.delivery_method,
+)
+_LINE_COLUMNS = (
+    OrderProduct.order_id,
+    OrderProduct.quantity,
+    OrderProduct.price_brutto,
+    OrderProduct.product_size_id,
+    OrderProduct.ean,
+    OrderProduct.name,
+)
+
+
+def read_data_version(conn) -> DataVersion:
+    """Jedno zapytanie o liczby wierszy i najnowsze znaczniki tabel zamowien."""
+    row = conn.execute(
+        select(
+            select(func.count()).select_from(Order).scalar_subquery(),
+            select(func.max(Order.updated_at)).scalar_subquery(),
+            select(func.count()).select_from(OrderProduct).scalar_subquery(),
+            select(func.max(OrderProduct.id)).scalar_subquery(),
+            select(func.max(OrderStatusLog.id)).scalar_subquery(),
+            # Ten sam zegar co server_default ``updated_at``.
+            func.localtimestamp() if db_module.is_postgres() else func.current_timestamp(),
+        )
+    ).one()
+    return DataVersion(
+        orders=int(row[0] or 0),
+        max_updated_at=row[1],
+        lines=int(row[2] or 0),
+        max_line_id=int(row[3] or 0),
+        max_status_id=int(row[4] or 0),
+        read_at=row[5],
+    )
+
+
+def _chunks(values: list) -> Iterable[list]:
+    for start in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[start:start + _IN_CHUNK_SIZE]
+
+
+def _latest_statuses(conn, order_ids: Optional[list[str]] = None) -> dict[str, str]:
+    latest = select(
+        OrderStatusLog.order_id,
+        func.max(OrderStatusLog.timestamp).label("max_ts"),
+    ).group_by(OrderStatusLog.order_id)
+    if order_ids is not None:
+        latest = latest.where(OrderStatusLog.order_id.in_(order_ids))
+    latest = latest.subquery()
+    rows = conn.execute(
+        select(OrderStatusLog.order_id, OrderStatusLog.status)
+        .join(
+            latest,
+            (OrderStatusLog.order_id == latest.c.order_id)
+            & (OrderStatusLog.timestamp == latest.c.max_ts),
+        )
+        .order_by(OrderStatusLog.id)
+    )
+    return {order_id: status for order_id, status in rows}
+
+
+def load_facts(conn, version: Optional[DataVersion] = None, order_ids: Optional[Iterable[str]] = None, *, codes: Optional[OrderFacts] = None) -> OrderFacts:
+    """Zbuduj migawke z bazy: wszystkie zamowienia albo tylko ``order_ids``.
+
+    ``codes`` przekazuje slowniki kategorii istniejacej migawki, zeby kody
+    dociaganych zamowien byly z nia zgodne.
+    """
+    if order_ids is None:
+        order_rows = conn.execute(select(*_ORDER_COLUMNS).order_by(Order.order_id)).all()
+        line_rows = conn.execute(select(*_LINE_COLUMNS).order_by(OrderProduct.id)).all()
+        statuses = _latest_statuses(conn)
+    else:
+        order_rows, line_rows, statuses = [], [], {}
+        for chunk in _chunks(sorted(set(order_ids))):
+            order_rows += conn.execute(
+                select(*_ORDER_COLUMNS).where(Order.order_id.in_(chunk)).order_by(Order.order_id)
+            ).all()
+            line_rows += conn.execute(
+                select(*_LINE_COLUMNS).where(OrderProduct.order_id.in_(chunk)).order_by(OrderProduct.id)
+            ).all()
+            statuses.update(_latest_statuses(conn, chunk))
+
+    known = {row.order_id for row in order_rows}
+    # Linie usunietego w miedzyczasie zamowienia nie maja do czego przylgnac.
+    line_rows = [line for line in line_rows if line.order_id in known]
+    if codes is None:
+        categories = (_Codes(), _Codes(), _Codes(), _Codes())
+    else:
+        categories = (codes.platforms.copy(), codes.carriers.copy(), codes.statuses.copy(), codes.line_keys.copy())
+    return OrderFacts._build(version, order_rows, line_rows, statuses, *categories)
+
+
+def _changed_order_ids(conn, previous: DataVersion) -> set[str]:
+    changed: set[str] = set()
+    query = select(Order.order_id)
+    if previous.max_updated_at is not None:
+        # Okno wstecz: transakcja zatwierdzona po poprzednim odczycie ma znacznik
+        # swojego startu, czesto starszy niz zapamietany.
+        query = query.where(
+            Order.updated_at >= previous.max_updated_at - timedelta(seconds=COMMIT_LAG_SECONDS)
+        )
+    changed.update(conn.execute(query).scalars())
+    changed.update(conn.execute(
+        select(OrderProduct.order_id).where(OrderProduct.id > previous.max_line_id)
+    ).scalars())
+    changed.update(conn.execute(
+        select(OrderStatusLog.order_id).where(OrderStatusLog.id > previous.max_status_id)
+    ).scalars())
+    return changed
+
+
+class OrderFactStore:
+    """Leniwie ladowana, przyrostowo odswiezana migawka ``OrderFacts``.
+
+    Migawka jest niezmienna - czytelnicy moga jej uzywac po zwolnieniu
+    blokady, a odswiezenie podmienia referencje.
+    """
+
+    def __init__(self):
+        self._facts: Optional[OrderFacts] = None
+        self._owner: tuple[int, object] | None = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"full_loads": 0, "incremental_loads": 0, "orders_reloaded": 0}
+
+    def get(self) -> OrderFacts:
+        owner = (os.getpid(), db_module.engine)
+        with self._lock:
+            with db_module.engine.connect() as conn:
+                version = read_data_version(conn)
+                now = time.monotonic()
+                facts = self._facts
+                if facts is None or self._owner != owner or now - self._loaded_at > FULL_RELOAD_SECONDS:
+                    self._owner = owner
+                    self._full_load(conn, version, now)
+                elif version != facts.version or not facts.version.settled:
+                    self._refresh(conn, facts, version, now)
+            return self._facts
+
+    def is_warm(self) -> bool:
+        """Czy ``get()`` obejdzie sie bez pelnego ladowania."""
+        return (
+            self._facts is not None
+            and self._owner == (os.getpid(), db_module.engine)
+            and time.monotonic() - self._loaded_at <= FULL_RELOAD_SECONDS
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._facts = None
+            self._owner = None
+
+    def _full_load(self, conn, version: DataVersion, now: float) -> None:
+        started = time.perf_counter()
+        self._facts = load_facts(conn, version)
+        self._loaded_at = now
+        self.stats["full_loads"] += 1
+        logger.info(
+            "Order facts loaded: orders=%s lines=%s elapsed_ms=%.1f",
+            self._facts.order_count,
+            self._facts.line_count,
+            (time.perf_counter() - started) * 1000,
+        )
+
+    def _refresh(self, conn, facts: OrderFacts, version: DataVersion, now: float) -> None:
+        previous = facts.version
+        changed = _changed_order_ids(conn, previous)
+        if changed:
+            delta = load_facts(conn, version, changed, codes=facts)
+            facts = facts.merged(version, delta, changed)
+            self.stats["incremental_loads"] += 1
+            self.stats["orders_reloaded"] += len(changed)
+        else:
+            facts = replace(facts, version=version)
+        # Usuniete zamowienia/linie - pelne przeladowanie.
+        if facts.order_count != version.orders or facts.line_count != version.lines:
+            self._full_load(conn, version, now)
+            return
+        self._facts = facts
+
+
+ORDER_FACTS = OrderFactStore()
+
+
+def get_order_facts() -> OrderFacts:
+    """Aktualna migawka faktow zamowien dla biezacego procesu."""
+    return ORDER_FACTS.get()
+
+
+def order_facts_warm() -> bool:
+    return ORDER_FACTS.is_warm()
+
+
+_LINE_FIELDS = ("order_id", "quantity", "price_brutto", "product_size_id", "ean", "name")
+
+
+@event.listens_for(Session, "after_flush")
+def _touch_orders_with_changed_lines(session, flush_context) -> None:
+    # Edycja linii nie zmienia wersji danych (liczby ani max id), a nowa linia
+    # lub status zatwierdzone pozniej moga miec id nizsze niz zapamietane -
+    # dotykamy ``updated_at`` zamowienia, zeby magazyn faktow je dociagnal.
+    order_ids: set[str] = {
+        obj.order_id
+        for obj in session.new
+        if isinstance(obj, (OrderProduct, OrderStatusLog)) and obj.order_id
+    }
+    for obj in session.dirty:
+        if not isinstance(obj, OrderProduct):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in _LINE_FIELDS):
+            # Przeniesiona linia zmienia oba zamowienia.
+            moved_from = state.attrs.order_id.history.deleted
+            order_ids.update(value for value in (*moved_from, obj.order_id) if value)
+    for chunk in _chunks(sorted(order_ids)):
+        session.connection().execute(
+            update(Order.__table__)
+            .where(Order.order_id.in_(chunk))
+            .values(updated_at=func.now())
+        )
+
+
+__all__ = [
+    "COMMIT_LAG_SECONDS",
+    "DataVersion",
+    "FULL_RELOAD_SECONDS",
+    "FactTotals",
+    "LineGroup",
+    "ORDER_FACTS",
+    "OrderFactStore",
+    "OrderFacts",
+    "get_order_facts",
+    "load_facts",
+    "order_facts_warm",
+    "read_data_version",
+]
@@ -4,8 +4,6 @@ from __future__ import annotations
 
 import logging
 
-from sqlalchemy import and_, desc, func
-
 from ..allegro_api.orders import (
     ALLEGRO_FULFILLMENT_MAP,
     fetch_allegro_order_detail,
@@ -14,7 +12,7 @@ from ..allegro_api.orders import (
 )
 from ..db import get_session
 from ..domain.order_platform import is_allegro_order
-from ..models.orders import Order, OrderStatusLog
+from ..models.orders import Order
 from .order_status import add_order_status
 
 logger = logging.getLogger(__name__)
@@ -41,32 +39,14 @@ def sync_allegro_fulfillment(app=None, *, log: logging.Logger | None = None) ->
 
     try:
         with get_session() as db:
-            latest_status_subq = (
-                db.query(
-                    OrderStatusLog.order_id,
-                    func.max(OrderStatusLog.timestamp).label("max_ts"),
-                )
-                .group_by(OrderStatusLog.order_id)
-                .subquery()
-            )
-
             orders = (
                 db.query(Order)
-                .join(OrderStatusLog, OrderStatusLog.order_id == Order.order_id)
-                .join(
-                    latest_status_subq,
-                    and_(
-                        OrderStatusLog.order_id == latest_status_subq.c.order_id,
-                        OrderStatusLog.timestamp == latest_status_subq.c.max_ts,
-                    ),
-                )
                 .filter(
-                    OrderStatusLog.status.in_(ACTIVE_FULFILLMENT_STATUSES),
+                    Order.current_status.in_(ACTIVE_FULFILLMENT_STATUSES),
                     Order.order_id.like("allegro_%"),
                     Order.external_order_id.isnot(None),
                     Order.external_order_id != "",
                 )
-                .distinct()
                 .all()
             )
 
@@ -126,13 +106,7 @@ def _sync_order_fulfillment(db, order: Order, log: logging.Logger) -> str:
     if derived_status == "anulowano":
         new_status = "anulowano"
 
-    current_log = (
-        db.query(OrderStatusLog)
-        .filter(OrderStatusLog.order_id == order.order_id)
-        .order_by(desc(OrderStatusLog.timestamp))
-        .first()
-    )
-    current_status = current_log.status if current_log else None
+    current_status = order.current_status
 
     if current_status == new_status:
         return "unchanged"
@@ -5,6 +5,9 @@ from __future__ import annotations
 import base64
 import tempfile
 from dataclasses import dataclass
+from typing import Optional
+
+from .label_store import StoredLabel, get_label_store
 
 
 @dataclass(frozen=True)
@@ -12,10 +15,28 @@ class PreparedOrderLabel:
     path: str
     filename: str
     mimetype: str
+    # Plik z magazynu etykiet: ETag to SHA-256 tresci, pliku nie usuwamy.
+    etag: Optional[str] = None
+    temporary: bool = True
+
+
+def _from_store(order_id: str, stored: StoredLabel) -> PreparedOrderLabel:
+    return PreparedOrderLabel(
+        path=str(stored.path),
+        filename=f"etykieta_{order_id}.{stored.ext}",
+        mimetype=stored.mimetype,
+        etag=stored.sha256,
+        temporary=False,
+    )
 
 
 def prepare_order_label_download(order_id: str, label_agent) -> PreparedOrderLabel | None:
-    """Pobierz pierwsza dostepna etykiete zamowienia i zapisz ja do pliku tymczasowego."""
+    """Pierwsza etykieta zamowienia: z magazynu etykiet, a gdy jej brak - z API."""
+    store = get_label_store()
+    stored_labels = store.for_order(order_id) if store is not None else []
+    if stored_labels:
+        return _from_store(order_id, stored_labels[0])
+
     packages = label_agent.get_order_packages(order_id)
     for package in packages:
         package_id = package.get("shipment_id") or package.get("package_id")
@@ -27,6 +48,12 @@ def prepare_order_label_download(order_id: str, label_agent) -> PreparedOrderLab
         if not label_data:
             continue
 
+        stored = None
+        if store is not None:
+            stored = store.put_base64(label_data, extension, keys=[str(package_id)], order_id=order_id)
+        if stored is not None:
+            return _from_store(order_id, stored)
+
         label_bytes = base64.b64decode(label_data)
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=f".{extension}")
         temp_file.write(label_bytes)
@@ -39,4 +66,4 @@ def prepare_order_label_download(order_id: str, label_agent) -> PreparedOrderLab
     return None
 
 
-__all__ = ["PreparedOrderLabel", "prepare_order_label_download"]
\ No newline at end of file
+__all__ = ["PreparedOrderLabel", "prepare_order_label_download"]
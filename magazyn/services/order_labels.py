@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+import base64
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, List, Tuple
 
 from ..db import get_session
+from .label_store import get_label_store
 from .order_status import add_order_status
 
 
@@ -16,22 +18,44 @@ class LabelActionResult:
     printed: bool = False
 
 
-def reprint_order_labels(order_id: str, label_agent: Any | None = None) -> LabelActionResult:
-    if label_agent is None:
-        from .print_agent_runtime import agent as label_agent
+def stored_order_labels(order_id: str) -> List[Tuple[str, str]]:
+    """Ostatni komplet etykiet zamowienia z magazynu etykiet - bez API przewoznika."""
+    store = get_label_store()
+    if store is None:
+        return []
+    labels = []
+    for stored in store.for_order(order_id):
+        data = store.read(stored)
+        if data is None:
+            return []
+        labels.append((base64.b64encode(data).decode("ascii"), stored.ext))
+    return labels
 
-    packages = label_agent.get_order_packages(order_id)
-    printed_any = False
 
-    for package in packages:
+def fetch_order_labels(order_id: str, label_agent: Any) -> List[Tuple[str, str]]:
+    """Etykiety zamowienia z magazynu etykiet, a gdy ich brak - przez API."""
+    labels = stored_order_labels(order_id)
+    if labels:
+        return labels
+    for package in label_agent.get_order_packages(order_id):
         package_id = package.get("shipment_id") or package.get("package_id")
         courier_code = package.get("courier_code") or package.get("carrier_id") or ""
         if not package_id:
             continue
         label_data, extension = label_agent.get_label(courier_code, package_id)
         if label_data:
-            label_agent.print_label(label_data, extension, order_id)
-            printed_any = True
+            labels.append((label_data, extension))
+    return labels
+
+
+def reprint_order_labels(order_id: str, label_agent: Any | None = None) -> LabelActionResult:
+    if label_agent is None:
+        from .print_agent_runtime import agent as label_agent
+
+    printed_any = False
+    for label_data, extension in fetch_order_labels(order_id, label_agent):
+        label_agent.print_label(label_data, extension, order_id)
+        printed_any = True
 
     if not printed_any:
         return LabelActionResult("Nie znaleziono etykiety do wydruku", "warning")
@@ -47,4 +71,9 @@ def reprint_order_labels(order_id: str, label_agent: Any | None = None) -> Label
     )
 
 
-__all__ = ["LabelActionResult", "reprint_order_labels"]
\ No newline at end of file
+__all__ = [
+    "LabelActionResult",
+    "fetch_order_labels",
+    "reprint_order_labels",
+    "stored_order_labels",
+]
\ No newline at end of file
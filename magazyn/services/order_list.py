@@ -10,6 +10,10 @@ from ..repositories.order_repository import OrderRepository
 from .order_presentation import _get_status_display, _unix_to_datetime
 
 
+# Sortowania bez paginacji keyset (kursor opiera sie na date_add).
+_OFFSET_SORTS = ("amount", "relevance")
+
+
 def _request_value(args: Any, key: str, default: Any = "", *, value_type: type | None = None) -> Any:
     getter = getattr(args, "get", None)
     if not getter:
@@ -19,6 +23,22 @@ def _request_value(args: Any, key: str, default: Any = "", *, value_type: type |
     return getter(key, default)
 
 
+def _page_numbers(page: int, total_pages: int) -> list[int | None]:
+    """Numery stron do paginacji: pierwsza, ostatnia i +-2 wokol biezacej.
+
+    ``None`` oznacza przerwe ("..."). Lista ma stala dlugosc niezaleznie
+    od liczby stron.
+    """
+    numbers: list[int | None] = []
+    for number in sorted({1, total_pages, *range(page - 2, page + 3)}):
+        if number < 1 or number > total_pages:
+            continue
+        if numbers and number - (numbers[-1] or 0) > 1:
+            numbers.append(None)
+        numbers.append(number)
+    return numbers
+
+
 def build_orders_list_context(args: Any) -> dict[str, Any]:
     page = _request_value(args, "page", 1, value_type=int)
     per_page = _request_value(args, "per_page", 25, value_type=int)
@@ -28,7 +48,10 @@ def build_orders_list_context(args: Any) -> dict[str, Any]:
     status_filter = _request_value(args, "status", "all")
     date_from = (_request_value(args, "date_from", "") or "").strip()
     date_to = (_request_value(args, "date_to", "") or "").strip()
+    after = (_request_value(args, "after", "") or "").strip()
 
+    if page < 1:
+        page = 1
     if per_page not in [10, 25, 50, 100]:
         per_page = 25
 
@@ -44,20 +67,28 @@ def build_orders_list_context(args: Any) -> dict[str, Any]:
         )
 
         total = query.count()
-        orders = query.offset((page - 1) * per_page).limit(per_page).all()
-        lp_map = {
-            order_id: idx + 1
-            for idx, order_id in enumerate(repository.chronological_order_ids(search=search))
-        }
+        keyset = repository.decode_cursor(after) if after and sort_by not in _OFFSET_SORTS else None
+        if keyset is not None:
+            page_query = repository.apply_keyset(query, keyset, sort_dir)
+        else:
+            page_query = query.offset((page - 1) * per_page)
+        orders = page_query.limit(per_page).all()
+
+        # Stala liczba zapytan niezaleznie od rozmiaru strony.
+        order_ids = [order.order_id for order in orders]
+        lp_map = repository.order_ordinals(order_ids, search=search)
+        statuses = repository.latest_statuses(order_ids)
+        products_map = repository.products_by_order(order_ids)
+        returns_map = repository.active_returns(order_ids)
 
         orders_data = []
         for order in orders:
-            latest_status = repository.latest_status(order.order_id)
+            latest_status = statuses.get(order.order_id)
             status_text, status_class = _get_status_display(
                 latest_status.status if latest_status else "pobrano"
             )
-            products = repository.order_products(order.order_id)
-            active_return = repository.active_return(order.order_id)
+            products = products_map.get(order.order_id, [])
+            active_return = returns_map.get(order.order_id)
 
             product_lines = [f"{product.name or 'Produkt'} x{product.quantity}" for product in products]
             return_info = None
@@ -101,6 +132,9 @@ def build_orders_list_context(args: Any) -> dict[str, Any]:
             )
 
     total_pages = (total + per_page - 1) // per_page
+    next_cursor = None
+    if orders and page < total_pages and sort_by not in _OFFSET_SORTS:
+        next_cursor = OrderRepository.encode_cursor(orders[-1])
     return {
         "orders": orders_data,
         "page": page,
@@ -109,6 +143,8 @@ def build_orders_list_context(args: Any) -> dict[str, Any]:
         "has_prev": page > 1,
         "has_next": page < total_pages,
         "total": total,
+        "next_cursor": next_cursor,
+        "page_numbers": _page_numbers(page, total_pages),
         "search": search,
         "sort_by": sort_by,
         "sort_dir": sort_dir,
@@ -0,0 +1,603 @@
+"""Dzienny rollup zamowien (tabela ``order_daily_rollup``).
+
+Jeden wiersz na dzien (lokalna data ``date_add``) x platforma x koszyk
+statusu rozliczenia z gotowymi sumami: liczba zamowien, sztuki, przychod,
+wartosc pozycji i skladniki zapisanego zysku. Dashboard i raporty okresowe
+czytaja kilka-kilkaset wierszy zamiast agregowac cala historie zamowien.
+
+Koszyki odpowiadaja filtrom dashboardu i ``get_period_summary``:
+
+- ``unpaid`` - brak wplaty i nie za pobraniem,
+- ``paid`` - oplacone lub COD, bez zakonczonego zwrotu,
+- ``returned`` - oplacone lub COD z zakonczonym zwrotem (``completed``).
+
+Utrzymanie jest przyrostowe: listener ``after_flush`` sesji zbiera dni
+dotkniete zmianami zamowien (sync, odswiezenie zysku, edycja), pozycji i
+zwrotow, a ``before_commit`` przelicza w tej samej transakcji tylko te dni.
+Zapisy z pominieciem ORM (import ``insert()``, reczny SQL) wymagaja
+``rebuild_order_rollup``; ``check_order_rollup`` porownuje rollup ze zrodlem
+i moze naprawic dni, ktore sie rozjechaly.
+
+Na PostgreSQL przeliczenie dnia bierze blokade doradcza transakcji na ten
+dzien, zanim policzy sumy: rownolegle transakcje (workery, watki synchronizacji)
+przeliczaja ten sam dzien po kolei, a druga widzi juz zatwierdzone zmiany
+pierwszej (READ COMMITTED), wiec zadna nie nadpisuje cudzych sum. Dni calej
+transakcji sa blokowane jednym rosnacym przebiegiem przy zatwierdzeniu - gdyby
+kazdy flush blokowal swoje dni, dwie transakcje z kilkoma flushami mogly
+wziac te same blokady w przeciwnej kolejnosci i sie zakleszczyc.
+
+Dopoki rollup jest pusty (swiezo po migracji, przed pierwszym krokiem
+``order_rollup_check``), ``daily_totals`` liczy sumy wprost ze zrodla.
+"""
+
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass, fields
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import delete, event, func, insert, inspect, or_, select, text
+from sqlalchemy.orm import Session
+
+from ..models.orders import Order, OrderDailyRollup, OrderProduct
+from ..models.returns import Return
+
+logger = logging.getLogger(__name__)
+
+BUCKET_UNPAID = "unpaid"
+BUCKET_PAID = "paid"
+BUCKET_RETURNED = "returned"
+BUCKETS = (BUCKET_UNPAID, BUCKET_PAID, BUCKET_RETURNED)
+
+# Ile ostatnich dni sprawdza krok order_rollup_check cyklu synchronizacji.
+RECENT_CHECK_DAYS = 3
+_IN_CHUNK_SIZE = 500
+# Pierwszy klucz blokad doradczych dni rollupu (drugi to numer dnia).
+ROLLUP_LOCK_NAMESPACE = 0x524F4C4C
+_CENT = Decimal("0.01")
+
+# Kolumny zamowienia, od ktorych zaleza sumy rollupu; products_json zmienia
+# sie razem z pozycjami, ktore sync kasuje zapytaniem z pominieciem ORM.
+_ORDER_FIELDS = (
+    "date_add",
+    "platform",
+    "payment_done",
+    "payment_method_cod",
+    "delivery_package_nr",
+    "products_json",
+    "real_profit_sale_price",
+    "real_profit_purchase_cost",
+    "real_profit_packaging_cost",
+    "real_profit_allegro_fees",
+    "real_profit_amount",
+)
+_ORDER_PRODUCT_FIELDS = ("order_id", "quantity", "price_brutto")
+_RETURN_FIELDS = ("order_id", "status")
+
+RollupKey = Tuple[date, str, str]
+
+
+@dataclass
+class RollupTotals:
+    """Sumy miar rollupu (jeden wiersz albo suma zakresu)."""
+    orders: int = 0
+    awaiting_label: int = 0
+    units: int = 0
+    revenue: Decimal = Decimal("0")
+    items_value: Decimal = Decimal("0")
+    sale_price: Decimal = Decimal("0")
+    cost: Decimal = Decimal("0")
+    fees: Decimal = Decimal("0")
+    packaging: Decimal = Decimal("0")
+    profit: Decimal = Decimal("0")
+    profit_pending: int = 0
+
+    def add(self, other: "RollupTotals") -> None:
+        for item in fields(self):
+            setattr(self, item.name, getattr(self, item.name) + getattr(other, item.name))
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            item.name: (
+                getattr(self, item.name).quantize(_CENT)
+                if isinstance(getattr(self, item.name), Decimal)
+                else getattr(self, item.name)
+            )
+            for item in fields(self)
+        }
+
+
+MEASURES = tuple(item.name for item in fields(RollupTotals))
+
+
+@dataclass(frozen=True)
+class RollupMismatch:
+    """Roznica miedzy zapisanym rollupem a przeliczeniem ze zrodla."""
+    day: date
+    platform: str
+    status_bucket: str
+    measure: str
+    stored: Any
+    expected: Any
+
+
+@dataclass(frozen=True)
+class RollupPeriodSummary:
+    """Podsumowanie sprzedazy okresu dla raportow agenta."""
+    orders_count: int
+    products_sold: int
+    total_revenue: Decimal
+    gross_profit: Decimal
+
+
+def order_day(date_add: Optional[int]) -> Optional[date]:
+    """Lokalny dzien zamowienia (jak zakresy ``TimeRanges`` dashboardu)."""
+    if date_add is None:
+        return None
+    return datetime.fromtimestamp(int(date_add)).date()
+
+
+def day_start_ts(day: date) -> int:
+    return int(datetime.combine(day, time.min).timestamp())
+
+
+def status_bucket(payment_done: Any, payment_method_cod: Any, returned: bool) -> str:
+    paid = bool(payment_method_cod) or Decimal(str(payment_done or 0)) > 0
+    if not paid:
+        return BUCKET_UNPAID
+    return BUCKET_RETURNED if returned else BUCKET_PAID
+
+
+def paid_order_filter():
+    return or_(Order.payment_done > 0, Order.payment_method_cod.is_(True))
+
+
+def completed_return_order_ids():
+    return select(Return.order_id).where(Return.status == "completed").distinct()
+
+
+def _decimal(value: Any) -> Decimal:
+    return Decimal(str(value)) if value is not None else Decimal("0")
+
+
+def _source_query(start_ts: Optional[int] = None, end_ts: Optional[int] = None):
+    conditions = [Order.date_add.isnot(None)]
+    if start_ts is not None:
+        conditions.append(Order.date_add >= start_ts)
+    if end_ts is not None:
+        conditions.append(Order.date_add < end_ts)
+
+    lines = select(
+        OrderProduct.order_id,
+        func.sum(OrderProduct.quantity).label("units"),
+        func.sum(OrderProduct.price_brutto * OrderProduct.quantity).label("items_value"),
+    )
+    if start_ts is not None or end_ts is not None:
+        lines = lines.where(
+            OrderProduct.order_id.in_(select(Order.order_id).where(*conditions))
+        )
+    lines = lines.group_by(OrderProduct.order_id).subquery()
+
+    return (
+        select(
+            Order.date_add,
+            Order.platform,
+            Order.payment_done,
+            Order.payment_method_cod,
+            Order.delivery_package_nr,
+            Order.real_profit_sale_price,
+            Order.real_profit_purchase_cost,
+            Order.real_profit_packaging_cost,
+            Order.real_profit_allegro_fees,
+            Order.real_profit_amount,
+            Order.order_id.in_(completed_return_order_ids()).label("returned"),
+            lines.c.units,
+            lines.c.items_value,
+        )
+        .outerjoin(lines, lines.c.order_id == Order.order_id)
+        .where(*conditions)
+    )
+
+
+def aggregate_orders(
+    bind,
+    start_ts: Optional[int] = None,
+    end_ts: Optional[int] = None,
+) -> Dict[RollupKey, RollupTotals]:
+    """Przelicz sumy rollupu ze zrodla dla zamowien z zakresu ``[start, end)``."""
+    totals: Dict[RollupKey, RollupTotals] = {}
+    for row in bind.execute(_source_query(start_ts, end_ts)):
+        bucket = status_bucket(row.payment_done, row.payment_method_cod, bool(row.returned))
+        key = (order_day(row.date_add), row.platform or "", bucket)
+        item = totals.setdefault(key, RollupTotals())
+
+        item.orders += 1
+        if row.delivery_package_nr is None:
+            item.awaiting_label += 1
+        item.units += int(row.units or 0)
+        payment_done = _decimal(row.payment_done)
+        if payment_done > 0:
+            item.revenue += payment_done
+        item.items_value += _decimal(row.items_value)
+
+        cached = (
+            row.real_profit_sale_price,
+            row.real_profit_purchase_cost,
+            row.real_profit_packaging_cost,
+            row.real_profit_allegro_fees,
+            row.real_profit_amount,
+        )
+        if any(value is None for value in cached):
+            item.profit_pending += 1
+        else:
+            item.sale_price += _decimal(row.real_profit_sale_price)
+            item.cost += _decimal(row.real_profit_purchase_cost)
+            item.packaging += _decimal(row.real_profit_packaging_cost)
+            item.fees += _decimal(row.real_profit_allegro_fees)
+        # Jak rekord zysku dashboardu: kazda zapisana kwota, takze bez kompletu pol.
+        item.profit += _decimal(row.real_profit_amount)
+    return totals
+
+
+def _day_ranges(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Scala dni w ciagle zakresy ``(pierwszy, ostatni)``."""
+    ranges: List[Tuple[date, date]] = []
+    for day in sorted(set(days)):
+        if ranges and day == ranges[-1][1] + timedelta(days=1):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+
+def _rows(totals: Dict[RollupKey, RollupTotals]) -> List[Dict[str, Any]]:
+    return [
+        {"day": day, "platform": platform, "status_bucket": bucket, **item.as_row()}
+        for (day, platform, bucket), item in sorted(totals.items())
+    ]
+
+
+def _replace_days(bind, start_day: Optional[date], end_day: Optional[date], totals) -> int:
+    """Zastap wiersze rollupu z zakresu dni (wlacznie) nowymi sumami."""
+    table = OrderDailyRollup.__table__
+    conditions = []
+    if start_day is not None:
+        conditions.append(table.c.day >= start_day)
+    if end_day is not None:
+        conditions.append(table.c.day <= end_day)
+    bind.execute(delete(table).where(*conditions))
+    rows = _rows(totals)
+    for start in range(0, len(rows), _IN_CHUNK_SIZE):
+        bind.execute(insert(table), rows[start:start + _IN_CHUNK_SIZE])
+    return len(rows)
+
+
+def _aggregate_days(bind, start_day: Optional[date], end_day: Optional[date]):
+    return aggregate_orders(
+        bind,
+        day_start_ts(start_day) if start_day is not None else None,
+        day_start_ts(end_day + timedelta(days=1)) if end_day is not None else None,
+    )
+
+
+def lock_days(bind, days: Iterable[date]) -> None:
+    """Zablokuj dni rollupu do konca transakcji (tylko PostgreSQL).
+
+    Dni sa blokowane rosnaco, zeby dwie transakcje z nakladajacymi sie dniami
+    nie zakleszczyly sie na sobie. Na SQLite zapisy i tak sa szeregowane.
+    """
+    dialect = bind.get_bind().dialect if isinstance(bind, Session) else bind.dialect
+    if dialect.name != "postgresql":
+        return
+    for day in sorted(set(days)):
+        bind.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :day)"),
+            {"namespace": ROLLUP_LOCK_NAMESPACE, "day": day.toordinal()},
+        )
+
+
+def refresh_days(bind, days: Iterable[date]) -> int:
+    """Przelicz wiersze rollupu dla podanych dni; zwraca liczbe zapisanych wierszy."""
+    days = {day for day in days if day is not None}
+    lock_days(bind, days)
+    written = 0
+    for first, last in _day_ranges(days):
+        written += _replace_days(bind, first, last, _aggregate_days(bind, first, last))
+    return written
+
+
+def rebuild_order_rollup(
+    bind,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+) -> int:
+    """Odbuduj rollup z historii zamowien (calosc albo zakres dni wlacznie)."""
+    if start_day is not None and end_day is not None:
+        lock_days(bind, (
+            start_day + timedelta(days=offset)
+            for offset in range((end_day - start_day).days + 1)
+        ))
+    rows = _replace_days(bind, start_day, end_day, _aggregate_days(bind, start_day, end_day))
+    logger.info("Order rollup rebuilt: start=%s end=%s rows=%s", start_day, end_day, rows)
+    return rows
+
+
+def _stored_rows(bind, start_day: Optional[date], end_day: Optional[date]) -> Dict[RollupKey, Dict[str, Any]]:
+    table = OrderDailyRollup.__table__
+    query = select(table)
+    if start_day is not None:
+        query = query.where(table.c.day >= start_day)
+    if end_day is not None:
+        query = query.where(table.c.day <= end_day)
+    return {
+        (row.day, row.platform, row.status_bucket): {
+            measure: getattr(row, measure) for measure in MEASURES
+        }
+        for row in bind.execute(query)
+    }
+
+
+def _normalized(value: Any) -> Any:
+    if isinstance(value, (Decimal, float)):
+        return Decimal(str(value)).quantize(_CENT)
+    return value
+
+
+def check_order_rollup(
+    bind,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    *,
+    repair: bool = False,
+) -> List[RollupMismatch]:
+    """Porownaj rollup z przeliczeniem ze zrodla; ``repair`` przelicza rozjechane dni."""
+    expected = _aggregate_days(bind, start_day, end_day)
+    stored = _stored_rows(bind, start_day, end_day)
+    empty = RollupTotals().as_row()
+
+    mismatches: List[RollupMismatch] = []
+    for key in sorted(set(expected) | set(stored)):
+        expected_row = expected[key].as_row() if key in expected else empty
+        stored_row = stored.get(key, empty)
+        for measure in MEASURES:
+            stored_value = _normalized(stored_row[measure])
+            expected_value = _normalized(expected_row[measure])
+            if stored_value != expected_value:
+                mismatches.append(RollupMismatch(*key, measure, stored_value, expected_value))
+
+    if mismatches:
+        logger.warning(
+            "Order rollup mismatches: count=%s days=%s",
+            len(mismatches),
+            sorted({item.day.isoformat() for item in mismatches}),
+        )
+        if repair:
+            refresh_days(bind, {item.day for item in mismatches})
+    return mismatches
+
+
+def ensure_order_rollup(bind, *, today: Optional[date] = None, recent_days: int = RECENT_CHECK_DAYS) -> Dict[str, int]:
+    """Krok cyklu: odbuduj pusty rollup, a potem pilnuj ostatnich dni."""
+    if rollup_empty(bind):
+        has_orders = bind.execute(
+            select(Order.order_id).where(Order.date_add.isnot(None)).limit(1)
+        ).first() is not None
+        if has_orders:
+            rows = rebuild_order_rollup(bind)
+            return {"rebuilt": 1, "rows": rows, "mismatches": 0}
+
+    today = today or date.today()
+    mismatches = check_order_rollup(
+        bind, today - timedelta(days=recent_days - 1), today, repair=True
+    )
+    return {"rebuilt": 0, "rows": 0, "mismatches": len(mismatches)}
+
+
+def rollup_empty(bind) -> bool:
+    return bind.execute(select(OrderDailyRollup.day).limit(1)).first() is None
+
+
+def daily_totals(
+    db,
+    start_day: Optional[date] = None,
+    end_day: Optional[date] = None,
+    buckets: Sequence[str] = BUCKETS,
+) -> Dict[date, RollupTotals]:
+    """Sumy dzienne (wszystkie platformy) dni ``start_day..end_day`` i koszykow.
+
+    Pusty rollup (przed pierwsza odbudowa) nie znaczy braku sprzedazy - wtedy
+    sumy sa liczone ze zrodla tak samo, jak liczy je odbudowa.
+    """
+    buckets = tuple(buckets)
+    days: Dict[date, RollupTotals] = {}
+    if rollup_empty(db):
+        for (day, _platform, bucket), item in _aggregate_days(db, start_day, end_day).items():
+            if bucket in buckets:
+                days.setdefault(day, RollupTotals()).add(item)
+        return days
+
+    table = OrderDailyRollup.__table__
+    query = select(
+        table.c.day,
+        *[func.coalesce(func.sum(table.c[measure]), 0) for measure in MEASURES],
+    ).where(table.c.status_bucket.in_(list(buckets)))
+    if start_day is not None:
+        query = query.where(table.c.day >= start_day)
+    if end_day is not None:
+        query = query.where(table.c.day <= end_day)
+    for day, *row in db.execute(query.group_by(table.c.day)):
+        values = {}
+        for measure, value in zip(MEASURES, row):
+            default = getattr(RollupTotals, measure)
+            values[measure] = _decimal(value) if isinstance(default, Decimal) else int(value or 0)
+        days[day] = RollupTotals(**values)
+    return days
+
+
+def sum_rollup(
+    db,
+    start_day: date,
+    end_day: date,
+    buckets: Sequence[str] = BUCKETS,
+) -> RollupTotals:
+    """Sumy rollupu dla dni ``start_day..end_day`` (wlacznie) i koszykow."""
+    total = RollupTotals()
+    for item in daily_totals(db, start_day, end_day, buckets).values():
+        total.add(item)
+    return total
+
+
+def summarize_period(db, calculator, start_day: date, end_day: date) -> RollupPeriodSummary:
+    """Sprzedaz i zysk brutto okresu jak ``get_period_summary``, z rollupu.
+
+    Zamowienia bez kompletu zapisanego zysku (``profit_pending``) sa
+    doliczane kalkulatorem zbiorczym - zwykle to tylko najswiezsze zamowienia.
+    """
+    paid = sum_rollup(db, start_day, end_day, (BUCKET_PAID,))
+    returned = sum_rollup(db, start_day, end_day, (BUCKET_RETURNED,))
+
+    total_revenue = paid.sale_price
+    gross_profit = paid.sale_price - paid.fees - paid.cost - paid.packaging
+    if paid.profit_pending:
+        pending_filters = (
+            Order.date_add >= day_start_ts(start_day),
+            Order.date_add < day_start_ts(end_day + timedelta(days=1)),
+            ~Order.order_id.in_(completed_return_order_ids()),
+            paid_order_filter(),
+            or_(
+                Order.real_profit_sale_price.is_(None),
+                Order.real_profit_purchase_cost.is_(None),
+                Order.real_profit_packaging_cost.is_(None),
+                Order.real_profit_allegro_fees.is_(None),
+                Order.real_profit_amount.is_(None),
+            ),
+        )
+        pending = db.query(Order).filter(*pending_filters).all()
+        breakdowns = calculator.calculate_order_profits(
+            pending,
+            order_scope=select(Order.order_id).where(*pending_filters),
+            trace_label="order-rollup",
+        )
+        for breakdown in breakdowns.values():
+            total_revenue += breakdown.sale_price
+            gross_profit += (
+                breakdown.sale_price
+                - breakdown.allegro_fees
+                - breakdown.purchase_cost
+                - breakdown.packaging_cost
+            )
+
+    return RollupPeriodSummary(
+        orders_count=paid.orders,
+        products_sold=paid.units + returned.units,
+        total_revenue=total_revenue,
+        gross_profit=gross_profit,
+    )
+
+
+def _touched_days(session: Session) -> Set[date]:
+    days: Set[date] = set()
+    order_ids: Set[str] = set()
+
+    def changed(state, names) -> bool:
+        return any(state.attrs[name].history.has_changes() for name in names)
+
+    def values(state, name) -> list:
+        history = state.attrs[name].history
+        return [*history.added, *history.unchanged, *history.deleted]
+
+    for obj in session.new:
+        if isinstance(obj, Order):
+            days.update(order_day(value) for value in values(inspect(obj), "date_add"))
+        elif isinstance(obj, (OrderProduct, Return)):
+            order_ids.add(obj.order_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            if changed(state, _ORDER_FIELDS):
+                days.update(order_day(value) for value in values(state, "date_add"))
+                order_ids.add(obj.order_id)
+        elif isinstance(obj, (OrderProduct, Return)):
+            state = inspect(obj)
+            names = _ORDER_PRODUCT_FIELDS if isinstance(obj, OrderProduct) else _RETURN_FIELDS
+            if changed(state, names):
+                order_ids.update(values(state, "order_id"))
+
+    for obj in session.deleted:
+        if isinstance(obj, Order):
+            days.update(order_day(value) for value in values(inspect(obj), "date_add"))
+        elif isinstance(obj, (OrderProduct, Return)):
+            order_ids.update(values(inspect(obj), "order_id"))
+
+    ids = sorted(order_id for order_id in order_ids if order_id)
+    if ids:
+        connection = session.connection()
+        for start in range(0, len(ids), _IN_CHUNK_SIZE):
+            days.update(
+                order_day(date_add)
+                for (date_add,) in connection.execute(
+                    select(Order.date_add).where(
+                        Order.order_id.in_(ids[start:start + _IN_CHUNK_SIZE])
+                    )
+                )
+            )
+    days.discard(None)
+    return days
+
+
+_PENDING_DAYS_KEY = "order_rollup_pending_days"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_touched_days(session, flush_context) -> None:
+    if not any(
+        isinstance(obj, (Order, OrderProduct, Return))
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        return
+    days = _touched_days(session)
+    if days:
+        session.info.setdefault(_PENDING_DAYS_KEY, set()).update(days)
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_touched_days(session) -> None:
+    if session.in_nested_transaction():
+        return
+    # Ostatni flush commita nastepuje po before_commit - jego dni tez musza trafic
+    # do tej samej, jedynej blokady.
+    session.flush()
+    days = session.info.pop(_PENDING_DAYS_KEY, None)
+    if days:
+        refresh_days(session.connection(), days)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _drop_touched_days(session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_PENDING_DAYS_KEY, None)
+
+
+__all__ = [
+    "BUCKETS",
+    "BUCKET_PAID",
+    "BUCKET_RETURNED",
+    "BUCKET_UNPAID",
+    "RollupMismatch",
+    "RollupPeriodSummary",
+    "RollupTotals",
+    "aggregate_orders",
+    "check_order_rollup",
+    "daily_totals",
+    "ensure_order_rollup",
+    "lock_days",
+    "order_day",
+    "rebuild_order_rollup",
+    "refresh_days",
+    "rollup_empty",
+    "sum_rollup",
+    "summarize_period",
+]
@@ -0,0 +1,114 @@
+"""Utrzymanie indeksu wyszukiwania zamowien (tabela ``order_search``).
+
+Dla kazdego zamowienia trzymany jest jeden znormalizowany dokument
+(``domain/order_search.py``): numery zamowienia, klient, login, email,
+telefon, metoda dostawy, numer przesylki i nazwy pozycji. Zapytania buduje
+``OrderRepository`` - na PostgreSQL ``LIKE`` po indeksie GIN pg_trgm, na
+SQLite ``MATCH`` w tabeli FTS5 ``order_search_fts`` (trigram).
+
+Listener ``after_flush`` przelicza dokumenty zamowien, ktorych pola lub
+pozycje zmieniono, w tej samej transakcji. ``ensure_order_search`` (krok
+cyklu synchronizacji) dopisuje dokumenty brakujace - po migracji albo
+zapisach z pominieciem ORM.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from ..domain.order_search import DOCUMENT_FIELDS, build_document
+from ..models.orders import Order, OrderProduct, OrderSearchDocument
+
+_IN_CHUNK_SIZE = 500
+_ORDER_COLUMNS = tuple(getattr(Order, name) for name in DOCUMENT_FIELDS)
+_ORDER_PRODUCT_FIELDS = ("order_id", "name")
+
+
+def _chunks(values: List[str]) -> Iterable[List[str]]:
+    for start in range(0, len(values), _IN_CHUNK_SIZE):
+        yield values[start:start + _IN_CHUNK_SIZE]
+
+
+def refresh_documents(bind, order_ids: Iterable[str]) -> int:
+    """Przelicz dokumenty wskazanych zamowien; usuniete zamowienia traca dokument."""
+    written = 0
+    for chunk in _chunks(sorted(set(order_ids))):
+        names: Dict[str, List[Optional[str]]] = {order_id: [] for order_id in chunk}
+        for order_id, name in bind.execute(
+            select(OrderProduct.order_id, OrderProduct.name)
+            .where(OrderProduct.order_id.in_(chunk))
+            .order_by(OrderProduct.id)
+        ):
+            names[order_id].append(name)
+        rows = [
+            {"order_id": row.order_id, "document": build_document(row._mapping, names[row.order_id])}
+            for row in bind.execute(select(*_ORDER_COLUMNS).where(Order.order_id.in_(chunk)))
+        ]
+        bind.execute(delete(OrderSearchDocument).where(OrderSearchDocument.order_id.in_(chunk)))
+        if rows:
+            bind.execute(insert(OrderSearchDocument), rows)
+        written += len(rows)
+    return written
+
+
+def ensure_order_search(bind) -> Dict[str, int]:
+    """Dopisz dokumenty zamowien, ktore jeszcze ich nie maja."""
+    missing = [
+        order_id
+        for (order_id,) in bind.execute(
+            select(Order.order_id)
+            .outerjoin(OrderSearchDocument, OrderSearchDocument.order_id == Order.order_id)
+            .where(OrderSearchDocument.order_id.is_(None))
+        )
+    ]
+    return {"indexed": refresh_documents(bind, missing) if missing else 0}
+
+
+def rebuild_order_search(bind) -> int:
+    """Zbuduj indeks od zera z calej tabeli ``orders``."""
+    bind.execute(delete(OrderSearchDocument))
+    return ensure_order_search(bind)["indexed"]
+
+
+def _touched_order_ids(session: Session) -> Set[str]:
+    order_ids: Set[str] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Order):
+            state = inspect(obj)
+            if obj in session.dirty and not any(
+                state.attrs[name].history.has_changes() for name in DOCUMENT_FIELDS
+            ):
+                continue
+            order_ids.add(obj.order_id)
+        elif isinstance(obj, OrderProduct):
+            state = inspect(obj)
+            if obj in session.dirty and not any(
+                state.attrs[name].history.has_changes() for name in _ORDER_PRODUCT_FIELDS
+            ):
+                continue
+            history = state.attrs.order_id.history
+            order_ids.update(value for value in (*history.deleted, obj.order_id) if value)
+    order_ids.discard(None)
+    return order_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_touched_documents(session, flush_context) -> None:
+    if not any(
+        isinstance(obj, (Order, OrderProduct))
+        for obj in (*session.new, *session.dirty, *session.deleted)
+    ):
+        return
+    order_ids = _touched_order_ids(session)
+    if order_ids:
+        refresh_documents(session.connection(), order_ids)
+
+
+__all__ = [
+    "ensure_order_search",
+    "rebuild_order_search",
+    "refresh_documents",
+]
@@ -120,18 +120,23 @@ def add_order_status(
         if courier_code:
             order.courier_code = courier_code
 
-    last_status = (
-        db.query(OrderStatusLog)
-        .filter(OrderStatusLog.order_id == order_id)
-        .order_by(desc(OrderStatusLog.timestamp))
-        .first()
-    )
+    if order is not None:
+        # Utrzymywany przez listener services/order_current_status.py.
+        last_status = order.current_status
+    else:
+        last_log = (
+            db.query(OrderStatusLog)
+            .filter(OrderStatusLog.order_id == order_id)
+            .order_by(desc(OrderStatusLog.timestamp), desc(OrderStatusLog.id))
+            .first()
+        )
+        last_status = last_log.status if last_log else None
 
-    if skip_if_same and last_status and last_status.status == status:
+    if skip_if_same and last_status == status:
         return None
 
     if not allow_backwards and last_status:
-        last_priority = STATUS_HIERARCHY.get(last_status.status, -1)
+        last_priority = STATUS_HIERARCHY.get(last_status, -1)
         new_priority = STATUS_HIERARCHY.get(status, -1)
 
         if (
@@ -143,7 +148,7 @@ def add_order_status(
             logger.warning(
                 "Pominięto cofnięcie statusu zamówienia %s: %s (priorytet %s) -> %s (priorytet %s)",
                 order_id,
-                last_status.status,
+                last_status,
                 last_priority,
                 status,
                 new_priority,
@@ -158,6 +163,9 @@ def add_order_status(
         notes=kwargs.get("notes"),
     )
     db.add(log)
+    # Flush uruchamia listener current_status - kolejne wywolanie w tej samej
+    # sesji widzi juz nowy status.
+    db.flush()
 
     if send_email:
         dispatch_email(db, order_id, status)
@@ -7,6 +7,21 @@ from dataclasses import dataclass
 from datetime import datetime
 from typing import Any, Callable, Optional
 
+from .job_graph import JobGraphExecutor, JobOutcome, SyncJob
+from .stats_cache import TAG_ORDERS, TAG_RETURNS
+from .stats_runtime import invalidate_stats_cache
+
+# Domyslny interwal krokow (dawny staly cykl 600 s). Nowe zamowienia i
+# statusy wysylek odswiezane sa czesciej, bo kroki nie blokuja sie juz
+# nawzajem.
+DEFAULT_INTERVAL = 600.0
+ORDERS_INTERVAL = 120.0
+FULFILLMENT_INTERVAL = 300.0
+DAILY_SYNC_TIMEOUT = 1800.0
+ROLLUP_CHECK_INTERVAL = 3600.0
+JITTER_RATIO = 0.1
+DEFAULT_MAX_WORKERS = 4
+
 
 @dataclass(frozen=True)
 class OrderSyncCallbacks:
@@ -24,20 +39,114 @@ class OrderSyncCycle:
         self.logger = logger
         self.callbacks = callbacks
 
-    def run(self, app: Any) -> None:
-        with app.app_context():
-            self.run_data_integrity_canary()
-            self.run_allegro_events_sync(app)
-            self.run_woo_orders_sync()
-            self.run_parcel_tracking_sync()
-            self.run_profit_cache_refresh(app)
-            self.run_allegro_fulfillment_sync(app)
-            self.run_returns_sync()
-            self.run_invoice_processing()
-            self.run_notification_retry()
-            self.run_unpaid_auto_cancel()
-            self.run_allegro_ratings_snapshot()
-            self.run_daily_offer_and_promo_sync()
+    def jobs(self, app: Any) -> list[SyncJob]:
+        """Graf krokow cyklu: zaleznosci, interwaly i limity czasu."""
+
+        def in_app(step: Callable[[], Any]) -> Callable[[], Any]:
+            def run() -> Any:
+                with app.app_context():
+                    return step()
+
+            return run
+
+        def job(name, step, *, depends_on=(), interval=DEFAULT_INTERVAL, timeout=300.0, items=None):
+            return SyncJob(
+                name=name,
+                run=in_app(step),
+                depends_on=depends_on,
+                interval=interval,
+                timeout=timeout,
+                jitter=interval * JITTER_RATIO,
+                items=items,
+            )
+
+        new_orders = ("allegro_events", "woo_orders")
+        return [
+            job("data_integrity_canary", self.run_data_integrity_canary),
+            job(
+                "allegro_events",
+                lambda: self.run_allegro_events_sync(app),
+                interval=ORDERS_INTERVAL,
+                items=lambda s: s["orders_synced"] + s["orders_cancelled"],
+            ),
+            job(
+                "woo_orders",
+                self.run_woo_orders_sync,
+                interval=ORDERS_INTERVAL,
+                items=lambda s: s.get("imported", 0),
+            ),
+            job(
+                "parcel_tracking",
+                self.run_parcel_tracking_sync,
+                timeout=600.0,
+                items=lambda s: s["updated"],
+            ),
+            job("billing_ledger", self.run_billing_ledger_sync, items=lambda s: s["stored"]),
+            job(
+                "profit_cache",
+                lambda: self.run_profit_cache_refresh(app),
+                depends_on=("allegro_events", "billing_ledger"),
+                items=lambda s: s["updated"],
+            ),
+            job(
+                "allegro_fulfillment",
+                lambda: self.run_allegro_fulfillment_sync(app),
+                depends_on=("allegro_events", "parcel_tracking"),
+                interval=FULFILLMENT_INTERVAL,
+                items=lambda s: s["updated"],
+            ),
+            job("returns", self.run_returns_sync, depends_on=("allegro_events",)),
+            job(
+                "order_rollup_check",
+                self.run_order_rollup_check,
+                interval=ROLLUP_CHECK_INTERVAL,
+                timeout=600.0,
+                items=lambda s: s["mismatches"],
+            ),
+            job(
+                "order_current_status_check",
+                self.run_current_status_check,
+                interval=ROLLUP_CHECK_INTERVAL,
+                items=lambda s: s["drifted"],
+            ),
+            job(
+                "order_search_index",
+                self.run_order_search_index,
+                interval=ROLLUP_CHECK_INTERVAL,
+                timeout=600.0,
+                items=lambda s: s["indexed"],
+            ),
+            job(
+                "invoices",
+                self.run_invoice_processing,
+                depends_on=new_orders,
+                items=lambda s: s["processed"],
+            ),
+            job(
+                "notification_retry",
+                self.run_notification_retry,
+                items=lambda s: s["retried"],
+            ),
+            job(
+                "unpaid_auto_cancel",
+                self.run_unpaid_auto_cancel,
+                depends_on=new_orders,
+                items=lambda s: s["cancelled"],
+            ),
+            job("allegro_ratings_snapshot", self.run_allegro_ratings_snapshot),
+            job(
+                "daily_offer_and_promo",
+                self.run_daily_offer_and_promo_sync,
+                timeout=DAILY_SYNC_TIMEOUT,
+            ),
+        ]
+
+    def executor(self, app: Any, *, max_workers: int = DEFAULT_MAX_WORKERS) -> JobGraphExecutor:
+        return JobGraphExecutor(self.jobs(app), logger=self.logger, max_workers=max_workers)
+
+    def run(self, app: Any) -> dict[str, JobOutcome]:
+        """Jednorazowo wykonaj wszystkie kroki (niezalezne rownolegle)."""
+        return self.executor(app).run()
 
     def run_data_integrity_canary(self) -> None:
         """Wykryj nagly, nienaturalny spadek liczby rekordow w bazie (patrz
@@ -56,7 +165,7 @@ class OrderSyncCycle:
                 "Error in data integrity canary: %s", exc, exc_info=True
             )
 
-    def run_allegro_events_sync(self, app: Any) -> None:
+    def run_allegro_events_sync(self, app: Any) -> dict:
         self.logger.info("Starting Allegro Events sync")
         ev_stats = self.callbacks.sync_from_allegro_events(app)
         self.logger.info(
@@ -64,18 +173,24 @@ class OrderSyncCycle:
             f"synced={ev_stats['orders_synced']}, cancelled={ev_stats['orders_cancelled']}, "
             f"errors={ev_stats['errors']}"
         )
+        if ev_stats["orders_synced"] or ev_stats["orders_cancelled"]:
+            invalidate_stats_cache(TAG_ORDERS)
+        return ev_stats
 
-    def run_woo_orders_sync(self) -> None:
+    def run_woo_orders_sync(self) -> Optional[dict]:
         from .woo_order_sync import sync_woo_orders
 
         self.logger.info("Starting WooCommerce orders sync")
         try:
             stats = sync_woo_orders()
             self.logger.info("WooCommerce orders sync completed: %s", stats)
+            if stats.get("imported"):
+                invalidate_stats_cache(TAG_ORDERS)
+            return stats
         except Exception as exc:
             self.logger.error("WooCommerce orders sync failed: %s", exc, exc_info=True)
 
-    def run_parcel_tracking_sync(self) -> None:
+    def run_parcel_tracking_sync(self) -> dict:
         from ..parcel_tracking import sync_parcel_statuses
 
         self.logger.info("Starting automatic parcel tracking sync")
@@ -84,23 +199,83 @@ class OrderSyncCycle:
             f"Parcel tracking sync completed: checked={stats['checked']}, "
             f"updated={stats['updated']}, errors={stats['errors']}"
         )
+        return stats
+
+    def run_billing_ledger_sync(self) -> Optional[dict]:
+        from .billing_ledger import sync_billing_entries
+
+        self.logger.info("Starting Allegro billing ledger sync")
+        try:
+            stats = sync_billing_entries(log=self.logger)
+            self.logger.info("Allegro billing ledger sync completed: %s", stats)
+            return stats
+        except Exception as exc:
+            self.logger.error("Allegro billing ledger sync failed: %s", exc, exc_info=True)
 
-    def run_profit_cache_refresh(self, app: Any) -> None:
+    def run_profit_cache_refresh(self, app: Any) -> dict:
         self.logger.info("Starting real profit cache refresh")
         profit_stats = self.callbacks.refresh_order_profit_cache(app)
         self.logger.info(
             f"Real profit cache refresh completed: checked={profit_stats['checked']}, "
             f"updated={profit_stats['updated']}, finalized={profit_stats['finalized']}, "
-            f"pending={profit_stats['pending']}, errors={profit_stats['errors']}"
+            f"pending={profit_stats['pending']}, errors={profit_stats['errors']}, "
+            f"due={profit_stats.get('due', 0)}, lag_seconds={profit_stats.get('lag_seconds', 0)}"
         )
+        if profit_stats["updated"] or profit_stats["finalized"]:
+            invalidate_stats_cache(TAG_ORDERS)
+        return profit_stats
+
+    def run_order_rollup_check(self) -> Optional[dict]:
+        """Odbuduj pusty rollup zamowien i napraw rozjazdy z ostatnich dni."""
+        from ..db import get_session
+        from .order_rollup import ensure_order_rollup
+
+        try:
+            with get_session() as db:
+                stats = ensure_order_rollup(db)
+            if stats["rebuilt"] or stats["mismatches"]:
+                self.logger.info("Order rollup check: %s", stats)
+                invalidate_stats_cache(TAG_ORDERS)
+            return stats
+        except Exception as exc:
+            self.logger.error("Order rollup check failed: %s", exc, exc_info=True)
+
+    def run_current_status_check(self) -> Optional[dict]:
+        """Napraw orders.current_status zapisany z pominieciem ORM."""
+        from ..db import get_session
+        from .order_current_status import check_current_status
+
+        try:
+            with get_session() as db:
+                drifts = check_current_status(db, repair=True)
+            if drifts:
+                invalidate_stats_cache(TAG_ORDERS)
+            return {"drifted": len(drifts)}
+        except Exception as exc:
+            self.logger.error("Order current status check failed: %s", exc, exc_info=True)
+
+    def run_order_search_index(self) -> Optional[dict]:
+        """Dopisz brakujace dokumenty indeksu wyszukiwania zamowien."""
+        from ..db import get_session
+        from .order_search import ensure_order_search
+
+        try:
+            with get_session() as db:
+                stats = ensure_order_search(db)
+            if stats["indexed"]:
+                self.logger.info("Order search index: %s", stats)
+            return stats
+        except Exception as exc:
+            self.logger.error("Order search index failed: %s", exc, exc_info=True)
 
-    def run_allegro_fulfillment_sync(self, app: Any) -> None:
+    def run_allegro_fulfillment_sync(self, app: Any) -> dict:
         self.logger.info("Starting Allegro fulfillment sync")
         f_stats = self.callbacks.sync_allegro_fulfillment(app)
         self.logger.info(
             f"Allegro fulfillment sync completed: checked={f_stats['checked']}, "
             f"updated={f_stats['updated']}, errors={f_stats['errors']}"
         )
+        return f_stats
 
     def run_returns_sync(self) -> None:
         from .return_sync import sync_returns
@@ -108,8 +283,10 @@ class OrderSyncCycle:
         self.logger.info("Starting automatic returns sync")
         returns_stats = sync_returns()
         self.logger.info(f"Returns sync completed: {returns_stats}")
+        # Wynik zwrotow nie ma jednego licznika zmian - kasujemy zawsze.
+        invalidate_stats_cache(TAG_RETURNS)
 
-    def run_invoice_processing(self) -> None:
+    def run_invoice_processing(self) -> Optional[dict]:
         try:
             inv_stats = self.callbacks.process_pending_invoices()
             if inv_stats["processed"] > 0:
@@ -117,10 +294,11 @@ class OrderSyncCycle:
                     f"Invoice processing: processed={inv_stats['processed']}, "
                     f"success={inv_stats['success']}, errors={inv_stats['errors']}"
                 )
+            return inv_stats
         except Exception as inv_err:
             self.logger.error(f"Error in invoice processing: {inv_err}", exc_info=True)
 
-    def run_notification_retry(self) -> None:
+    def run_notification_retry(self) -> Optional[dict]:
         try:
             from .notification_retry import retry_pending_allegro_notifications
 
@@ -133,6 +311,7 @@ class OrderSyncCycle:
                     stats["success"],
                     stats["errors"],
                 )
+            return stats
         except Exception as exc:
             self.logger.error("Error in notification retry: %s", exc, exc_info=True)
 
@@ -149,7 +328,7 @@ class OrderSyncCycle:
         except Exception as exc:
             self.logger.warning("Allegro ratings snapshot failed: %s", exc)
 
-    def run_unpaid_auto_cancel(self) -> None:
+    def run_unpaid_auto_cancel(self) -> Optional[dict]:
         try:
             cancel_stats = self.callbacks.cancel_stale_unpaid_orders()
             if cancel_stats["cancelled"] > 0:
@@ -157,6 +336,7 @@ class OrderSyncCycle:
                     f"Unpaid auto-cancel: checked={cancel_stats['checked']}, "
                     f"cancelled={cancel_stats['cancelled']}, errors={cancel_stats['errors']}"
                 )
+            return cancel_stats
         except Exception as cancel_err:
             self.logger.error(f"Error in unpaid auto-cancel: {cancel_err}", exc_info=True)
 
@@ -85,6 +85,8 @@ class AgentConfig:
     api_retry_attempts: int = 3
     api_retry_backoff_initial: float = 1.0
     api_retry_backoff_max: float = 30.0
+    print_transport: str = "lp"
+    print_max_in_flight: int = 4
 
     @classmethod
     def from_settings(cls, cfg: Any) -> "AgentConfig":
@@ -121,6 +123,8 @@ class AgentConfig:
             api_retry_attempts=int(cfg.API_RETRY_ATTEMPTS),
             api_retry_backoff_initial=float(cfg.API_RETRY_BACKOFF_INITIAL),
             api_retry_backoff_max=float(cfg.API_RETRY_BACKOFF_MAX),
+            print_transport=(getattr(cfg, "PRINT_TRANSPORT", "") or "lp").strip().lower(),
+            print_max_in_flight=int(getattr(cfg, "PRINT_MAX_IN_FLIGHT", "") or 4),
         )
 
     def with_updates(self, **kwargs: Any) -> "AgentConfig":
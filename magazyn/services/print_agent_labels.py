@@ -6,13 +6,14 @@ import base64
 import logging
 import time
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from ..domain.order_platform import is_allegro_order
 from .label_barcode_extract import (
     extract_dhl_box_barcodes_from_label_pdf,
     needs_dhl_box_label_barcode_extraction,
 )
+from .label_store import LabelStore
 from .print_agent_errors import ApiError, ShipmentExpiredError
 
 
@@ -42,6 +43,8 @@ class PrintLabelService:
         retry: Callable[..., Any],
         errors_total: Any,
         sleep: Callable[[float], None] = time.sleep,
+        prefetched_labels: Optional[Dict[str, str]] = None,
+        label_store: Optional[LabelStore] = None,
     ):
         self.logger = logger
         self.get_shipment_label = get_shipment_label
@@ -52,12 +55,29 @@ class PrintLabelService:
         self.retry = retry
         self.errors_total = errors_total
         self.sleep = sleep
+        self.prefetched_labels = prefetched_labels if prefetched_labels is not None else {}
+        self.label_store = label_store
 
     def get_label(self, courier_code: str, package_id: str) -> Tuple[str, str]:
-        """Pobierz etykiete przesylki z Allegro Shipment Management API."""
+        """Etykieta przesylki z magazynu etykiet, a gdy jej brak - z Allegro API."""
         if not package_id:
             raise ApiError("Brak ID przesylki do pobrania etykiety")
 
+        if self.label_store is None:
+            return self._download_label(courier_code, package_id)
+        stored = self.label_store.load_base64(package_id)
+        if stored is not None:
+            return stored
+        label_data, extension = self._download_label(courier_code, package_id)
+        self.label_store.put_base64(label_data, extension, keys=[package_id])
+        return label_data, extension
+
+    def _download_label(self, courier_code: str, package_id: str) -> Tuple[str, str]:
+        # Etykieta pobrana juz przez pipeline tworzenia przesylek.
+        prefetched = self.prefetched_labels.pop(package_id, None)
+        if prefetched:
+            return prefetched, "pdf"
+
         try:
             return self._fetch_label_attempt(courier_code, package_id, 1)
         except RuntimeError as exc:
@@ -181,7 +201,10 @@ class PrintLabelService:
             # InPost ShipX (Woo) — etykieta juz w payloadzie
             embedded = package.get("label_pdf_b64")
             if embedded:
-                labels.append((str(embedded), package.get("label_ext") or "pdf"))
+                extension = package.get("label_ext") or "pdf"
+                labels.append((str(embedded), extension))
+                if self.label_store is not None:
+                    self.label_store.put_base64(str(embedded), extension, keys=[str(shipment_id)])
                 continue
 
             label_data, extension = self._fetch_package_label(
@@ -195,6 +218,9 @@ class PrintLabelService:
             if label_data:
                 labels.append((label_data, extension))
 
+        if labels and self.label_store is not None:
+            # Reprint i pobranie etykiety siegaja po ten komplet bez API.
+            self.label_store.assign_order(order_id, package_ids)
         return CollectedLabels(labels, courier_code, package_ids, tracking_numbers)
 
     def _fetch_label_attempt(
@@ -5,6 +5,8 @@ from __future__ import annotations
 from collections.abc import Iterable
 from typing import Any, Callable
 
+from .print_agent_wakeup import print_wakeup
+
 WorkerFactory = Callable[[Any], Any]
 
 
@@ -42,6 +44,9 @@ def stop_agent_thread(agent: Any, *, token_refresher: Any) -> None:
         agent.logger.info("Zatrzymano worker: %s", worker.name)
     agent._workers = []
 
+    # Petla spi na sygnale budzenia - ustaw stop i obudz ja przed join.
+    agent._thread_runtime.stop_event.set()
+    print_wakeup.interrupt()
     agent._thread_runtime.stop(
         stopping_message="Stopping print agent thread...",
         stopped_message="Print agent thread stopped",
@@ -4,12 +4,39 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Tuple, Type
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
 
 from .print_agent_config import is_cod_order
 from .print_agent_errors import ApiError
 from .print_agent_order_data import apply_package_tracking, build_last_order_data
 from .print_agent_status import set_print_error_status
+from .print_agent_storage import (
+    QUEUE_STATUS_PRINTED,
+    QUEUE_STATUS_PRINTING,
+    QUEUE_STATUS_QUEUED,
+)
+
+
+def _payment_state(order: Dict[str, Any]) -> Tuple[float, bool]:
+    payment_done = float(order.get("payment_done") or 0)
+    is_cod = is_cod_order(
+        order.get("payment_method_cod", "0"),
+        order.get("payment_method", ""),
+    )
+    return payment_done, is_cod
+
+
+def awaits_label(
+    order: Dict[str, Any],
+    queue: List[Dict[str, Any]],
+    printed: Dict[str, Any],
+) -> bool:
+    """Czy iteracja agenta bedzie dla zamowienia tworzyc/pobierac etykiete."""
+    order_id = str(order["order_id"])
+    if order_id in printed or any(item["order_id"] == order_id for item in queue):
+        return False
+    payment_done, is_cod = _payment_state(order)
+    return is_cod or payment_done > 0
 
 
 class PrintOrderProcessor:
@@ -36,6 +63,7 @@ class PrintOrderProcessor:
         errors_total: Any,
         print_error_type: Type[Exception],
         now: Callable[[], datetime],
+        print_labels: Optional[Callable[[List[Tuple[str, str]], List[str]], None]] = None,
     ):
         self.logger = logger
         self.set_last_order_data = set_last_order_data
@@ -55,6 +83,7 @@ class PrintOrderProcessor:
         self.errors_total = errors_total
         self.print_error_type = print_error_type
         self.now = now
+        self.print_labels = print_labels
 
     def process(
         self,
@@ -104,11 +133,7 @@ class PrintOrderProcessor:
         if order_id in queued_order_ids:
             return True
 
-        payment_done = float(order.get("payment_done") or 0)
-        is_cod = is_cod_order(
-            order.get("payment_method_cod", "0"),
-            order.get("payment_method", ""),
-        )
+        payment_done, is_cod = _payment_state(order)
         if not is_cod and payment_done <= 0:
             self.logger.info(
                 "Pomijam %s - nieoplacone (payment_done=%.2f, cod=%s)",
@@ -158,7 +183,9 @@ class PrintOrderProcessor:
     ) -> None:
         for label_data, extension in labels:
             queue.append(
-                self._queue_entry(order_id, label_data, extension, last_order_data, "queued")
+                self._queue_entry(
+                    order_id, label_data, extension, last_order_data, QUEUE_STATUS_QUEUED
+                )
             )
         self.notify_messenger(last_order_data, True)
         self.mark_as_printed(order_id, last_order_data)
@@ -173,7 +200,9 @@ class PrintOrderProcessor:
         printed: Dict[str, Any],
     ) -> None:
         entries = [
-            self._queue_entry(order_id, label_data, extension, last_order_data, "in_progress")
+            self._queue_entry(
+                order_id, label_data, extension, last_order_data, QUEUE_STATUS_PRINTING
+            )
             for label_data, extension in labels
         ]
         queue.extend(entries)
@@ -181,19 +210,12 @@ class PrintOrderProcessor:
 
         print_success = True
         try:
-            for entry in entries:
-                self.retry(
-                    self.print_label,
-                    entry["label_data"],
-                    entry.get("ext", "pdf"),
-                    entry["order_id"],
-                    stage="print",
-                    retry_exceptions=(self.print_error_type,),
-                )
+            self._print_entries(order_id, entries)
             self.consume_order_stock(last_order_data.get("products", []), order_id=order_id)
             self.mark_as_printed(order_id, last_order_data)
             printed[order_id] = self.now()
             for entry in entries:
+                entry["status"] = QUEUE_STATUS_PRINTED
                 if entry in queue:
                     queue.remove(entry)
         except Exception as exc:
@@ -201,13 +223,34 @@ class PrintOrderProcessor:
             print_success = False
             set_print_error_status(order_id, f"Blad drukowania: {exc}", self.logger)
             for entry in entries:
-                entry["status"] = "queued"
+                entry["status"] = QUEUE_STATUS_QUEUED
             self.save_queue(queue)
             self.logger.info("Retry za 60s dla %s", order_id)
             self.wait(60)
 
         self.notify_messenger(last_order_data, print_success)
 
+    def _print_entries(self, order_id: str, entries: List[Dict[str, Any]]) -> None:
+        if self.print_labels is not None and len(entries) > 1:
+            # Etykiety wielopaczkowego zamowienia jednym zleceniem druku.
+            self.retry(
+                self.print_labels,
+                [(entry["label_data"], entry.get("ext", "pdf")) for entry in entries],
+                [order_id],
+                stage="print",
+                retry_exceptions=(self.print_error_type,),
+            )
+            return
+        for entry in entries:
+            self.retry(
+                self.print_label,
+                entry["label_data"],
+                entry.get("ext", "pdf"),
+                entry["order_id"],
+                stage="print",
+                retry_exceptions=(self.print_error_type,),
+            )
+
     def _handle_missing_labels(self, order_id: str) -> None:
         self.logger.error(
             "Brak etykiety dla zamowienia %s (Allegro nie zwrocilo danych)",
@@ -247,4 +290,4 @@ class PrintOrderProcessor:
         }
 
 
-__all__ = ["PrintOrderProcessor"]
\ No newline at end of file
+__all__ = ["PrintOrderProcessor", "awaits_label"]
\ No newline at end of file
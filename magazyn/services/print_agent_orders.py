@@ -6,7 +6,8 @@ import logging
 from datetime import datetime, timedelta
 from typing import Any, Callable, Dict, List, Optional
 
-from sqlalchemy import desc, func
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload
 
 from ..db import get_session
 from ..domain.order_platform import is_allegro_order, is_manual_order, is_woo_order
@@ -27,8 +28,40 @@ def collect_printable_orders(
     week_ago = int((now() - timedelta(days=days)).timestamp())
     orders: List[Dict[str, Any]] = []
 
+    # Liczba blad_druku per zamowienie jako podzapytanie grupujace - kandydaci,
+    # licznik bledow i pozycje przychodza jednym zapytaniem.
+    print_errors = (
+        select(OrderStatusLog.order_id, func.count(OrderStatusLog.id).label("count"))
+        .where(OrderStatusLog.status == "blad_druku")
+        .group_by(OrderStatusLog.order_id)
+        .subquery()
+    )
+
     with get_session() as db:
-        recent_orders = db.query(Order).filter(Order.date_add >= week_ago).all()
+        # Brak historii statusow traktujemy jak "pobrano".
+        recent_orders = (
+            db.query(Order)
+            .outerjoin(print_errors, print_errors.c.order_id == Order.order_id)
+            .options(joinedload(Order.products))
+            .filter(
+                Order.date_add >= week_ago,
+                or_(
+                    Order.current_status.in_(("pobrano", "blad_druku")),
+                    Order.current_status.is_(None),
+                ),
+                # Reczna etykieta / juz nadana paczka - nie tworzyc kolejnej.
+                or_(Order.delivery_package_nr.is_(None), Order.delivery_package_nr == ""),
+                # Limit ponowien tylko dla blad_druku - zamowienie recznie
+                # przywrocone do "pobrano" drukujemy mimo wczesniejszych bledow.
+                or_(
+                    Order.current_status.is_(None),
+                    Order.current_status != "blad_druku",
+                    func.coalesce(print_errors.c.count, 0) < max_print_error_retries,
+                ),
+            )
+            .order_by(Order.date_add, Order.order_id)
+            .all()
+        )
 
         for order in recent_orders:
             if is_manual_order(order):
@@ -37,32 +70,6 @@ def collect_printable_orders(
             if not (is_allegro_order(order) or is_woo_order(order)):
                 continue
 
-            # Reczna etykieta / juz nadana paczka — nie tworzyc kolejnej.
-            if order.delivery_package_nr:
-                continue
-
-            latest = (
-                db.query(OrderStatusLog)
-                .filter(OrderStatusLog.order_id == order.order_id)
-                .order_by(desc(OrderStatusLog.timestamp))
-                .first()
-            )
-            current_status = latest.status if latest else "pobrano"
-
-            if current_status == "blad_druku":
-                error_count = (
-                    db.query(func.count(OrderStatusLog.id))
-                    .filter(
-                        OrderStatusLog.order_id == order.order_id,
-                        OrderStatusLog.status == "blad_druku",
-                    )
-                    .scalar()
-                ) or 0
-                if error_count >= max_print_error_retries:
-                    continue
-            elif current_status != "pobrano":
-                continue
-
             orders.append(_build_order_payload(order))
 
     active_logger.debug("Znaleziono %d zamowien do druku", len(orders))
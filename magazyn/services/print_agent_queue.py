@@ -4,11 +4,27 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Any, Callable, Dict, List, Type
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from .print_agent_storage import (
+    QUEUE_STATUS_FAILED,
+    QUEUE_STATUS_PRINTED,
+    QUEUE_STATUS_PRINTING,
+    QUEUE_STATUS_QUEUED,
+)
+
+# Najwiecej etykiet w jednym scalonym zleceniu druku.
+MERGE_LABEL_LIMIT = 20
 
 
 class PrintQueueProcessor:
-    """Drukuje zalegle etykiety zapisane w kolejce."""
+    """Drukuje zalegle etykiety zapisane w kolejce.
+
+    Z ``print_labels`` etykiety kolejnych zamowien ida wspolnymi zleceniami
+    (do ``merge_limit`` etykiet); blad zlecenia wraca wszystkie jego
+    zamowienia do kolejki. Etykiety sa wczesniej sprawdzane
+    (``validate_label``) osobno - uszkodzona obciaza tylko swoje zamowienie.
+    """
 
     def __init__(
         self,
@@ -25,6 +41,9 @@ class PrintQueueProcessor:
         errors_total: Any,
         now: Callable[[], datetime],
         max_queue_retries: int = 10,
+        print_labels: Optional[Callable[[List[Tuple[str, str]], List[str]], None]] = None,
+        merge_limit: int = MERGE_LABEL_LIMIT,
+        validate_label: Optional[Callable[[str, str], None]] = None,
     ):
         self.logger = logger
         self.is_quiet_time = is_quiet_time
@@ -38,6 +57,9 @@ class PrintQueueProcessor:
         self.errors_total = errors_total
         self.now = now
         self.max_queue_retries = max_queue_retries
+        self.print_labels = print_labels
+        self.merge_limit = merge_limit
+        self.validate_label = validate_label
 
     def process(
         self,
@@ -48,32 +70,82 @@ class PrintQueueProcessor:
             return queue
 
         grouped = self._group_by_order(queue)
+        ready = [
+            (order_id, items)
+            for order_id, items in grouped.items()
+            if not self._is_retry_limit_reached(order_id, items)
+        ]
         new_queue: List[Dict[str, Any]] = []
-        for order_id, items in grouped.items():
-            if self._is_retry_limit_reached(order_id, items):
-                continue
-
-            retry_count = items[0].get("retry_count", 0)
+        ready = [entry for entry in ready if self._labels_valid(entry[1], new_queue)]
+        for batch in self._batches(ready):
             try:
-                self._print_items(queue, items)
-                last_order_data = items[0].get("last_order_data", {})
-                self.consume_order_stock(last_order_data.get("products", []), order_id=order_id)
-                self.mark_as_printed(order_id, last_order_data)
-                printed[order_id] = self.now()
-                self.notify_messenger(last_order_data, True)
+                self._print_batch(queue, batch)
             except Exception as exc:
-                self.logger.error(
-                    "Blad przetwarzania z kolejki (proba %d/%d): %s",
-                    retry_count + 1,
-                    self.max_queue_retries,
-                    exc,
-                )
-                self._restore_items_for_retry(items, retry_count + 1)
-                new_queue.extend(items)
-                self.errors_total.labels(stage="queue").inc()
+                for _, items in batch:
+                    self._handle_failure(items, exc, new_queue)
+                continue
+            for order_id, items in batch:
+                try:
+                    self._set_status(items, QUEUE_STATUS_PRINTED)
+                    last_order_data = items[0].get("last_order_data", {})
+                    self.consume_order_stock(last_order_data.get("products", []), order_id=order_id)
+                    self.mark_as_printed(order_id, last_order_data)
+                    printed[order_id] = self.now()
+                    self.notify_messenger(last_order_data, True)
+                except Exception as exc:
+                    self._handle_failure(items, exc, new_queue)
 
         return new_queue
 
+    def _labels_valid(
+        self,
+        items: List[Dict[str, Any]],
+        new_queue: List[Dict[str, Any]],
+    ) -> bool:
+        if self.print_labels is None or self.validate_label is None:
+            return True
+        try:
+            for item in items:
+                self.validate_label(item["label_data"], item.get("ext", "pdf"))
+        except Exception as exc:
+            self._handle_failure(items, exc, new_queue)
+            return False
+        return True
+
+    def _batches(
+        self,
+        ready: List[Tuple[str, List[Dict[str, Any]]]],
+    ) -> List[List[Tuple[str, List[Dict[str, Any]]]]]:
+        """Zamowienia laczone w jedno zlecenie druku, do ``merge_limit`` etykiet."""
+        if self.print_labels is None:
+            return [[entry] for entry in ready]
+        batches: List[List[Tuple[str, List[Dict[str, Any]]]]] = []
+        size = self.merge_limit
+        for entry in ready:
+            if size + len(entry[1]) > self.merge_limit:
+                batches.append([])
+                size = 0
+            batches[-1].append(entry)
+            size += len(entry[1])
+        return batches
+
+    def _handle_failure(
+        self,
+        items: List[Dict[str, Any]],
+        exc: Exception,
+        new_queue: List[Dict[str, Any]],
+    ) -> None:
+        retry_count = items[0].get("retry_count", 0)
+        self.logger.error(
+            "Blad przetwarzania z kolejki (proba %d/%d): %s",
+            retry_count + 1,
+            self.max_queue_retries,
+            exc,
+        )
+        self._restore_items_for_retry(items, retry_count + 1)
+        new_queue.extend(items)
+        self.errors_total.labels(stage="queue").inc()
+
     def _group_by_order(
         self,
         queue: List[Dict[str, Any]],
@@ -97,20 +169,31 @@ class PrintQueueProcessor:
             order_id,
             self.max_queue_retries,
         )
+        self._set_status(items, QUEUE_STATUS_FAILED)
         last_order_data = items[0].get("last_order_data")
         self.mark_as_printed(order_id, last_order_data)
         self.notify_messenger(items[0].get("last_order_data", {}), False)
         return True
 
-    def _print_items(
+    def _print_batch(
         self,
         queue: List[Dict[str, Any]],
-        items: List[Dict[str, Any]],
+        batch: List[Tuple[str, List[Dict[str, Any]]]],
     ) -> None:
-        for item in items:
-            item["status"] = "in_progress"
+        items = [item for _, order_items in batch for item in order_items]
+        self._set_status(items, QUEUE_STATUS_PRINTING)
         self.save_queue(queue)
 
+        if self.print_labels is not None:
+            self.retry(
+                self.print_labels,
+                [(item["label_data"], item.get("ext", "pdf")) for item in items],
+                [order_id for order_id, _ in batch],
+                stage="print",
+                retry_exceptions=(self.print_error_type,),
+            )
+            return
+
         for item in items:
             self.retry(
                 self.print_label,
@@ -127,8 +210,13 @@ class PrintQueueProcessor:
         retry_count: int,
     ) -> None:
         for item in items:
-            item["status"] = "queued"
+            item["status"] = QUEUE_STATUS_QUEUED
             item["retry_count"] = retry_count
 
+    @staticmethod
+    def _set_status(items: List[Dict[str, Any]], status: str) -> None:
+        for item in items:
+            item["status"] = status
+
 
 __all__ = ["PrintQueueProcessor"]
\ No newline at end of file
@@ -64,40 +64,32 @@ class PrintAgentReportService:
         if end_date is None:
             end_date = datetime.now()
 
-        start_date = end_date - timedelta(days=days)
-        start_ts = int(
-            start_date.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
-        )
-        end_ts = int(
-            end_date.replace(hour=23, minute=59, second=59, microsecond=999999).timestamp()
-        )
+        start_day = (end_date - timedelta(days=days)).date()
+        end_day = end_date.date()
 
         try:
             from ..db import get_session
             from ..domain.financial import FinancialCalculator
             from ..settings_store import settings_store
+            from .order_rollup import summarize_period
 
-            access_token = settings_store.get("ALLEGRO_ACCESS_TOKEN")
             with get_session() as db:
                 calculator = FinancialCalculator(db, settings_store)
-                summary = calculator.get_period_summary(
-                    start_ts,
-                    end_ts,
-                    include_fixed_costs=include_fixed_costs,
-                    access_token=access_token,
-                )
+                # Pelne dni z dziennego rollupu; kalkulator liczy tylko
+                # zamowienia bez zapisanego zysku.
+                summary = summarize_period(db, calculator, start_day, end_day)
 
                 result = {
                     "products_sold": summary.products_sold,
                     "total_revenue": float(summary.total_revenue),
-                    "real_profit": float(
-                        summary.net_profit if include_fixed_costs else summary.gross_profit
-                    ),
+                    "real_profit": float(summary.gross_profit),
                 }
                 if include_fixed_costs:
+                    fixed_costs, fixed_costs_list = calculator.get_fixed_costs()
+                    result["real_profit"] = float(summary.gross_profit - fixed_costs)
                     result["profit_before_fixed"] = float(summary.gross_profit)
-                    result["fixed_costs"] = float(summary.fixed_costs)
-                    result["fixed_costs_list"] = summary.fixed_costs_list
+                    result["fixed_costs"] = float(fixed_costs)
+                    result["fixed_costs_list"] = fixed_costs_list
                 return result
         except Exception as exc:
             self.logger.error("Blad pobierania podsumowania sprzedazy: %s", exc)
@@ -1,10 +1,20 @@
-"""Tworzenie przesylek Allegro Shipment Management dla agenta drukowania."""
+"""Tworzenie przesylek Allegro Shipment Management dla agenta drukowania.
+
+Wyslana komenda utworzenia jest zapisywana w stanie agenta
+(``sm_command:<order_id>``) zaraz po jej przyjeciu i czyszczona dopiero po
+zapisaniu ``sm_shipment:<order_id>`` - przerwane oczekiwanie (timeout, blad
+bazy, zatrzymanie agenta) konczy sie dopytaniem o te sama komende, a nie
+druga, platna przesylka.
+"""
 
 from __future__ import annotations
 
 import logging
+import time
+from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional
 
+from ..metrics import PRINT_SHIPMENT_STAGE_SECONDS
 from .print_agent_shipments import (
     build_additional_services,
     build_cod_payload,
@@ -18,6 +28,20 @@ from .shipment_waybills import extract_waybills_from_shipment_details
 SKIP_MANUAL_TRACKING_CARRIER_IDS = frozenset({"ALLEGRO"})
 
 
+def command_state_key(order_id: str) -> str:
+    return f"sm_command:{order_id}"
+
+
+@dataclass
+class PendingShipment:
+    """Wyslana komenda utworzenia przesylki czekajaca na shipmentId."""
+
+    order_id: str
+    checkout_form_id: str
+    carrier_id: Optional[str]
+    command_id: str
+
+
 class PrintShipmentCreator:
     """Buduje payload i tworzy shipment w Allegro Shipment Management."""
 
@@ -35,6 +59,7 @@ class PrintShipmentCreator:
         add_shipment_tracking: Callable[..., Any],
         update_fulfillment_status: Callable[[str, str], Any],
         save_state_value: Callable[[str, Optional[str]], None],
+        load_state_value: Optional[Callable[[str], Optional[str]]] = None,
     ):
         self.logger = logger
         self.settings_store = settings_store
@@ -47,6 +72,7 @@ class PrintShipmentCreator:
         self.add_shipment_tracking = add_shipment_tracking
         self.update_fulfillment_status = update_fulfillment_status
         self.save_state_value = save_state_value
+        self.load_state_value = load_state_value
 
     def create(
         self,
@@ -54,10 +80,82 @@ class PrintShipmentCreator:
         checkout_form_id: str,
         order_data: Dict[str, Any],
     ) -> List[Dict[str, Any]]:
+        pending = self.stored_command(order_id, checkout_form_id, order_data or {})
+        if pending is None:
+            pending = self.submit(order_id, checkout_form_id, order_data)
+        if pending is None:
+            return []
+        try:
+            started = time.monotonic()
+            creation_result = self.wait_for_shipment_creation(pending.command_id)
+            PRINT_SHIPMENT_STAGE_SECONDS.labels(stage="confirm").observe(time.monotonic() - started)
+        except RuntimeError as exc:
+            # Allegro odrzucilo komende - nastepna proba moze wyslac nowa.
+            self._log_creation_error(order_id, exc)
+            self.forget_command(order_id)
+            return []
+        except Exception as exc:
+            # Timeout albo blad sieci: komenda zostaje w stanie do dopytania.
+            self._log_creation_error(order_id, exc)
+            return []
+        try:
+            return self.complete(pending, creation_result.get("shipmentId"))
+        except Exception as exc:
+            self._log_creation_error(order_id, exc)
+            return []
+
+    def stored_command(
+        self,
+        order_id: str,
+        checkout_form_id: str,
+        order_data: Dict[str, Any],
+    ) -> Optional[PendingShipment]:
+        """Komenda wyslana wczesniej, a niepotwierdzona - do wznowienia zamiast nowej."""
+        if self.load_state_value is None:
+            return None
+        command_id = self.load_state_value(command_state_key(order_id))
+        if not command_id:
+            return None
+        delivery_method = order_data.get("delivery_method") or order_data.get("shipping") or ""
+        self.logger.info(
+            "Wznawiam niepotwierdzona komende %s dla zamowienia %s",
+            command_id,
+            order_id,
+        )
+        return PendingShipment(
+            order_id,
+            checkout_form_id,
+            self.resolve_carrier_id(delivery_method),
+            command_id,
+        )
+
+    def forget_command(self, order_id: str) -> None:
+        self.remember_command(order_id, None)
+
+    def remember_command(self, order_id: str, command_id: Optional[str]) -> None:
+        """Zapisz (albo wyczysc) komende zamowienia; blad zapisu tylko logujemy."""
+        try:
+            self.save_state_value(command_state_key(order_id), command_id)
+        except Exception as exc:
+            self.logger.error(
+                "Nie zapisano komendy przesylki %s dla zamowienia %s: %s",
+                command_id,
+                order_id,
+                exc,
+            )
+
+    def submit(
+        self,
+        order_id: str,
+        checkout_form_id: str,
+        order_data: Dict[str, Any],
+    ) -> Optional[PendingShipment]:
+        """Wyslij komende utworzenia przesylki bez czekania na jej wynik."""
         if not order_data or order_data.get("order_id") != order_id:
             self.logger.error("Brak danych zamowienia %s do utworzenia przesylki", order_id)
-            return []
+            return None
 
+        started = time.monotonic()
         delivery_method = order_data.get("delivery_method", "") or order_data.get("shipping", "")
         delivery_method_id, delivery_method = self._resolve_delivery_method(
             order_id,
@@ -70,21 +168,70 @@ class PrintShipmentCreator:
                 delivery_method,
                 order_id,
             )
-            return []
+            return None
 
         carrier_id = self.resolve_carrier_id(delivery_method)
         try:
-            return self._create_shipment_payload(
-                order_id,
-                checkout_form_id,
-                order_data,
-                delivery_method_id,
-                carrier_id,
+            packages, reference_number = build_packages(order_data.get("products", []))
+            command_result = self.create_shipment(
+                delivery_method_id=delivery_method_id,
+                sender=build_sender(self.settings_store),
+                receiver=build_receiver(order_data),
+                packages=packages,
+                cash_on_delivery=build_cod_payload(order_data),
+                reference_number=reference_number,
+                additional_services=build_additional_services(carrier_id),
             )
         except Exception as exc:
             self._log_creation_error(order_id, exc)
+            return None
+        PRINT_SHIPMENT_STAGE_SECONDS.labels(stage="submit").observe(time.monotonic() - started)
+
+        command_id = command_result.get("commandId")
+        if not command_id:
+            self.logger.error("Brak commandId w odpowiedzi create_shipment")
+            return None
+        self.remember_command(order_id, command_id)
+        return PendingShipment(order_id, checkout_form_id, carrier_id, command_id)
+
+    def complete(self, pending: PendingShipment, shipment_id: Optional[str]) -> List[Dict[str, Any]]:
+        """Dokoncz utworzona przesylke: waybill, tracking, fulfillment i mapping zamowienia."""
+        order_id = pending.order_id
+        if not shipment_id:
+            self.logger.error("Brak shipmentId po utworzeniu (commandId=%s)", pending.command_id)
+            self.forget_command(order_id)
             return []
 
+        started = time.monotonic()
+        carrier_id = pending.carrier_id
+        waybill, waybills = self._load_waybills(shipment_id)
+        self._sync_tracking_and_fulfillment(
+            pending.checkout_form_id,
+            order_id,
+            carrier_id,
+            waybill,
+        )
+        self.save_state_value(f"sm_shipment:{order_id}", shipment_id)
+        self.forget_command(order_id)
+        PRINT_SHIPMENT_STAGE_SECONDS.labels(stage="complete").observe(time.monotonic() - started)
+
+        self.logger.info(
+            "Utworzono przesylke %s (waybill: %s) dla zamowienia %s",
+            shipment_id,
+            waybill,
+            order_id,
+        )
+        return [
+            {
+                "shipment_id": shipment_id,
+                "waybill": waybill,
+                "waybills": waybills,
+                "carrier_id": carrier_id or "",
+                "courier_code": carrier_id or "",
+                "courier_package_nr": waybill,
+            }
+        ]
+
     def _resolve_delivery_method(
         self,
         order_id: str,
@@ -123,61 +270,6 @@ class PrintShipmentCreator:
         )
         return self.resolve_delivery_service_id(delivery_method), delivery_method
 
-    def _create_shipment_payload(
-        self,
-        order_id: str,
-        checkout_form_id: str,
-        order_data: Dict[str, Any],
-        delivery_method_id: str,
-        carrier_id: Optional[str],
-    ) -> List[Dict[str, Any]]:
-        packages, reference_number = build_packages(order_data.get("products", []))
-        command_result = self.create_shipment(
-            delivery_method_id=delivery_method_id,
-            sender=build_sender(self.settings_store),
-            receiver=build_receiver(order_data),
-            packages=packages,
-            cash_on_delivery=build_cod_payload(order_data),
-            reference_number=reference_number,
-            additional_services=build_additional_services(carrier_id),
-        )
-        command_id = command_result.get("commandId")
-        if not command_id:
-            self.logger.error("Brak commandId w odpowiedzi create_shipment")
-            return []
-
-        creation_result = self.wait_for_shipment_creation(command_id)
-        shipment_id = creation_result.get("shipmentId")
-        if not shipment_id:
-            self.logger.error("Brak shipmentId po utworzeniu (commandId=%s)", command_id)
-            return []
-
-        waybill, waybills = self._load_waybills(shipment_id)
-        self._sync_tracking_and_fulfillment(
-            checkout_form_id,
-            order_id,
-            carrier_id,
-            waybill,
-        )
-        self.save_state_value(f"sm_shipment:{order_id}", shipment_id)
-
-        self.logger.info(
-            "Utworzono przesylke %s (waybill: %s) dla zamowienia %s",
-            shipment_id,
-            waybill,
-            order_id,
-        )
-        return [
-            {
-                "shipment_id": shipment_id,
-                "waybill": waybill,
-                "waybills": waybills,
-                "carrier_id": carrier_id or "",
-                "courier_code": carrier_id or "",
-                "courier_package_nr": waybill,
-            }
-        ]
-
     def _load_waybills(self, shipment_id: str) -> tuple[str, list[str]]:
         try:
             details = self.get_shipment_details(shipment_id)
@@ -253,4 +345,4 @@ class PrintShipmentCreator:
             self.logger.error("  SM API response body: %s", response.text[:500])
 
 
-__all__ = ["PrintShipmentCreator"]
\ No newline at end of file
+__all__ = ["PendingShipment", "PrintShipmentCreator", "command_state_key"]
\ No newline at end of file
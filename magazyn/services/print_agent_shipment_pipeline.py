@@ -0,0 +1,228 @@
+"""Rownolegle tworzenie przesylek Allegro dla zamowien czekajacych na etykiete.
+
+Sciezka pojedynczego zamowienia (``PrintShipmentCreator.create``) czeka na
+potwierdzenie swojej komendy, zanim agent przejdzie do nastepnego - poranna
+zaleglosc to suma tych oczekiwan. Pipeline wysyla komendy wszystkich
+zamowien na ograniczonej puli watkow, sprawdza statusy wszystkich
+oczekujacych komend w jednym takcie co ``poll_interval`` i zaraz po
+potwierdzeniu dokancza przesylke oraz pobiera etykiete. Petla agenta bierze
+gotowe przesylki i etykiety z ``PreparedShipments`` zamiast tworzyc je przy
+kazdym zamowieniu.
+
+Komenda jest zapisywana w stanie agenta (``sm_command:<order_id>``) zaraz
+po wyslaniu; bez wyniku po ``timeout`` albo po zatrzymaniu agenta zostaje
+tam, a kolejna iteracja dopytuje o nia zamiast tworzyc druga przesylke.
+Blad jednego zamowienia (takze bazy stanu) nie przerywa pozostalych.
+"""
+
+from __future__ import annotations
+
+import base64
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from ..domain.order_platform import is_allegro_order
+from ..metrics import PRINT_SHIPMENT_STAGE_SECONDS
+from .print_agent_order_data import build_last_order_data
+from .print_agent_shipment_creation import (
+    PendingShipment,
+    PrintShipmentCreator,
+    command_state_key,
+)
+
+SHIPMENT_PIPELINE_WORKERS = 8
+CONFIRM_POLL_INTERVAL = 2.0
+CONFIRM_TIMEOUT = 60.0
+
+
+@dataclass
+class PreparedShipments:
+    """Wynik pipeline'u: przesylki zamowien i pobrane etykiety (base64 PDF).
+
+    Pusta lista przesylek oznacza blad tworzenia, ``deferred`` - komende
+    niepotwierdzona w czasie; petla agenta nie tworzy dla nich przesylki.
+    """
+
+    packages: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    labels: Dict[str, str] = field(default_factory=dict)
+    deferred: Set[str] = field(default_factory=set)
+
+
+class ShipmentPipeline:
+    """Tworzy przesylki wielu zamowien naraz i pobiera etykiety potwierdzonych."""
+
+    def __init__(
+        self,
+        *,
+        logger: logging.Logger,
+        creator: PrintShipmentCreator,
+        get_create_command_status: Callable[[str], Dict[str, Any]],
+        get_shipment_label: Callable[..., bytes],
+        load_state_value: Callable[[str], Optional[str]],
+        wait: Callable[[float], Any],
+        workers: int = SHIPMENT_PIPELINE_WORKERS,
+        poll_interval: float = CONFIRM_POLL_INTERVAL,
+        timeout: float = CONFIRM_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.logger = logger
+        self.creator = creator
+        self.get_create_command_status = get_create_command_status
+        self.get_shipment_label = get_shipment_label
+        self.load_state_value = load_state_value
+        self.wait = wait
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.clock = clock
+
+    def run(self, orders: List[Dict[str, Any]]) -> PreparedShipments:
+        prepared = PreparedShipments()
+        if not orders:
+            return prepared
+
+        self.logger.info("Tworze przesylki dla %d zamowien rownolegle", len(orders))
+        with ThreadPoolExecutor(
+            max_workers=min(self.workers, len(orders)),
+            thread_name_prefix="shipment-pipeline",
+        ) as pool:
+            pending = []
+            for order, submitted in zip(orders, pool.map(self._submit, orders)):
+                if submitted is None:
+                    # Blad juz zalogowany - petla agenta nie ponawia go w tej iteracji.
+                    prepared.packages[str(order["order_id"])] = []
+                else:
+                    pending.append(submitted)
+            completions = self._confirm(pool, pending, prepared)
+            for pending_shipment, future in completions:
+                try:
+                    packages, label = future.result()
+                except Exception as exc:
+                    self.logger.error(
+                        "Blad dokonczenia przesylki dla zamowienia %s: %s",
+                        pending_shipment.order_id,
+                        exc,
+                    )
+                    packages, label = [], ""
+                prepared.packages[pending_shipment.order_id] = packages
+                if label:
+                    prepared.labels[packages[0]["shipment_id"]] = label
+        return prepared
+
+    def _submit(self, order: Dict[str, Any]) -> Optional[tuple[PendingShipment, float]]:
+        order_id = str(order["order_id"])
+        checkout_form_id = order_id[len("allegro_"):] if is_allegro_order(order_id) else order_id
+        started = self.clock()
+        try:
+            stored_command_id = self.load_state_value(command_state_key(order_id))
+            if stored_command_id:
+                delivery_method = order.get("delivery_method") or order.get("shipping") or ""
+                carrier_id = self.creator.resolve_carrier_id(delivery_method)
+                return PendingShipment(order_id, checkout_form_id, carrier_id, stored_command_id), started
+
+            # Creator zapisuje sm_command zaraz po przyjeciu komendy przez Allegro.
+            pending = self.creator.submit(order_id, checkout_form_id, build_last_order_data(order))
+        except Exception as exc:
+            self.logger.error("Blad wysylania komendy przesylki dla zamowienia %s: %s", order_id, exc)
+            return None
+        return (pending, started) if pending is not None else None
+
+    def _confirm(
+        self,
+        pool: ThreadPoolExecutor,
+        pending: List[tuple[PendingShipment, float]],
+        prepared: PreparedShipments,
+    ) -> List[tuple[PendingShipment, Future]]:
+        """Jeden takt sprawdza wszystkie oczekujace komendy; potwierdzone od razu dokancza."""
+        completions: List[tuple[PendingShipment, Future]] = []
+        deadline = self.clock() + self.timeout
+        while pending:
+            results = list(pool.map(self._command_status, [item for item, _ in pending]))
+            waiting = []
+            for (item, started), result in zip(pending, results):
+                status = result.get("status", "")
+                if status == "SUCCESS":
+                    PRINT_SHIPMENT_STAGE_SECONDS.labels(stage="confirm").observe(self.clock() - started)
+                    # sm_command czysci complete() dopiero po zapisaniu sm_shipment.
+                    completions.append((item, pool.submit(self._complete, item, result.get("shipmentId"))))
+                elif status == "ERROR":
+                    errors = "; ".join(
+                        error.get("message", str(error)) for error in result.get("errors") or []
+                    )
+                    self.logger.error(
+                        "Blad tworzenia przesylki dla zamowienia %s (commandId=%s): %s",
+                        item.order_id,
+                        item.command_id,
+                        errors or "Nieznany blad",
+                    )
+                    self.creator.forget_command(item.order_id)
+                    prepared.packages[item.order_id] = []
+                else:
+                    waiting.append((item, started))
+            pending = waiting
+            if not pending:
+                break
+            if self.clock() >= deadline:
+                self._defer(pending, prepared, f"niepotwierdzona po {self.timeout:.0f}s")
+                break
+            if self.wait(self.poll_interval):
+                # Zatrzymanie agenta - nie odpytuj dalej bez przerwy do terminu.
+                self._defer(pending, prepared, "agent zatrzymany")
+                break
+        return completions
+
+    def _defer(
+        self,
+        pending: List[tuple[PendingShipment, float]],
+        prepared: PreparedShipments,
+        reason: str,
+    ) -> None:
+        for item, _ in pending:
+            self.logger.warning(
+                "Przesylka zamowienia %s %s (commandId=%s) - sprawdze w nastepnej iteracji",
+                item.order_id,
+                reason,
+                item.command_id,
+            )
+            self.creator.remember_command(item.order_id, item.command_id)
+            prepared.deferred.add(item.order_id)
+
+    def _command_status(self, pending: PendingShipment) -> Dict[str, Any]:
+        try:
+            return self.get_create_command_status(pending.command_id)
+        except Exception as exc:
+            self.logger.warning(
+                "Blad sprawdzania komendy %s (zamowienie %s): %s",
+                pending.command_id,
+                pending.order_id,
+                exc,
+            )
+            return {}
+
+    def _complete(self, pending: PendingShipment, shipment_id: Optional[str]) -> tuple[List[Dict[str, Any]], str]:
+        packages = self.creator.complete(pending, shipment_id)
+        if not packages:
+            return packages, ""
+        started = self.clock()
+        try:
+            label_bytes = self.get_shipment_label(
+                [packages[0]["shipment_id"]],
+                page_size="A6",
+                cut_line=False,
+            )
+        except Exception as exc:
+            # Etykieta jeszcze niegotowa - petla agenta pobierze ja zwyklym trybem.
+            self.logger.info("Etykieta %s niepobrana w pipeline: %s", packages[0]["shipment_id"], exc)
+            return packages, ""
+        PRINT_SHIPMENT_STAGE_SECONDS.labels(stage="label").observe(self.clock() - started)
+        return packages, base64.b64encode(label_bytes).decode("ascii")
+
+
+__all__ = [
+    "PreparedShipments",
+    "ShipmentPipeline",
+    "command_state_key",
+]
@@ -2,18 +2,68 @@
 
 from __future__ import annotations
 
+import base64
+import binascii
 import json
 import logging
+import os
+import socket
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Any, Callable, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from sqlalchemy import text
 from sqlalchemy.exc import DBAPIError
 
-from ..db import db_connect, table_has_column
+from .. import db as db_module
+from ..db import db_connect, is_postgres, table_has_column
 from ..metrics import PRINT_QUEUE_OLDEST_AGE_SECONDS, PRINT_QUEUE_SIZE
 from ..parsing import parse_product_info
+from .label_store import LabelStore, get_label_store
+from .order_barcodes import index_order_barcodes
+
+
+QUEUE_STATUS_QUEUED = "queued"
+QUEUE_STATUS_PRINTING = "in_progress"
+QUEUE_STATUS_PRINTED = "printed"
+QUEUE_STATUS_FAILED = "failed"
+ACTIVE_QUEUE_STATUSES = (QUEUE_STATUS_QUEUED, QUEUE_STATUS_PRINTING)
+FINISHED_QUEUE_STATUSES = (QUEUE_STATUS_PRINTED, QUEUE_STATUS_FAILED)
+DEFAULT_QUEUE_LEASE_SECONDS = 300
+# Synchronizacja zbioru wydrukowanych: ponownie czytamy ostatnie minuty,
+# zeby nie zgubic zapisow innego procesu z troche starszym printed_at.
+PRINTED_SYNC_OVERLAP = timedelta(minutes=5)
+# Czyszczenie starych wpisow: porcjami, z limitem czasu, najwyzej co godzine.
+CLEANUP_BATCH_SIZE = 500
+CLEANUP_TIME_BUDGET_SECONDS = 2.0
+CLEANUP_INTERVAL = timedelta(hours=1)
+
+_QUEUE_LEGACY_COLUMNS = (
+    "order_id, label_data, ext, last_order_data, queued_at, status, retry_count"
+)
+
+
+def _encode_label(label_data: Any) -> Tuple[Optional[bytes], Optional[str]]:
+    """Zwroc (bajty, tekst) etykiety - base64 trafia do kolumny binarnej."""
+    if label_data is None:
+        return None, None
+    if isinstance(label_data, (bytes, bytearray)):
+        return bytes(label_data), None
+    try:
+        raw = base64.b64decode(label_data, validate=True)
+    except (binascii.Error, ValueError):
+        return None, label_data
+    # Tylko kanoniczny base64 - odczyt musi oddac identyczny napis.
+    if base64.b64encode(raw).decode("ascii") != label_data:
+        return None, label_data
+    return raw, None
+
+
+def _decode_label(label_pdf: Any, label_data: Optional[str]) -> Optional[str]:
+    if label_pdf is not None:
+        return base64.b64encode(bytes(label_pdf)).decode("ascii")
+    return label_data
 
 
 @dataclass
@@ -31,12 +81,44 @@ class PrintAgentStorage:
         logger: logging.Logger,
         now: Callable[[], datetime],
         handle_readonly_error: Callable[[str, Exception], bool],
+        label_store: Callable[[], Optional[LabelStore]] = get_label_store,
     ):
         self.logger = logger
         self._now = now
         self._handle_readonly_error = handle_readonly_error
+        # Nowe etykiety kolejki ida do magazynu plikow - w wierszu tylko hash.
+        self._label_store = label_store
+        # Kody z kolejki juz zapisane w order_barcodes - save_queue jest
+        # wolane co iteracje, wiec nie indeksujemy ponownie tych samych wpisow.
+        self._indexed_queue_keys: set[tuple] = set()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = DEFAULT_QUEUE_LEASE_SECONDS
+        # Wiersze kolejki znane tej instancji: id -> (slownik wpisu, migawka
+        # zapisanych kolumn). save_queue zapisuje tylko roznice.
+        self._queue_rows: Dict[int, Tuple[Dict[str, Any], tuple]] = {}
+        # Etykiety sa niezmienne dla danego wiersza - nie czytamy ich ponownie.
+        # Klucz (id, order_id, queued_at) chroni przed ponownie nadanym id.
+        self._label_cache: Dict[tuple, Optional[str]] = {}
+        # Silnik, dla ktorego schemat jest juz sprawdzony (ensure_db raz na baze).
+        self._schema_engine = None
+        # Wydrukowane zamowienia (order_id -> printed_at) trzymane w pamieci
+        # i dociagane przyrostowo po printed_at; klucz silnika jak wyzej.
+        self._printed: Dict[str, datetime] = {}
+        self._printed_since: Optional[str] = None
+        self._printed_engine = None
+        self._next_cleanup_at: Optional[datetime] = None
+
+    def _ensure_schema(self) -> None:
+        """``ensure_db`` tylko raz dla danego silnika - nie w kazdej iteracji."""
+        if self._schema_engine is not db_module.engine:
+            self.ensure_db()
 
     def ensure_db(self) -> None:
+        """Utworz/uzupelnij tabele agenta i napraw stare wpisy printed_orders.
+
+        Baza aplikacji ma ten schemat z migracji Alembic; tu zostaje obsluga
+        samodzielnej bazy SQLite agenta i jednorazowa naprawa danych.
+        """
         try:
             with db_connect() as conn:
                 conn.execute(text(
@@ -48,14 +130,34 @@ class PrintAgentStorage:
                         "ALTER TABLE printed_orders ADD COLUMN last_order_data TEXT"
                     ))
                 conn.execute(text(
-                    "CREATE TABLE IF NOT EXISTS label_queue("
-                    "order_id TEXT, label_data TEXT, ext TEXT, last_order_data TEXT,"
-                    " queued_at TEXT, status TEXT, retry_count INTEGER DEFAULT 0)"
+                    "CREATE INDEX IF NOT EXISTS idx_printed_orders_printed_at "
+                    "ON printed_orders(printed_at)"
+                ))
+                conn.execute(text(self._label_queue_ddl("label_queue")))
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS label_files("
+                    "label_key TEXT PRIMARY KEY, sha256 TEXT NOT NULL, ext TEXT NOT NULL,"
+                    " size_bytes INTEGER NOT NULL, order_id TEXT, created_at TEXT NOT NULL,"
+                    " last_used_at TEXT NOT NULL)"
                 ))
+                for column in ("sha256", "order_id", "last_used_at"):
+                    conn.execute(text(
+                        f"CREATE INDEX IF NOT EXISTS idx_label_files_{column} "
+                        f"ON label_files({column})"
+                    ))
                 conn.execute(text(
                     "CREATE TABLE IF NOT EXISTS agent_state("
                     "key TEXT PRIMARY KEY, value TEXT)"
                 ))
+                conn.execute(text(
+                    "CREATE TABLE IF NOT EXISTS order_barcodes("
+                    "barcode TEXT PRIMARY KEY, order_id TEXT NOT NULL, kind TEXT NOT NULL,"
+                    " created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+                ))
+                conn.execute(text(
+                    "CREATE INDEX IF NOT EXISTS idx_order_barcodes_order_id "
+                    "ON order_barcodes(order_id)"
+                ))
                 conn.execute(text(
                     "CREATE TABLE IF NOT EXISTS allegro_replied_threads("
                     "thread_id TEXT PRIMARY KEY, replied_at TEXT)"
@@ -74,6 +176,7 @@ class PrintAgentStorage:
                             conn.execute(text(ddl))
                         except (DBAPIError, Exception):
                             pass
+                self._migrate_label_queue(conn)
 
                 rows = conn.execute(text(
                     "SELECT order_id, last_order_data FROM printed_orders"
@@ -101,6 +204,7 @@ class PrintAgentStorage:
                             text("UPDATE printed_orders SET last_order_data = :data WHERE order_id = :oid"),
                             {"data": json.dumps(data), "oid": order_id},
                         )
+            self._schema_engine = db_module.engine
         except (DBAPIError, Exception) as exc:
             if self._handle_readonly_error("database migrations", exc):
                 return
@@ -111,8 +215,43 @@ class PrintAgentStorage:
             self.logger.error("Blad ensure_db: %s", exc)
             raise
 
+    @staticmethod
+    def _label_queue_ddl(table: str) -> str:
+        id_column = "id SERIAL PRIMARY KEY" if is_postgres() else "id INTEGER PRIMARY KEY"
+        blob_type = "BYTEA" if is_postgres() else "BLOB"
+        return (
+            f"CREATE TABLE IF NOT EXISTS {table}("
+            f"{id_column}, order_id TEXT, label_data TEXT, label_pdf {blob_type},"
+            " label_sha256 TEXT, ext TEXT, last_order_data TEXT, queued_at TEXT, status TEXT DEFAULT 'queued',"
+            " retry_count INTEGER DEFAULT 0, claimed_by TEXT, lease_until TEXT,"
+            " updated_at TEXT)"
+        )
+
+    def _migrate_label_queue(self, conn) -> None:
+        """Dodaj kolumny kolejki wierszowej do starszych baz agenta."""
+        if not table_has_column("label_queue", "id"):
+            # Stara baza SQLite agenta nie miala klucza - przepisujemy tabele raz.
+            conn.execute(text("ALTER TABLE label_queue RENAME TO label_queue_legacy"))
+            conn.execute(text(self._label_queue_ddl("label_queue")))
+            conn.execute(text(
+                f"INSERT INTO label_queue({_QUEUE_LEGACY_COLUMNS}) "
+                f"SELECT {_QUEUE_LEGACY_COLUMNS} FROM label_queue_legacy"
+            ))
+            conn.execute(text("DROP TABLE label_queue_legacy"))
+            return
+        blob_type = "BYTEA" if is_postgres() else "BLOB"
+        for col, col_type in [
+            ("label_pdf", blob_type),
+            ("label_sha256", "TEXT"),
+            ("claimed_by", "TEXT"),
+            ("lease_until", "TEXT"),
+            ("updated_at", "TEXT"),
+        ]:
+            if not table_has_column("label_queue", col):
+                conn.execute(text(f"ALTER TABLE label_queue ADD COLUMN {col} {col_type}"))
+
     def load_printed_orders(self) -> List[Dict[str, Any]]:
-        self.ensure_db()
+        self._ensure_schema()
         with db_connect() as conn:
             rows = conn.execute(text(
                 "SELECT order_id, printed_at, last_order_data FROM printed_orders ORDER BY printed_at DESC"
@@ -132,6 +271,41 @@ class PrintAgentStorage:
             )
         return items
 
+    def printed_orders_map(self) -> Dict[str, datetime]:
+        """Wydrukowane zamowienia (order_id -> printed_at) z pamieci.
+
+        Kazde wywolanie czyta tylko wiersze z ``printed_at`` od ostatniej
+        synchronizacji (minus ``PRINTED_SYNC_OVERLAP``); pierwsze - cala tabele.
+        Zwracany slownik jest wspoldzielony: wpisy dodane przez petle druku
+        zostaja w nim do kolejnej synchronizacji.
+        """
+        self._ensure_schema()
+        if self._printed_engine is not db_module.engine:
+            self._printed = {}
+            self._printed_since = None
+            self._printed_engine = db_module.engine
+        sql = "SELECT order_id, printed_at FROM printed_orders"
+        params: Dict[str, Any] = {}
+        if self._printed_since is not None:
+            sql += " WHERE printed_at >= :since"
+            params["since"] = self._printed_since
+        with db_connect() as conn:
+            rows = conn.execute(text(sql), params).fetchall()
+        newest: Optional[datetime] = None
+        for order_id, timestamp in rows:
+            try:
+                printed_at = datetime.fromisoformat(timestamp)
+            except (TypeError, ValueError):
+                continue
+            self._printed[order_id] = printed_at
+            if newest is None or printed_at > newest:
+                newest = printed_at
+        if newest is not None:
+            since = (newest - PRINTED_SYNC_OVERLAP).isoformat()
+            if self._printed_since is None or since > self._printed_since:
+                self._printed_since = since
+        return self._printed
+
     def upsert_printed_order_record(
         self,
         order_id: str,
@@ -155,19 +329,15 @@ class PrintAgentStorage:
         params = {"oid": order_id, "ts": self._now().isoformat(), "data": data_json}
 
         if db_session is not None:
-            db_session.execute(
-                text(
-                    "CREATE TABLE IF NOT EXISTS printed_orders("
-                    "order_id TEXT PRIMARY KEY, printed_at TEXT, last_order_data TEXT)"
-                )
-            )
             db_session.execute(insert_sql, params)
+            index_order_barcodes(db_session, order_id, last_order_data or {})
             return
 
-        self.ensure_db()
+        self._ensure_schema()
         try:
             with db_connect() as conn:
                 conn.execute(insert_sql, params)
+                index_order_barcodes(conn, order_id, last_order_data or {})
         except (DBAPIError, Exception) as exc:
             if self._handle_readonly_error("upsert_printed_order_record", exc):
                 return
@@ -203,7 +373,7 @@ class PrintAgentStorage:
             )
 
     def load_state_value(self, key: str) -> Optional[str]:
-        self.ensure_db()
+        self._ensure_schema()
         with db_connect() as conn:
             row = conn.execute(
                 text("SELECT value FROM agent_state WHERE key = :k"), {"k": key}
@@ -211,7 +381,7 @@ class PrintAgentStorage:
         return row[0] if row else None
 
     def save_state_value(self, key: str, value: Optional[str]) -> None:
-        self.ensure_db()
+        self._ensure_schema()
         try:
             with db_connect() as conn:
                 if value is None:
@@ -247,17 +417,53 @@ class PrintAgentStorage:
             self.save_state_value("last_success_order_id", order_id)
 
     def clean_old_printed_orders(self, printed_expiry_days: int) -> None:
-        threshold = self._now() - timedelta(days=printed_expiry_days)
+        """Usun stare wpisy printed_orders i zakonczone wiersze kolejki.
+
+        Kasuje porcjami po ``CLEANUP_BATCH_SIZE`` w limicie
+        ``CLEANUP_TIME_BUDGET_SECONDS``; niedokonczone czyszczenie wraca
+        w nastepnej iteracji, pelne - dopiero po ``CLEANUP_INTERVAL``.
+        """
+        now = self._now()
+        if self._next_cleanup_at is not None and now < self._next_cleanup_at:
+            return
+        threshold = now - timedelta(days=printed_expiry_days)
+        deadline = time.monotonic() + CLEANUP_TIME_BUDGET_SECONDS
+        targets = (
+            ("printed_orders", "order_id", "printed_at < :ts", {}),
+            (
+                "label_queue",
+                "id",
+                "status IN (:printed, :failed) AND updated_at < :ts",
+                {"printed": QUEUE_STATUS_PRINTED, "failed": QUEUE_STATUS_FAILED},
+            ),
+        )
+        finished = True
         try:
-            with db_connect() as conn:
-                conn.execute(
-                    text("DELETE FROM printed_orders WHERE printed_at < :ts"),
-                    {"ts": threshold.isoformat()},
-                )
+            for table, key, condition, extra in targets:
+                params = {"ts": threshold.isoformat(), "limit": CLEANUP_BATCH_SIZE, **extra}
+                while True:
+                    with db_connect() as conn:
+                        deleted = conn.execute(
+                            text(
+                                f"DELETE FROM {table} WHERE {key} IN "  # nosec B608
+                                f"(SELECT {key} FROM {table} WHERE {condition} LIMIT :limit)"
+                            ),
+                            params,
+                        ).rowcount
+                    if deleted < CLEANUP_BATCH_SIZE:
+                        break
+                    if time.monotonic() >= deadline:
+                        finished = False
+                        break
+                if not finished:
+                    break
         except (DBAPIError, Exception) as exc:
             if self._handle_readonly_error("clean_old_printed_orders", exc):
                 return
             raise
+        for order_id in [oid for oid, printed_at in self._printed.items() if printed_at < threshold]:
+            del self._printed[order_id]
+        self._next_cleanup_at = None if not finished else now + CLEANUP_INTERVAL
 
     def deduplicate_queue(self, queue: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
         items = list(queue)
@@ -301,32 +507,50 @@ class PrintAgentStorage:
         return queue_list
 
     def load_queue(self) -> List[Dict[str, Any]]:
-        self.ensure_db()
+        """Wczytaj aktywne wpisy kolejki (oczekujace i w trakcie druku)."""
+        self._ensure_schema()
         with db_connect() as conn:
-            rows = conn.execute(text(
-                "SELECT order_id, label_data, ext, last_order_data, queued_at, status, retry_count FROM label_queue"
-            )).fetchall()
+            rows = conn.execute(
+                text(
+                    "SELECT id, order_id, ext, last_order_data, queued_at, status,"
+                    " retry_count, claimed_by, lease_until FROM label_queue"
+                    " WHERE status IS NULL OR status IN (:queued, :printing) ORDER BY id"
+                ),
+                {"queued": QUEUE_STATUS_QUEUED, "printing": QUEUE_STATUS_PRINTING},
+            ).fetchall()
+            self._load_labels(conn, {row[0]: self._label_key(row) for row in rows})
+
+        self._queue_rows = {}
         items: List[Dict[str, Any]] = []
         for row in rows:
-            order_id, label_data, ext, last_order_json, queued_at, status = row[:6]
-            retry_count = row[6] if len(row) > 6 else 0
+            row_id, order_id, ext, last_order_json, queued_at, status = row[:6]
+            retry_count, claimed_by, lease_until = row[6:9]
             try:
                 last_data = json.loads(last_order_json) if last_order_json else {}
             except Exception:  # pragma: no cover - defensive
                 last_data = {}
             if not queued_at:
                 queued_at = self._now().isoformat()
-            items.append(
-                {
-                    "order_id": order_id,
-                    "label_data": label_data,
-                    "ext": ext,
-                    "last_order_data": last_data,
-                    "queued_at": queued_at,
-                    "status": status or "queued",
-                    "retry_count": retry_count or 0,
-                }
-            )
+            item = {
+                "id": row_id,
+                "order_id": order_id,
+                "label_data": self._label_cache.get(self._label_key(row)),
+                "ext": ext,
+                "last_order_data": last_data,
+                "queued_at": queued_at,
+                "status": status or QUEUE_STATUS_QUEUED,
+                "retry_count": retry_count or 0,
+                "claimed_by": claimed_by,
+                "lease_until": lease_until,
+            }
+            items.append(item)
+            self._queue_rows[row_id] = (item, self._queue_snapshot(item, last_order_json))
+
+        live_keys = {self._label_key(row) for row in rows}
+        for key in list(self._label_cache):
+            if key not in live_keys:
+                del self._label_cache[key]
+
         deduped = self.deduplicate_queue(items)
         if len(deduped) != len(items):
             self.logger.info(
@@ -336,32 +560,193 @@ class PrintAgentStorage:
             self.save_queue(deduped)
         return deduped
 
+    @staticmethod
+    def _label_key(row) -> tuple:
+        # (id, order_id, queued_at) z wiersza SELECT w load_queue
+        return (row[0], row[1], row[4])
+
+    def _load_labels(self, conn, keys: Dict[int, tuple]) -> None:
+        missing = [row_id for row_id, key in keys.items() if key not in self._label_cache]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            params = {f"id{index}": row_id for index, row_id in enumerate(chunk)}
+            placeholders = ", ".join(f":{key}" for key in params)
+            for row_id, label_data, label_pdf, label_sha256, ext in conn.execute(
+                text(
+                    "SELECT id, label_data, label_pdf, label_sha256, ext FROM label_queue "
+                    f"WHERE id IN ({placeholders})"
+                ),
+                params,
+            ):
+                if label_sha256:
+                    label_pdf = self._read_stored_label(label_sha256, ext)
+                self._label_cache[keys[row_id]] = _decode_label(label_pdf, label_data)
+
+    def _read_stored_label(self, sha256: str, ext: Optional[str]) -> Optional[bytes]:
+        store = self._label_store()
+        content = store.read_content(sha256, ext) if store is not None else None
+        if content is None:
+            self.logger.error("Brak pliku etykiety %s w magazynie etykiet", sha256)
+        return content
+
+    @staticmethod
+    def _queue_snapshot(item: Dict[str, Any], last_order_json: Optional[str]) -> tuple:
+        return (
+            item.get("status") or QUEUE_STATUS_QUEUED,
+            item.get("retry_count") or 0,
+            last_order_json,
+            item.get("claimed_by"),
+            item.get("lease_until"),
+        )
+
+    def is_lease_active(self, item: Dict[str, Any]) -> bool:
+        """Czy wpis jest drukowany przez inny proces z wazna dzierzawa."""
+        claimed_by = item.get("claimed_by")
+        lease_until = item.get("lease_until")
+        if not claimed_by or claimed_by == self.worker_id or not lease_until:
+            return False
+        try:
+            return datetime.fromisoformat(lease_until) > self._now()
+        except ValueError:
+            return False
+
+    def _apply_claim(self, item: Dict[str, Any]) -> None:
+        if item.get("status") == QUEUE_STATUS_PRINTING:
+            if item.get("claimed_by") != self.worker_id:
+                item["claimed_by"] = self.worker_id
+                item["lease_until"] = (
+                    self._now() + timedelta(seconds=self.lease_seconds)
+                ).isoformat()
+        elif item.get("status") not in FINISHED_QUEUE_STATUSES:
+            item["claimed_by"] = None
+            item["lease_until"] = None
+
     def save_queue(self, items: Iterable[Dict[str, Any]]) -> None:
+        """Zapisz stan kolejki, modyfikujac tylko zmienione wiersze.
+
+        Nowe wpisy sa wstawiane (etykieta jako bajty), zmienione - aktualizowane
+        po ``id``. Wpisy, ktore zniknely z listy, przechodza w status
+        ``printed``/``failed`` ustawiony przez wywolujacego albo sa usuwane.
+        """
         items_list = self.update_queue_metrics(items)
 
         try:
             with db_connect() as conn:
-                conn.execute(text("DELETE FROM label_queue"))
-                for item in items_list:
-                    conn.execute(
-                        text(
-                            "INSERT INTO label_queue(order_id, label_data, ext, last_order_data, queued_at, status, retry_count)"
-                            " VALUES (:oid, :ldata, :ext, :odata, :qat, :st, :rc)"
-                        ),
-                        {
-                            "oid": item.get("order_id"),
-                            "ldata": item.get("label_data"),
-                            "ext": item.get("ext"),
-                            "odata": json.dumps(item.get("last_order_data", {}), default=str),
-                            "qat": item.get("queued_at"),
-                            "st": item.get("status", "queued"),
-                            "rc": item.get("retry_count", 0),
-                        },
-                    )
+                self._write_queue_changes(conn, items_list)
+                self._index_queue_barcodes(conn, items_list)
         except (DBAPIError, Exception) as exc:
             if self._handle_readonly_error("save_queue", exc):
                 return
             raise
 
+    def _write_queue_changes(self, conn, items: List[Dict[str, Any]]) -> None:
+        now = self._now().isoformat()
+        known = self._queue_rows
+        current: Dict[int, Tuple[Dict[str, Any], tuple]] = {}
+
+        for item in items:
+            self._apply_claim(item)
+            odata = json.dumps(item.get("last_order_data", {}), default=str)
+            snapshot = self._queue_snapshot(item, odata)
+            row_id = item.get("id")
+            if row_id is None:
+                row_id = self._insert_queue_row(conn, item, odata, now)
+                item["id"] = row_id
+                key = (row_id, item.get("order_id"), item.get("queued_at"))
+                self._label_cache[key] = item.get("label_data")
+            elif row_id not in known or known[row_id][1] != snapshot:
+                conn.execute(
+                    text(
+                        "UPDATE label_queue SET status = :st, retry_count = :rc,"
+                        " last_order_data = :odata, claimed_by = :cb,"
+                        " lease_until = :lease, updated_at = :now WHERE id = :id"
+                    ),
+                    {
+                        "st": snapshot[0],
+                        "rc": snapshot[1],
+                        "odata": odata,
+                        "cb": snapshot[3],
+                        "lease": snapshot[4],
+                        "now": now,
+                        "id": row_id,
+                    },
+                )
+            current[row_id] = (item, snapshot)
+
+        for row_id, (item, _snapshot) in known.items():
+            if row_id in current:
+                continue
+            status = item.get("status")
+            if status in FINISHED_QUEUE_STATUSES:
+                conn.execute(
+                    text(
+                        "UPDATE label_queue SET status = :st, claimed_by = NULL,"
+                        " lease_until = NULL, updated_at = :now WHERE id = :id"
+                    ),
+                    {"st": status, "now": now, "id": row_id},
+                )
+            else:
+                conn.execute(text("DELETE FROM label_queue WHERE id = :id"), {"id": row_id})
+            self._label_cache.pop((row_id, item.get("order_id"), item.get("queued_at")), None)
+
+        self._queue_rows = current
+
+    def _insert_queue_row(
+        self, conn, item: Dict[str, Any], odata: str, now: str
+    ) -> int:
+        label_pdf, label_data = _encode_label(item.get("label_data"))
+        label_sha256 = None
+        store = self._label_store() if label_pdf is not None else None
+        stored = store.put(label_pdf, item.get("ext"), conn=conn) if store is not None else None
+        if stored is not None:
+            label_pdf, label_sha256 = None, stored.sha256
+        params = {
+            "oid": item.get("order_id"),
+            "ldata": label_data,
+            "lpdf": label_pdf,
+            "lsha": label_sha256,
+            "ext": item.get("ext"),
+            "odata": odata,
+            "qat": item.get("queued_at"),
+            "st": item.get("status") or QUEUE_STATUS_QUEUED,
+            "rc": item.get("retry_count", 0),
+            "cb": item.get("claimed_by"),
+            "lease": item.get("lease_until"),
+            "now": now,
+        }
+        sql = (
+            "INSERT INTO label_queue(order_id, label_data, label_pdf, label_sha256, ext,"
+            " last_order_data, queued_at, status, retry_count, claimed_by, lease_until,"
+            " updated_at) VALUES (:oid, :ldata, :lpdf, :lsha, :ext, :odata, :qat, :st, :rc,"
+            " :cb, :lease, :now)"
+        )
+        if conn.dialect.insert_returning:
+            return conn.execute(text(sql + " RETURNING id"), params).scalar_one()
+        return conn.execute(text(sql), params).lastrowid
 
-__all__ = ["PrintAgentStorage", "SuccessMarker"]
\ No newline at end of file
+    def _index_queue_barcodes(self, conn, items: List[Dict[str, Any]]) -> None:
+        for item in items:
+            order_id = item.get("order_id")
+            data = item.get("last_order_data") or {}
+            key = (
+                order_id,
+                tuple(data.get("package_ids") or ()),
+                tuple(data.get("tracking_numbers") or ()),
+                data.get("delivery_package_nr"),
+            )
+            if not order_id or key in self._indexed_queue_keys:
+                continue
+            index_order_barcodes(conn, order_id, data)
+            self._indexed_queue_keys.add(key)
+
+
+__all__ = [
+    "ACTIVE_QUEUE_STATUSES",
+    "FINISHED_QUEUE_STATUSES",
+    "PrintAgentStorage",
+    "QUEUE_STATUS_FAILED",
+    "QUEUE_STATUS_PRINTED",
+    "QUEUE_STATUS_PRINTING",
+    "QUEUE_STATUS_QUEUED",
+    "SuccessMarker",
+]
\ No newline at end of file
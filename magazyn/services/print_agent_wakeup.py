@@ -0,0 +1,137 @@
+"""Budzenie petli agenta druku, gdy pojawia sie zamowienie do druku.
+
+Petla agenta spi ``poll_interval`` miedzy iteracjami. Listener sesji
+zaznacza transakcje, ktora dodala zamowienie albo wpis statusu ``pobrano``
+(``sync_order_from_data``, ``add_order_status``) i po jej zatwierdzeniu
+sygnalizuje ``print_wakeup`` w tym procesie. Na PostgreSQL ta sama
+transakcja wysyla ``NOTIFY print_agent_wakeup`` - dostarczane dopiero po
+COMMIT i porzucane przy ROLLBACK - a ``PrintWakeupWorker`` agenta nasluchuje
+kanalu, wiec zapis z innego procesu budzi agenta w ulamku sekundy.
+``poll_interval`` zostaje gornym limitem snu (kolejka ponowien, heartbeat).
+"""
+
+from __future__ import annotations
+
+import logging
+import select
+import threading
+import time
+from typing import Any
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .. import db as db_module
+from ..models.orders import Order, OrderStatusLog
+
+logger = logging.getLogger(__name__)
+
+WAKEUP_CHANNEL = "print_agent_wakeup"
+WAKEUP_STATUSES = ("pobrano",)
+LISTEN_POLL_SECONDS = 1.0
+_PENDING_KEY = "print_agent_wakeup"
+
+
+class PrintWakeup:
+    """Sygnal "sa nowe zamowienia do druku" dla petli agenta."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._pending = False
+
+    def notify(self) -> None:
+        with self._condition:
+            self._pending = True
+            self._condition.notify_all()
+
+    def interrupt(self) -> None:
+        """Obudz czekajacych bez sygnalu pracy - np. przy zatrzymaniu agenta."""
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, stop_event: Any, timeout: float) -> bool:
+        """Czekaj na sygnal najwyzej ``timeout`` sekund; przerwij po ustawieniu stopu.
+
+        Zwraca True, gdy obudzil sygnal (i go konsumuje).
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or stop_event.is_set():
+                    return False
+                self._condition.wait(remaining)
+            self._pending = False
+            return True
+
+
+print_wakeup = PrintWakeup()
+
+
+def _adds_printable_order(session: Session) -> bool:
+    for obj in session.new:
+        # Nowe zamowienie bez historii statusow agent traktuje jak "pobrano".
+        if isinstance(obj, Order):
+            return True
+        if isinstance(obj, OrderStatusLog) and obj.status in WAKEUP_STATUSES:
+            return True
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_wakeup(session, flush_context) -> None:
+    if session.info.get(_PENDING_KEY) or not _adds_printable_order(session):
+        return
+    session.info[_PENDING_KEY] = True
+    connection = session.connection()
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(f"NOTIFY {WAKEUP_CHANNEL}"))
+
+
+@event.listens_for(Session, "after_commit")
+def _signal_wakeup(session) -> None:
+    if session.info.pop(_PENDING_KEY, False):
+        print_wakeup.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_wakeup(session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def listen_for_wakeups(stop_event: Any, *, poll_seconds: float = LISTEN_POLL_SECONDS) -> bool:
+    """Nasluchuj ``NOTIFY print_agent_wakeup`` az do ustawienia stopu.
+
+    Zwraca False, gdy baza nie wspiera LISTEN (SQLite) - wystarcza wtedy
+    sygnal w procesie.
+    """
+    engine = db_module.engine
+    if engine.dialect.name != "postgresql":
+        return False
+    raw = engine.raw_connection()
+    # Polaczenie z LISTEN i autocommit nie wraca do puli.
+    raw.detach()
+    try:
+        connection = raw.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {WAKEUP_CHANNEL}")
+        logger.info("Nasluchiwanie kanalu %s", WAKEUP_CHANNEL)
+        while not stop_event.is_set():
+            if not select.select([connection], [], [], poll_seconds)[0]:
+                continue
+            connection.poll()
+            if connection.notifies:
+                del connection.notifies[:]
+                print_wakeup.notify()
+    finally:
+        raw.close()
+    return True
+
+
+__all__ = [
+    "PrintWakeup",
+    "WAKEUP_CHANNEL",
+    "listen_for_wakeups",
+    "print_wakeup",
+]
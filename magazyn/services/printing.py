@@ -1,29 +1,145 @@
-"""Niskopoziomowa obsługa drukowania przez CUPS."""
+"""Niskopoziomowa obsługa drukowania przez CUPS.
+
+Domyślnie każde zlecenie idzie przez ``lp`` (plik tymczasowy + proces).
+Transport ``ipp`` wysyła dokument bezpośrednio z Pythona (``ipp.py``) na
+utrzymywanym połączeniu i pilnuje okna najwyżej ``max_in_flight``
+niezakończonych zleceń. ``print_labels_base64`` łączy etykiety PDF w jeden
+wielostronicowy dokument - seria etykiet to jedno zlecenie CUPS.
+"""
 
 from __future__ import annotations
 
 import base64
+import io
 import logging
 import os
 import re
 import subprocess  # nosec B404
 import tempfile
-from dataclasses import dataclass
-from typing import Optional
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pypdf import PdfReader, PdfWriter
+
+from .ipp import (
+    JOB_STATE_COMPLETED,
+    JOB_STATE_PENDING,
+    TERMINAL_JOB_STATES,
+    IppClient,
+    IppError,
+)
 
 
 logger = logging.getLogger(__name__)
 
+TRANSPORT_LP = "lp"
+TRANSPORT_IPP = "ipp"
+JOB_POLL_INTERVAL = 0.5
+JOB_WINDOW_TIMEOUT = 120.0
+_DOCUMENT_FORMATS = {"pdf": "application/pdf", "txt": "text/plain"}
+
 
 class PrintCommandError(RuntimeError):
     """Błąd wywołania systemowego drukowania."""
 
 
+def merge_pdf_documents(documents: Sequence[bytes]) -> bytes:
+    """Połącz dokumenty PDF w jeden wielostronicowy."""
+    writer = PdfWriter()
+    for document in documents:
+        for page in PdfReader(io.BytesIO(document)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def check_label_document(base64_data: str, extension: str | None = "pdf") -> None:
+    """Sprawdź, czy etykietę da się zdekodować i (PDF) scalić - bez drukowania.
+
+    Rzuca wyjątek dla uszkodzonej etykiety, zanim trafi do wspólnego zlecenia.
+    """
+    payload = base64.b64decode(base64_data, validate=True)
+    if CupsPrinter._safe_extension(extension).lower() == "pdf":
+        merge_pdf_documents([payload])
+
+
+class PrintJobWindow:
+    """Okno zleceń IPP w drodze: stan zleceń i limit niezakończonych."""
+
+    def __init__(
+        self,
+        limit: int,
+        *,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        timeout: float = JOB_WINDOW_TIMEOUT,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = max(1, limit)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.sleep = sleep
+        self.clock = clock
+        self.jobs: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def track(self, job_id: int, state: int) -> None:
+        with self._lock:
+            self.jobs[job_id] = state
+
+    def refresh(self, client: IppClient) -> None:
+        """Odśwież stan niezakończonych zleceń; zakończone zdejmij z okna."""
+        with self._lock:
+            job_ids = list(self.jobs)
+        for job_id in job_ids:
+            try:
+                state = client.job_state(job_id)
+            except (IppError, OSError) as exc:
+                logger.warning("Nie można sprawdzić zlecenia %s: %s", job_id, exc)
+                continue
+            with self._lock:
+                if state not in TERMINAL_JOB_STATES:
+                    self.jobs[job_id] = state
+                    continue
+                self.jobs.pop(job_id, None)
+            if state != JOB_STATE_COMPLETED:
+                logger.error("Zlecenie wydruku %s zakończone stanem %s", job_id, state)
+
+    def wait_for_slot(self, client: IppClient) -> None:
+        """Czekaj, aż w oknie zwolni się miejsce na kolejne zlecenie."""
+        deadline = self.clock() + self.timeout
+        while len(self.jobs) >= self.limit:
+            self.refresh(client)
+            if len(self.jobs) < self.limit:
+                return
+            if self.clock() >= deadline:
+                raise PrintCommandError(
+                    f"Drukarka nie przyjmuje zleceń - {len(self.jobs)} niezakończonych"
+                )
+            self.sleep(self.poll_interval)
+
+
 @dataclass(frozen=True)
 class CupsPrinter:
     printer_name: str
     cups_server: Optional[str] = None
     cups_port: Optional[int] = None
+    transport: str = TRANSPORT_LP
+    max_in_flight: int = 4
+    _ipp_state: Dict[str, object] = field(default_factory=dict, compare=False, repr=False)
+
+    @classmethod
+    def from_config(cls, config: Any) -> "CupsPrinter":
+        return cls(
+            printer_name=config.printer_name,
+            cups_server=config.cups_server,
+            cups_port=config.cups_port,
+            transport=config.print_transport,
+            max_in_flight=config.print_max_in_flight,
+        )
 
     def _host(self) -> Optional[str]:
         if not self.cups_server and not self.cups_port:
@@ -45,29 +161,64 @@ class CupsPrinter:
 
     def print_label_base64(self, base64_data: str, extension: str | None = "pdf") -> None:
         payload = base64.b64decode(base64_data)
-        suffix = f".{self._safe_extension(extension)}"
-        file_path = self._write_temp_file(payload, prefix="label_", suffix=suffix)
+        self._submit(payload, self._safe_extension(extension))
+
+    def print_labels_base64(self, labels: Sequence[Tuple[str, str | None]]) -> None:
+        """Wydrukuj serię etykiet; etykiety PDF idą jednym zleceniem."""
+        pdf_documents: List[bytes] = []
+        for base64_data, extension in labels:
+            payload = base64.b64decode(base64_data)
+            safe_extension = self._safe_extension(extension)
+            if safe_extension.lower() == "pdf":
+                pdf_documents.append(payload)
+            else:
+                self._submit(payload, safe_extension)
+        if len(pdf_documents) == 1:
+            self._submit(pdf_documents[0], "pdf")
+        elif pdf_documents:
+            self._submit(merge_pdf_documents(pdf_documents), "pdf", job_name=f"etykiety x{len(pdf_documents)}")
+
+    def _submit(
+        self,
+        payload: bytes,
+        extension: str,
+        *,
+        job_name: str = "etykieta",
+        prefix: str = "label_",
+    ) -> None:
+        if self.transport == TRANSPORT_IPP:
+            self._submit_ipp(payload, extension, job_name)
+            return
+        file_path = self._write_temp_file(payload, prefix=prefix, suffix=f".{extension}")
         try:
             self._run_lp(file_path)
         finally:
             self._remove_temp_file(file_path)
 
-    def print_text(self, text: str, *, prefix: str = "print_test_") -> None:
-        file_path = None
+    def _ipp(self) -> Tuple[IppClient, PrintJobWindow]:
+        if "client" not in self._ipp_state:
+            self._ipp_state["client"] = IppClient(
+                self.printer_name,
+                host=self.cups_server or ("localhost" if self.cups_port else None),
+                port=self.cups_port,
+            )
+            self._ipp_state["window"] = PrintJobWindow(self.max_in_flight)
+        return self._ipp_state["client"], self._ipp_state["window"]
+
+    def _submit_ipp(self, payload: bytes, extension: str, job_name: str) -> None:
+        client, window = self._ipp()
+        document_format = _DOCUMENT_FORMATS.get(extension.lower(), "application/octet-stream")
         try:
-            with tempfile.NamedTemporaryFile(
-                mode="w",
-                encoding="utf-8",
-                prefix=prefix,
-                suffix=".txt",
-                delete=False,
-            ) as handle:
-                file_path = handle.name
-                handle.write(text)
-            self._run_lp(file_path)
-        finally:
-            if file_path:
-                self._remove_temp_file(file_path)
+            window.wait_for_slot(client)
+            job_id = client.print_job(payload, document_format=document_format, job_name=job_name)
+        except (IppError, OSError) as exc:
+            logger.error("Błąd drukowania IPP: %s", exc)
+            raise PrintCommandError(str(exc)) from exc
+        window.track(job_id, JOB_STATE_PENDING)
+        logger.debug("Zlecenie IPP %s (%d B) przyjęte", job_id, len(payload))
+
+    def print_text(self, text: str, *, prefix: str = "print_test_") -> None:
+        self._submit(text.encode("utf-8"), "txt", job_name="test", prefix=prefix)
 
     @staticmethod
     def _write_temp_file(payload: bytes, *, prefix: str, suffix: str) -> str:
@@ -100,4 +251,12 @@ class CupsPrinter:
             logger.debug("Nie udało się usunąć pliku tymczasowego %s: %s", file_path, exc)
 
 
-__all__ = ["CupsPrinter", "PrintCommandError"]
\ No newline at end of file
+__all__ = [
+    "CupsPrinter",
+    "PrintCommandError",
+    "PrintJobWindow",
+    "TRANSPORT_IPP",
+    "TRANSPORT_LP",
+    "check_label_document",
+    "merge_pdf_documents",
+]
\ No newline at end of file
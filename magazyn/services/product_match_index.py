@@ -0,0 +1,635 @@
+"""Indeks dopasowania produktow magazynu budowany raz na proces.
+
+Dopasowanie pozycji zamowienia, oferty Allegro czy wiersza faktury do
+``ProductSize`` wymagalo dotad pobrania wszystkich rozmiarow danego wymiaru i
+normalizacji nazw/kolorow w Pythonie dla kazdego kandydata. Indeks trzyma
+znormalizowane cechy (klucze nazwy, seria, kanoniczny kolor, rozmiar, EAN)
+w slownikach, wiec dopasowanie to kilka odczytow z ``dict``.
+
+Odswiezanie:
+- zapisy ORM ``Product``/``ProductSize`` oznaczaja zmienione produkty
+  (``after_flush``, ponownie po commit/rollback); przy kolejnym odczycie
+  indeks przeladowuje tylko ich wiersze,
+- zmiana silnika bazy (nowa konfiguracja) wymusza pelna przebudowe,
+- nieudane dopasowanie (``check_version=True``) porownuje z baza tania
+  wersje (maksymalne ID i liczba wierszy produktow i rozmiarow) - produkt
+  dodany przez inny worker lub proces wymusza przebudowe od razu,
+- pozostale zmiany spoza ORM tego procesu (edycja w innym workerze, surowy
+  SQL) lapie pelna przebudowa po ``PRODUCT_MATCH_INDEX_MAX_AGE`` sekundach
+  albo jawne ``invalidate_product_match_index()``.
+
+Pamiec dopasowan trzyma tylko trafienia - brak dopasowania jest liczony
+ponownie, bo produkt moze dojsc w kazdej chwili.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import time
+import unicodedata
+from dataclasses import dataclass
+from threading import RLock
+from typing import Iterable, Optional
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from ..constants import normalize_size_token, resolve_product_alias
+from ..models.products import Product, ProductSize
+from .product_matching import (
+    _extract_model_series,
+    _normalize_name,
+    _parse_tiptop_sku,
+)
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_SECONDS = 300.0
+_MATCH_MEMO_LIMIT = 20_000
+_SESSION_INFO_KEY = "product_match_index_dirty"
+_PRODUCT_ATTRS = ("_name", "category", "brand", "series", "color", "sizing_mode")
+_SIZE_ATTRS = ("size", "barcode", "product_id")
+
+
+def _strip_diacritics_ord(text: str) -> str:
+    if not text:
+        return ""
+    # NFKD nie rozkłada polskiego ł/Ł — mapuj explicite przed normalizacją.
+    text = text.replace("Ł", "L").replace("ł", "l")
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+_COLOR_CANONICAL_MAP = {
+    "pomaranczowy": "pomaranczowy",
+    "pomaranczowe": "pomaranczowy",
+    "pomaranczowa": "pomaranczowy",
+    "brazowy": "brazowy",
+    "brazowe": "brazowy",
+    "brazowa": "brazowy",
+    "zolty": "zolty",
+    "zolte": "zolty",
+    "zolta": "zolty",
+    "czarny": "czarny",
+    "czarne": "czarny",
+    "czarna": "czarny",
+    "czerwony": "czerwony",
+    "czerwone": "czerwony",
+    "czerwona": "czerwony",
+    "niebieski": "niebieski",
+    "niebieskie": "niebieski",
+    "niebieska": "niebieski",
+    "zielony": "zielony",
+    "zielone": "zielony",
+    "zielona": "zielony",
+    "rozowy": "rozowy",
+    "rozowe": "rozowy",
+    "rozowa": "rozowy",
+    "fioletowy": "fioletowy",
+    "fioletowe": "fioletowy",
+    "fioletowa": "fioletowy",
+    "srebrny": "srebrny",
+    "srebrne": "srebrny",
+    "srebrna": "srebrny",
+    "granatowy": "granatowy",
+    "granatowe": "granatowy",
+    "granatowa": "granatowy",
+    "szary": "szary",
+    "szare": "szary",
+    "szara": "szary",
+    "turkusowy": "turkusowy",
+    "turkusowe": "turkusowy",
+    "turkusowa": "turkusowy",
+    "bialy": "bialy",
+    "biale": "bialy",
+    "biala": "bialy",
+    "blekitny": "blekitny",
+    "blekitne": "blekitny",
+    "blekitna": "blekitny",
+    "limonkowy": "limonkowy",
+    "limonkowe": "limonkowy",
+    "limonkowa": "limonkowy",
+}
+
+
+def _normalize_color_key(color: str) -> str:
+    if not color:
+        return ""
+    stripped = _strip_diacritics_ord(color).lower().strip()
+    return _COLOR_CANONICAL_MAP.get(stripped, stripped)
+
+
+def _extract_series_from_name(product_name: str) -> str:
+    if not product_name:
+        return ""
+    match = re.search(r"Truelove\s+(.+)", product_name, re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    normalized = _strip_diacritics_ord(product_name).lower()
+    if "amortyzator" in normalized and "smyczy" in normalized:
+        return "Premium"
+    return ""
+
+
+def _normalized_name_keys(name: str) -> set[str]:
+    keys: set[str] = set()
+    if not name:
+        return keys
+    for variant in (name, resolve_product_alias(name)):
+        normalized = _strip_diacritics_ord(variant).lower().strip()
+        if normalized:
+            keys.add(normalized)
+    return keys
+
+
+_SMYCZ_NAME_KEYS = frozenset(_normalized_name_keys("Smycz dla psa Truelove"))
+_SASZETKI_NAME_KEYS = frozenset(_normalized_name_keys("Saszetki dla psa Truelove Standard"))
+_ACTIVE_PRO_NAME_KEYS = frozenset(_normalized_name_keys("Smycz dla psa Truelove Active Pro+"))
+_ACTIVE_PRO_SERIES = "Active Pro+"
+
+
+@dataclass(frozen=True)
+class IndexedProductSize:
+    """Rozmiar produktu z cechami policzonymi raz przy budowie indeksu.
+
+    Atrybuty ``ps_id``/``name``/``color``/``size``/``barcode``/``category``
+    odpowiadaja wierszom ``get_product_sizes()``.
+    """
+
+    ps_id: int
+    product_id: int
+    name: str
+    color: str
+    size: str
+    barcode: Optional[str]
+    category: str
+    series: str
+    sizing_mode: Optional[str]
+    size_upper: str
+    name_keys: frozenset
+    series_norm: str
+    color_key: str
+    model_series: str
+    keywords: frozenset
+
+    @classmethod
+    def from_row(cls, row) -> "IndexedProductSize":
+        name = getattr(row, "name", None) or ""
+        raw_name = getattr(row, "raw_name", None) or ""
+        series = getattr(row, "series", None) or ""
+        color = getattr(row, "color", None) or ""
+        size = getattr(row, "size", None) or ""
+        name_keys = _normalized_name_keys(name) | _normalized_name_keys(raw_name)
+        return cls(
+            ps_id=row.ps_id,
+            product_id=row.product_id,
+            name=name,
+            color=color,
+            size=size,
+            barcode=getattr(row, "barcode", None),
+            category=getattr(row, "category", None) or "",
+            series=series,
+            sizing_mode=getattr(row, "sizing_mode", None),
+            size_upper=size.upper(),
+            name_keys=frozenset(name_keys),
+            series_norm=_strip_diacritics_ord(series).lower(),
+            color_key=_normalize_color_key(color),
+            model_series=_extract_model_series(name),
+            keywords=frozenset(_normalize_name(name)),
+        )
+
+    def __getitem__(self, key: str):
+        # Szablon przegladu faktury czyta wiersze jak slowniki (ps['name']).
+        return getattr(self, key)
+
+
+class ProductMatchIndex:
+    """Slowniki cech rozmiarow produktow do dopasowan bez zapytan."""
+
+    def __init__(self, rows: Iterable = ()) -> None:
+        self._entries: dict[int, IndexedProductSize] = {}
+        self._by_product: dict[int, list[int]] = {}
+        self._memo: dict[tuple, int] = {}
+        self._sorted_entries: Optional[list[IndexedProductSize]] = None
+        self._reset_buckets()
+        self.add_rows(rows)
+
+    def _reset_buckets(self) -> None:
+        self._by_barcode: dict[str, IndexedProductSize] = {}
+        self._by_name_size: dict[tuple, list] = {}
+        self._by_size: dict[str, list] = {}
+        self._by_size_name_key: dict[tuple, list] = {}
+        self._by_size_series: dict[tuple, list] = {}
+        self._by_size_category_color: dict[tuple, list] = {}
+        self._by_series: dict[str, list] = {}
+        self._by_model_series_size: dict[tuple, list] = {}
+        self._by_keyword: dict[str, list] = {}
+
+    # ------------------------------------------------------------------
+    # Utrzymanie
+    # ------------------------------------------------------------------
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def entries(self) -> list[IndexedProductSize]:
+        """Wszystkie rozmiary w kolejnosci ``ps_id``."""
+        if self._sorted_entries is None:
+            self._sorted_entries = sorted(self._entries.values(), key=lambda e: e.ps_id)
+        return self._sorted_entries
+
+    def add_rows(self, rows: Iterable) -> None:
+        # Pierwsze wypelnienie dopisuje do list w miejscu; pozniejsze zmiany
+        # podmieniaja listy na nowe, zeby rownolegle dopasowania iterowaly
+        # po spojnej kopii.
+        in_place = not self._entries
+        changed = False
+        for row in rows:
+            entry = IndexedProductSize.from_row(row)
+            if entry.ps_id in self._entries:
+                self._remove_entry(self._entries[entry.ps_id])
+            self._add_entry(entry, in_place=in_place)
+            changed = True
+        if changed:
+            self._changed()
+
+    def replace_products(self, product_ids: Iterable[int], rows: Iterable) -> None:
+        """Podmien wpisy wskazanych produktow na ``rows`` (aktualne z bazy)."""
+        for product_id in set(product_ids):
+            for ps_id in list(self._by_product.get(product_id, ())):
+                self._remove_entry(self._entries[ps_id])
+        self._changed()
+        self.add_rows(rows)
+
+    def _changed(self) -> None:
+        self._memo.clear()
+        self._sorted_entries = None
+
+    def _buckets_for(self, entry: IndexedProductSize):
+        yield self._by_name_size, (entry.name, entry.size)
+        yield self._by_size, entry.size_upper
+        for key in entry.name_keys:
+            yield self._by_size_name_key, (entry.size_upper, key)
+        if entry.series_norm:
+            yield self._by_size_series, (entry.size_upper, entry.series_norm)
+        yield self._by_size_category_color, (
+            entry.size_upper,
+            entry.category.lower(),
+            entry.color_key,
+        )
+        if entry.series:
+            yield self._by_series, entry.series
+        yield self._by_model_series_size, (entry.model_series, entry.size_upper)
+        for keyword in entry.keywords:
+            yield self._by_keyword, keyword
+
+    def _add_entry(self, entry: IndexedProductSize, *, in_place: bool) -> None:
+        self._entries[entry.ps_id] = entry
+        self._by_product.setdefault(entry.product_id, []).append(entry.ps_id)
+        if entry.barcode:
+            self._by_barcode[entry.barcode] = entry
+        for bucket, key in self._buckets_for(entry):
+            items = bucket.get(key)
+            if items is None:
+                bucket[key] = [entry]
+            elif in_place and items[-1].ps_id < entry.ps_id:
+                items.append(entry)
+            else:
+                bucket[key] = sorted((*items, entry), key=lambda e: e.ps_id)
+
+    def _remove_entry(self, entry: IndexedProductSize) -> None:
+        self._entries.pop(entry.ps_id, None)
+        product_entries = self._by_product.get(entry.product_id)
+        if product_entries is not None:
+            product_entries.remove(entry.ps_id)
+            if not product_entries:
+                del self._by_product[entry.product_id]
+        if entry.barcode and self._by_barcode.get(entry.barcode) is entry:
+            del self._by_barcode[entry.barcode]
+        for bucket, key in self._buckets_for(entry):
+            items = bucket.get(key)
+            if not items:
+                continue
+            remaining = [item for item in items if item.ps_id != entry.ps_id]
+            if remaining:
+                bucket[key] = remaining
+            else:
+                del bucket[key]
+
+    # ------------------------------------------------------------------
+    # Odczyty
+    # ------------------------------------------------------------------
+    def get(self, ps_id: int) -> Optional[IndexedProductSize]:
+        return self._entries.get(ps_id)
+
+    def by_barcode(self, barcode: Optional[str]) -> Optional[IndexedProductSize]:
+        if not barcode:
+            return None
+        return self._by_barcode.get(barcode)
+
+    def by_name_and_size(self, name: str, size: str) -> list[IndexedProductSize]:
+        """Rozmiary o dokladnie takiej nazwie produktu i rozmiarze."""
+        return list(self._by_name_size.get((name, size), ()))
+
+    def match(self, name: str, color: str, size: str) -> Optional[IndexedProductSize]:
+        """Dopasuj pozycje zamowienia/oferty (nazwa, kolor, rozmiar) do rozmiaru."""
+        key = (name, color, size)
+        ps_id = self._memo.get(key)
+        if ps_id is not None:
+            return self._entries.get(ps_id)
+        entry = self._match(name, color, size)
+        if entry is not None:
+            if len(self._memo) >= _MATCH_MEMO_LIMIT:
+                self._memo.clear()
+            self._memo[key] = entry.ps_id
+        return entry
+
+    def _match(self, name: str, color: str, size: str) -> Optional[IndexedProductSize]:
+        color_norm = _normalize_color_key(color)
+        canonical_size = normalize_size_token(size) or size
+        size_upper = (canonical_size.upper() if canonical_size else size) or ""
+        parsed_name_keys = _normalized_name_keys(name)
+
+        def valid_mode(entry: IndexedProductSize) -> bool:
+            # A legacy phantom "Uniwersalny" row must never capture an item of a
+            # product that is explicitly configured as sized.
+            return not (size_upper == "UNIWERSALNY" and entry.sizing_mode == "sized")
+
+        def color_ok(entry: IndexedProductSize) -> bool:
+            return not color_norm or entry.color_key == color_norm
+
+        def first(candidates) -> Optional[IndexedProductSize]:
+            return min(candidates, key=lambda e: e.ps_id, default=None)
+
+        if name and size:
+            found = first(
+                entry
+                for key in parsed_name_keys
+                for entry in self._by_size_name_key.get((size_upper, key), ())
+                if valid_mode(entry) and color_ok(entry)
+            )
+            if found:
+                return found
+
+        candidates = self._by_size.get(size_upper, ())
+        series = _extract_series_from_name(name)
+        series_norm = _strip_diacritics_ord(series).lower() if series else ""
+
+        if series_norm:
+            found = first(
+                entry
+                for entry in self._by_size_series.get((size_upper, series_norm), ())
+                if valid_mode(entry) and color_ok(entry)
+            )
+            if found:
+                return found
+
+            def series_related(entry: IndexedProductSize) -> bool:
+                db_series = entry.series_norm
+                return bool(db_series) and (
+                    db_series in series_norm or series_norm in db_series
+                )
+
+            found = first(
+                entry
+                for entry in candidates
+                if valid_mode(entry) and series_related(entry) and color_ok(entry)
+            )
+            if found:
+                return found
+
+            if not color_norm:
+                series_matches = [
+                    entry
+                    for entry in candidates
+                    if valid_mode(entry)
+                    and series_related(entry)
+                    and parsed_name_keys & entry.name_keys
+                ]
+                if len(series_matches) == 1:
+                    return series_matches[0]
+
+        # Smycz bez serii w tytule: dopasuj po kolorze gdy jest jednoznacznie.
+        if parsed_name_keys & _SMYCZ_NAME_KEYS and color_norm:
+            smycz_matches = [
+                entry
+                for entry in self._by_size_category_color.get(
+                    (size_upper, "smycz", color_norm), ()
+                )
+                if valid_mode(entry)
+            ]
+            if len(smycz_matches) == 1:
+                return smycz_matches[0]
+
+        # Saszetki Standard w magazynie tylko w rozmiarze M.
+        if size_upper == "UNIWERSALNY" and parsed_name_keys & _SASZETKI_NAME_KEYS:
+            found = first(
+                entry
+                for key in parsed_name_keys
+                for entry in self._by_size_name_key.get(("M", key), ())
+                if color_ok(entry)
+            )
+            if found:
+                return found
+
+        # Smycz Active Pro+ bez rozmiaru w tytule.
+        if parsed_name_keys & _ACTIVE_PRO_NAME_KEYS and color_norm:
+            pro_matches = [
+                entry
+                for entry in self._by_series.get(_ACTIVE_PRO_SERIES, ())
+                if entry.color_key == color_norm
+            ]
+            if len(pro_matches) == 1:
+                return pro_matches[0]
+            for preferred_size in ("L", "M", "S"):
+                sized = [entry for entry in pro_matches if entry.size_upper == preferred_size]
+                if len(sized) == 1:
+                    return sized[0]
+
+        return None
+
+    def sku_candidates(self, sku: str) -> list[IndexedProductSize]:
+        """Rozmiary o serii i rozmiarze z SKU TipTop (kandydaci dla faktury)."""
+        parsed = _parse_tiptop_sku(sku)
+        if not parsed or not parsed.get("series"):
+            return []
+        key = (parsed["series"], parsed.get("size", "").upper())
+        return list(self._by_model_series_size.get(key, ()))
+
+    def fuzzy_candidates(self, name: str) -> list[IndexedProductSize]:
+        """Rozmiary majace co najmniej jedno slowo kluczowe wspolne z nazwa."""
+        found: dict[int, IndexedProductSize] = {}
+        for keyword in _normalize_name(name):
+            for entry in self._by_keyword.get(keyword, ()):
+                found[entry.ps_id] = entry
+        return [found[ps_id] for ps_id in sorted(found)]
+
+
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def load_index_rows(db, product_ids: Optional[Iterable[int]] = None) -> list:
+    """Wiersze rozmiarow z cechami produktu potrzebnymi do indeksu."""
+    query = db.query(
+        ProductSize.id.label("ps_id"),
+        ProductSize.product_id.label("product_id"),
+        ProductSize.size,
+        ProductSize.barcode,
+        Product.name.label("name"),
+        Product._name.label("raw_name"),
+        Product.category,
+        Product.series,
+        Product.color,
+        Product.sizing_mode,
+    ).join(Product, ProductSize.product_id == Product.id)
+    if product_ids is not None:
+        query = query.filter(ProductSize.product_id.in_(list(product_ids)))
+    return query.order_by(ProductSize.id).all()
+
+
+def load_index_version(db) -> tuple:
+    """Tania wersja tabel produktow: (max ID, liczba) rozmiarow i produktow."""
+    return tuple(db.execute(select(
+        select(func.max(ProductSize.id)).scalar_subquery(),
+        select(func.count(ProductSize.id)).scalar_subquery(),
+        select(func.max(Product.id)).scalar_subquery(),
+        select(func.count(Product.id)).scalar_subquery(),
+    )).one())
+
+
+class _SharedIndex:
+    """Indeks procesu z leniwym, przyrostowym odswiezaniem."""
+
+    def __init__(self) -> None:
+        self._lock = RLock()
+        self._index: Optional[ProductMatchIndex] = None
+        self._bind = None
+        self._built_at = 0.0
+        self._version: Optional[tuple] = None
+        self._full_rebuild = True
+        self._dirty_products: set[int] = set()
+
+    def invalidate(self, product_ids: Optional[Iterable[int]] = None) -> None:
+        with self._lock:
+            if product_ids is None:
+                self._full_rebuild = True
+            else:
+                self._dirty_products.update(product_ids)
+
+    def get(self, db, *, check_version: bool = False) -> ProductMatchIndex:
+        max_age = _env_seconds("PRODUCT_MATCH_INDEX_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+        bind = db.get_bind()
+        with self._lock:
+            now = time.monotonic()
+            version = load_index_version(db) if check_version else None
+            if (
+                self._index is None
+                or self._full_rebuild
+                or bind is not self._bind
+                or now - self._built_at >= max_age
+                or (check_version and version != self._version)
+            ):
+                started = time.perf_counter()
+                self._dirty_products.clear()
+                self._full_rebuild = False
+                # Wersja czytana przed wierszami - wszystko, co obejmuje,
+                # trafia tez do indeksu.
+                self._version = version if check_version else load_index_version(db)
+                self._index = ProductMatchIndex(load_index_rows(db))
+                self._bind = bind
+                self._built_at = now
+                logger.debug(
+                    "Product match index built: %d sizes in %.3fs",
+                    len(self._index),
+                    time.perf_counter() - started,
+                )
+            elif self._dirty_products:
+                product_ids = set(self._dirty_products)
+                self._dirty_products.clear()
+                self._index.replace_products(
+                    product_ids, load_index_rows(db, product_ids)
+                )
+            return self._index
+
+
+_shared = _SharedIndex()
+
+
+def get_product_match_index(db=None, *, check_version: bool = False) -> ProductMatchIndex:
+    """Zwroc aktualny indeks procesu (``db`` - sesja do ewentualnego przeladowania).
+
+    ``check_version`` - przebuduj indeks, gdy w bazie przybylo (lub ubylo)
+    produktow od ostatniej przebudowy; do powtorki po nieudanym dopasowaniu.
+    """
+    if db is not None:
+        return _shared.get(db, check_version=check_version)
+    from ..db import get_session
+
+    with get_session() as session:
+        return _shared.get(session, check_version=check_version)
+
+
+def invalidate_product_match_index(product_ids: Optional[Iterable[int]] = None) -> None:
+    """Oznacz produkty (albo caly indeks, gdy ``None``) do przeladowania."""
+    _shared.invalidate(product_ids)
+
+
+def _changes_indexed_attrs(obj, attrs: tuple[str, ...]) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _changed_product_ids(session: Session) -> set[int]:
+    product_ids: set[int] = set()
+    for obj in (*session.new, *session.deleted):
+        if isinstance(obj, Product) and obj.id is not None:
+            product_ids.add(obj.id)
+        elif isinstance(obj, ProductSize) and obj.product_id is not None:
+            product_ids.add(obj.product_id)
+    # Zmiany stanow (quantity, stock_value) nie dotycza indeksu.
+    for obj in session.dirty:
+        if isinstance(obj, Product):
+            if obj.id is not None and _changes_indexed_attrs(obj, _PRODUCT_ATTRS):
+                product_ids.add(obj.id)
+        elif isinstance(obj, ProductSize):
+            if obj.product_id is not None and _changes_indexed_attrs(obj, _SIZE_ATTRS):
+                product_ids.add(obj.product_id)
+                previous = inspect(obj).attrs.product_id.history.deleted
+                product_ids.update(pid for pid in previous or () if pid is not None)
+    return product_ids
+
+
+@event.listens_for(Session, "after_flush")
+def _track_product_changes(session, flush_context) -> None:
+    product_ids = _changed_product_ids(session)
+    if not product_ids:
+        return
+    session.info.setdefault(_SESSION_INFO_KEY, set()).update(product_ids)
+    _shared.invalidate(product_ids)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reload_after_transaction(session) -> None:
+    # Inne sesje mogly przeladowac produkty przed commitem (widzac stare
+    # dane) - po zakonczeniu transakcji oznacz je ponownie.
+    product_ids = session.info.pop(_SESSION_INFO_KEY, None)
+    if product_ids:
+        _shared.invalidate(product_ids)
+
+
+__all__ = [
+    "IndexedProductSize",
+    "ProductMatchIndex",
+    "get_product_match_index",
+    "invalidate_product_match_index",
+    "load_index_rows",
+    "load_index_version",
+]
@@ -0,0 +1,219 @@
+"""Harmonogram odswiezania zapisanego zysku zamowien (``orders.next_profit_check_at``).
+
+Cykl odswiezania bierze tylko niefinalne zamowienia, ktorych termin minal
+(NULL = od razu), zamiast przeliczac wszystkie otwarte zamowienia za kazdym
+razem. Po przeliczeniu termin przesuwa sie wykladniczo wraz z wiekiem
+zamowienia, z mnoznikiem zaleznym od ostatniego statusu (przed wysylka i po
+doreczeniu oplaty zmieniaja sie rzadko). Zamowienia starsze niz horyzont
+rozliczenia sa zamrazane (``FROZEN_AT``).
+
+Zdarzenia, po ktorych zysk moze sie zmienic - nowe wpisy billingowe, zmiana
+statusu, zwrot - ustawiaja termin na "teraz" (takze dla zamrozonych, na jedno
+przeliczenie). Glebokosc kolejki i opoznienie najstarszego zaleglego
+zamowienia trafiaja do metryk Prometheus.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import DateTime, event, func, inspect, or_, update
+
+from ..metrics import PROFIT_REFRESH_LAG_SECONDS, PROFIT_REFRESH_QUEUE_DEPTH
+from ..models.orders import Order, OrderStatusLog
+from ..models.returns import Return
+from ..status_config import STATUS_HIERARCHY
+
+logger = logging.getLogger(__name__)
+
+BASE_DELAY = timedelta(minutes=15)
+MAX_DELAY = timedelta(days=1)
+# Po tym czasie od zlozenia zamowienia Allegro/Woo nie dopisuja juz oplat.
+SETTLEMENT_HORIZON = timedelta(days=45)
+FROZEN_AT = datetime(9999, 12, 31)
+MAX_ORDERS_PER_CYCLE = 500
+_IN_CHUNK_SIZE = 500
+
+# Mnoznik opoznienia wg ostatniego statusu: oplaty za wysylke pojawiaja sie
+# po nadaniu, a zmiana statusu i tak wymusza przeliczenie.
+_STATUS_DELAY_FACTORS = {
+    "pobrano": 2,
+    "nieoplacone": 4,
+    "wydrukowano": 2,
+    "spakowano": 2,
+    "wyslano": 1,
+    "w_transporcie": 1,
+    "w_punkcie": 1,
+    "dostarczono": 2,
+}
+_PROBLEM_STATUS_FACTOR = 4
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def refreshable_filters() -> tuple:
+    """Zamowienia Allegro/Woo oplacone (lub COD) bez finalnego zysku."""
+    return (
+        or_(Order.order_id.like("allegro_%"), Order.order_id.like("woo_%")),
+        or_(
+            Order.real_profit_amount.is_(None),
+            Order.real_profit_is_final.is_(False),
+            Order.real_profit_is_final.is_(None),
+        ),
+        or_(
+            Order.payment_done > 0,
+            Order.payment_method_cod.is_(True),
+        ),
+    )
+
+
+def _due_filter(now: datetime):
+    return or_(
+        Order.next_profit_check_at.is_(None),
+        Order.next_profit_check_at <= now,
+    )
+
+
+def _due_since():
+    # Zamowienia jeszcze nieharmonogramowane czekaja od utworzenia.
+    return func.coalesce(Order.next_profit_check_at, Order.created_at)
+
+
+def load_due_orders(db, *, now: Optional[datetime] = None, limit: int = MAX_ORDERS_PER_CYCLE) -> list:
+    """Zalegle zamowienia, najdluzej czekajace pierwsze."""
+    now = now or _utcnow()
+    return (
+        db.query(Order)
+        .filter(*refreshable_filters(), _due_filter(now))
+        .order_by(_due_since(), Order.order_id)
+        .limit(limit)
+        .all()
+    )
+
+
+def load_current_statuses(db, order_ids: Iterable[str]) -> dict[str, str]:
+    """Ostatni status kazdego zamowienia jednym zapytaniem."""
+    ids = list(dict.fromkeys(order_ids))
+    if not ids:
+        return {}
+    latest = (
+        db.query(
+            OrderStatusLog.order_id,
+            func.max(OrderStatusLog.timestamp).label("max_ts"),
+        )
+        .filter(OrderStatusLog.order_id.in_(ids))
+        .group_by(OrderStatusLog.order_id)
+        .subquery()
+    )
+    rows = (
+        db.query(OrderStatusLog.order_id, OrderStatusLog.status)
+        .join(
+            latest,
+            (OrderStatusLog.order_id == latest.c.order_id)
+            & (OrderStatusLog.timestamp == latest.c.max_ts),
+        )
+        .all()
+    )
+    return {order_id: status for order_id, status in rows}
+
+
+def next_check_at(
+    order,
+    status: Optional[str],
+    *,
+    final: bool = False,
+    now: Optional[datetime] = None,
+) -> datetime:
+    """Kolejny termin przeliczenia zysku zamowienia."""
+    now = now or _utcnow()
+    if final:
+        return FROZEN_AT
+
+    date_add = getattr(order, "date_add", None)
+    age = timedelta(0)
+    if date_add:
+        placed_at = datetime.fromtimestamp(int(date_add), timezone.utc).replace(tzinfo=None)
+        age = max(now - placed_at, timedelta(0))
+    if age >= SETTLEMENT_HORIZON:
+        return FROZEN_AT
+
+    # 0-1 dnia: BASE_DELAY, potem podwojenie przy kazdym podwojeniu wieku.
+    age_factor = 2 ** int(math.log2(age.days + 1))
+    if STATUS_HIERARCHY.get(status) == 999:
+        status_factor = _PROBLEM_STATUS_FACTOR
+    else:
+        status_factor = _STATUS_DELAY_FACTORS.get(status, 1)
+    return now + min(BASE_DELAY * age_factor * status_factor, MAX_DELAY)
+
+
+def update_queue_metrics(db, *, now: Optional[datetime] = None) -> dict[str, float]:
+    """Ustaw metryki glebokosci i opoznienia kolejki; zwraca je tez w slowniku."""
+    now = now or _utcnow()
+    due, oldest = (
+        db.query(func.count(Order.order_id), func.min(_due_since(), type_=DateTime))
+        .filter(*refreshable_filters(), _due_filter(now))
+        .one()
+    )
+    lag = max((now - oldest).total_seconds(), 0.0) if oldest else 0.0
+    PROFIT_REFRESH_QUEUE_DEPTH.set(due)
+    PROFIT_REFRESH_LAG_SECONDS.set(lag)
+    return {"due": int(due), "lag_seconds": round(lag, 1)}
+
+
+def invalidate_profit_schedule(
+    bind,
+    *,
+    order_ids: Iterable[str] = (),
+    external_order_ids: Iterable[str] = (),
+    now: Optional[datetime] = None,
+) -> None:
+    """Ustaw termin przeliczenia na teraz (``bind`` to sesja lub polaczenie)."""
+    now = now or _utcnow()
+    targets = (
+        (Order.order_id, [value for value in dict.fromkeys(order_ids) if value]),
+        (Order.external_order_id, [value for value in dict.fromkeys(external_order_ids) if value]),
+    )
+    for column, values in targets:
+        for start in range(0, len(values), _IN_CHUNK_SIZE):
+            bind.execute(
+                update(Order.__table__)
+                .where(
+                    column.in_(values[start:start + _IN_CHUNK_SIZE]),
+                    or_(
+                        Order.next_profit_check_at.is_(None),
+                        Order.next_profit_check_at > now,
+                    ),
+                )
+                .values(next_profit_check_at=now)
+            )
+
+
+@event.listens_for(OrderStatusLog, "after_insert")
+def _status_changed(mapper, connection, target) -> None:
+    invalidate_profit_schedule(connection, order_ids=[target.order_id])
+
+
+@event.listens_for(Return, "after_insert")
+@event.listens_for(Return, "after_update")
+def _return_changed(mapper, connection, target) -> None:
+    state = inspect(target)
+    if state.attrs.status.history.has_changes() or state.attrs.order_id.history.has_changes():
+        invalidate_profit_schedule(connection, order_ids=[target.order_id])
+
+
+__all__ = [
+    "FROZEN_AT",
+    "MAX_ORDERS_PER_CYCLE",
+    "SETTLEMENT_HORIZON",
+    "invalidate_profit_schedule",
+    "load_current_statuses",
+    "load_due_orders",
+    "next_check_at",
+    "refreshable_filters",
+    "update_queue_metrics",
+]
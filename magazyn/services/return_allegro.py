@@ -6,8 +6,7 @@ import json
 import logging
 from typing import Dict, Optional
 
-import requests
-
+from .. import http_transport
 from ..db import get_session
 from ..domain.returns import (
     RETURN_STATUS_CANCELLED,
@@ -46,7 +45,7 @@ def _fetch_recent_customer_returns(
     limit. Zeby dostac najnowsze, czytamy laczna liczbe zwrotow z pola `count`
     i pobieramy ostatnia strone (`offset = count - limit`).
     """
-    probe = requests.get(
+    probe = http_transport.get_session(http_transport.ALLEGRO).get(
         _CUSTOMER_RETURNS_URL,
         headers=headers,
         params={"limit": 1, "offset": 0},
@@ -56,7 +55,7 @@ def _fetch_recent_customer_returns(
     count = probe.json().get("count") or 0
 
     offset = max(0, count - limit)
-    response = requests.get(
+    response = http_transport.get_session(http_transport.ALLEGRO).get(
         _CUSTOMER_RETURNS_URL,
         headers=headers,
         params={"limit": limit, "offset": offset},
@@ -290,7 +289,7 @@ def track_return_parcel(return_id: int, *, log: Optional[logging.Logger] = None)
                 "Accept": "application/vnd.allegro.public.v1+json",
                 "User-Agent": ALLEGRO_USER_AGENT,
             }
-            response = requests.get(
+            response = http_transport.get_session(http_transport.ALLEGRO).get(
                 f"https://api.allegro.pl/order/carriers/{carrier_id}/tracking",
                 headers=headers,
                 params={"waybill": return_record.return_tracking_number},
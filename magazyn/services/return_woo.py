@@ -7,8 +7,7 @@ import hmac
 import logging
 from typing import Any, Dict, List, Optional
 
-import requests
-
+from .. import http_transport
 from ..db import get_session
 from ..domain.returns import RETURN_STATUS_PENDING
 from ..models.orders import Order
@@ -175,7 +174,7 @@ def _poll_withdrawals_from_wp(
         return []
     url = f"{base}/wp-json/retrievershop/v1/withdrawals"
     try:
-        response = requests.get(
+        response = http_transport.get_session(http_transport.WOOCOMMERCE).get(
             url,
             params={"after_id": after_id, "limit": limit},
             headers={
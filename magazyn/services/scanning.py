@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import json
 import logging
-import re
 import time
 from collections import Counter
 from dataclasses import dataclass
@@ -16,6 +15,7 @@ from ..db import db_connect, get_session
 from ..models.orders import OrderProduct, OrderStatusLog
 from ..models.printing import PrintedOrder, ScanLog
 from ..services.order_status import add_order_status
+from .order_barcodes import barcode_scan_candidates, find_order_id_for_barcode
 
 
 logger = logging.getLogger(__name__)
@@ -49,68 +49,6 @@ def parse_last_order_data(raw: Any) -> dict[str, Any]:
     return parsed if isinstance(parsed, dict) else {}
 
 
-def barcode_scan_candidates(barcode: str) -> list[str]:
-    """Rozszerz kod skanera o warianty używane na etykietach przewoźników."""
-    barcode = barcode.strip()
-    if not barcode:
-        return []
-
-    candidates = [barcode]
-    if "+" in barcode:
-        upper = barcode.upper()
-        if upper.startswith("2L"):
-            # Routing DHL/Orlen: unikalny jest prefiks przed '+', sufiks bywa wspólny.
-            prefix = barcode.split("+", 1)[0].strip()
-            if prefix:
-                candidates.append(prefix)
-        else:
-            for part in barcode.split("+"):
-                part = part.strip()
-                if part:
-                    candidates.append(part)
-
-    if barcode.upper().startswith("JJD"):
-        digits = re.sub(r"\D", "", barcode)
-        if digits:
-            candidates.append(digits)
-            if len(digits) >= 11:
-                candidates.append(digits[-11:])
-
-    seen: set[str] = set()
-    unique: list[str] = []
-    for candidate in candidates:
-        if candidate not in seen:
-            seen.add(candidate)
-            unique.append(candidate)
-    return unique
-
-
-def barcode_matches_order(order_data: dict[str, Any], barcode: str) -> bool:
-    """Sprawdź, czy kod z etykiety pasuje do zapisanych danych zamówienia."""
-    package_ids = order_data.get("package_ids") or []
-    tracking_numbers = [str(value) for value in (order_data.get("tracking_numbers") or [])]
-    delivery_package_nr = str(order_data.get("delivery_package_nr") or "").strip()
-
-    for candidate in barcode_scan_candidates(barcode):
-        if candidate in package_ids or candidate in tracking_numbers:
-            return True
-        if delivery_package_nr and candidate == delivery_package_nr:
-            return True
-
-        for tracking_number in tracking_numbers:
-            tracking_number = str(tracking_number or "")
-            if len(tracking_number) >= 6 and tracking_number in candidate:
-                return True
-            if len(candidate) >= 6 and candidate in tracking_number:
-                return True
-
-        if delivery_package_nr and len(delivery_package_nr) >= 6:
-            if delivery_package_nr in candidate or candidate in delivery_package_nr:
-                return True
-
-    return False
-
-
 def record_scan_event(
     scan_type: str,
     barcode: str,
@@ -265,7 +203,12 @@ def check_and_auto_pack(
 
 
 def load_order_for_barcode(barcode: str) -> tuple[Optional[str], Optional[dict[str, Any]]]:
-    """Wczytaj zamówienie dla kodu etykiety lub numeru śledzenia."""
+    """Wczytaj zamówienie dla kodu etykiety lub numeru śledzenia.
+
+    Kod jest rozwiązywany przez indeks ``order_barcodes`` (jedno zapytanie po
+    unikalnym indeksie), a dane zamówienia czytane po kluczu z
+    ``printed_orders`` lub z kolejki etykiet.
+    """
     barcode = barcode.strip()
     matched_order_id = None
     order_data = None
@@ -277,25 +220,27 @@ def load_order_for_barcode(barcode: str) -> tuple[Optional[str], Optional[dict[s
             order_data = parse_last_order_data(direct.last_order_data)
 
         if not order_data:
-            for printed_order in db_session.query(PrintedOrder).all():
-                data = parse_last_order_data(printed_order.last_order_data)
-                if barcode_matches_order(data, barcode):
-                    matched_order_id = printed_order.order_id
-                    order_data = data
-                    break
+            matched_order_id = find_order_id_for_barcode(db_session, barcode)
+            if matched_order_id:
+                printed_order = db_session.get(PrintedOrder, matched_order_id)
+                if printed_order:
+                    order_data = parse_last_order_data(printed_order.last_order_data)
 
     if order_data:
         return matched_order_id, order_data
 
+    queue_order_id = matched_order_id or barcode
     try:
         with db_connect() as conn:
-            rows = conn.execute(
-                text("SELECT order_id, last_order_data FROM label_queue")
-            ).fetchall()
-            for order_id, data_json in rows:
-                data = parse_last_order_data(data_json)
-                if barcode == order_id or barcode_matches_order(data, barcode):
-                    return order_id, data
+            row = conn.execute(
+                text(
+                    "SELECT order_id, last_order_data FROM label_queue "
+                    "WHERE order_id = :oid LIMIT 1"
+                ),
+                {"oid": queue_order_id},
+            ).fetchone()
+            if row:
+                return row[0], parse_last_order_data(row[1])
     except Exception as exc:
         logger.debug("Nie udało się sprawdzić kolejki etykiet dla kodu %s: %s", barcode, exc)
 
@@ -398,7 +343,6 @@ __all__ = [
     "AUTO_PACK_SCAN_TTL_SECONDS",
     "AUTO_PACK_TARGET_STATUS",
     "AutoPackResult",
-    "barcode_matches_order",
     "barcode_scan_candidates",
     "check_and_auto_pack",
     "load_order_for_barcode",
@@ -58,6 +58,10 @@ SETTINGS_GROUPS = {
     "PRINTER_NAME": ("Drukowanie", "bi-printer"),
     "CUPS_SERVER": ("Drukowanie", "bi-printer"),
     "CUPS_PORT": ("Drukowanie", "bi-printer"),
+    "PRINT_TRANSPORT": ("Drukowanie", "bi-printer"),
+    "PRINT_MAX_IN_FLIGHT": ("Drukowanie", "bi-printer"),
+    "LABEL_STORE_DIR": ("Drukowanie", "bi-printer"),
+    "LABEL_STORE_MAX_MB": ("Drukowanie", "bi-printer"),
     "POLL_INTERVAL": ("Drukowanie", "bi-printer"),
     "QUIET_HOURS_START": ("Drukowanie", "bi-printer"),
     "QUIET_HOURS_END": ("Drukowanie", "bi-printer"),
@@ -3,30 +3,27 @@
 from __future__ import annotations
 
 from .stats_endpoint_context import (
+    _EXPORT_FORMATS,
     AllegroOffer,
     AllegroPriceHistory,
-    Order,
-    OrderProduct,
     PriceReportItem,
     _build_cache_key,
     _cache_get,
     _cache_set,
     _endpoint_name,
     _export_table,
-    _fetch_orders,
     _format_filters,
-    _json_error,
+    _invalid_export_format,
+    _order_facts,
     _parse_filters,
     _record_telemetry,
     _telemetry_stats,
     _to_ts,
-    case,
     datetime,
     defaultdict,
     func,
     get_session,
     jsonify,
-    or_,
     request,
     time,
     timezone,
@@ -40,8 +37,8 @@ def stats_products():
         return err
 
     export_format = (request.args.get("format") or "").strip().lower()
-    if export_format and export_format not in {"csv", "xlsx"}:
-        return _json_error("INVALID_EXPORT_FORMAT", "Dozwolone formaty eksportu: csv, xlsx")
+    if export_format and export_format not in _EXPORT_FORMATS:
+        return _invalid_export_format()
 
     cache_key = "products|" + _build_cache_key(filters)
     if not export_format:
@@ -59,60 +56,33 @@ def stats_products():
     start_ts = _to_ts(filters.date_from)
     end_ts = _to_ts(filters.date_to)
 
-    with get_session() as db:
-        orders = _fetch_orders(db, filters, start_ts, end_ts)
-        order_ids = [o.order_id for o in orders]
-
-        rows = []
-        if order_ids:
-            rows = (
-                db.query(
-                    OrderProduct.ean,
-                    OrderProduct.name,
-                    func.sum(OrderProduct.quantity).label("items"),
-                    func.sum(OrderProduct.price_brutto * OrderProduct.quantity).label("gross"),
-                    func.count(func.distinct(OrderProduct.order_id)).label("orders_count"),
-                    func.sum(
-                        case(
-                            (
-                                or_(
-                                    Order.payment_method_cod.is_(True),
-                                    func.lower(func.coalesce(Order.payment_method, "")).like("%pobranie%"),
-                                ),
-                                1,
-                            ),
-                            else_=0,
-                        )
-                    ).label("cod_orders"),
-                )
-                .join(Order, Order.order_id == OrderProduct.order_id)
-                .filter(OrderProduct.order_id.in_(order_ids))
-                .group_by(OrderProduct.ean, OrderProduct.name)
-                .all()
-            )
+    facts = _order_facts()
+    groups = facts.line_groups(
+        facts.select(start_ts, end_ts, platform=filters.platform, payment_type=filters.payment_type)
+    )
 
-        result_rows = []
-        for row in rows:
-            total_orders = int(row.orders_count or 0)
-            cod_orders = int(row.cod_orders or 0)
-            cod_share = (cod_orders / total_orders * 100) if total_orders else 0
-            recommendation = "hold"
-            if total_orders >= 5 and cod_share < 25:
-                recommendation = "raise_2pct"
-            elif cod_share > 60:
-                recommendation = "review_margin"
-
-            result_rows.append(
-                {
-                    "ean": row.ean or "",
-                    "name": row.name or "",
-                    "items_sold": int(row.items or 0),
-                    "revenue_gross": float(row.gross or 0),
-                    "orders": total_orders,
-                    "cod_share": round(cod_share, 2),
-                    "repricing_recommendation": recommendation,
-                }
-            )
+    result_rows = []
+    for group in groups:
+        total_orders = group.orders
+        cod_orders = group.cod_lines
+        cod_share = (cod_orders / total_orders * 100) if total_orders else 0
+        recommendation = "hold"
+        if total_orders >= 5 and cod_share < 25:
+            recommendation = "raise_2pct"
+        elif cod_share > 60:
+            recommendation = "review_margin"
+
+        result_rows.append(
+            {
+                "ean": group.ean or "",
+                "name": group.name or "",
+                "items_sold": group.items,
+                "revenue_gross": float(group.gross),
+                "orders": total_orders,
+                "cod_share": round(cod_share, 2),
+                "repricing_recommendation": recommendation,
+            }
+        )
 
     result_rows.sort(key=lambda x: x["revenue_gross"], reverse=True)
 
@@ -152,8 +122,8 @@ def stats_competition():
         return err
 
     export_format = (request.args.get("format") or "").strip().lower()
-    if export_format and export_format not in {"csv", "xlsx"}:
-        return _json_error("INVALID_EXPORT_FORMAT", "Dozwolone formaty eksportu: csv, xlsx")
+    if export_format and export_format not in _EXPORT_FORMATS:
+        return _invalid_export_format()
 
     cache_key = "competition|" + _build_cache_key(filters)
     if not export_format:
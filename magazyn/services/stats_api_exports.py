@@ -0,0 +1,46 @@
+"""Strumieniowe eksporty API statystyk."""
+
+from __future__ import annotations
+
+from .stats_endpoint_context import (
+    _EXPORT_FORMATS,
+    _export_table,
+    _invalid_export_format,
+    _iter_order_export_rows,
+    _parse_filters,
+    _to_ts,
+    get_session,
+    logger,
+    request,
+    time,
+)
+
+
+def stats_orders_export():
+    filters, err = _parse_filters()
+    if err:
+        return err
+
+    export_format = (request.args.get("format") or "csv").strip().lower()
+    if export_format not in _EXPORT_FORMATS:
+        return _invalid_export_format()
+
+    start_ts = _to_ts(filters.date_from)
+    end_ts = _to_ts(filters.date_to)
+
+    def rows():
+        # Sesja zyje tyle, co wysylka odpowiedzi - kursor czyta porcjami.
+        started_at = time.perf_counter()
+        exported = 0
+        with get_session() as db:
+            for row in _iter_order_export_rows(db, filters, start_ts, end_ts):
+                exported += 1
+                yield row
+        logger.info(
+            "Stats orders export done: format=%s rows=%s elapsed_ms=%.1f",
+            export_format,
+            exported,
+            (time.perf_counter() - started_at) * 1000,
+        )
+
+    return _export_table(rows(), "stats-orders", export_format)
@@ -3,12 +3,13 @@
 from __future__ import annotations
 
 from .stats_endpoint_context import (
+    _EXPORT_FORMATS,
     AllegroOffer,
     Decimal,
     FinancialCalculator,
     OrderProduct,
     Return,
-    _bucket_key,
+    _aggregate_orders,
     _build_cache_key,
     _cache_get,
     _cache_set,
@@ -16,14 +17,15 @@ from .stats_endpoint_context import (
     _export_table,
     _fetch_orders,
     _format_filters,
-    _is_cod,
+    _invalid_export_format,
     _json_error,
-    _order_products_map,
-    _order_revenue,
+    _order_facts,
+    _order_facts_warm,
     _parse_filters,
     _pct_change,
     _period_offsets,
     _record_telemetry,
+    _supports_push_down,
     _telemetry_stats,
     _to_ts,
     _upsert_billing_types,
@@ -65,40 +67,30 @@ def stats_overview():
     wow_prev_end = wow_start
     wow_prev_start = wow_start - 7 * 86400
 
+    facts = _order_facts()
+    with get_session() as db:
+        active_return_ids = [
+            row.order_id
+            for row in db.query(Return.order_id).filter(Return.status != "cancelled")
+        ]
+
     def _agg(start_ts: int, end_ts: int) -> dict:
-        with get_session() as db:
-            orders = _fetch_orders(db, filters, start_ts, end_ts)
-            order_ids = [o.order_id for o in orders]
-            products_map = _order_products_map(db, order_ids)
-
-            revenue_gross = Decimal("0")
-            items_sold = 0
-            cod_orders = 0
-
-            for order in orders:
-                if _is_cod(order):
-                    cod_orders += 1
-                p = products_map.get(order.order_id, {"qty": 0, "gross": Decimal("0")})
-                items_sold += int(p["qty"])
-                revenue_gross += _order_revenue(order, products_map)
-
-            orders_count = len(orders)
-            aov = (revenue_gross / orders_count) if orders_count else Decimal("0")
-
-            active_returns = 0
-            if order_ids:
-                active_returns = (
-                    db.query(Return)
-                    .filter(Return.order_id.in_(order_ids), Return.status != "cancelled")
-                    .count()
-                )
-            returns_rate = (Decimal(str(active_returns)) / Decimal(str(orders_count)) * 100) if orders_count else Decimal("0")
-            cod_share = (Decimal(str(cod_orders)) / Decimal(str(orders_count)) * 100) if orders_count else Decimal("0")
+        mask = facts.select(
+            start_ts, end_ts, platform=filters.platform, payment_type=filters.payment_type
+        )
+        totals = facts.totals(mask)
+        revenue_gross = totals.revenue
+        orders_count = totals.orders
+        aov = (revenue_gross / orders_count) if orders_count else Decimal("0")
+
+        active_returns = facts.count_matching(mask, active_return_ids) if orders_count else 0
+        returns_rate = (Decimal(str(active_returns)) / Decimal(str(orders_count)) * 100) if orders_count else Decimal("0")
+        cod_share = (Decimal(str(totals.cod_orders)) / Decimal(str(orders_count)) * 100) if orders_count else Decimal("0")
 
         return {
             "revenue_gross": revenue_gross,
             "orders_count": Decimal(str(orders_count)),
-            "items_sold": Decimal(str(items_sold)),
+            "items_sold": Decimal(str(totals.items)),
             "aov": aov,
             "returns_rate": returns_rate,
             "cod_share": cod_share,
@@ -151,6 +143,54 @@ def stats_overview():
     return jsonify(payload)
 
 
+def _sales_aggregates(filters, current: tuple[int, int], previous: tuple[int, int]):
+    """Kubelki i sumy biezacego okresu, podzial platform i przychod poprzedniego.
+
+    Przy cieplym magazynie faktow liczone w pamieci; na zimno agregujemy
+    w bazie, zeby pierwsze zapytanie nie placilo za pelne ladowanie faktow.
+    """
+    if not _order_facts_warm():
+        with get_session() as db:
+            if _supports_push_down(db):
+                buckets = {row.key: row for row in _aggregate_orders(db, filters, *current)}
+                platform_counts = {
+                    row.key: row.orders
+                    for row in _aggregate_orders(db, filters, *current, group_by="platform")
+                }
+                totals = _aggregate_orders(db, filters, *current, group_by=None)[0]
+                prev_revenue = _aggregate_orders(db, filters, *previous, group_by=None)[0].revenue
+                return buckets, totals, prev_revenue, platform_counts
+
+    facts = _order_facts()
+    current_mask = facts.select(*current, platform=filters.platform, payment_type=filters.payment_type)
+    prev_mask = facts.select(*previous, platform=filters.platform, payment_type=filters.payment_type)
+    return (
+        facts.buckets(current_mask, filters.granularity),
+        facts.totals(current_mask),
+        facts.totals(prev_mask).revenue,
+        facts.count_by(current_mask, "platform"),
+    )
+
+
+def _period_totals(filters, periods: list[tuple[int, int]]) -> list:
+    """Sumy (zamowienia, przychod) dla kolejnych zakresow ``periods``."""
+    if not _order_facts_warm():
+        with get_session() as db:
+            if _supports_push_down(db):
+                return [
+                    _aggregate_orders(db, filters, start_ts, end_ts, group_by=None)[0]
+                    for start_ts, end_ts in periods
+                ]
+
+    facts = _order_facts()
+    return [
+        facts.totals(facts.select(
+            start_ts, end_ts, platform=filters.platform, payment_type=filters.payment_type
+        ))
+        for start_ts, end_ts in periods
+    ]
+
+
 def stats_sales():
     started_at = time.perf_counter()
     filters, err = _parse_filters()
@@ -170,46 +210,26 @@ def stats_sales():
         return jsonify(cached)
 
     current_start, current_end, prev_start, prev_end = _period_offsets(filters)
+    buckets, current_totals, prev_revenue, platform_counts = _sales_aggregates(
+        filters, (current_start, current_end), (prev_start, prev_end)
+    )
+    current_revenue = current_totals.revenue
 
-    with get_session() as db:
-        current_orders = _fetch_orders(db, filters, current_start, current_end)
-        prev_orders = _fetch_orders(db, filters, prev_start, prev_end)
-
-        current_ids = [o.order_id for o in current_orders]
-        prev_ids = [o.order_id for o in prev_orders]
-        current_products = _order_products_map(db, current_ids)
-        prev_products = _order_products_map(db, prev_ids)
-
-        buckets: dict[str, dict[str, Decimal | int]] = defaultdict(
-            lambda: {"revenue": Decimal("0"), "orders": 0, "items": 0}
-        )
-
-        for order in current_orders:
-            key = _bucket_key(order.date_add or current_start, filters.granularity)
-            buckets[key]["revenue"] = Decimal(str(buckets[key]["revenue"])) + _order_revenue(order, current_products)
-            buckets[key]["orders"] = int(buckets[key]["orders"]) + 1
-            buckets[key]["items"] = int(buckets[key]["items"]) + int(
-                current_products.get(order.order_id, {}).get("qty", 0)
-            )
-
-        current_revenue = sum((_order_revenue(o, current_products) for o in current_orders), Decimal("0"))
-        prev_revenue = sum((_order_revenue(o, prev_products) for o in prev_orders), Decimal("0"))
-
-        cod_count = sum(1 for o in current_orders if _is_cod(o))
-        online_count = len(current_orders) - cod_count
-        total_count = len(current_orders) or 1
+    cod_count = current_totals.cod_orders
+    online_count = current_totals.orders - cod_count
+    total_count = current_totals.orders or 1
 
-        allegro_count = sum(1 for o in current_orders if (o.platform or "") == "allegro")
-        shop_count = sum(1 for o in current_orders if (o.platform or "") == "shop")
-        ebay_count = sum(1 for o in current_orders if (o.platform or "") == "ebay")
-        manual_count = len(current_orders) - allegro_count - shop_count - ebay_count
+    allegro_count = platform_counts.get("allegro", 0)
+    shop_count = platform_counts.get("shop", 0)
+    ebay_count = platform_counts.get("ebay", 0)
+    manual_count = current_totals.orders - allegro_count - shop_count - ebay_count
 
     series = [
         {
             "bucket": key,
-            "revenue": float(value["revenue"]),
-            "orders": int(value["orders"]),
-            "items": int(value["items"]),
+            "revenue": float(value.revenue),
+            "orders": value.orders,
+            "items": value.items,
         }
         for key, value in sorted(buckets.items(), key=lambda x: x[0])
     ]
@@ -234,7 +254,7 @@ def stats_sales():
             },
             "summary": {
                 "revenue": float(current_revenue),
-                "orders": len(current_orders),
+                "orders": current_totals.orders,
                 "mom": _pct_change(current_revenue, prev_revenue),
             },
         },
@@ -280,26 +300,28 @@ def stats_profit():
         )
         return jsonify(cached)
 
-    with get_session() as db:
-        data_load_started_at = time.perf_counter()
-        orders = _fetch_orders(db, filters, int(filters.date_from.timestamp()), int(filters.date_to.timestamp()))
-        order_ids = [o.order_id for o in orders]
-        products_map = _order_products_map(db, order_ids)
-        prev_start, prev_end = int((filters.date_from - (filters.date_to - filters.date_from)).timestamp()), int(filters.date_from.timestamp())
-        prev_orders = _fetch_orders(db, filters, prev_start, prev_end)
-        prev_products = _order_products_map(db, [o.order_id for o in prev_orders])
-        logger.info(
-            "Stats profit db inputs loaded: trace=%s current_orders=%s prev_orders=%s current_order_products=%s prev_order_products=%s elapsed_ms=%.1f",
-            trace_label,
-            len(orders),
-            len(prev_orders),
-            len(products_map),
-            len(prev_products),
-            (time.perf_counter() - data_load_started_at) * 1000,
-        )
+    data_load_started_at = time.perf_counter()
+    prev_start, prev_end = int((filters.date_from - (filters.date_to - filters.date_from)).timestamp()), int(filters.date_from.timestamp())
+    wow_end = int(filters.date_to.timestamp())
+    wow_start = wow_end - 7 * 86400
+    wow_prev_end = wow_start
+    wow_prev_start = wow_start - 7 * 86400
+    current, prev, wow_cur, wow_prv = _period_totals(filters, [
+        (int(filters.date_from.timestamp()), int(filters.date_to.timestamp())),
+        (prev_start, prev_end),
+        (wow_start, wow_end),
+        (wow_prev_start, wow_prev_end),
+    ])
+    logger.info(
+        "Stats profit db inputs loaded: trace=%s current_orders=%s prev_orders=%s elapsed_ms=%.1f",
+        trace_label,
+        current.orders,
+        prev.orders,
+        (time.perf_counter() - data_load_started_at) * 1000,
+    )
 
-    current_revenue = sum((_order_revenue(o, products_map) for o in orders), Decimal("0"))
-    prev_revenue = sum((_order_revenue(o, prev_products) for o in prev_orders), Decimal("0"))
+    current_revenue = current.revenue
+    prev_revenue = prev.revenue
 
     access_token = settings_store.get("ALLEGRO_ACCESS_TOKEN")
     with get_session() as db2:
@@ -329,21 +351,8 @@ def stats_profit():
         {"name": "Zysk netto", "value": float(net_profit_cur), "cumulative": float(net_profit_cur)},
     ]
 
-    wow_end = int(filters.date_to.timestamp())
-    wow_start = wow_end - 7 * 86400
-    wow_prev_end = wow_start
-    wow_prev_start = wow_start - 7 * 86400
-
-    wow_orders = []
-    wow_prev_orders = []
-    with get_session() as db:
-        wow_orders = _fetch_orders(db, filters, wow_start, wow_end)
-        wow_prev_orders = _fetch_orders(db, filters, wow_prev_start, wow_prev_end)
-        wow_pm = _order_products_map(db, [o.order_id for o in wow_orders])
-        wow_pm_prev = _order_products_map(db, [o.order_id for o in wow_prev_orders])
-
-    wow_cur_revenue = sum((_order_revenue(o, wow_pm) for o in wow_orders), Decimal("0"))
-    wow_prv_revenue = sum((_order_revenue(o, wow_pm_prev) for o in wow_prev_orders), Decimal("0"))
+    wow_cur_revenue = wow_cur.revenue
+    wow_prv_revenue = wow_prv.revenue
 
     payload = {
         "ok": True,
@@ -399,55 +408,74 @@ def stats_allegro_costs():
         cached["meta"]["telemetry"] = _telemetry_stats(endpoint, response_ms)
         return jsonify(cached)
 
-    access_token = settings_store.get("ALLEGRO_ACCESS_TOKEN")
-    if not access_token:
-        return _json_error(
-            "ALLEGRO_TOKEN_MISSING",
-            "Brak tokenu Allegro - nie mozna pobrac kosztow Allegro",
-            400,
-        )
+    from .billing_ledger import ledger_covers, period_daily_costs, period_fees_by_type
 
-    from ..allegro_api import fetch_billing_entries, fetch_billing_types, get_period_ads_cost
+    use_ledger = ledger_covers(filters.date_from, filters.date_to)
+    types_list: list = []
+    api_type_name_map: dict = {}
+    agg: dict[str, Decimal] = defaultdict(lambda: Decimal("0"))
+    if use_ledger:
+        for type_id, fee in period_fees_by_type(filters.date_from, filters.date_to).items():
+            agg[type_id] += fee["amount"]
+            if fee["name"]:
+                api_type_name_map[type_id] = fee["name"]
+        daily_ads = period_daily_costs(filters.date_from, filters.date_to, ["NSP"])
+        ads_result = {
+            "total_cost": sum((row["amount"] for row in daily_ads), Decimal("0")),
+            "daily_costs": daily_ads,
+        }
+    else:
+        access_token = settings_store.get("ALLEGRO_ACCESS_TOKEN")
+        if not access_token:
+            return _json_error(
+                "ALLEGRO_TOKEN_MISSING",
+                "Brak tokenu Allegro - nie mozna pobrac kosztow Allegro",
+                400,
+            )
 
-    date_from_iso = filters.date_from.strftime("%Y-%m-%dT00:00:00Z")
-    date_to_iso = (filters.date_to - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        from ..allegro_api import fetch_billing_entries, fetch_billing_types, get_period_ads_cost
 
-    entries_data = fetch_billing_entries(
-        access_token,
-        occurred_at_gte=date_from_iso,
-        occurred_at_lte=date_to_iso,
-        limit=100,
-    )
-    entries = entries_data.get("billingEntries", [])
+        date_from_iso = filters.date_from.strftime("%Y-%m-%dT00:00:00Z")
+        date_to_iso = (filters.date_to - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    types_data = fetch_billing_types(access_token)
-    if isinstance(types_data, dict):
-        types_list = types_data.get("billingTypes", [])
-    else:
-        types_list = types_data or []
-    api_type_name_map = {
-        t.get("id"): t.get("description") or t.get("name") or t.get("id")
-        for t in types_list
-        if t.get("id")
-    }
+        entries_data = fetch_billing_entries(
+            access_token,
+            occurred_at_gte=date_from_iso,
+            occurred_at_lte=date_to_iso,
+            limit=100,
+        )
+        entries = entries_data.get("billingEntries", [])
+
+        types_data = fetch_billing_types(access_token)
+        if isinstance(types_data, dict):
+            types_list = types_data.get("billingTypes", [])
+        else:
+            types_list = types_data or []
+        api_type_name_map = {
+            t.get("id"): t.get("description") or t.get("name") or t.get("id")
+            for t in types_list
+            if t.get("id")
+        }
 
-    agg: dict[str, Decimal] = defaultdict(lambda: Decimal("0"))
-    for e in entries:
-        t = (e.get("type") or {}).get("id") or "UNKNOWN"
-        amount = Decimal(str((e.get("value") or {}).get("amount") or 0))
-        if amount < 0:
-            agg[t] += abs(amount)
+        for e in entries:
+            t = (e.get("type") or {}).get("id") or "UNKNOWN"
+            amount = Decimal(str((e.get("value") or {}).get("amount") or 0))
+            if amount < 0:
+                agg[t] += abs(amount)
 
-    ads_result = get_period_ads_cost(access_token, date_from_iso, date_to_iso)
+        ads_result = get_period_ads_cost(access_token, date_from_iso, date_to_iso)
     ads_total = Decimal(str(ads_result.get("total_cost") or 0))
 
     with get_session() as db:
         db_type_name_map = _upsert_billing_types(db, types_list)
         type_name_map = {**db_type_name_map, **api_type_name_map}
-        orders = _fetch_orders(db, filters, _to_ts(filters.date_from), _to_ts(filters.date_to))
-        order_ids = [o.order_id for o in orders]
-        products_map = _order_products_map(db, order_ids)
-        revenue = sum((_order_revenue(o, products_map) for o in orders), Decimal("0"))
+    facts = _order_facts()
+    revenue = facts.totals(facts.select(
+        _to_ts(filters.date_from),
+        _to_ts(filters.date_to),
+        platform=filters.platform,
+        payment_type=filters.payment_type,
+    )).revenue
 
     allegro_total = sum(agg.values(), Decimal("0"))
     allegro_pct = (allegro_total / revenue * 100) if revenue > 0 else Decimal("0")
@@ -482,7 +510,11 @@ def stats_allegro_costs():
         },
         "meta": {
             "confidence": "medium",
-            "sources": ["allegro.billing", "allegro.ads", "db.orders", "db.order_products"],
+            "sources": (
+                ["db.billing_entries", "db.orders", "db.order_products"]
+                if use_ledger
+                else ["allegro.billing", "allegro.ads", "db.orders", "db.order_products"]
+            ),
             "cache": "miss",
             "telemetry": {},
         },
@@ -503,8 +535,8 @@ def stats_ads_offer_analytics():
         return err
 
     export_format = (request.args.get("format") or "").strip().lower()
-    if export_format and export_format not in {"csv", "xlsx"}:
-        return _json_error("INVALID_EXPORT_FORMAT", "Dozwolone formaty eksportu: csv, xlsx")
+    if export_format and export_format not in _EXPORT_FORMATS:
+        return _invalid_export_format()
 
     cache_key = "ads-offer-analytics|" + _build_cache_key(filters)
     if not export_format:
@@ -519,30 +551,39 @@ def stats_ads_offer_analytics():
             cached["meta"]["telemetry"] = _telemetry_stats(endpoint, response_ms)
             return jsonify(cached)
 
-    access_token = settings_store.get("ALLEGRO_ACCESS_TOKEN")
-    if not access_token:
-        return _json_error(
-            "ALLEGRO_TOKEN_MISSING",
-            "Brak tokenu Allegro - nie mozna pobrac analityki reklam i ofert",
-            400,
-        )
+    ads_types = {"NSP", "ADS", "FEA", "DPG", "PRO"}
+    promoted_commission_types = {"BRG", "FSF"}
+    bonus_types = {"CB2"}
 
-    from ..allegro_api import fetch_billing_entries
+    from .billing_ledger import ledger_covers, period_offer_campaign_entries
 
-    date_from_iso = filters.date_from.strftime("%Y-%m-%dT00:00:00Z")
-    date_to_iso = (filters.date_to - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    if ledger_covers(filters.date_from, filters.date_to):
+        entries = period_offer_campaign_entries(
+            filters.date_from,
+            filters.date_to,
+            ads_types | promoted_commission_types | bonus_types,
+        )
+    else:
+        access_token = settings_store.get("ALLEGRO_ACCESS_TOKEN")
+        if not access_token:
+            return _json_error(
+                "ALLEGRO_TOKEN_MISSING",
+                "Brak tokenu Allegro - nie mozna pobrac analityki reklam i ofert",
+                400,
+            )
 
-    entries_data = fetch_billing_entries(
-        access_token,
-        occurred_at_gte=date_from_iso,
-        occurred_at_lte=date_to_iso,
-        limit=100,
-    )
-    entries = entries_data.get("billingEntries", [])
+        from ..allegro_api import fetch_billing_entries
 
-    ads_types = {"NSP", "ADS", "FEA", "DPG", "PRO"}
-    promoted_commission_types = {"BRG", "FSF"}
-    bonus_types = {"CB2"}
+        date_from_iso = filters.date_from.strftime("%Y-%m-%dT00:00:00Z")
+        date_to_iso = (filters.date_to - timedelta(seconds=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        entries_data = fetch_billing_entries(
+            access_token,
+            occurred_at_gte=date_from_iso,
+            occurred_at_lte=date_to_iso,
+            limit=100,
+        )
+        entries = entries_data.get("billingEntries", [])
 
     offer_costs: dict[str, dict[str, Decimal | str]] = {}
     campaign_costs: dict[str, dict[str, Decimal | str]] = {}
@@ -12,9 +12,9 @@ from .stats_endpoint_context import (
     _cache_get,
     _cache_set,
     _endpoint_name,
-    _fetch_orders,
     _format_filters,
     _is_cod,
+    _order_facts,
     _parse_filters,
     _record_telemetry,
     _telemetry_stats,
@@ -177,27 +177,22 @@ def stats_returns():
     start_dt = datetime.fromtimestamp(start_ts)
     end_dt = datetime.fromtimestamp(end_ts)
 
-    with get_session() as db:
-        orders = _fetch_orders(db, filters, start_ts, end_ts)
-        order_ids = {o.order_id for o in orders}
+    facts = _order_facts()
+    period_mask = facts.select(
+        start_ts, end_ts, platform=filters.platform, payment_type=filters.payment_type
+    )
+    orders_count = int(period_mask.sum())
 
+    with get_session() as db:
         returns_q = db.query(Return).filter(Return.created_at >= start_dt, Return.created_at < end_dt)
         if filters.platform != "all":
             returns_q = returns_q.join(Order, Return.order_id == Order.order_id).filter(Order.platform == filters.platform)
         returns_data = returns_q.all()
 
         if filters.payment_type != "all":
-            filtered_returns = []
-            orders_map = {o.order_id: o for o in orders}
-            for ret in returns_data:
-                order = orders_map.get(ret.order_id)
-                if not order:
-                    continue
-                if filters.payment_type == "cod" and _is_cod(order):
-                    filtered_returns.append(ret)
-                if filters.payment_type == "online" and not _is_cod(order):
-                    filtered_returns.append(ret)
-            returns_data = filtered_returns
+            # Maska juz uwzglednia typ platnosci - zostaja zwroty zamowien z okresu.
+            period_orders = set(facts.ids(period_mask))
+            returns_data = [ret for ret in returns_data if ret.order_id in period_orders]
 
         status_counts = {
             "pending": 0,
@@ -213,7 +208,7 @@ def stats_returns():
         refund_processed = sum(1 for ret in returns_data if bool(ret.refund_processed))
         stock_restored = sum(1 for ret in returns_data if bool(ret.stock_restored))
 
-        returns_rate = (Decimal(str(total_returns)) / Decimal(str(len(order_ids))) * 100) if order_ids else Decimal("0")
+        returns_rate = (Decimal(str(total_returns)) / Decimal(str(orders_count)) * 100) if orders_count else Decimal("0")
         refund_success_rate = (Decimal(str(refund_processed)) / Decimal(str(total_returns)) * 100) if total_returns else Decimal("0")
         stock_restore_rate = (Decimal(str(stock_restored)) / Decimal(str(total_returns)) * 100) if total_returns else Decimal("0")
 
@@ -0,0 +1,473 @@
+"""Wspoldzielony miedzy workerami cache payloadow API statystyk.
+
+Backend wybierany jest wedlug bazy aplikacji: przy PostgreSQL wpisy trafiaja
+do tabeli UNLOGGED ``stats_cache`` (tworzonej migracja), przy SQLite do
+osobnego pliku obok bazy (``STATS_CACHE_PATH`` nadpisuje sciezke). Wszystkie
+workery gunicorna widza te same wpisy, wiec kosztowny payload liczy sie raz.
+
+Cache ma limit wpisow i bajtow (wypychanie LRU po ``last_access``),
+ochrone przed lawina przeliczen (pierwszy worker bierze dzierzawe klucza,
+pozostali czekaja na wynik) oraz uniewaznianie po tagach, wolane przez
+synchronizacje zamowien, billingu i zwrotow.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import create_engine, event, text
+
+from .. import db as db_module
+from ..metrics import (
+    STATS_CACHE_COMPUTE_SECONDS,
+    STATS_CACHE_EVICTIONS_TOTAL,
+    STATS_CACHE_INVALIDATIONS_TOTAL,
+    STATS_CACHE_REQUESTS_TOTAL,
+)
+
+logger = logging.getLogger(__name__)
+
+TAG_ORDERS = "orders"
+TAG_BILLING = "billing"
+TAG_RETURNS = "returns"
+TAG_OFFERS = "offers"
+TAG_MESSAGES = "messages"
+
+# Zrodla danych kazdego endpointu - zmiana w zrodle kasuje jego wpisy.
+ENDPOINT_TAGS: dict[str, tuple[str, ...]] = {
+    "overview": (TAG_ORDERS, TAG_RETURNS),
+    "sales": (TAG_ORDERS,),
+    "profit": (TAG_ORDERS, TAG_BILLING, TAG_RETURNS),
+    "allegro-costs": (TAG_BILLING,),
+    "ads-offer-analytics": (TAG_BILLING, TAG_ORDERS, TAG_OFFERS),
+    "logistics": (TAG_ORDERS,),
+    "order-funnel": (TAG_ORDERS,),
+    "shipment-errors": (TAG_ORDERS,),
+    "invoice-coverage": (TAG_ORDERS,),
+    "returns": (TAG_RETURNS, TAG_ORDERS),
+    "refund-timeline": (TAG_RETURNS,),
+    "customer-support": (TAG_MESSAGES, TAG_ORDERS),
+    "products": (TAG_ORDERS, TAG_OFFERS),
+    "competition": (TAG_OFFERS,),
+    "offer-publication-history": (TAG_OFFERS,),
+}
+DEFAULT_TAGS = (TAG_ORDERS,)
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Po tym czasie dzierzawa porzuconego przeliczenia (np. wyjatek) wygasa.
+LEASE_SECONDS = 60.0
+# Ile czeka worker, ktory trafil na trwajace przeliczenie, zanim policzy sam.
+WAIT_SECONDS = 15.0
+POLL_INTERVAL = 0.05
+# Trafienia czesciej niz co tyle sekund nie przepisuja last_access (LRU).
+ACCESS_RESOLUTION = 5.0
+
+_SQLITE_DDL = (
+    "CREATE TABLE IF NOT EXISTS stats_cache ("
+    " cache_key TEXT PRIMARY KEY,"
+    " payload TEXT,"
+    " tags TEXT NOT NULL DEFAULT '',"
+    " size_bytes INTEGER NOT NULL DEFAULT 0,"
+    " expires_at DOUBLE PRECISION NOT NULL DEFAULT 0,"
+    " last_access DOUBLE PRECISION NOT NULL DEFAULT 0,"
+    " lease_token TEXT,"
+    " lease_until DOUBLE PRECISION)",
+    "CREATE INDEX IF NOT EXISTS idx_stats_cache_last_access ON stats_cache(last_access)",
+)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, "") or default)
+    except ValueError:
+        return default
+
+
+def endpoint_tags(key: str) -> tuple[str, ...]:
+    endpoint = key.split("|", 1)[0] if "|" in key else "overview"
+    return ENDPOINT_TAGS.get(endpoint, DEFAULT_TAGS)
+
+
+def _encode_tags(tags: Iterable[str]) -> str:
+    # Przecinki po obu stronach pozwalaja szukac tagu przez LIKE '%,tag,%'.
+    return "," + ",".join(sorted(set(tags))) + ","
+
+
+def _dumps(payload: dict) -> str:
+    # Ten sam serializer co jsonify - trafienie zwraca identyczny JSON.
+    if has_app_context():
+        return current_app.json.dumps(payload)
+    return json.dumps(payload, default=str)
+
+
+class MemoryStatsCache:
+    """Cache w pamieci procesu (LRU + TTL + tagi), bez wspoldzielenia."""
+
+    name = "memory"
+
+    def __init__(self, *, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, raw, _tags = item
+            if time.time() > expires_at:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+        return json.loads(raw)
+
+    def set(self, key: str, payload: dict, ttl: float, tags: Iterable[str]) -> None:
+        raw = _dumps(payload)
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, raw, _encode_tags(tags))
+            self._entries.move_to_end(key)
+            total = sum(len(item[1]) for item in self._entries.values())
+            while self._entries and (
+                len(self._entries) > self.max_entries or total > self.max_bytes
+            ):
+                _key, item = self._entries.popitem(last=False)
+                total -= len(item[1])
+                STATS_CACHE_EVICTIONS_TOTAL.labels(backend=self.name).inc()
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        needles = [f",{tag}," for tag in tags]
+        with self._lock:
+            doomed = [
+                key for key, item in self._entries.items()
+                if any(needle in item[2] for needle in needles)
+            ]
+            for key in doomed:
+                del self._entries[key]
+        return len(doomed)
+
+    def release_leases(self) -> None:
+        pass
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def close(self) -> None:
+        self.clear()
+
+
+class SqlStatsCache:
+    """Cache w tabeli ``stats_cache`` widocznej dla wszystkich workerow."""
+
+    def __init__(self, engine, *, name: str, max_entries: int, max_bytes: int):
+        self.engine = engine
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Dzierzawy przeliczen trzymane przez ten proces: (klucz, watek) -> (token, start).
+        self._leases: dict[tuple[str, int], tuple[str, float]] = {}
+
+    def get(self, key: str) -> Optional[dict]:
+        deadline = time.monotonic() + WAIT_SECONDS
+        while True:
+            payload, waiting = self._get_or_lease(key)
+            if payload is not None or not waiting:
+                return payload
+            if time.monotonic() >= deadline:
+                logger.warning("Stats cache: przekroczono czas oczekiwania na %s", key)
+                return None
+            time.sleep(POLL_INTERVAL)
+
+    def _get_or_lease(self, key: str) -> tuple[Optional[dict], bool]:
+        """Zwroc (payload, False), przejmij dzierzawe (None, False) lub czekaj (None, True)."""
+        now = time.time()
+        token = uuid.uuid4().hex
+        # Tagi dzierzawy pozwalaja uniewaznic takze trwajace przeliczenie.
+        lease = {
+            "key": key,
+            "now": now,
+            "token": token,
+            "lease": now + LEASE_SECONDS,
+            "tags": _encode_tags(endpoint_tags(key)),
+        }
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                text(
+                    "SELECT payload, expires_at, last_access FROM stats_cache"
+                    " WHERE cache_key = :key"
+                ),
+                {"key": key},
+            ).first()
+            if row is not None and row.payload is not None and row.expires_at > now:
+                if now - row.last_access < ACCESS_RESOLUTION:
+                    return json.loads(row.payload), False
+                conn.execute(
+                    text("UPDATE stats_cache SET last_access = :now WHERE cache_key = :key"),
+                    {"now": now, "key": key},
+                )
+                return json.loads(row.payload), False
+            if row is None:
+                claimed = conn.execute(
+                    text(
+                        "INSERT INTO stats_cache(cache_key, payload, tags, expires_at,"
+                        " last_access, lease_token, lease_until)"
+                        " VALUES (:key, NULL, :tags, 0, :now, :token, :lease)"
+                        " ON CONFLICT (cache_key) DO NOTHING"
+                    ),
+                    lease,
+                ).rowcount
+            else:
+                claimed = conn.execute(
+                    text(
+                        "UPDATE stats_cache SET payload = NULL, tags = :tags,"
+                        " lease_token = :token, lease_until = :lease WHERE cache_key = :key"
+                        " AND (payload IS NOT NULL OR lease_until IS NULL OR lease_until < :now)"
+                    ),
+                    lease,
+                ).rowcount
+        if claimed:
+            self._leases[(key, threading.get_ident())] = (token, time.perf_counter())
+            return None, False
+        return None, True
+
+    def set(self, key: str, payload: dict, ttl: float, tags: Iterable[str]) -> None:
+        raw = _dumps(payload)
+        now = time.time()
+        params = {
+            "key": key,
+            "payload": raw,
+            "tags": _encode_tags(tags),
+            "size": len(raw),
+            "expires": now + ttl,
+            "now": now,
+        }
+        lease = self._leases.pop((key, threading.get_ident()), None)
+        with self.engine.begin() as conn:
+            if lease is not None:
+                token, started = lease
+                STATS_CACHE_COMPUTE_SECONDS.labels(endpoint=key.split("|", 1)[0]).observe(
+                    time.perf_counter() - started
+                )
+                # Brak wiersza z nasza dzierzawa = uniewaznienie w trakcie
+                # przeliczenia; taki wynik moze byc juz nieaktualny.
+                conn.execute(
+                    text(
+                        "UPDATE stats_cache SET payload = :payload, tags = :tags,"
+                        " size_bytes = :size, expires_at = :expires, last_access = :now,"
+                        " lease_token = NULL, lease_until = NULL"
+                        " WHERE cache_key = :key AND lease_token = :token"
+                    ),
+                    {**params, "token": token},
+                )
+            else:
+                conn.execute(
+                    text(
+                        "INSERT INTO stats_cache(cache_key, payload, tags, size_bytes,"
+                        " expires_at, last_access)"
+                        " VALUES (:key, :payload, :tags, :size, :expires, :now)"
+                        " ON CONFLICT (cache_key) DO UPDATE SET payload = excluded.payload,"
+                        " tags = excluded.tags, size_bytes = excluded.size_bytes,"
+                        " expires_at = excluded.expires_at, last_access = excluded.last_access,"
+                        " lease_token = NULL, lease_until = NULL"
+                    ),
+                    params,
+                )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now: float) -> None:
+        conn.execute(
+            text(
+                "DELETE FROM stats_cache WHERE (payload IS NOT NULL AND expires_at < :now)"
+                " OR (payload IS NULL AND lease_until < :now)"
+            ),
+            {"now": now},
+        )
+        count, total = conn.execute(
+            text("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM stats_cache")
+        ).one()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        doomed = []
+        for row in conn.execute(
+            text(
+                "SELECT cache_key, size_bytes FROM stats_cache"
+                " WHERE payload IS NOT NULL ORDER BY last_access"
+            )
+        ):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append(row.cache_key)
+            count -= 1
+            total -= row.size_bytes
+        for key in doomed:
+            conn.execute(text("DELETE FROM stats_cache WHERE cache_key = :key"), {"key": key})
+        STATS_CACHE_EVICTIONS_TOTAL.labels(backend=self.name).inc(len(doomed))
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        removed = 0
+        with self.engine.begin() as conn:
+            for tag in tags:
+                removed += conn.execute(
+                    text("DELETE FROM stats_cache WHERE tags LIKE :pattern"),
+                    {"pattern": f"%,{tag},%"},
+                ).rowcount
+        return removed
+
+    def release_leases(self) -> None:
+        """Zwolnij dzierzawy watku, ktory zakonczyl zadanie bez zapisu payloadu."""
+        ident = threading.get_ident()
+        held = [item for item in self._leases if item[1] == ident]
+        if not held:
+            return
+        with self.engine.begin() as conn:
+            for item in held:
+                token, _started = self._leases.pop(item)
+                conn.execute(
+                    text(
+                        "DELETE FROM stats_cache WHERE cache_key = :key"
+                        " AND lease_token = :token AND payload IS NULL"
+                    ),
+                    {"key": item[0], "token": token},
+                )
+
+    def clear(self) -> None:
+        self._leases.clear()
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM stats_cache"))
+
+    def close(self) -> None:
+        if self.engine is not db_module.engine:
+            self.engine.dispose()
+
+
+def _sqlite_cache_path(main_engine) -> Optional[Path]:
+    override = os.environ.get("STATS_CACHE_PATH")
+    if override:
+        return Path(override)
+    database = main_engine.url.database if main_engine is not None else None
+    if not database or database == ":memory:":
+        return None
+    return Path(database).with_name(Path(database).name + ".stats-cache")
+
+
+def _build_backend():
+    max_entries = _env_int("STATS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+    max_bytes = _env_int("STATS_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)
+    choice = os.environ.get("STATS_CACHE_BACKEND", "auto").lower()
+    main_engine = db_module.engine
+
+    if choice != "memory" and main_engine is not None and db_module.is_postgres():
+        return SqlStatsCache(
+            main_engine, name="postgres", max_entries=max_entries, max_bytes=max_bytes
+        )
+    path = _sqlite_cache_path(main_engine) if choice != "memory" else None
+    if path is None:
+        return MemoryStatsCache(max_entries=max_entries, max_bytes=max_bytes)
+
+    engine = create_engine(
+        f"sqlite:///{path}", future=True, connect_args=db_module.SQLITE_CONNECT_ARGS
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _record):
+        db_module._configure_sqlite_connection(dbapi_connection)
+
+    with engine.begin() as conn:
+        for statement in _SQLITE_DDL:
+            conn.execute(text(statement))
+    return SqlStatsCache(engine, name="sqlite", max_entries=max_entries, max_bytes=max_bytes)
+
+
+class SharedStatsCache:
+    """Fasada wybierajaca backend leniwie, osobno w kazdym procesie.
+
+    Backend jest odtwarzany po forku workera i po przekonfigurowaniu silnika
+    bazy (testy). Bledy backendu nie przerywaja zadania - traktowane sa jak
+    chybienie, a payload liczy sie bez cache.
+    """
+
+    def __init__(self):
+        self._backend = None
+        self._owner: tuple[int, object] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        owner = (os.getpid(), db_module.engine)
+        if self._backend is None or self._owner != owner:
+            with self._lock:
+                if self._backend is None or self._owner != owner:
+                    if self._backend is not None and self._owner[0] == owner[0]:
+                        self._backend.close()
+                    self._backend = _build_backend()
+                    self._owner = owner
+        return self._backend
+
+    def get(self, key: str) -> Optional[dict]:
+        endpoint = key.split("|", 1)[0]
+        try:
+            payload = self.backend.get(key)
+        except Exception as exc:
+            logger.warning("Stats cache get failed for %s: %s", key, exc)
+            payload = None
+        STATS_CACHE_REQUESTS_TOTAL.labels(
+            endpoint=endpoint, result="hit" if payload is not None else "miss"
+        ).inc()
+        return payload
+
+    def set(self, key: str, payload: dict, ttl: float, tags: Iterable[str] | None = None) -> None:
+        try:
+            self.backend.set(key, payload, ttl, tags or endpoint_tags(key))
+        except Exception as exc:
+            logger.warning("Stats cache set failed for %s: %s", key, exc)
+
+    def invalidate(self, *tags: str) -> int:
+        try:
+            removed = self.backend.invalidate(tags)
+        except Exception as exc:
+            logger.warning("Stats cache invalidation %s failed: %s", tags, exc)
+            return 0
+        for tag in tags:
+            STATS_CACHE_INVALIDATIONS_TOTAL.labels(tag=tag).inc()
+        return removed
+
+    def release_leases(self) -> None:
+        if self._backend is None:
+            return
+        try:
+            self.backend.release_leases()
+        except Exception as exc:
+            logger.warning("Stats cache lease release failed: %s", exc)
+
+    def clear(self) -> None:
+        try:
+            self.backend.clear()
+        except Exception as exc:
+            logger.warning("Stats cache clear failed: %s", exc)
+
+
+__all__ = [
+    "DEFAULT_TAGS",
+    "ENDPOINT_TAGS",
+    "MemoryStatsCache",
+    "SharedStatsCache",
+    "SqlStatsCache",
+    "TAG_BILLING",
+    "TAG_MESSAGES",
+    "TAG_OFFERS",
+    "TAG_ORDERS",
+    "TAG_RETURNS",
+    "endpoint_tags",
+]
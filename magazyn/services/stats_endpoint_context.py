@@ -38,17 +38,26 @@ from ..services.stats_logistics import (
     delivery_method_label as _delivery_method_label,
     group_logistics_rows as _group_logistics_rows,
 )
+from ..services.order_facts import (
+    get_order_facts as _order_facts,
+    order_facts_warm as _order_facts_warm,
+)
 from ..services.stats_orders import (
+    aggregate_orders as _aggregate_orders,
     bucket_key as _bucket_key,
     fetch_orders as _fetch_orders,
     is_cod as _is_cod,
+    iter_order_export_rows as _iter_order_export_rows,
     order_products_map as _order_products_map,
     order_revenue as _order_revenue,
+    supports_push_down as _supports_push_down,
 )
 from ..services.stats_support import (
+    EXPORT_FORMATS as _EXPORT_FORMATS,
     build_cache_key as _build_cache_key,
     export_table as _export_table,
     format_filters as _format_filters,
+    invalid_export_format as _invalid_export_format,
     json_error as _json_error,
     parse_filters as _parse_filters,
     pct_change as _pct_change,
@@ -86,7 +95,9 @@ __all__ = [
     "Return",
     "ReturnStatusLog",
     "Thread",
+    "_EXPORT_FORMATS",
     "_TELEMETRY",
+    "_aggregate_orders",
     "_build_alerts",
     "_build_cache_key",
     "_bucket_key",
@@ -99,14 +110,19 @@ __all__ = [
     "_fetch_orders",
     "_format_filters",
     "_group_logistics_rows",
+    "_invalid_export_format",
     "_is_cod",
+    "_iter_order_export_rows",
     "_json_error",
+    "_order_facts",
+    "_order_facts_warm",
     "_order_products_map",
     "_order_revenue",
     "_parse_filters",
     "_period_offsets",
     "_pct_change",
     "_record_telemetry",
+    "_supports_push_down",
     "_telemetry_stats",
     "_to_ts",
     "_upsert_billing_types",
@@ -4,9 +4,9 @@ from __future__ import annotations
 
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Any
+from typing import Any, Iterator, NamedTuple, Optional
 
-from sqlalchemy import func
+from sqlalchemy import BigInteger, case, cast, func, select
 
 from ..models.orders import Order, OrderProduct
 from .stats_support import StatsFilters, to_ts
@@ -74,6 +74,179 @@ def bucket_key(ts: int, granularity: str) -> str:
     return dt.strftime("%Y-%m-%d")
 
 
+class BucketRow(NamedTuple):
+    """Zwarty wynik agregacji w bazie; pola jak ``order_facts.FactTotals``."""
+
+    key: Optional[str]
+    orders: int
+    items: int
+    revenue: Decimal
+    cod_orders: int
+
+
+PUSH_DOWN_DIALECTS = frozenset({"postgresql", "sqlite"})
+
+
+def _bucket_expression(dialect: str, granularity: str):
+    # Klucze musza byc identyczne z ``bucket_key`` (czas lokalny procesu).
+    # PostgreSQL liczy w strefie sesji - w produkcji PGTZ = TZ aplikacji.
+    if dialect == "postgresql":
+        moment = func.to_timestamp(Order.date_add)
+        if granularity == "month":
+            return func.to_char(moment, "YYYY-MM")
+        if granularity == "week":
+            return func.to_char(func.date_trunc("week", moment), "YYYY-MM-DD")
+        return func.to_char(moment, "YYYY-MM-DD")
+    if granularity == "month":
+        return func.strftime("%Y-%m", Order.date_add, "unixepoch", "localtime")
+    if granularity == "week":
+        # Cofniecie o 6 dni i "weekday 1" daje poniedzialek biezacego tygodnia.
+        return func.strftime("%Y-%m-%d", Order.date_add, "unixepoch", "localtime", "-6 days", "weekday 1")
+    return func.strftime("%Y-%m-%d", Order.date_add, "unixepoch", "localtime")
+
+
+def _grosze(column):
+    return cast(func.round(func.coalesce(column, 0) * 100), BigInteger)
+
+
+def supports_push_down(db: Any) -> bool:
+    return db.get_bind().dialect.name in PUSH_DOWN_DIALECTS
+
+
+def _order_columns():
+    """Podzapytanie sum linii oraz wyrazenia pobrania i przychodu (w groszach)."""
+    lines = (
+        select(
+            OrderProduct.order_id,
+            func.sum(func.coalesce(OrderProduct.quantity, 0)).label("qty"),
+            func.sum(_grosze(OrderProduct.price_brutto) * OrderProduct.quantity).label("gross"),
+        )
+        .group_by(OrderProduct.order_id)
+        .subquery()
+    )
+    cod = Order.payment_method_cod.is_(True) | func.lower(func.coalesce(Order.payment_method, "")).contains(
+        "pobranie", autoescape=True
+    )
+    revenue = case(
+        (cod, func.coalesce(lines.c.gross, 0) + _grosze(Order.delivery_price)),
+        else_=_grosze(Order.payment_done),
+    )
+    return lines, cod, revenue
+
+
+def _filtered(query, filters: StatsFilters, start_ts: int, end_ts: int, lines, cod):
+    query = (
+        query.select_from(Order)
+        .outerjoin(lines, lines.c.order_id == Order.order_id)
+        .where(Order.date_add >= start_ts, Order.date_add < end_ts)
+    )
+    if filters.platform != "all":
+        query = query.where(Order.platform == filters.platform)
+    if filters.payment_type == "cod":
+        query = query.where(cod)
+    elif filters.payment_type != "all":
+        query = query.where(~cod)
+    return query
+
+
+def aggregate_orders(
+    db: Any,
+    filters: StatsFilters,
+    start_ts: int,
+    end_ts: int,
+    *,
+    group_by: Optional[str] = "bucket",
+) -> list[BucketRow]:
+    """Zamowienia z zakresu zgrupowane w bazie.
+
+    ``group_by`` to ``"bucket"`` (kubelki ``filters.granularity``),
+    ``"platform"`` albo ``None`` (jeden wiersz sum). Przychod liczony jak
+    ``order_revenue``, ale w groszach, wiec sumy sa dokladne.
+    """
+    lines, cod, revenue = _order_columns()
+    if group_by == "bucket":
+        key = _bucket_expression(db.get_bind().dialect.name, filters.granularity)
+    elif group_by == "platform":
+        key = Order.platform
+    else:
+        key = None
+
+    columns = [
+        func.count().label("orders"),
+        func.coalesce(func.sum(func.coalesce(lines.c.qty, 0)), 0).label("items"),
+        func.coalesce(func.sum(revenue), 0).label("revenue"),
+        func.coalesce(func.sum(case((cod, 1), else_=0)), 0).label("cod_orders"),
+    ]
+    query = _filtered(
+        select(*([key.label("key")] if key is not None else []), *columns),
+        filters, start_ts, end_ts, lines, cod,
+    )
+    if key is not None:
+        query = query.group_by(key)
+
+    rows = [
+        BucketRow(
+            key=row.key if key is not None else None,
+            orders=int(row.orders),
+            items=int(row.items),
+            revenue=Decimal(int(row.revenue)).scaleb(-2),
+            cod_orders=int(row.cod_orders),
+        )
+        for row in db.execute(query)
+    ]
+    return sorted(rows, key=lambda row: (row.key is not None, row.key or ""))
+
+
+EXPORT_CHUNK_SIZE = 1000
+
+
+def iter_order_export_rows(
+    db: Any,
+    filters: StatsFilters,
+    start_ts: int,
+    end_ts: int,
+    *,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> Iterator[dict[str, Any]]:
+    """Wiersze eksportu zamowien czytane kursorem po stronie serwera.
+
+    ``yield_per`` wlacza ``stream_results`` - w pamieci jest co najwyzej
+    ``chunk_size`` wierszy, niezaleznie od dlugosci zakresu.
+    """
+    lines, cod, revenue = _order_columns()
+    query = _filtered(
+        select(
+            Order.order_id,
+            Order.external_order_id,
+            Order.platform,
+            Order.date_add,
+            Order.payment_method,
+            cod.label("cod"),
+            Order.delivery_method,
+            Order.delivery_package_nr,
+            Order.currency,
+            func.coalesce(lines.c.qty, 0).label("items"),
+            revenue.label("revenue"),
+        ),
+        filters, start_ts, end_ts, lines, cod,
+    ).order_by(Order.date_add, Order.order_id)
+
+    for row in db.execute(query.execution_options(yield_per=chunk_size)):
+        yield {
+            "order_id": row.order_id,
+            "external_order_id": row.external_order_id,
+            "platform": row.platform,
+            "date": datetime.fromtimestamp(row.date_add).isoformat(sep=" ") if row.date_add else None,
+            "payment_method": row.payment_method,
+            "cod": bool(row.cod),
+            "delivery_method": row.delivery_method,
+            "delivery_package_nr": row.delivery_package_nr,
+            "currency": row.currency,
+            "items": int(row.items),
+            "revenue": Decimal(int(row.revenue)).scaleb(-2),
+        }
+
+
 def period_offsets(filters: StatsFilters) -> tuple[int, int, int, int]:
     current_start = to_ts(filters.date_from)
     current_end = to_ts(filters.date_to)
@@ -84,11 +257,17 @@ def period_offsets(filters: StatsFilters) -> tuple[int, int, int, int]:
 
 
 __all__ = [
+    "BucketRow",
+    "EXPORT_CHUNK_SIZE",
+    "PUSH_DOWN_DIALECTS",
+    "aggregate_orders",
     "bucket_key",
     "fetch_orders",
     "filter_orders_by_payment",
     "is_cod",
+    "iter_order_export_rows",
     "order_products_map",
     "order_revenue",
     "period_offsets",
+    "supports_push_down",
 ]
\ No newline at end of file
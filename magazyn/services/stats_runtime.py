@@ -5,9 +5,12 @@ from __future__ import annotations
 import time
 from collections import defaultdict
 
+from .stats_cache import SharedStatsCache
+
 
 FAST_CACHE_TTL_SECONDS = 60
-FAST_CACHE: dict[str, tuple[float, dict]] = {}
+# Wspolny dla workerow cache payloadow (patrz services/stats_cache.py).
+FAST_CACHE = SharedStatsCache()
 TELEMETRY: dict[str, dict[str, float]] = defaultdict(
     lambda: {
         "requests": 0,
@@ -23,18 +26,16 @@ def endpoint_name(cache_key: str) -> str:
 
 
 def cache_get(key: str) -> dict | None:
-    item = FAST_CACHE.get(key)
-    if not item:
-        return None
-    expires_at, payload = item
-    if time.time() > expires_at:
-        FAST_CACHE.pop(key, None)
-        return None
-    return payload
+    return FAST_CACHE.get(key)
 
 
 def cache_set(key: str, payload: dict) -> None:
-    FAST_CACHE[key] = (time.time() + FAST_CACHE_TTL_SECONDS, payload)
+    FAST_CACHE.set(key, payload, FAST_CACHE_TTL_SECONDS)
+
+
+def invalidate_stats_cache(*tags: str) -> int:
+    """Usun payloady zalezne od zmienionych danych (tagi z ``stats_cache``)."""
+    return FAST_CACHE.invalidate(*tags)
 
 
 def record_telemetry(endpoint: str, cache_state: str, started_at: float) -> float:
@@ -68,6 +69,7 @@ __all__ = [
     "cache_get",
     "cache_set",
     "endpoint_name",
+    "invalidate_stats_cache",
     "record_telemetry",
     "telemetry_stats",
 ]
\ No newline at end of file
@@ -7,9 +7,12 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 import io
+import json
+import tempfile
+from typing import Iterable, Iterator
 
-import pandas as pd
-from flask import Response, jsonify, request
+from flask import Response, jsonify, request, stream_with_context
+from openpyxl import Workbook
 
 
 @dataclass
@@ -21,6 +24,21 @@ class StatsFilters:
     payment_type: str
 
 
+# Progi dla granularity=auto: najdrobniejsze ziarno, ktore daje czytelna
+# liczbe kubelkow na wykresie.
+AUTO_DAY_MAX_DAYS = 62
+AUTO_WEEK_MAX_DAYS = 366
+
+
+def choose_granularity(date_from: datetime, date_to: datetime) -> str:
+    days = (date_to - date_from).days
+    if days <= AUTO_DAY_MAX_DAYS:
+        return "day"
+    if days <= AUTO_WEEK_MAX_DAYS:
+        return "week"
+    return "month"
+
+
 def json_error(code: str, message: str, status: int = 400):
     return (
         jsonify(
@@ -53,9 +71,9 @@ def parse_filters() -> tuple[StatsFilters | None, tuple | None]:
     platform = (request.args.get("platform") or "all").strip().lower()
     payment_type = (request.args.get("payment_type") or "all").strip().lower()
 
-    if granularity not in {"day", "week", "month"}:
+    if granularity not in {"day", "week", "month", "auto"}:
         return None, json_error(
-            "INVALID_GRANULARITY", "Dozwolone granularity: day, week, month"
+            "INVALID_GRANULARITY", "Dozwolone granularity: day, week, month, auto"
         )
 
     if platform not in {"all", "allegro", "shop", "ebay", "manual"}:
@@ -92,6 +110,9 @@ def parse_filters() -> tuple[StatsFilters | None, tuple | None]:
             "INVALID_DATE_RANGE", "date_from musi byc mniejsze niz date_to"
         )
 
+    if granularity == "auto":
+        granularity = choose_granularity(date_from, date_to)
+
     return StatsFilters(
         date_from=date_from,
         date_to=date_to,
@@ -142,49 +163,139 @@ def format_filters(filters: StatsFilters) -> dict[str, str]:
     }
 
 
-def export_table(rows: list[dict], filename_prefix: str, export_format: str) -> Response:
-    if export_format == "csv":
-        output = io.StringIO()
-        fieldnames = list(rows[0].keys()) if rows else ["empty"]
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in rows:
-            writer.writerow(row)
-        content = output.getvalue()
-        return Response(
-            content,
-            mimetype="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename_prefix}.csv",
-            },
-        )
+EXPORT_FORMATS = ("csv", "xlsx", "ndjson")
+EXPORT_MIMETYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ndjson": "application/x-ndjson",
+}
+# Eksport wysyla dane porcjami mniej wiecej tej wielkosci.
+EXPORT_CHUNK_BYTES = 64 * 1024
 
-    if export_format == "xlsx":
-        df = pd.DataFrame(rows or [{"empty": "no-data"}])
-        buffer = io.BytesIO()
-        with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name="stats")
-        buffer.seek(0)
-        return Response(
-            buffer.read(),
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename_prefix}.xlsx",
-            },
-        )
 
-    return json_error("INVALID_EXPORT_FORMAT", "Dozwolone formaty eksportu: csv, xlsx")
+def invalid_export_format():
+    return json_error(
+        "INVALID_EXPORT_FORMAT", "Dozwolone formaty eksportu: " + ", ".join(EXPORT_FORMATS)
+    )
+
+
+def csv_chunks(rows: Iterable[dict]) -> Iterator[str]:
+    """CSV porcjami; naglowek z kluczy pierwszego wiersza idzie od razu."""
+    buffer = io.StringIO()
+    writer = None
+    for row in rows:
+        if writer is None:
+            writer = csv.DictWriter(buffer, fieldnames=list(row.keys()))
+            writer.writeheader()
+            writer.writerow(row)
+            yield _drain(buffer)
+            continue
+        writer.writerow(row)
+        if buffer.tell() >= EXPORT_CHUNK_BYTES:
+            yield _drain(buffer)
+    if writer is None:
+        csv.DictWriter(buffer, fieldnames=["empty"]).writeheader()
+    if buffer.tell():
+        yield _drain(buffer)
+
+
+def _drain(buffer: io.StringIO) -> str:
+    content = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return content
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def ndjson_chunks(rows: Iterable[dict]) -> Iterator[str]:
+    """Jeden obiekt JSON na linie; pierwsza linia wychodzi od razu."""
+    pending: list[str] = []
+    size = 0
+    first = True
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, default=_json_default) + "\n"
+        pending.append(line)
+        size += len(line)
+        if first or size >= EXPORT_CHUNK_BYTES:
+            yield "".join(pending)
+            pending, size, first = [], 0, False
+    if pending:
+        yield "".join(pending)
+
+
+def _xlsx_cell(value):
+    if value is None or isinstance(value, (str, int, float, Decimal, datetime, bool)):
+        return value
+    return str(value)
+
+
+def xlsx_chunks(rows: Iterable[dict], sheet_name: str = "stats") -> Iterator[bytes]:
+    """XLSX w trybie write-only openpyxl, zapisany do pliku tymczasowego.
+
+    Arkusz trafia na dysk wiersz po wierszu, wiec pamiec nie rosnie z liczba
+    wierszy. Archiwum ZIP da sie wyslac dopiero po zapisaniu calosci.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name)
+    fieldnames = None
+    for row in rows:
+        if fieldnames is None:
+            fieldnames = list(row.keys())
+            sheet.append(fieldnames)
+        sheet.append([_xlsx_cell(row.get(name)) for name in fieldnames])
+    if fieldnames is None:
+        sheet.append(["empty"])
+        sheet.append(["no-data"])
+
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while chunk := spool.read(EXPORT_CHUNK_BYTES):
+            yield chunk
+
+
+_EXPORT_WRITERS = {"csv": csv_chunks, "xlsx": xlsx_chunks, "ndjson": ndjson_chunks}
+
+
+def export_table(rows: Iterable[dict], filename_prefix: str, export_format: str) -> Response:
+    """Strumieniowy eksport wierszy (lista albo generator) do CSV/XLSX/NDJSON.
+
+    Generator wierszy jest konsumowany dopiero podczas wysylki odpowiedzi,
+    w kontekscie zadania (``stream_with_context``).
+    """
+    writer = _EXPORT_WRITERS.get(export_format)
+    if writer is None:
+        return invalid_export_format()
+    return Response(
+        stream_with_context(writer(rows)),
+        mimetype=EXPORT_MIMETYPES[export_format],
+        headers={
+            "Content-Disposition": f"attachment; filename={filename_prefix}.{export_format}",
+        },
+    )
 
 
 __all__ = [
+    "EXPORT_FORMATS",
+    "EXPORT_MIMETYPES",
     "StatsFilters",
     "build_cache_key",
+    "choose_granularity",
+    "csv_chunks",
     "export_table",
     "format_filters",
+    "invalid_export_format",
     "json_error",
+    "ndjson_chunks",
     "parse_date",
     "parse_filters",
     "pct_change",
     "period_offsets",
     "to_ts",
+    "xlsx_chunks",
 ]
\ No newline at end of file
@@ -17,6 +17,8 @@ HIDDEN_KEYS = {
     "ENABLE_HTTP_SERVER", "HTTP_PORT", "DB_PATH",
     # Klucze wewnetrzne zarzadzane automatycznie przez kod
     "ALLEGRO_LAST_EVENT_ID",
+    "ALLEGRO_BILLING_CURSOR",
+    "ALLEGRO_BILLING_LEDGER_START",
     "ALLEGRO_TOKEN_EXPIRES_AT",
     "ALLEGRO_TOKEN_EXPIRES_IN",
     "ALLEGRO_TOKEN_METADATA",
@@ -4,6 +4,7 @@ from __future__ import annotations
 
 import logging
 import os
+import time
 from collections import OrderedDict
 from pathlib import Path
 from threading import RLock
@@ -17,6 +18,13 @@ from .domain.settings_persistence import APP_SETTINGS_SCHEMA, SettingsDatabaseGa
 
 LOGGER = logging.getLogger(__name__)
 
+# Maksymalny czas (s), przez jaki odczyt moze zwracac nieaktualna wartosc
+# zapisana przez inny proces, gdy brak powiadomien LISTEN/NOTIFY (SQLite).
+DEFAULT_MAX_STALENESS = 2.0
+# Awaryjne sprawdzenie wersji, gdy dziala nasluch NOTIFY (PostgreSQL) -
+# chroni przed zgubionym powiadomieniem.
+DEFAULT_LISTENER_FALLBACK = 60.0
+
 
 class SettingsPersistenceError(RuntimeError):
     """Raised when settings cannot be persisted to any backing store."""
@@ -28,6 +36,13 @@ def _default_db_path() -> Path:
     return Path(os.path.join(os.path.dirname(__file__), "database.db"))
 
 
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
 class SettingsStore:
     """Store application configuration in the database."""
 
@@ -38,6 +53,14 @@ class SettingsStore:
         self._db_path: Path = _default_db_path()
         self._loaded = False
         self._db_last_updated_at: Optional[str] = None
+        # Migawka w pamieci jest uniewazniana przez NOTIFY (PostgreSQL) albo
+        # zmiane mtime pliku bazy (SQLite), sprawdzana najwyzej co okno
+        # staleness - dzieki temu get() nie wykonuje zapytan.
+        self._next_check_at = 0.0
+        self._invalidated = False
+        self._change_marker: Optional[tuple] = None
+        self._listener = None
+        self._listener_pid: Optional[int] = None
         self._db_gateway = SettingsDatabaseGateway(
             logger=LOGGER,
             engine_factory=create_engine,
@@ -90,6 +113,33 @@ class SettingsStore:
             self._apply_environment(self._values, replace_all=True)
             self._loaded = True
             self._db_last_updated_at = db_updated_at
+            self._change_marker = self._db_gateway.change_marker(db_path)
+            self._invalidated = False
+            self._ensure_listener()
+            self._next_check_at = time.monotonic() + self._check_interval()
+
+    def _ensure_listener(self) -> None:
+        # Watki nie przezywaja fork() - po forku workera gunicorna startujemy
+        # nasluch od nowa.
+        if (
+            self._listener is not None
+            and self._listener_pid == os.getpid()
+            and self._listener.is_alive()
+        ):
+            return
+        try:
+            self._listener = self._db_gateway.start_listener(self.invalidate)
+        except Exception as exc:
+            LOGGER.warning("Failed to start settings change listener: %s", exc)
+            self._listener = None
+        self._listener_pid = os.getpid()
+
+    def _check_interval(self) -> float:
+        if self._listener is not None and self._listener.connected.is_set():
+            return _env_seconds(
+                "SETTINGS_LISTENER_FALLBACK_SECONDS", DEFAULT_LISTENER_FALLBACK
+            )
+        return _env_seconds("SETTINGS_MAX_STALENESS_SECONDS", DEFAULT_MAX_STALENESS)
 
     def _load_via_engine(self, eng):
         return self._db_gateway.load_via_engine(eng)
@@ -258,6 +308,10 @@ class SettingsStore:
         1. Value explicitly saved to database (_values).
         2. Namespace default (from .env.example or hardcoded fallback).
         3. The ``default`` argument passed to this method.
+
+        The lookup is served from the in-memory snapshot; the database is
+        consulted only after a change notification or once the staleness
+        window (``SETTINGS_MAX_STALENESS_SECONDS``) has elapsed.
         """
 
         self._ensure_loaded()
@@ -270,9 +324,27 @@ class SettingsStore:
             return ns_val
         return default
 
+    def invalidate(self) -> None:
+        """Oznacz migawke jako nieaktualna; kolejny odczyt sprawdzi baze."""
+        self._invalidated = True
+
     def _refresh_if_stale(self) -> None:
         if not self._loaded or not self._db_path:
             return
+        now = time.monotonic()
+        if not self._invalidated and now < self._next_check_at:
+            return
+        with self._lock:
+            forced = self._invalidated
+            self._invalidated = False
+            if self._listener_pid != os.getpid():
+                self._ensure_listener()
+            self._next_check_at = now + self._check_interval()
+            marker = self._db_gateway.change_marker(self._db_path)
+            if not forced and marker is not None and marker == self._change_marker:
+                return
+            self._change_marker = marker
+
         latest = self._fetch_last_updated_at()
         if latest is None:
             return
@@ -50,6 +50,7 @@ from .services import stats_api_logistics as _logistics_endpoints
 from .services import stats_api_catalog as _catalog_endpoints
 from .services import stats_api_ads_panel as _ads_panel_endpoints
 from .services import stats_api_support as _support_endpoints
+from .services import stats_api_exports as _export_endpoints
 
 
 __all__ = [
@@ -85,6 +86,12 @@ __all__ = [
 bp = Blueprint("stats", __name__, url_prefix="/api/stats")
 
 
+@bp.teardown_request
+def _release_stats_cache_leases(_exc=None):
+    # Endpoint zakonczony bledem bez zapisu payloadu nie blokuje innych workerow.
+    _FAST_CACHE.release_leases()
+
+
 @bp.route("/overview")
 @login_required
 def stats_overview():
@@ -181,6 +188,12 @@ def stats_offer_publication_history():
     return _catalog_endpoints.stats_offer_publication_history()
 
 
+@bp.route("/orders/export")
+@login_required
+def stats_orders_export():
+    return _export_endpoints.stats_orders_export()
+
+
 @bp.route("/telemetry")
 @login_required
 def stats_telemetry():
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+from magazyn import http_transport
 from magazyn.services import allegro_ratings_snapshot as mod
 
 
@@ -34,7 +35,7 @@ def test_fetch_and_save_snapshot(monkeypatch):
 
     stored = {}
 
-    monkeypatch.setattr(mod.requests, "get", fake_get)
+    monkeypatch.setattr(http_transport.get_session(http_transport.ALLEGRO), "get", fake_get)
     monkeypatch.setattr(mod, "_count_orders", lambda: 762)
     monkeypatch.setattr(
         mod.settings_store,
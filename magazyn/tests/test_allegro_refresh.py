@@ -11,6 +11,7 @@ from requests.exceptions import HTTPError
 import magazyn.allegro_sync as sync_mod
 import magazyn.config as cfg
 
+from magazyn import http_transport
 from magazyn.db import get_session
 from magazyn.models.allegro import AllegroOffer, AllegroPriceHistory
 from magazyn.models.products import Product, ProductSize
@@ -1199,7 +1200,7 @@ def test_refresh_token_uses_settings_store_even_if_env_present(app, monkeypatch)
         assert data == {"grant_type": "refresh_token", "refresh_token": "refresh-token"}
         return DummyResponse()
 
-    monkeypatch.setattr("magazyn.allegro_api.auth.requests.post", fake_post)
+    monkeypatch.setattr(http_transport.get_session(http_transport.ALLEGRO), "post", fake_post)
 
     try:
         result = api_refresh_token("refresh-token")
@@ -1243,7 +1244,7 @@ def test_refresh_token_uses_settings_store_when_env_missing(app, monkeypatch):
         assert data == {"grant_type": "refresh_token", "refresh_token": "refresh-token"}
         return DummyResponse()
 
-    monkeypatch.setattr("magazyn.allegro_api.auth.requests.post", fake_post)
+    monkeypatch.setattr(http_transport.get_session(http_transport.ALLEGRO), "post", fake_post)
 
     try:
         result = api_refresh_token("refresh-token")
@@ -0,0 +1,43 @@
+"""Generator danych benchmarkow: deterministyczny i zgodny z gorącymi sciezkami."""
+
+from datetime import datetime
+
+from magazyn.db import get_session, reset_db
+from magazyn.models.orders import Order
+from magazyn.services.order_sync import match_product_to_warehouse
+from magazyn.services.print_agent_orders import collect_printable_orders
+from magazyn.services.scanning import load_order_for_barcode
+from scripts.benchmarks.datagen import DatasetScale, generate_dataset
+
+SCALE = DatasetScale(orders=120, products=12, offers=30, days=30)
+
+
+def test_dataset_is_seeded_and_feeds_hot_paths(app):
+    anchor = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    dataset = generate_dataset(SCALE, seed=7, anchor=anchor)
+
+    assert dataset.counts["orders"] == 120
+    assert dataset.counts["product_sizes"] == 12 * SCALE.sizes_per_product
+    assert dataset.counts["billing_entries"] > 0
+    assert dataset.barcodes
+
+    order_id, order_data = load_order_for_barcode(dataset.barcodes[0])
+    assert order_data["delivery_package_nr"] == dataset.barcodes[0]
+    assert collect_printable_orders()
+
+    with get_session() as db:
+        name, color, size = dataset.order_items[0]
+        assert match_product_to_warehouse(db, name, color, size) is not None
+        first_orders = [
+            (order.order_id, order.date_add, str(order.payment_done))
+            for order in db.query(Order).order_by(Order.order_id).limit(20)
+        ]
+
+    reset_db()
+    repeated = generate_dataset(SCALE, seed=7, anchor=anchor)
+    with get_session() as db:
+        assert first_orders == [
+            (order.order_id, order.date_add, str(order.payment_done))
+            for order in db.query(Order).order_by(Order.order_id).limit(20)
+        ]
+    assert repeated.barcodes == dataset.barcodes
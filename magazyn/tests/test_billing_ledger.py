@@ -0,0 +1,202 @@
+"""Lokalna ksiega billing_entries: synchronizacja oknami i odczyty bez API."""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from magazyn import allegro_api
+from magazyn.db import get_session
+from magazyn.domain.financial import FinancialCalculator
+from magazyn.models.allegro import BillingEntry
+from magazyn.models.orders import Order
+from magazyn.services import billing_ledger
+from magazyn.settings_store import settings_store
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def _entry(entry_id, type_id, amount, *, occurred_at, order_id=None, offer_id=None):
+    entry = {
+        "id": entry_id,
+        "occurredAt": occurred_at.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "type": {"id": type_id, "name": f"Typ {type_id}"},
+        "value": {"amount": str(amount), "currency": "PLN"},
+    }
+    if order_id:
+        entry["order"] = {"id": order_id}
+    if offer_id:
+        entry["offer"] = {"id": offer_id, "name": f"Oferta {offer_id}"}
+    return entry
+
+
+class _FakeBillingApi:
+    def __init__(self, entries):
+        self.entries = entries
+        self.calls = []
+
+    def __call__(self, token, occurred_at_gte=None, occurred_at_lte=None, limit=100, offset=0, **kwargs):
+        self.calls.append((occurred_at_gte, occurred_at_lte, offset))
+        start = datetime.strptime(occurred_at_gte, "%Y-%m-%dT%H:%M:%SZ")
+        end = datetime.strptime(occurred_at_lte, "%Y-%m-%dT%H:%M:%SZ")
+        matching = [
+            e for e in self.entries
+            if start <= billing_ledger._parse_datetime(e["occurredAt"]) <= end
+        ]
+        return {"billingEntries": matching[offset:offset + limit]}
+
+
+def _fail_api(*args, **kwargs):
+    raise AssertionError("Allegro API nie powinno byc wywolane")
+
+
+@pytest.fixture
+def synced_ledger(app, monkeypatch):
+    now = _now()
+    entries = [
+        _entry("e-suc", "SUC", "-12.30", occurred_at=now - timedelta(days=2), order_id="uuid-1"),
+        _entry("e-hlb", "HLB", "-8.99", occurred_at=now - timedelta(days=1), order_id="uuid-1"),
+        _entry("e-suc2", "SUC", "-5.00", occurred_at=now - timedelta(days=1), order_id="uuid-2"),
+        _entry("e-nsp", "NSP", "-4.00", occurred_at=now - timedelta(days=1)),
+    ]
+    entries += [
+        _entry(f"e-lis-{i}", "LIS", "-0.10", occurred_at=now - timedelta(days=3), offer_id="111")
+        for i in range(150)
+    ]
+    api = _FakeBillingApi(entries)
+    monkeypatch.setattr(allegro_api, "fetch_billing_entries", api)
+    settings_store.update({
+        billing_ledger.CURSOR_KEY: None,
+        billing_ledger.START_KEY: None,
+    })
+    stats = billing_ledger.sync_billing_entries("token", now=now)
+    with get_session() as db:
+        for order_id in ("uuid-1", "uuid-2"):
+            db.add(Order(
+                order_id=f"allegro_{order_id}",
+                external_order_id=order_id,
+                date_add=_timestamp(now - timedelta(days=3)),
+            ))
+    return api, stats, now
+
+
+def _timestamp(value):
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def test_sync_pages_windows_and_persists_cursor(synced_ledger):
+    api, stats, now = synced_ledger
+
+    assert stats["stored"] == 154
+    assert stats["errors"] == 0
+    assert any(offset == 100 for _, _, offset in api.calls)
+    start, cursor = billing_ledger.ledger_coverage()
+    assert cursor == now
+    assert start == now - timedelta(days=billing_ledger.BACKFILL_DAYS)
+
+    # Kolejny przebieg czyta tylko koncowke od kursora i nie dubluje wpisow.
+    api.calls.clear()
+    again = billing_ledger.sync_billing_entries("token", now=now + timedelta(hours=1))
+    assert again["stored"] == 0
+    assert len(api.calls) == 1
+    with get_session() as db:
+        assert db.query(BillingEntry).count() == 154
+
+
+def test_order_summary_reads_ledger_without_api(synced_ledger, monkeypatch):
+    monkeypatch.setattr(allegro_api, "fetch_billing_entries", _fail_api)
+    monkeypatch.setattr(allegro_api, "get_order_billing_summary", _fail_api)
+
+    summary = billing_ledger.get_order_billing_summary("token", "uuid-1")
+
+    assert summary["success"] is True
+    assert summary["source"] == "ledger"
+    assert summary["commission"] == Decimal("12.30")
+    assert summary["shipping_fee"] == Decimal("8.99")
+    assert summary["total_fees"] == Decimal("21.29")
+
+
+def test_stale_ledger_falls_back_to_api(synced_ledger, monkeypatch):
+    _api, _stats, now = synced_ledger
+    settings_store.update({
+        billing_ledger.CURSOR_KEY: billing_ledger._iso(now - timedelta(days=1)),
+    })
+    calls = []
+
+    def fake_summary(token, order_id, **kwargs):
+        calls.append(order_id)
+        return allegro_api.build_billing_summary([])
+
+    monkeypatch.setattr(allegro_api, "get_order_billing_summary", fake_summary)
+
+    summary = billing_ledger.get_order_billing_summary("token", "uuid-1")
+
+    assert calls == ["uuid-1"]
+    assert summary["source"] == "api"
+
+
+def test_order_older_than_ledger_falls_back_to_api(synced_ledger, monkeypatch):
+    _api, _stats, now = synced_ledger
+    # Zamowienie sprzed poczatku ksiegi ma w niej tylko pozniejsze wpisy.
+    with get_session() as db:
+        db.query(Order).filter(Order.external_order_id == "uuid-1").update({
+            Order.date_add: _timestamp(now - timedelta(days=billing_ledger.BACKFILL_DAYS + 5)),
+        })
+    calls = []
+
+    def fake_summary(token, order_id, **kwargs):
+        calls.append(order_id)
+        return allegro_api.build_billing_summary([])
+
+    monkeypatch.setattr(allegro_api, "get_order_billing_summary", fake_summary)
+
+    assert billing_ledger.get_order_billing_summary("token", "uuid-1")["source"] == "api"
+    assert billing_ledger.get_order_billing_summary("token", "uuid-unknown")["source"] == "api"
+    assert calls == ["uuid-1", "uuid-unknown"]
+    assert set(billing_ledger.load_order_billing_summaries(["uuid-1", "uuid-2"])) == {"uuid-2"}
+
+
+def test_prefetch_uses_ledger_for_all_known_orders(synced_ledger, monkeypatch):
+    monkeypatch.setattr(allegro_api, "get_order_billing_summary", _fail_api)
+    orders = [
+        type("O", (), {"external_order_id": "uuid-1"})(),
+        type("O", (), {"external_order_id": "uuid-2"})(),
+    ]
+
+    with get_session() as db:
+        summaries = FinancialCalculator(db, settings_store)._prefetch_order_billing_summaries(
+            orders, "token"
+        )
+
+    assert set(summaries) == {"uuid-1", "uuid-2"}
+    assert summaries["uuid-2"]["commission"] == Decimal("5.00")
+
+
+def test_period_aggregates(synced_ledger):
+    _api, _stats, now = synced_ledger
+    date_from = now - timedelta(days=30)
+
+    fees = billing_ledger.period_fees_by_type(date_from, now + timedelta(seconds=1))
+    daily = billing_ledger.period_daily_costs(date_from, now, ["NSP"])
+
+    assert fees["SUC"]["amount"] == Decimal("17.30")
+    assert fees["LIS"]["amount"] == Decimal("15.00")
+    assert [row["amount"] for row in daily] == [Decimal("4.00")]
+
+
+def test_stats_allegro_costs_served_from_ledger(synced_ledger, client, login, monkeypatch):
+    from magazyn import stats as stats_module
+
+    stats_module._FAST_CACHE.clear()
+    for name in ("fetch_billing_entries", "fetch_billing_types", "get_period_ads_cost"):
+        monkeypatch.setattr(allegro_api, name, _fail_api)
+
+    response = client.get("/api/stats/allegro-costs")
+
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert payload["meta"]["sources"][0] == "db.billing_entries"
+    assert payload["data"]["totals"]["ads_total"] == 4.0
+    assert payload["data"]["totals"]["allegro_total"] == pytest.approx(45.29)
@@ -8,7 +8,7 @@ def test_agent_loop_stores_courier_code(monkeypatch):
 
     monkeypatch.setattr(agent, "_send_periodic_reports", lambda: None)
     monkeypatch.setattr(agent, "clean_old_printed_orders", lambda: None)
-    monkeypatch.setattr(agent, "load_printed_orders", lambda: [])
+    monkeypatch.setattr(agent, "printed_orders", lambda: {})
     monkeypatch.setattr(agent, "load_queue", lambda: [])
     monkeypatch.setattr(agent, "save_queue", lambda q: None)
     monkeypatch.setattr(agent, "is_quiet_time", lambda: False)
@@ -32,11 +32,13 @@ def test_agent_loop_stores_courier_code(monkeypatch):
     monkeypatch.setattr(agent, "get_label", lambda code, pid: ("data", "pdf"))
 
     class Stopper:
+        # Petla sprawdza stop przed iteracja - druga kontrola konczy ja po jednym przebiegu.
         def __init__(self):
             self.calls = 0
 
         def is_set(self):
-            return self.calls > 0
+            self.calls += 1
+            return self.calls > 1
 
         def wait(self, t):
             self.calls += 1
@@ -56,7 +58,7 @@ def test_agent_loop_treats_pobranie_as_cod_with_zero_payment(monkeypatch):
 
     monkeypatch.setattr(agent, "_send_periodic_reports", lambda: None)
     monkeypatch.setattr(agent, "clean_old_printed_orders", lambda: None)
-    monkeypatch.setattr(agent, "load_printed_orders", lambda: [])
+    monkeypatch.setattr(agent, "printed_orders", lambda: {})
     monkeypatch.setattr(agent, "load_queue", lambda: [])
     monkeypatch.setattr(agent, "save_queue", lambda q: None)
     monkeypatch.setattr(agent, "is_quiet_time", lambda: False)
@@ -84,11 +86,13 @@ def test_agent_loop_treats_pobranie_as_cod_with_zero_payment(monkeypatch):
     monkeypatch.setattr(agent, "get_label", lambda code, pid: ("data", "pdf"))
 
     class Stopper:
+        # Petla sprawdza stop przed iteracja - druga kontrola konczy ja po jednym przebiegu.
         def __init__(self):
             self.calls = 0
 
         def is_set(self):
-            return self.calls > 0
+            self.calls += 1
+            return self.calls > 1
 
         def wait(self, t):
             self.calls += 1
@@ -140,3 +144,35 @@ def test_get_orders_includes_blad_druku_under_3_retries(app):
         orders = agent.get_orders()
         order_ids = [o["order_id"] for o in orders]
         assert oid not in order_ids
+
+
+def test_get_orders_includes_order_reset_to_pobrano_after_retry_limit(app):
+    """Reczny powrot do pobrano po limicie blad_druku wraca do kolejki."""
+    from magazyn.db import get_session
+    from magazyn.models.orders import Order, OrderStatusLog
+    import time
+
+    oid = "allegro_test-retry-reset"
+
+    with app.app_context():
+        with get_session() as db:
+            db.add(
+                Order(
+                    order_id=oid,
+                    platform="allegro",
+                    date_add=int(time.time()),
+                    delivery_fullname="Test Reset",
+                )
+            )
+            for attempt in range(3):
+                db.add(OrderStatusLog(order_id=oid, status="blad_druku", notes=f"test{attempt}"))
+            db.commit()
+
+        agent = importlib.reload(print_agent_runtime).agent
+        assert oid not in [o["order_id"] for o in agent.get_orders()]
+
+        with get_session() as db:
+            db.add(OrderStatusLog(order_id=oid, status="pobrano", notes="reset"))
+            db.commit()
+
+        assert oid in [o["order_id"] for o in agent.get_orders()]
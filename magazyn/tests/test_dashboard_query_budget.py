@@ -0,0 +1,89 @@
+"""Dashboard: staly budzet zapytan niezaleznie od wielkosci katalogu."""
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from magazyn.db import get_session
+from magazyn.domain.dashboard import DashboardService
+from magazyn.models.allegro import AllegroOffer
+from magazyn.models.orders import Order, OrderProduct
+from magazyn.models.products import Product, ProductSize, PurchaseBatch
+from magazyn.services.allegro_promotions import PromoSummary
+from magazyn.settings_store import settings_store
+
+QUERY_BUDGET = 40
+
+
+def _seed(db, start, count):
+    now = int(datetime.now().timestamp())
+    for index in range(start, start + count):
+        product = Product(name=f"Szelki {index}", color="Czarny", series="Tropical")
+        db.add(product)
+        db.flush()
+        size = ProductSize(
+            product_id=product.id, size="M", barcode=f"590{index:010d}", quantity=index % 7,
+        )
+        db.add(size)
+        db.flush()
+        db.add(AllegroOffer(offer_id=f"offer-{index}", title=product.name, price=Decimal("60")))
+        db.add(PurchaseBatch(
+            product_id=product.id, size="M", quantity=2, price=Decimal("25.00"),
+            purchase_date=f"2026-0{1 + index % 9}-1{index % 10}",
+            invoice_number=f"FV/{index % 4}", supplier=None if index % 2 else "Hurtownia",
+        ))
+        order_id = f"allegro_{index}"
+        db.add(Order(
+            order_id=order_id, platform="allegro", date_add=now - index * 60,
+            payment_done=Decimal("100.00"), payment_method_cod=False,
+        ))
+        db.flush()
+        db.add(OrderProduct(
+            order_id=order_id, name=product.name, quantity=1 + index % 3,
+            price_brutto=Decimal("50.00"), product_size_id=size.id, ean=size.barcode,
+        ))
+        db.add(OrderProduct(
+            order_id=order_id, name=f"Smycz {index}", quantity=1,
+            price_brutto=Decimal("20.00"), auction_id=f"offer-{index}",
+        ))
+
+
+def _dashboard_statements():
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with get_session() as db:
+        bind = db.get_bind()
+        event.listen(bind, "before_cursor_execute", on_execute)
+        try:
+            dashboard = DashboardService(db, settings_store).get_full_dashboard()
+        finally:
+            event.remove(bind, "before_cursor_execute", on_execute)
+    return dashboard, len(statements)
+
+
+def test_full_dashboard_stays_within_query_budget(app, monkeypatch):
+    monkeypatch.setattr(
+        "magazyn.services.allegro_promotions.get_promotions_summary",
+        lambda: PromoSummary(),
+    )
+    with get_session() as db:
+        _seed(db, 0, 6)
+    small, small_statements = _dashboard_statements()
+
+    with get_session() as db:
+        _seed(db, 6, 60)
+    large, large_statements = _dashboard_statements()
+
+    assert small_statements == large_statements <= QUERY_BUDGET
+    assert len(large["bestsellers"]["all_time"]) == 10
+    top = large["bestsellers"]["all_time"][0]
+    assert top["short_name"] == "Tropical/Czarny/M"
+    assert top["quantity"] == 3
+    assert top["ean"] == "5900000000002"
+    assert len(large["latest_deliveries"]) == 5
+    for delivery in large["latest_deliveries"]:
+        assert sum(item["quantity"] for item in delivery["products"]) == delivery["total_quantity"]
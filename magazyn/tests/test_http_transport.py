@@ -0,0 +1,103 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from magazyn import http_transport
+from magazyn.metrics import HTTP_TRANSPORT_REQUESTS_TOTAL
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = 0
+
+    def setup(self):
+        type(self).connections += 1
+        super().setup()
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Set-Cookie", "sticky=1")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _metric(integration, connection):
+    return HTTP_TRANSPORT_REQUESTS_TOTAL.labels(
+        integration=integration, connection=connection
+    )._value.get()
+
+
+def test_session_reuses_keep_alive_connection(local_server):
+    integration = "test-keepalive"
+    new_before = _metric(integration, "new")
+    reused_before = _metric(integration, "reused")
+
+    for _ in range(5):
+        response = http_transport.get_session(integration).get(f"{local_server}/x", timeout=5)
+        assert response.json() == {"ok": True}
+
+    assert _metric(integration, "new") - new_before == 1
+    assert _metric(integration, "reused") - reused_before == 4
+    assert len(http_transport.get_session(integration).cookies) == 0
+    http_transport.close_all()
+
+
+def test_new_connections_counted_exactly_across_threads(local_server):
+    integration = "test-threads"
+    new_before = _metric(integration, "new")
+    reused_before = _metric(integration, "reused")
+    connections_before = _KeepAliveHandler.connections
+    session = http_transport.get_session(integration)
+    barrier = threading.Barrier(4)
+
+    def worker():
+        barrier.wait()
+        for _ in range(3):
+            session.get(f"{local_server}/x", timeout=5).raise_for_status()
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    opened = _KeepAliveHandler.connections - connections_before
+    assert _metric(integration, "new") - new_before == opened
+    assert _metric(integration, "reused") - reused_before == 12 - opened
+    http_transport.close_all()
+
+
+def test_session_is_shared_per_integration():
+    first = http_transport.get_session(http_transport.ALLEGRO)
+    assert http_transport.get_session(http_transport.ALLEGRO) is first
+    assert http_transport.get_session(http_transport.WFIRMA) is not first
+
+
+def test_resolve_keeps_non_requests_callables():
+    def fake_get(url, **kwargs):
+        return url
+
+    assert http_transport.resolve(http_transport.ALLEGRO, fake_get) is fake_get
+    resolved = http_transport.resolve(http_transport.ALLEGRO, requests.get)
+    assert resolved is not requests.get
+    assert resolved.args == ("GET",)
@@ -0,0 +1,227 @@
+"""Graf zadan synchronizacji: rownoleglosc, zaleznosci, limity czasu i interwaly."""
+
+import logging
+import threading
+import time
+
+import pytest
+
+from magazyn.services.job_graph import (
+    RESULT_ERROR,
+    RESULT_OVERLAP,
+    RESULT_SUCCESS,
+    RESULT_TIMEOUT,
+    JobGraphExecutor,
+    SyncJob,
+)
+from magazyn.services.order_sync_cycle import OrderSyncCallbacks, OrderSyncCycle
+
+LOGGER = logging.getLogger("test.job_graph")
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sleeper(seconds, log=None, name=None):
+    def run():
+        if log is not None:
+            log.append(("start", name))
+        time.sleep(seconds)
+        if log is not None:
+            log.append(("end", name))
+        return {"items": 2}
+
+    return run
+
+
+def test_independent_jobs_run_concurrently():
+    executor = JobGraphExecutor(
+        [SyncJob(f"io-{i}", _sleeper(0.2)) for i in range(3)],
+        logger=LOGGER,
+        max_workers=3,
+    )
+
+    started = time.perf_counter()
+    outcomes = executor.run()
+
+    assert time.perf_counter() - started < 0.5
+    assert {outcome.result for outcome in outcomes.values()} == {RESULT_SUCCESS}
+
+
+def test_dependent_job_starts_after_dependencies():
+    log = []
+    executor = JobGraphExecutor(
+        [
+            SyncJob("profit", _sleeper(0.01, log, "profit"), depends_on=("events", "billing")),
+            SyncJob("events", _sleeper(0.1, log, "events")),
+            SyncJob("billing", _sleeper(0.05, log, "billing")),
+        ],
+        logger=LOGGER,
+        max_workers=3,
+    )
+
+    outcomes = executor.run()
+
+    assert log.index(("start", "profit")) > log.index(("end", "events"))
+    assert log.index(("start", "profit")) > log.index(("end", "billing"))
+    assert outcomes["profit"].result == RESULT_SUCCESS
+
+
+def test_timeout_does_not_block_dependents_and_prevents_overlap():
+    release = threading.Event()
+    executor = JobGraphExecutor(
+        [
+            SyncJob("slow", lambda: release.wait(5), timeout=0.1),
+            SyncJob("after", lambda: {"n": 1}, depends_on=("slow",)),
+        ],
+        logger=LOGGER,
+    )
+
+    first = executor.run()
+    second = executor.run(["slow"])
+    release.set()
+
+    assert first["slow"].result == RESULT_TIMEOUT
+    assert first["after"].result == RESULT_SUCCESS
+    assert second["slow"].result == RESULT_OVERLAP
+
+
+def test_failed_job_is_reported_and_rescheduled():
+    clock = _Clock()
+
+    def boom():
+        raise RuntimeError("api down")
+
+    executor = JobGraphExecutor(
+        [SyncJob("broken", boom, interval=60), SyncJob("ok", lambda: None, interval=300)],
+        logger=LOGGER,
+        clock=clock,
+    )
+
+    outcomes = executor.run_due()
+    assert outcomes["broken"].result == RESULT_ERROR
+    assert executor.due_jobs() == []
+    assert executor.seconds_until_next_due() == 60
+
+    clock.now += 61
+    assert executor.due_jobs() == ["broken"]
+
+
+def test_items_are_counted_from_job_result():
+    executor = JobGraphExecutor(
+        [SyncJob("events", _sleeper(0), items=lambda stats: stats["items"])],
+        logger=LOGGER,
+    )
+
+    assert executor.run()["events"].items == 2
+
+
+def test_invalid_graph_is_rejected():
+    with pytest.raises(ValueError):
+        JobGraphExecutor([SyncJob("a", lambda: None, depends_on=("missing",))], logger=LOGGER)
+    with pytest.raises(ValueError):
+        JobGraphExecutor(
+            [
+                SyncJob("a", lambda: None, depends_on=("b",)),
+                SyncJob("b", lambda: None, depends_on=("a",)),
+            ],
+            logger=LOGGER,
+        )
+
+
+def test_order_sync_cycle_graph_is_valid(app):
+    callbacks = OrderSyncCallbacks(
+        sync_from_allegro_events=lambda app: {},
+        refresh_order_profit_cache=lambda app: {},
+        sync_allegro_fulfillment=lambda app: {},
+        process_pending_invoices=lambda: {},
+        cancel_stale_unpaid_orders=lambda: {},
+        get_last_offer_sync_date=lambda: None,
+        set_last_offer_sync_date=lambda value: None,
+    )
+
+    executor = OrderSyncCycle(logger=LOGGER, callbacks=callbacks).executor(app)
+
+    assert set(executor.jobs["profit_cache"].depends_on) == {"allegro_events", "billing_ledger"}
+    assert executor.jobs["allegro_events"].interval < executor.jobs["returns"].interval
+
+
+def _tick_until(executor, name):
+    deadline = time.perf_counter() + 2
+    while time.perf_counter() < deadline:
+        outcomes = executor.submit_due()
+        if name in outcomes:
+            return outcomes
+        time.sleep(0.01)
+    raise AssertionError(f"{name} nie zakonczyl sie")
+
+
+def test_slow_job_does_not_delay_fast_job_interval():
+    clock = _Clock()
+    release = threading.Event()
+    fast_runs = []
+    executor = JobGraphExecutor(
+        [
+            SyncJob("daily", lambda: release.wait(5), interval=86400, timeout=1800),
+            SyncJob("orders", lambda: fast_runs.append(clock.now), interval=120),
+            SyncJob("profit", lambda: None, depends_on=("daily",), interval=600),
+        ],
+        logger=LOGGER,
+        clock=clock,
+    )
+    try:
+        assert executor.submit_due() == {}
+        assert _tick_until(executor, "orders")["orders"].result == RESULT_SUCCESS
+        assert executor.seconds_until_next_due() <= 1.0
+
+        clock.now += 121
+        assert _tick_until(executor, "orders")["orders"].result == RESULT_SUCCESS
+        assert fast_runs == [1000.0, 1121.0]
+        assert "daily" not in executor.due_jobs()
+
+        release.set()
+        assert _tick_until(executor, "daily")["daily"].result == RESULT_SUCCESS
+        assert _tick_until(executor, "profit")["profit"].result == RESULT_SUCCESS
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_hung_job_leaves_at_most_one_abandoned_thread():
+    from magazyn.metrics import SYNC_JOB_ABANDONED_THREADS
+
+    gauge = SYNC_JOB_ABANDONED_THREADS.labels(job="hung")
+    clock = _Clock()
+    release = threading.Event()
+    finished = threading.Event()
+
+    def hung():
+        release.wait(5)
+        finished.set()
+
+    executor = JobGraphExecutor([SyncJob("hung", hung, interval=1, timeout=10)], logger=LOGGER, clock=clock)
+    baseline = gauge._value.get()
+    try:
+        executor.submit_due()
+        for _ in range(3):
+            clock.now += 11
+            outcomes = executor.submit_due()
+            assert outcomes["hung"].result in (RESULT_TIMEOUT, RESULT_OVERLAP)
+        assert executor.abandoned_threads == 1
+        assert gauge._value.get() - baseline == 1
+
+        release.set()
+        assert finished.wait(2)
+        deadline = time.perf_counter() + 2
+        while executor.abandoned_threads and time.perf_counter() < deadline:
+            time.sleep(0.01)
+        assert executor.abandoned_threads == 0
+        assert gauge._value.get() == baseline
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,137 @@
+"""Kolejka etykiet zapisywana wierszami: tylko zmienione wiersze, etykiety binarnie."""
+
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+
+import magazyn.db as db_module
+from magazyn.db import db_connect
+from magazyn.services.label_store import get_label_store
+from magazyn.services.print_agent_runtime import agent
+from magazyn.services.print_agent_storage import (
+    QUEUE_STATUS_FAILED,
+    QUEUE_STATUS_PRINTED,
+    QUEUE_STATUS_PRINTING,
+)
+
+
+class _WriteCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(" ", 1)[0].upper() in ("INSERT", "UPDATE", "DELETE"):
+            self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _label(index):
+    return base64.b64encode(b"%PDF-1.4 label " + str(index).encode() * 100).decode("ascii")
+
+
+def _item(index):
+    return {
+        "order_id": f"ORD-{index}",
+        "label_data": _label(index),
+        "ext": "pdf",
+        "last_order_data": {"order_id": f"ORD-{index}"},
+        "queued_at": "2026-01-01T00:00:00",
+        "status": "queued",
+    }
+
+
+def _rows():
+    with db_connect() as conn:
+        return conn.execute(
+            text("SELECT order_id, status, label_data, label_pdf FROM label_queue ORDER BY id")
+        ).fetchall()
+
+
+def test_labels_are_stored_as_binary(app, monkeypatch):
+    agent.storage.save_queue([_item(1)])
+
+    row = _rows()[0]
+    assert row.label_data is None and row.label_pdf is None
+    with db_connect() as conn:
+        sha256 = conn.execute(text("SELECT label_sha256 FROM label_queue")).scalar_one()
+    assert get_label_store().read_content(sha256).startswith(b"%PDF")
+    assert agent.storage.load_queue()[0]["label_data"] == _label(1)
+
+    # Bez magazynu etykiet (LABEL_STORE_MAX_MB=0) bajty zostaja w wierszu.
+    monkeypatch.setattr(agent.storage, "_label_store", lambda: None)
+    agent.storage.save_queue(agent.storage.load_queue() + [_item(2)])
+    assert bytes(_rows()[1].label_pdf).startswith(b"%PDF")
+
+
+def test_unchanged_queue_is_not_rewritten(app):
+    agent.storage.save_queue([_item(i) for i in range(20)])
+    queue = agent.storage.load_queue()
+
+    with _WriteCounter(db_module.engine) as counter:
+        agent.storage.save_queue(queue)
+    assert counter.statements == []
+
+    queue[3]["retry_count"] = 1
+    with _WriteCounter(db_module.engine) as counter:
+        agent.storage.save_queue(queue)
+    assert len(counter.statements) == 1
+    assert counter.statements[0].startswith("UPDATE label_queue SET status")
+
+
+def test_removed_items_keep_final_status(app):
+    agent.storage.save_queue([_item(1), _item(2), _item(3)])
+    queue = agent.storage.load_queue()
+
+    printed, failed, dropped = queue
+    printed["status"] = QUEUE_STATUS_PRINTED
+    failed["status"] = QUEUE_STATUS_FAILED
+    agent.storage.save_queue([])
+
+    assert [(row.order_id, row.status) for row in _rows()] == [
+        ("ORD-1", QUEUE_STATUS_PRINTED),
+        ("ORD-2", QUEUE_STATUS_FAILED),
+    ]
+    assert agent.storage.load_queue() == []
+
+
+def test_printing_item_gets_lease(app):
+    item = _item(1)
+    item["status"] = QUEUE_STATUS_PRINTING
+    agent.storage.save_queue([item])
+
+    loaded = agent.storage.load_queue()[0]
+    assert loaded["claimed_by"] == agent.storage.worker_id
+    assert not agent.storage.is_lease_active(loaded)
+
+    loaded["claimed_by"] = "other-host:1"
+    assert agent.storage.is_lease_active(loaded)
+    loaded["lease_until"] = (datetime.now() - timedelta(seconds=1)).isoformat()
+    assert not agent.storage.is_lease_active(loaded)
+
+
+def test_legacy_table_without_id_is_migrated(app):
+    with db_connect() as conn:
+        conn.execute(text("DROP TABLE label_queue"))
+        conn.execute(text(
+            "CREATE TABLE label_queue(order_id TEXT, label_data TEXT, ext TEXT,"
+            " last_order_data TEXT, queued_at TEXT, status TEXT, retry_count INTEGER DEFAULT 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO label_queue(order_id, label_data, ext, last_order_data) "
+            "VALUES ('OLD-1', 'legacy-text', 'pdf', '{}')"
+        ))
+
+    queue = agent.storage.load_queue()
+
+    assert [(item["order_id"], item["label_data"]) for item in queue] == [
+        ("OLD-1", "legacy-text")
+    ]
+    assert queue[0]["id"] is not None
@@ -0,0 +1,127 @@
+"""Magazyn etykiet na dysku: adresowanie trescia, LRU, reprint i pobieranie bez API."""
+
+import base64
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+from sqlalchemy import text
+
+from magazyn.db import db_connect, get_session
+from magazyn.models.orders import Order
+from magazyn.services.label_store import LabelStore, get_label_store
+from magazyn.services.order_labels import reprint_order_labels
+from magazyn.services.print_agent_labels import PrintLabelService
+from magazyn.services.print_agent_runtime import agent
+
+
+def _pdf(tag):
+    return b"%PDF-1.4 " + tag.encode() * 200
+
+
+class _Clock:
+    def __init__(self):
+        self.current = datetime(2026, 5, 4, 12, 0)
+
+    def __call__(self):
+        self.current += timedelta(seconds=1)
+        return self.current
+
+
+def test_store_deduplicates_content_and_evicts_least_recently_used(app, tmp_path):
+    store = LabelStore(tmp_path / "labels", max_bytes=2 * len(_pdf("a")), now=_Clock())
+
+    first = store.put(_pdf("a"), "pdf", keys=["ship-1"])
+    assert store.put(_pdf("a"), "pdf", keys=["WB-1"]) == first
+    assert first.path == tmp_path / "labels" / first.sha256[:2] / f"{first.sha256}.pdf"
+    queued = store.put(_pdf("q"), "pdf")
+    with db_connect() as conn:
+        conn.execute(
+            text("INSERT INTO label_queue(order_id, label_sha256, status) VALUES ('1', :sha, 'queued')"),
+            {"sha": queued.sha256},
+        )
+
+    store.put(_pdf("b"), "pdf", keys=["ship-2"])
+
+    # Limit dwoch plikow: wylatuje najdawniej uzyty, etykieta aktywnej kolejki zostaje.
+    assert store.get("ship-1") is None and not first.path.exists()
+    assert store.get("WB-1") is None
+    assert store.read_content(queued.sha256) == _pdf("q")
+    assert store.load_base64("ship-2") == (base64.b64encode(_pdf("b")).decode("ascii"), "pdf")
+
+
+def test_limit_counts_labels_written_by_other_processes(app, tmp_path):
+    # Dwa obiekty magazynu jak worker aplikacji i agent druku na jednej bazie.
+    clock = _Clock()
+    worker = LabelStore(tmp_path / "labels", max_bytes=2 * len(_pdf("a")), now=clock)
+    agent_store = LabelStore(tmp_path / "labels", max_bytes=2 * len(_pdf("a")), now=clock)
+
+    first = worker.put(_pdf("a"), "pdf", keys=["ship-1"])
+    agent_store.put(_pdf("b"), "pdf", keys=["ship-2"])
+    agent_store.put(_pdf("c"), "pdf", keys=["ship-3"])
+    worker.put(_pdf("d"), "pdf", keys=["ship-4"])
+
+    with db_connect() as conn:
+        total = conn.execute(text("SELECT COALESCE(SUM(size_bytes), 0) FROM label_files")).scalar_one()
+    assert total <= 2 * len(_pdf("a"))
+    assert worker.get("ship-1") is None and not first.path.exists()
+    assert agent_store.get("ship-4") is not None
+
+
+def _label_service(get_shipment_label):
+    return PrintLabelService(
+        logger=Mock(),
+        get_shipment_label=get_shipment_label,
+        cancel_shipment=Mock(),
+        create_shipment=Mock(),
+        fetch_label=Mock(),
+        recreate_shipment_and_get_label=Mock(),
+        retry=Mock(),
+        errors_total=Mock(),
+        label_store=get_label_store(),
+    )
+
+
+def test_reprint_uses_stored_labels_without_api(app, monkeypatch):
+    with get_session() as db:
+        db.add(Order(order_id="allegro_1", date_add=1))
+    get_shipment_label = Mock(side_effect=lambda ids, **kwargs: _pdf(ids[0]))
+    service = _label_service(get_shipment_label)
+    service.retry = lambda func, *args, **kwargs: func(*args)
+    service.fetch_label = service.get_label
+
+    collected = service.collect_order_labels(
+        "allegro_1",
+        [{"shipment_id": "ship-1", "carrier_id": "INPOST"}, {"shipment_id": "ship-2"}],
+    )
+    assert len(collected.labels) == 2
+    assert service.get_label("INPOST", "ship-1") == collected.labels[0]
+    assert get_shipment_label.call_count == 2
+
+    printed = []
+    monkeypatch.setattr(agent, "get_order_packages", Mock(side_effect=AssertionError("API")))
+    monkeypatch.setattr(agent, "print_label", lambda data, ext, order_id: printed.append(data))
+    result = reprint_order_labels("allegro_1", agent)
+
+    assert result.printed
+    assert sorted(base64.b64decode(data) for data in printed) == [_pdf("ship-1"), _pdf("ship-2")]
+
+
+def test_download_streams_stored_label_with_etag_and_range(app, client, login, monkeypatch):
+    stored = get_label_store().put(_pdf("d"), "pdf", keys=["ship-9"], order_id="allegro_9")
+    monkeypatch.setattr(agent, "get_order_packages", Mock(side_effect=AssertionError("API")))
+
+    response = client.get("/order/allegro_9/download_label")
+    assert response.status_code == 200
+    assert response.data == _pdf("d")
+    assert response.headers["ETag"] == f'"{stored.sha256}"'
+
+    partial = client.get("/order/allegro_9/download_label", headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.data == b"%PDF-1.4"
+
+    cached = client.get(
+        "/order/allegro_9/download_label",
+        headers={"If-None-Match": f'"{stored.sha256}"'},
+    )
+    assert cached.status_code == 304
+    assert stored.path.exists()
@@ -0,0 +1,187 @@
+"""Indeks order_barcodes: skan etykiety rozwiazywany jednym zapytaniem."""
+
+from sqlalchemy import text
+
+from magazyn.db import db_connect
+from magazyn.services.order_barcodes import (
+    find_order_id_for_barcode,
+    index_order_barcodes,
+    lookup_values,
+)
+from magazyn.services.print_agent_runtime import agent
+from magazyn.services.scanning import load_order_for_barcode
+
+
+def _order_data(**overrides):
+    data = {
+        "order_id": "ORD-1",
+        "external_order_id": "EXT-1",
+        "package_ids": ["pkg-123456"],
+        "tracking_numbers": ["JJD000030123456789012"],
+        "delivery_package_nr": "WAY123456789",
+        "products": [],
+    }
+    data.update(overrides)
+    return data
+
+
+def test_printed_order_is_resolved_by_waybill(app):
+    agent.mark_as_printed("ORD-1", _order_data())
+
+    order_id, order_data = load_order_for_barcode("WAY123456789")
+
+    assert order_id == "ORD-1"
+    assert order_data["external_order_id"] == "EXT-1"
+
+
+def test_longer_scan_containing_stored_number(app):
+    agent.mark_as_printed("ORD-1", _order_data())
+
+    order_id, _ = load_order_for_barcode("%WAY123456789%0042")
+
+    assert order_id == "ORD-1"
+
+
+def test_jjd_digits_and_dhl_routing_prefix(app):
+    agent.mark_as_printed(
+        "ORD-2",
+        _order_data(
+            order_id="ORD-2",
+            tracking_numbers=["JJD000030123456789012", "2LPL12345678+49000000"],
+        ),
+    )
+
+    assert load_order_for_barcode("30123456789012")[0] == "ORD-2"
+    assert load_order_for_barcode("2LPL12345678+12345678")[0] == "ORD-2"
+
+
+def test_routing_prefix_does_not_match_other_shared_suffix(app):
+    agent.mark_as_printed(
+        "ORD-A", _order_data(order_id="ORD-A", tracking_numbers=["2LPL02495+83545000"])
+    )
+    agent.mark_as_printed(
+        "ORD-B", _order_data(order_id="ORD-B", tracking_numbers=["2LPL00910+83545000"])
+    )
+
+    assert load_order_for_barcode("2LPL02495+83545000")[0] == "ORD-A"
+    assert load_order_for_barcode("2LPL00910+83545000")[0] == "ORD-B"
+
+
+def test_direct_and_partial_tracking(app):
+    agent.mark_as_printed(
+        "ORD-P",
+        _order_data(
+            order_id="ORD-P",
+            external_order_id="EXT-P",
+            package_ids=["pkg-1"],
+            tracking_numbers=["JJD000030123456"],
+            delivery_package_nr="A003RFH916",
+        ),
+    )
+
+    assert load_order_for_barcode("pkg-1")[0] == "ORD-P"
+    assert load_order_for_barcode("prefix-JJD000030123456-suffix")[0] == "ORD-P"
+    assert load_order_for_barcode("A003RFH916")[0] == "ORD-P"
+    assert load_order_for_barcode("missing")[0] is None
+    # Skaner odczytal tylko poczatek albo koniec numeru.
+    assert load_order_for_barcode("JJD0000301")[0] == "ORD-P"
+    assert load_order_for_barcode("030123456")[0] == "ORD-P"
+    assert load_order_for_barcode("A003RF")[0] == "ORD-P"
+
+
+def test_orlen_carrier_waybill(app):
+    agent.mark_as_printed(
+        "ORD-O",
+        _order_data(
+            order_id="ORD-O",
+            package_ids=["ship-1"],
+            tracking_numbers=["AD02MJHDL5", "2102413302196"],
+            delivery_package_nr="AD02MJHDL5",
+        ),
+    )
+
+    assert load_order_for_barcode("2102413302196")[0] == "ORD-O"
+
+
+def test_dhl_jjd_and_routing_from_label(app):
+    agent.mark_as_printed(
+        "ORD-D",
+        _order_data(
+            order_id="ORD-D",
+            tracking_numbers=[
+                "AD02MHU8Z9",
+                "30774980700",
+                "JJD000030230864000435460935",
+                "2LPL02495+83545000",
+            ],
+            delivery_package_nr="AD02MHU8Z9",
+            package_ids=["d988625a-39dc-44fe-8684-35f2fb0b791f"],
+        ),
+    )
+
+    assert load_order_for_barcode("JJD000030230864000435460935")[0] == "ORD-D"
+    assert load_order_for_barcode("2LPL02495+83545000")[0] == "ORD-D"
+    assert load_order_for_barcode("30774980700")[0] == "ORD-D"
+
+
+def test_fragment_does_not_take_over_full_code_of_other_order(app):
+    agent.mark_as_printed("ORD-FULL", _order_data(order_id="ORD-FULL", tracking_numbers=["ABC123456"]))
+    agent.mark_as_printed(
+        "ORD-LONG", _order_data(order_id="ORD-LONG", tracking_numbers=["ABC123456789"])
+    )
+
+    assert load_order_for_barcode("ABC123456")[0] == "ORD-FULL"
+    assert load_order_for_barcode("ABC1234567")[0] == "ORD-LONG"
+
+
+def test_long_scan_needs_single_lookup():
+    values = lookup_values("X" * 40 + "-WAY123456789-" + "Y" * 10)
+
+    assert "WAY123456789" in values
+    assert len(values) <= 500
+
+
+def test_newer_order_takes_over_reused_code(app):
+    agent.mark_as_printed("ORD-OLD", _order_data(order_id="ORD-OLD"))
+    agent.mark_as_printed("ORD-NEW", _order_data(order_id="ORD-NEW"))
+
+    with db_connect() as conn:
+        assert find_order_id_for_barcode(conn, "WAY123456789") == "ORD-NEW"
+        # Ponowny zapis tego samego zamowienia nie zmienia wiersza.
+        assert index_order_barcodes(conn, "ORD-NEW", _order_data()) > 0
+        count = conn.execute(
+            text("SELECT COUNT(*) FROM order_barcodes WHERE barcode = 'WAY123456789'")
+        ).scalar()
+    assert count == 1
+
+
+def test_queued_order_is_indexed_once(app):
+    item = {"order_id": "ORD-Q", "last_order_data": _order_data(order_id="ORD-Q")}
+    agent.storage.save_queue([item])
+    agent.storage.save_queue([item])
+
+    order_id, order_data = load_order_for_barcode("pkg-123456")
+
+    assert order_id == "ORD-Q"
+    assert order_data["order_id"] == "ORD-Q"
+
+
+def test_order_and_package_ids_match_only_whole_scan(app):
+    agent.mark_as_printed(
+        "123456",
+        _order_data(order_id="123456", external_order_id="987654321"),
+    )
+
+    assert load_order_for_barcode("123456")[0] == "123456"
+    assert load_order_for_barcode("987654321")[0] == "123456"
+    # Obcy skan zawierajacy ciag cyfr ID zamowienia lub paczki nie trafia.
+    assert load_order_for_barcode("X00123456X")[0] is None
+    assert load_order_for_barcode("5900987654321")[0] is None
+    assert load_order_for_barcode("pkg-1234567")[0] is None
+    # Numer przewoznika nadal moze byc czescia dluzszego skanu.
+    assert load_order_for_barcode("%WAY123456789%0042")[0] == "123456"
+
+
+def test_unknown_code_returns_nothing(app):
+    assert load_order_for_barcode("NOPE-000000") == (None, None)
+    assert lookup_values("") == []
@@ -0,0 +1,95 @@
+"""orders.current_status: listener, checker rozjazdow i filtry po statusie."""
+
+from datetime import datetime, timedelta
+
+from magazyn.db import get_session
+from magazyn.models.orders import Order, OrderStatusLog
+from magazyn.repositories.order_repository import OrderRepository
+from magazyn.services.order_current_status import check_current_status
+from magazyn.services.order_status import add_order_status
+
+BASE = datetime(2026, 5, 4, 12, 0)
+
+
+def _order(db, order_id):
+    db.add(Order(order_id=order_id, platform="allegro", date_add=int(BASE.timestamp())))
+    db.flush()
+
+
+def test_add_order_status_keeps_column_in_step(app):
+    with get_session() as db:
+        _order(db, "a1")
+        order = db.get(Order, "a1")
+        assert order.current_status is None
+
+        add_order_status(db, "a1", "pobrano", send_email=False)
+        assert order.current_status == "pobrano"
+        # Ten sam status w tej samej sesji jest pomijany bez zapytania o historie.
+        assert add_order_status(db, "a1", "pobrano", send_email=False) is None
+        add_order_status(db, "a1", "wydrukowano", send_email=False)
+        assert order.current_status == "wydrukowano"
+        assert order.current_status_at is not None
+
+    with get_session() as db:
+        assert db.get(Order, "a1").current_status == "wydrukowano"
+
+
+def test_listener_follows_direct_log_writes(app):
+    with get_session() as db:
+        _order(db, "a2")
+        db.add(OrderStatusLog(order_id="a2", status="spakowano", timestamp=BASE))
+        late = OrderStatusLog(order_id="a2", status="wyslano", timestamp=BASE + timedelta(hours=1))
+        # Wpis z wczesniejszym czasem nie zmienia biezacego statusu.
+        db.add(OrderStatusLog(order_id="a2", status="pobrano", timestamp=BASE - timedelta(hours=1)))
+        db.add(late)
+        db.flush()
+        assert db.get(Order, "a2").current_status == "wyslano"
+
+        db.delete(late)
+        db.flush()
+        order = db.get(Order, "a2")
+        assert (order.current_status, order.current_status_at) == ("spakowano", BASE)
+
+
+def test_checker_repairs_writes_bypassing_orm(app):
+    with get_session() as db:
+        _order(db, "a3")
+        _order(db, "a4")
+        add_order_status(db, "a3", "pobrano", send_email=False)
+        add_order_status(db, "a4", "pobrano", send_email=False)
+
+    with get_session() as db:
+        db.execute(OrderStatusLog.__table__.insert().values(
+            order_id="a3", status="dostarczono", timestamp=datetime.now() + timedelta(minutes=5),
+        ))
+        drifts = check_current_status(db)
+        assert [(item.order_id, item.stored, item.expected) for item in drifts] == [
+            ("a3", "pobrano", "dostarczono"),
+        ]
+        assert check_current_status(db, repair=True)
+
+    with get_session() as db:
+        assert check_current_status(db) == []
+        assert db.get(Order, "a3").current_status == "dostarczono"
+
+
+def test_repository_status_filter_uses_column(app):
+    with get_session() as db:
+        for order_id, status in (("b1", "pobrano"), ("b2", "wyslano"), ("b3", "dostarczono")):
+            _order(db, order_id)
+            add_order_status(db, order_id, status, send_email=False)
+        _order(db, "b4")
+
+    with get_session() as db:
+        repo = OrderRepository(db)
+
+        def ids(status_filter):
+            query = repo.list_query(
+                search="", status_filter=status_filter, date_from="", date_to="",
+                sort_by="date", sort_dir="desc",
+            )
+            return sorted(order.order_id for order in query)
+
+        assert ids("w_transporcie") == ["b2"]
+        assert ids("dostarczono") == ["b3"]
+        assert ids("all") == ["b1", "b2", "b3", "b4"]
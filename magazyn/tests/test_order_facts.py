@@ -0,0 +1,130 @@
+"""Kolumnowy magazyn faktow: zgodnosc z helperami stats_orders i odswiezanie."""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import func
+
+from magazyn.db import get_session
+from magazyn.models.orders import Order, OrderProduct, OrderStatusLog
+from magazyn.services.order_facts import OrderFactStore, get_order_facts
+from magazyn.services.stats_orders import bucket_key, fetch_orders, order_products_map, order_revenue
+from magazyn.services.stats_support import StatsFilters
+
+START = datetime(2026, 2, 20)
+END = datetime(2026, 4, 10)
+
+
+def _seed(db, count=60, prefix="ord"):
+    for index in range(count):
+        order_id = f"{prefix}_{index}"
+        cod = index % 5 == 0
+        db.add(Order(
+            order_id=order_id,
+            platform=("allegro", "shop", "ebay", None)[index % 4],
+            date_add=int((START + timedelta(hours=19 * index)).timestamp()),
+            payment_done=Decimal("0") if cod else Decimal("99.99") + index,
+            payment_method="Pobranie" if cod else ("Przelew", "pobranie za pobraniem")[index % 7 == 3],
+            payment_method_cod=cod,
+            delivery_price=Decimal("15.57") if cod else None,
+            delivery_method=("InPost Paczkomat", "DPD")[index % 2],
+        ))
+        db.flush()
+        for line in range(index % 3):
+            db.add(OrderProduct(
+                order_id=order_id,
+                name=f"Produkt {line}",
+                ean=None if line == 2 else f"590{line}",
+                quantity=line + 1,
+                price_brutto=Decimal("49.99") + line,
+            ))
+
+
+def _expected(filters):
+    with get_session() as db:
+        orders = fetch_orders(db, filters, int(filters.date_from.timestamp()), int(filters.date_to.timestamp()))
+        products = order_products_map(db, [order.order_id for order in orders])
+    buckets = defaultdict(lambda: [Decimal("0"), 0, 0])
+    for order in orders:
+        bucket = buckets[bucket_key(order.date_add, filters.granularity)]
+        bucket[0] += order_revenue(order, products)
+        bucket[1] += 1
+        bucket[2] += int(products.get(order.order_id, {}).get("qty", 0))
+    return {key: tuple(value) for key, value in buckets.items()}
+
+
+def _actual(filters, store=None):
+    facts = store.get() if store else get_order_facts()
+    mask = facts.select(
+        int(filters.date_from.timestamp()),
+        int(filters.date_to.timestamp()),
+        platform=filters.platform,
+        payment_type=filters.payment_type,
+    )
+    return {
+        key: (value.revenue, value.orders, value.items)
+        for key, value in facts.buckets(mask, filters.granularity).items()
+    }
+
+
+def test_facts_match_python_aggregation(app):
+    with get_session() as db:
+        _seed(db)
+
+    for granularity in ("day", "week", "month"):
+        for platform in ("all", "allegro", "manual"):
+            for payment_type in ("all", "cod", "online"):
+                filters = StatsFilters(START, END, granularity, platform, payment_type)
+                assert _actual(filters) == _expected(filters), (granularity, platform, payment_type)
+
+    facts = get_order_facts()
+    mask = facts.select(int(START.timestamp()), int(END.timestamp()))
+    groups = {(group.ean, group.name): group for group in facts.line_groups(mask)}
+    assert (groups[("5900", "Produkt 0")].items, groups[("5900", "Produkt 0")].orders) == (40, 40)
+    assert (groups[("5901", "Produkt 1")].items, groups[("5901", "Produkt 1")].orders) == (40, 20)
+    assert groups[("5901", "Produkt 1")].gross == Decimal("2039.60")
+    assert facts.count_by(mask, "carrier") == {"InPost Paczkomat": 30, "DPD": 30}
+
+
+def test_store_refreshes_only_changed_orders(app):
+    store = OrderFactStore()
+    with get_session() as db:
+        _seed(db, count=20)
+    filters = StatsFilters(START, END, "month", "all", "all")
+    assert _actual(filters, store) == _expected(filters)
+    assert store.stats["full_loads"] == 1
+
+    with get_session() as db:
+        db.query(OrderProduct).filter_by(order_id="ord_4").first().quantity = 7
+        db.add(OrderStatusLog(order_id="ord_5", status="wyslano"))
+        _seed(db, count=3, prefix="new")
+    assert _actual(filters, store) == _expected(filters)
+    assert store.stats["full_loads"] == 1
+    assert store.stats["incremental_loads"] >= 1
+    facts = store.get()
+    assert facts.count_by(facts.select(0, 2**40), "status") == {None: 22, "wyslano": 1}
+
+    with get_session() as db:
+        db.delete(db.get(Order, "ord_7"))
+    assert _actual(filters, store) == _expected(filters)
+    assert store.stats["full_loads"] == 2
+
+
+def test_store_picks_up_commit_with_older_updated_at(app):
+    store = OrderFactStore()
+    with get_session() as db:
+        _seed(db, count=20)
+    filters = StatsFilters(START, END, "month", "all", "all")
+    assert _actual(filters, store) == _expected(filters)
+
+    # Transakcja wystartowana wczesniej, zatwierdzona po odczycie: znacznik
+    # starszy niz najnowszy, a liczby wierszy bez zmian - wersja danych ta sama.
+    with get_session() as db:
+        newest = db.query(func.max(Order.updated_at)).scalar()
+        db.query(Order).filter_by(order_id="ord_1").update({
+            Order.payment_done: Decimal("555.55"),
+            Order.updated_at: newest - timedelta(seconds=60),
+        })
+    assert _actual(filters, store) == _expected(filters)
+    assert store.stats["full_loads"] == 1
@@ -0,0 +1,110 @@
+"""Lista zamowien: stala liczba zapytan, numer lp i paginacja keyset."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+import magazyn.db as db_module
+from magazyn.db import get_session
+from magazyn.models.orders import Order, OrderProduct, OrderStatusLog
+from magazyn.models.returns import Return
+from magazyn.services.order_list import _page_numbers, build_orders_list_context
+from magazyn.services.order_presentation import _get_status_display
+
+
+BASE_TS = 1_767_225_600  # 2026-01-01
+
+
+def _seed_orders(count):
+    with get_session() as db:
+        for index in range(count):
+            order_id = f"ORD-{index:03d}"
+            db.add(Order(order_id=order_id, platform="allegro", date_add=BASE_TS + index * 60,
+                         payment_done=10 + index, currency="PLN"))
+            db.add(OrderProduct(order_id=order_id, name=f"Produkt {index}", quantity=1))
+            db.add(OrderStatusLog(order_id=order_id, status="pobrano",
+                                  timestamp=datetime(2026, 1, 1)))
+            db.add(OrderStatusLog(order_id=order_id, status="wydrukowano",
+                                  timestamp=datetime(2026, 1, 1) + timedelta(hours=1)))
+        db.add(Return(order_id="ORD-005", status="pending"))
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(db_module.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db_module.engine, "before_cursor_execute", self._on_execute)
+
+
+def test_query_count_does_not_depend_on_page_size(app):
+    _seed_orders(60)
+
+    with _QueryCounter() as small:
+        small_ctx = build_orders_list_context(MultiDict({"per_page": "10"}))
+    with _QueryCounter() as large:
+        large_ctx = build_orders_list_context(MultiDict({"per_page": "50"}))
+
+    assert len(small_ctx["orders"]) == 10
+    assert len(large_ctx["orders"]) == 50
+    assert small.count == large.count
+
+
+def test_rows_carry_ordinal_status_products_and_return(app):
+    _seed_orders(12)
+
+    ctx = build_orders_list_context(MultiDict({"per_page": "10"}))
+    first = ctx["orders"][0]
+    by_id = {row["order_id"]: row for row in ctx["orders"]}
+
+    assert first["order_id"] == "ORD-011"
+    assert first["lp"] == 12
+    assert first["status_text"] == _get_status_display("wydrukowano")[0]
+    assert first["product_summary"] == ["Produkt 11 x1"]
+    assert by_id["ORD-005"]["return_info"] == {"status": "pending", "refund_processed": False}
+
+    searched = build_orders_list_context(MultiDict({"search": "Produkt 1"}))
+    assert {row["order_id"]: row["lp"] for row in searched["orders"]} == {
+        "ORD-011": 3,
+        "ORD-010": 2,
+        "ORD-001": 1,
+    }
+
+
+def test_keyset_page_matches_offset_page(app):
+    _seed_orders(30)
+
+    first = build_orders_list_context(MultiDict({"per_page": "10"}))
+    by_offset = build_orders_list_context(MultiDict({"per_page": "10", "page": "2"}))
+    by_keyset = build_orders_list_context(
+        MultiDict({"per_page": "10", "page": "2", "after": first["next_cursor"]})
+    )
+
+    assert [row["order_id"] for row in by_keyset["orders"]] == [
+        row["order_id"] for row in by_offset["orders"]
+    ]
+    assert by_keyset["orders"][0]["order_id"] == "ORD-019"
+
+
+def test_orders_page_links_next_cursor(app, client, login):
+    _seed_orders(30)
+
+    response = client.get("/orders?per_page=10")
+
+    assert response.status_code == 200
+    assert "after=1767226800:ORD-020" in response.get_data(as_text=True).replace("%3A", ":")
+
+
+def test_page_numbers_are_bounded():
+    assert _page_numbers(1, 1) == [1]
+    assert _page_numbers(5, 8000) == [1, None, 3, 4, 5, 6, 7, None, 8000]
+    assert _page_numbers(2, 4) == [1, 2, 3, 4]
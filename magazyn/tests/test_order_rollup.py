@@ -0,0 +1,231 @@
+"""Dzienny rollup zamowien: utrzymanie przyrostowe, checker i odczyty dashboardu."""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from sqlalchemy import insert
+
+from magazyn.db import get_session
+from magazyn.domain.dashboard import DashboardService
+from magazyn.domain.financial import FinancialCalculator
+from magazyn.models.orders import Order, OrderDailyRollup, OrderProduct
+from magazyn.models.returns import Return
+from magazyn.services import order_rollup
+from magazyn.settings_store import settings_store
+
+DAY = date(2026, 3, 10)
+
+
+def _ts(day: date, hour: int = 12) -> int:
+    return int(datetime.combine(day, datetime.min.time()).replace(hour=hour).timestamp())
+
+
+def _add_order(db, order_id, day, lines=((1, "50.00"),), **fields):
+    fields.setdefault("payment_done", Decimal("100.00"))
+    fields.setdefault("payment_method_cod", False)
+    db.add(Order(order_id=order_id, platform="allegro", date_add=_ts(day), **fields))
+    db.flush()
+    for quantity, price in lines:
+        db.add(OrderProduct(
+            order_id=order_id, name="Produkt", quantity=quantity, price_brutto=Decimal(price),
+        ))
+
+
+def _rows():
+    with get_session() as db:
+        return {
+            (row.day, row.status_bucket): row
+            for row in db.query(OrderDailyRollup).all()
+        }
+
+
+def _assert_consistent():
+    with get_session() as db:
+        assert order_rollup.check_order_rollup(db) == []
+
+
+def test_rollup_follows_order_product_and_return_changes(app):
+    with get_session() as db:
+        _add_order(db, "allegro_1", DAY, lines=((2, "40.00"), (1, "20.00")))
+        _add_order(db, "allegro_2", DAY, delivery_package_nr="PKG-2")
+        _add_order(db, "allegro_3", DAY, payment_done=Decimal("0"))
+        _add_order(db, "allegro_4", DAY, payment_done=Decimal("0"), payment_method_cod=True)
+
+    paid = _rows()[(DAY, order_rollup.BUCKET_PAID)]
+    assert (paid.orders, paid.awaiting_label, paid.units) == (3, 2, 5)
+    assert paid.revenue == Decimal("200.00")
+    assert paid.items_value == Decimal("200.00")
+    assert paid.profit_pending == 3
+    assert _rows()[(DAY, order_rollup.BUCKET_UNPAID)].orders == 1
+    _assert_consistent()
+
+    with get_session() as db:
+        order = db.get(Order, "allegro_1")
+        order.real_profit_sale_price = Decimal("120.00")
+        order.real_profit_purchase_cost = Decimal("40.00")
+        order.real_profit_packaging_cost = Decimal("0.16")
+        order.real_profit_allegro_fees = Decimal("14.76")
+        order.real_profit_amount = Decimal("65.08")
+        db.get(Order, "allegro_2").date_add = _ts(DAY + timedelta(days=1))
+        db.get(Order, "allegro_3").payment_done = Decimal("80.00")
+        line = db.query(OrderProduct).filter_by(order_id="allegro_4").one()
+        line.quantity = 3
+
+    rows = _rows()
+    paid = rows[(DAY, order_rollup.BUCKET_PAID)]
+    assert (paid.orders, paid.units, paid.profit_pending) == (3, 7, 2)
+    assert (paid.profit, paid.fees) == (Decimal("65.08"), Decimal("14.76"))
+    assert (DAY, order_rollup.BUCKET_UNPAID) not in rows
+    assert rows[(DAY + timedelta(days=1), order_rollup.BUCKET_PAID)].orders == 1
+    _assert_consistent()
+
+    with get_session() as db:
+        db.add(Return(order_id="allegro_1", status="completed"))
+        db.delete(db.query(OrderProduct).filter_by(order_id="allegro_4").one())
+        db.delete(db.get(Order, "allegro_3"))
+
+    rows = _rows()
+    assert rows[(DAY, order_rollup.BUCKET_RETURNED)].units == 3
+    assert rows[(DAY, order_rollup.BUCKET_PAID)].units == 0
+    _assert_consistent()
+
+
+def test_two_sessions_touching_same_day_keep_both_changes(app):
+    with get_session() as db:
+        _add_order(db, "allegro_1", DAY)
+        _add_order(db, "allegro_2", DAY)
+
+    with get_session() as second:
+        late = second.get(Order, "allegro_2")
+        with get_session() as first:
+            first.get(Order, "allegro_1").payment_done = Decimal("0")
+        late.delivery_package_nr = "PKG-2"
+
+    rows = _rows()
+    assert rows[(DAY, order_rollup.BUCKET_UNPAID)].orders == 1
+    paid = rows[(DAY, order_rollup.BUCKET_PAID)]
+    assert (paid.orders, paid.awaiting_label) == (1, 0)
+    _assert_consistent()
+
+
+def test_refresh_locks_days_in_order_on_postgresql():
+    executed = []
+    bind = SimpleNamespace(
+        dialect=SimpleNamespace(name="postgresql"),
+        execute=lambda statement, params: executed.append((str(statement), params)),
+    )
+
+    order_rollup.lock_days(bind, [DAY + timedelta(days=1), DAY, DAY])
+
+    assert [params["day"] for _, params in executed] == [DAY.toordinal(), DAY.toordinal() + 1]
+    assert all("pg_advisory_xact_lock" in sql for sql, _ in executed)
+
+
+def test_days_of_all_flushes_refreshed_once_in_order_at_commit(app, monkeypatch):
+    refreshed = []
+    real_refresh = order_rollup.refresh_days
+
+    def recording_refresh(bind, days):
+        refreshed.append(sorted(days))
+        return real_refresh(bind, days)
+
+    monkeypatch.setattr(order_rollup, "refresh_days", recording_refresh)
+    later = DAY + timedelta(days=5)
+    with get_session() as db:
+        _add_order(db, "allegro_late", later)
+        db.flush()
+        _add_order(db, "allegro_early", DAY)
+        db.flush()
+        assert refreshed == []
+
+    assert refreshed == [[DAY, later]]
+    _assert_consistent()
+
+
+def test_checker_reports_and_repairs_writes_that_bypass_orm(app):
+    with get_session() as db:
+        _add_order(db, "allegro_1", DAY)
+    with get_session() as db:
+        db.execute(insert(Order), [{
+            "order_id": "allegro_bulk", "platform": "woocommerce",
+            "date_add": _ts(DAY + timedelta(days=2)), "payment_done": Decimal("30.00"),
+        }])
+
+    with get_session() as db:
+        mismatches = order_rollup.check_order_rollup(db, repair=True)
+    assert {(item.day, item.platform, item.measure) for item in mismatches} >= {
+        (DAY + timedelta(days=2), "woocommerce", "orders"),
+        (DAY + timedelta(days=2), "woocommerce", "revenue"),
+    }
+    _assert_consistent()
+
+    with get_session() as db:
+        db.query(OrderDailyRollup).delete()
+    with get_session() as db:
+        stats = order_rollup.ensure_order_rollup(db, today=DAY)
+    assert stats["rebuilt"] == 1
+    assert stats["rows"] == 2
+    _assert_consistent()
+
+
+def test_dashboard_and_reports_read_rollup(app):
+    today = datetime.now().date()
+    week_start = today - timedelta(days=today.weekday())
+    with get_session() as db:
+        _add_order(db, "allegro_today", today, lines=((2, "30.00"),))
+        _add_order(db, "allegro_unpaid", today, payment_done=Decimal("0"))
+        _add_order(db, "allegro_prev", week_start - timedelta(days=3), delivery_package_nr="P")
+        _add_order(
+            db, "allegro_cached", today, lines=((1, "90.00"),),
+            real_profit_sale_price=Decimal("90.00"), real_profit_purchase_cost=Decimal("30.00"),
+            real_profit_packaging_cost=Decimal("0.16"), real_profit_allegro_fees=Decimal("11.07"),
+            real_profit_amount=Decimal("48.77"),
+        )
+        _add_order(db, "allegro_returned", today)
+        db.add(Return(order_id="allegro_returned", status="completed"))
+
+    with get_session() as db:
+        service = DashboardService(db, settings_store)
+        orders = service.get_order_stats()
+        revenue = service.get_revenue_stats()
+        trends = service.get_trends()
+
+        calculator = FinancialCalculator(db, settings_store=None)
+        start = week_start - timedelta(days=7)
+        expected = calculator.get_period_summary(
+            _ts(start, 0), _ts(today + timedelta(days=1), 0), include_fixed_costs=False
+        )
+        summary = order_rollup.summarize_period(db, calculator, start, today)
+
+    assert (orders.today, orders.pending) == (4, 4)
+    assert revenue.today == 200.0
+    assert trends.prev_week_orders == 1
+    assert trends.prev_week_revenue == 50.0
+    assert summary.orders_count == expected.orders_count == 3
+    assert summary.products_sold == expected.products_sold
+    assert summary.total_revenue == expected.total_revenue
+    assert summary.gross_profit == expected.gross_profit
+
+
+def test_dashboard_reads_source_while_rollup_is_empty(app):
+    today = datetime.now().date()
+    with get_session() as db:
+        _add_order(db, "allegro_today", today, lines=((2, "30.00"),))
+        _add_order(db, "allegro_unpaid", today, payment_done=Decimal("0"))
+    with get_session() as db:
+        service = DashboardService(db, settings_store)
+        filled = (service.get_order_stats(), service.get_revenue_stats(), service.get_trends())
+
+    with get_session() as db:
+        db.query(OrderDailyRollup).delete()
+    with get_session() as db:
+        assert order_rollup.rollup_empty(db)
+        service = DashboardService(db, settings_store)
+        empty = (service.get_order_stats(), service.get_revenue_stats(), service.get_trends())
+        records = service.get_sales_records()
+
+    assert empty == filled
+    assert empty[0].today == 2
+    assert empty[1].today == 100.0
+    assert records.daily_quantity == 2
@@ -0,0 +1,101 @@
+"""Indeks wyszukiwania zamowien: normalizacja, listener i ranking."""
+
+from magazyn.db import get_session
+from magazyn.domain.order_search import build_document, search_terms
+from magazyn.models.orders import Order, OrderProduct, OrderSearchDocument
+from magazyn.repositories.order_repository import OrderRepository
+from magazyn.services.order_search import ensure_order_search
+
+
+def _search(db, search, sort_by="date"):
+    query = OrderRepository(db).list_query(
+        search=search, status_filter="all", date_from="", date_to="",
+        sort_by=sort_by, sort_dir="desc",
+    )
+    return [order.order_id for order in query]
+
+
+def test_document_and_query_share_normalization():
+    document = build_document(
+        {"order_id": "allegro_1", "customer_name": "Łukasz  Żółć", "phone": "+48 600-100-200"},
+        ["Szelki ŁÓDŹ"],
+    )
+    assert document == "| allegro_1 | lukasz zolc | +48 600-100-200 | 600100200 | szelki lodz |"
+    assert search_terms("  ŁUKASZ Żółć ") == ["lukasz", "zolc"]
+    assert search_terms("+48 600 100 200") == ["600100200"]
+    assert search_terms("0048600100200") == ["600100200"]
+    assert search_terms("ab 12") == ["ab", "12"]
+
+
+def test_search_follows_orders_and_lines(app):
+    with get_session() as db:
+        db.add(Order(
+            order_id="allegro_1", customer_name="Łukasz Żółć", email="Lukasz@Example.com",
+            phone="+48 600 100 200", delivery_package_nr="AB123PL", date_add=1,
+        ))
+        db.add(Order(order_id="woo_2", customer_name="Anna Nowak", phone="500600700", date_add=2))
+        db.flush()
+        db.add(OrderProduct(order_id="woo_2", name="Szelki Łódź"))
+
+    with get_session() as db:
+        assert _search(db, "ZOLC") == ["allegro_1"]
+        assert _search(db, "600 100 200") == ["allegro_1"]
+        assert _search(db, "lukasz@example") == ["allegro_1"]
+        assert _search(db, "ab123") == ["allegro_1"]
+        # Wszystkie slowa, takze krotsze niz trigram i z roznych pol.
+        assert _search(db, "nowak lodz") == ["woo_2"]
+        assert _search(db, "an") == ["woo_2"]
+        assert _search(db, "100%") == []
+
+        db.query(OrderProduct).filter_by(order_id="woo_2").one().name = "Smycz"
+        db.get(Order, "allegro_1").delivery_package_nr = "XY999PL"
+
+    with get_session() as db:
+        assert _search(db, "szelki") == []
+        assert _search(db, "smycz") == ["woo_2"]
+        assert _search(db, "xy999") == ["allegro_1"]
+        db.delete(db.get(Order, "woo_2"))
+
+    with get_session() as db:
+        assert db.get(OrderSearchDocument, "woo_2") is None
+
+
+def test_relevance_ranks_exact_field_first(app):
+    with get_session() as db:
+        db.add(Order(order_id="o1", customer_name="Jan Kowalski-Nowak", date_add=3))
+        db.add(Order(order_id="o2", customer_name="Nowak", date_add=1))
+        db.add(Order(order_id="o3", customer_name="Ewa Nowakowska", date_add=2))
+
+    with get_session() as db:
+        assert _search(db, "nowak") == ["o1", "o3", "o2"]
+        assert _search(db, "nowak", sort_by="relevance") == ["o2", "o3", "o1"]
+
+
+def test_ensure_indexes_orders_written_without_orm(app):
+    with get_session() as db:
+        db.execute(Order.__table__.insert(), [
+            {"order_id": f"import_{index}", "customer_name": f"Klient {index}"} for index in range(3)
+        ])
+        # Przed uzupelnieniem indeksu - wyszukiwanie po kolumnach.
+        assert sorted(_search(db, "klient")) == ["import_0", "import_1", "import_2"]
+        assert ensure_order_search(db) == {"indexed": 3}
+        assert ensure_order_search(db) == {"indexed": 0}
+        assert sorted(_search(db, "klient")) == ["import_0", "import_1", "import_2"]
+
+
+def test_orders_without_document_found_next_to_indexed(app):
+    with get_session() as db:
+        db.add(Order(order_id="indexed_1", customer_name="Anna Kowalska", date_add=2))
+        db.flush()
+        db.execute(Order.__table__.insert(), [
+            {"order_id": "legacy_1", "customer_name": "Jan Kowalski", "date_add": 1},
+        ])
+
+    with get_session() as db:
+        assert _search(db, "kowalsk") == ["indexed_1", "legacy_1"]
+        assert _search(db, "anna") == ["indexed_1"]
+        ensure_order_search(db)
+
+    with get_session() as db:
+        assert _search(db, "kowalsk") == ["indexed_1", "legacy_1"]
+
@@ -0,0 +1,199 @@
+"""Testy rownoleglego tworzenia przesylek (ShipmentPipeline)."""
+
+import base64
+import threading
+from unittest.mock import Mock
+
+from magazyn.services.print_agent_labels import PrintLabelService
+from magazyn.services.print_agent_shipment_creation import PrintShipmentCreator
+from magazyn.services.print_agent_shipment_pipeline import ShipmentPipeline
+
+
+def _order(order_id):
+    return {
+        "order_id": order_id,
+        "delivery_method": "Allegro Paczkomaty InPost",
+        "delivery_fullname": "Jan Kowalski",
+        "payment_done": 100.0,
+        "products": [{"name": "Szelki", "quantity": 1, "ref": order_id.split("_")[1]}],
+    }
+
+
+class _Allegro:
+    """Atrapa Shipment Management: komendy potwierdzane po zadanej liczbie taktow."""
+
+    def __init__(self, ticks, parallel):
+        self.ticks = dict(ticks)
+        self.barrier = threading.Barrier(parallel, timeout=5)
+        self.created = []
+        self.state = {}
+
+    def create_shipment(self, **payload):
+        # Bariera przechodzi tylko, gdy komendy sa wysylane jednoczesnie.
+        self.barrier.wait()
+        command_id = f"cmd-{payload['reference_number']}"
+        self.created.append(command_id)
+        return {"commandId": command_id}
+
+    def command_status(self, command_id):
+        order_id = command_id.split("-", 1)[1]
+        remaining = self.ticks[order_id]
+        if remaining == "ERROR":
+            return {"status": "ERROR", "errors": [{"message": "Zly adres"}]}
+        if remaining > 0:
+            self.ticks[order_id] = remaining - 1
+            return {"status": "IN_PROGRESS"}
+        return {"status": "SUCCESS", "shipmentId": f"ship-{order_id}"}
+
+
+def _pipeline(allegro, *, timeout=60.0, load_state_value=None, wait=None):
+    waits = []
+    creator = PrintShipmentCreator(
+        logger=Mock(),
+        settings_store={},
+        fetch_order_detail=lambda checkout_form_id: {"delivery": {"method": {"id": "dm-1"}}},
+        resolve_delivery_service_id=Mock(),
+        resolve_carrier_id=lambda method: "INPOST",
+        create_shipment=allegro.create_shipment,
+        wait_for_shipment_creation=Mock(),
+        get_shipment_details=lambda shipment_id: {"packages": [{"waybill": f"WB-{shipment_id}"}]},
+        add_shipment_tracking=Mock(),
+        update_fulfillment_status=Mock(),
+        save_state_value=allegro.state.__setitem__,
+        load_state_value=allegro.state.get,
+    )
+    pipeline = ShipmentPipeline(
+        logger=Mock(),
+        creator=creator,
+        get_create_command_status=allegro.command_status,
+        get_shipment_label=lambda ids, **kwargs: f"PDF {ids[0]}".encode(),
+        load_state_value=load_state_value or allegro.state.get,
+        wait=wait or waits.append,
+        timeout=timeout,
+    )
+    return pipeline, waits
+
+
+def test_pipeline_submits_concurrently_and_polls_together(monkeypatch):
+    monkeypatch.setattr(
+        "magazyn.services.print_agent_shipment_creation.build_packages",
+        lambda products: ([{"type": "PACKAGE"}], products[0]["ref"]),
+    )
+    allegro = _Allegro({"1": 0, "2": 2, "3": "ERROR"}, parallel=3)
+    pipeline, waits = _pipeline(allegro)
+
+    prepared = pipeline.run([_order("allegro_1"), _order("allegro_2"), _order("allegro_3")])
+
+    assert sorted(allegro.created) == ["cmd-1", "cmd-2", "cmd-3"]
+    # Wszystkie komendy sprawdzane wspolnym taktem - dwa takty czekania dla najwolniejszej.
+    assert waits == [2.0, 2.0]
+    assert prepared.packages["allegro_1"][0]["waybill"] == "WB-ship-1"
+    assert prepared.packages["allegro_2"][0]["shipment_id"] == "ship-2"
+    assert prepared.packages["allegro_3"] == []
+    assert base64.b64decode(prepared.labels["ship-2"]) == b"PDF ship-2"
+    assert allegro.state["sm_shipment:allegro_1"] == "ship-1"
+    assert not prepared.deferred
+
+    label = prepared.labels["ship-1"]
+    service = PrintLabelService(
+        logger=Mock(),
+        get_shipment_label=Mock(side_effect=AssertionError("etykieta juz pobrana")),
+        cancel_shipment=Mock(),
+        create_shipment=Mock(),
+        fetch_label=Mock(),
+        recreate_shipment_and_get_label=Mock(),
+        retry=Mock(),
+        errors_total=Mock(),
+        prefetched_labels=prepared.labels,
+    )
+    assert service.get_label("INPOST", "ship-1") == (label, "pdf")
+    assert "ship-1" not in prepared.labels
+
+
+def test_unconfirmed_command_is_resumed_not_recreated(monkeypatch):
+    monkeypatch.setattr(
+        "magazyn.services.print_agent_shipment_creation.build_packages",
+        lambda products: ([{"type": "PACKAGE"}], products[0]["ref"]),
+    )
+    allegro = _Allegro({"1": 5}, parallel=1)
+    pipeline, _ = _pipeline(allegro, timeout=0)
+
+    prepared = pipeline.run([_order("allegro_1")])
+    assert prepared.deferred == {"allegro_1"}
+    assert allegro.state["sm_command:allegro_1"] == "cmd-1"
+
+    allegro.ticks["1"] = 0
+    prepared = pipeline.run([_order("allegro_1")])
+    assert allegro.created == ["cmd-1"]
+    assert prepared.packages["allegro_1"][0]["shipment_id"] == "ship-1"
+    assert allegro.state["sm_command:allegro_1"] is None
+
+
+
+def test_failure_of_one_order_keeps_commands_of_others(monkeypatch):
+    monkeypatch.setattr(
+        "magazyn.services.print_agent_shipment_creation.build_packages",
+        lambda products: ([{"type": "PACKAGE"}], products[0]["ref"]),
+    )
+    allegro = _Allegro({"1": 1, "3": 0}, parallel=2)
+
+    def load_state_value(key):
+        if key == "sm_command:allegro_2":
+            raise RuntimeError("database is locked")
+        return allegro.state.get(key)
+
+    pipeline, _ = _pipeline(allegro, load_state_value=load_state_value)
+    prepared = pipeline.run([_order("allegro_1"), _order("allegro_2"), _order("allegro_3")])
+
+    assert prepared.packages["allegro_2"] == []
+    assert prepared.packages["allegro_1"][0]["shipment_id"] == "ship-1"
+    assert prepared.packages["allegro_3"][0]["shipment_id"] == "ship-3"
+    assert allegro.state["sm_shipment:allegro_1"] == "ship-1"
+    assert allegro.state["sm_command:allegro_1"] is None
+
+
+def test_stop_defers_pending_commands_without_polling_loop(monkeypatch):
+    monkeypatch.setattr(
+        "magazyn.services.print_agent_shipment_creation.build_packages",
+        lambda products: ([{"type": "PACKAGE"}], products[0]["ref"]),
+    )
+    allegro = _Allegro({"1": 100}, parallel=1)
+    polls = []
+    status = allegro.command_status
+    allegro.command_status = lambda command_id: polls.append(command_id) or status(command_id)
+
+    stopped = threading.Event()
+    stopped.set()
+    pipeline, _ = _pipeline(allegro, wait=stopped.wait)
+    prepared = pipeline.run([_order("allegro_1")])
+
+    assert polls == ["cmd-1"]
+    assert prepared.deferred == {"allegro_1"}
+    assert allegro.state["sm_command:allegro_1"] == "cmd-1"
+
+
+def test_sequential_create_resumes_stored_command():
+    state = {"sm_command:allegro_7": "cmd-7"}
+    create_shipment = Mock(side_effect=AssertionError("druga przesylka"))
+    wait_for_shipment_creation = Mock(return_value={"status": "SUCCESS", "shipmentId": "ship-7"})
+    creator = PrintShipmentCreator(
+        logger=Mock(),
+        settings_store={},
+        fetch_order_detail=Mock(),
+        resolve_delivery_service_id=Mock(),
+        resolve_carrier_id=lambda method: "INPOST",
+        create_shipment=create_shipment,
+        wait_for_shipment_creation=wait_for_shipment_creation,
+        get_shipment_details=lambda shipment_id: {"packages": [{"waybill": "WB-7"}]},
+        add_shipment_tracking=Mock(),
+        update_fulfillment_status=Mock(),
+        save_state_value=state.__setitem__,
+        load_state_value=state.get,
+    )
+
+    packages = creator.create("allegro_7", "7", {"order_id": "allegro_7"})
+
+    wait_for_shipment_creation.assert_called_once_with("cmd-7")
+    assert packages[0]["shipment_id"] == "ship-7"
+    assert state["sm_shipment:allegro_7"] == "ship-7"
+    assert state["sm_command:allegro_7"] is None
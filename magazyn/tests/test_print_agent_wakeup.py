@@ -0,0 +1,91 @@
+"""Budzenie agenta druku i wybor zamowien do druku jednym zapytaniem."""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+import magazyn.db as db_module
+from magazyn.db import get_session
+from magazyn.models.orders import Order, OrderProduct
+from magazyn.services.order_status import add_order_status
+from magazyn.services.print_agent_orders import collect_printable_orders
+from magazyn.services.print_agent_wakeup import PrintWakeup, print_wakeup
+
+NOW = datetime(2026, 5, 4, 12, 0)
+
+
+def _consume_pending():
+    print_wakeup.wait(threading.Event(), 0)
+
+
+def test_commit_with_pobrano_wakes_agent(app):
+    with get_session() as db:
+        db.add(Order(order_id="allegro_1", date_add=1))
+    _consume_pending()
+
+    with get_session() as db:
+        add_order_status(db, "allegro_1", "wydrukowano", send_email=False)
+    assert print_wakeup.wait(threading.Event(), 0) is False
+
+    try:
+        with get_session() as db:
+            add_order_status(db, "allegro_1", "pobrano", allow_backwards=True, send_email=False)
+            raise RuntimeError("rollback")
+    except RuntimeError:
+        pass
+    assert print_wakeup.wait(threading.Event(), 0) is False
+
+    waiter = threading.Thread(target=lambda: result.append(print_wakeup.wait(threading.Event(), 5)))
+    result = []
+    waiter.start()
+    with get_session() as db:
+        add_order_status(db, "allegro_1", "pobrano", allow_backwards=True, send_email=False)
+    waiter.join(2)
+    assert result == [True]
+
+
+def test_wait_stops_on_interrupt():
+    wakeup = PrintWakeup()
+    stop = threading.Event()
+    started = time.monotonic()
+    assert wakeup.wait(stop, 0.05) is False
+    assert time.monotonic() - started >= 0.05
+
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(wakeup.wait(stop, 30)))
+    waiter.start()
+    stop.set()
+    wakeup.interrupt()
+    waiter.join(2)
+    assert result == [False]
+
+
+def test_printable_orders_come_from_single_query(app):
+    timestamp = int(NOW.timestamp())
+    with get_session() as db:
+        for order_id in ("allegro_new", "woo_failed", "allegro_gave_up", "manual_1"):
+            db.add(Order(order_id=order_id, date_add=timestamp))
+        db.add(Order(order_id="allegro_shipped", date_add=timestamp, delivery_package_nr="AB123PL"))
+        db.add(OrderProduct(order_id="allegro_new", name="Szelki", quantity=2))
+        db.add(OrderProduct(order_id="allegro_new", name="Smycz", quantity=1))
+        db.flush()
+        add_order_status(db, "woo_failed", "blad_druku", send_email=False)
+        for _ in range(3):
+            add_order_status(db, "allegro_gave_up", "blad_druku", skip_if_same=False, send_email=False)
+
+    statements = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_module.engine, "before_cursor_execute", _on_execute)
+    try:
+        orders = collect_printable_orders(now=lambda: NOW)
+    finally:
+        event.remove(db_module.engine, "before_cursor_execute", _on_execute)
+
+    assert [order["order_id"] for order in orders] == ["allegro_new", "woo_failed"]
+    assert [product["name"] for product in orders[0]["products"]] == ["Szelki", "Smycz"]
+    assert len(statements) == 1
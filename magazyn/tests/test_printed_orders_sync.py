@@ -0,0 +1,93 @@
+"""Zbior wydrukowanych zamowien w pamieci i czyszczenie porcjami."""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, text
+
+import magazyn.db as db_module
+from magazyn.db import db_connect
+from magazyn.services import print_agent_storage
+from magazyn.services.print_agent_storage import PrintAgentStorage
+
+NOW = datetime(2026, 5, 4, 12, 0)
+
+
+def _storage(clock):
+    return PrintAgentStorage(
+        logger=logging.getLogger("test"),
+        now=lambda: clock[0],
+        handle_readonly_error=lambda action, exc: False,
+    )
+
+
+def _insert_printed(rows):
+    with db_connect() as conn:
+        conn.execute(
+            text("INSERT INTO printed_orders(order_id, printed_at) VALUES (:oid, :ts)"),
+            [{"oid": order_id, "ts": ts.isoformat()} for order_id, ts in rows],
+        )
+
+
+class _Statements:
+    def __init__(self):
+        self.items = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.items.append(statement.lstrip().split(None, 1)[0].upper())
+
+    def __enter__(self):
+        event.listen(db_module.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db_module.engine, "before_cursor_execute", self._on_execute)
+
+
+def test_printed_map_syncs_incrementally(app):
+    clock = [NOW]
+    storage = _storage(clock)
+    _insert_printed([("a", NOW - timedelta(days=2)), ("b", NOW - timedelta(hours=1))])
+
+    printed = storage.printed_orders_map()
+    assert set(printed) == {"a", "b"}
+
+    # Zapis innego procesu - dociagany po printed_at, bez ponownego czytania calej tabeli.
+    _insert_printed([("c", NOW)])
+    with _Statements() as statements:
+        assert set(storage.printed_orders_map()) == {"a", "b", "c"}
+        storage.clean_old_printed_orders(30)
+        storage.clean_old_printed_orders(30)
+        storage.printed_orders_map()
+    # Bez DDL i sprawdzania kolumn; czyszczenie raz na CLEANUP_INTERVAL.
+    assert statements.items == ["SELECT", "DELETE", "DELETE", "SELECT"]
+
+
+def test_cleanup_is_batched_and_time_boxed(app, monkeypatch):
+    monkeypatch.setattr(print_agent_storage, "CLEANUP_BATCH_SIZE", 10)
+    monkeypatch.setattr(print_agent_storage, "CLEANUP_TIME_BUDGET_SECONDS", 0)
+    clock = [NOW]
+    storage = _storage(clock)
+    old = NOW - timedelta(days=40)
+    _insert_printed([(f"old{index}", old) for index in range(25)] + [("fresh", NOW)])
+    assert len(storage.printed_orders_map()) == 26
+
+    def remaining():
+        with db_connect() as conn:
+            return conn.execute(text("SELECT COUNT(*) FROM printed_orders")).scalar()
+
+    # Limit czasu konczy sie po pierwszej porcji - reszta w kolejnych iteracjach.
+    storage.clean_old_printed_orders(30)
+    assert remaining() == 16
+    storage.clean_old_printed_orders(30)
+    assert remaining() == 6
+    storage.clean_old_printed_orders(30)
+    assert remaining() == 1
+    assert set(storage.printed_orders_map()) == {"fresh"}
+
+    _insert_printed([("old_again", old)])
+    storage.clean_old_printed_orders(30)
+    assert remaining() == 2
+    clock[0] = NOW + print_agent_storage.CLEANUP_INTERVAL
+    storage.clean_old_printed_orders(30)
+    assert remaining() == 1
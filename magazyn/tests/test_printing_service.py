@@ -1,11 +1,36 @@
 import base64
+import http.client
+import io
 import subprocess
 from pathlib import Path
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
+from pypdf import PdfReader, PdfWriter
 
-from magazyn.services.printing import CupsPrinter, PrintCommandError
+from magazyn.services.ipp import (
+    IppClient,
+    JOB_STATE_COMPLETED,
+    JOB_STATE_PENDING,
+    JOB_STATE_PROCESSING,
+    OP_PRINT_JOB,
+    TAG_ENUM,
+    TAG_INTEGER,
+    TAG_KEYWORD,
+    decode_message,
+    encode_request,
+)
+from magazyn.services.print_agent_queue import PrintQueueProcessor
+from magazyn.services.printing import (
+    JOB_POLL_INTERVAL,
+    TRANSPORT_IPP,
+    CupsPrinter,
+    PrintCommandError,
+    PrintJobWindow,
+    check_label_document,
+    merge_pdf_documents,
+)
+from scripts.benchmarks.print_jobs import StandInIppServer
 
 
 def _ok_process(args, **kwargs):
@@ -49,4 +74,193 @@ def test_print_text_uses_default_printer_command(mock_run):
     cmd = mock_run.call_args.args[0]
     assert cmd[:3] == ["lp", "-d", "Zebra"]
     assert cmd[-1].endswith(".txt")
-    assert not Path(cmd[-1]).exists()
\ No newline at end of file
+    assert not Path(cmd[-1]).exists()
+
+def _pdf(pages=1):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=298, height=420)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_ipp_request_roundtrip():
+    message = encode_request(
+        OP_PRINT_JOB,
+        7,
+        [(TAG_INTEGER, "job-id", 42), (TAG_KEYWORD, "requested-attributes", "job-state")],
+    ) + b"%PDF"
+
+    operation, request_id, attributes, document = decode_message(message)
+
+    assert (operation, request_id, document) == (OP_PRINT_JOB, 7, b"%PDF")
+    assert attributes == {"job-id": 42, "requested-attributes": "job-state"}
+
+
+class _FakeIppConnection:
+    """Polaczenie HTTP z zaplanowanym bledem zapisu albo odczytu odpowiedzi."""
+
+    def __init__(self, reply, *, send_error=None, read_error=None):
+        self.reply = reply
+        self.send_error = send_error
+        self.read_error = read_error
+        self.sent = 0
+
+    def request(self, method, url, body=None, headers=None):
+        if self.send_error is not None:
+            raise self.send_error
+        self.sent += 1
+
+    def getresponse(self):
+        if self.read_error is not None:
+            raise self.read_error
+        return Mock(status=200, read=Mock(return_value=self.reply))
+
+    def close(self):
+        pass
+
+
+def _ipp_client(stale, *fresh):
+    client = IppClient("Zebra", host="127.0.0.1")
+    client._connection = stale
+    client._connect = Mock(side_effect=list(fresh))
+    return client
+
+
+def test_ipp_resends_print_job_only_when_kept_alive_connection_was_closed():
+    job_reply = encode_request(0x0000, 1, [(TAG_INTEGER, "job-id", 5)])
+    fresh = _FakeIppConnection(job_reply)
+    client = _ipp_client(_FakeIppConnection(job_reply, send_error=BrokenPipeError()), fresh)
+    assert client.print_job(b"%PDF") == 5
+    assert fresh.sent == 1
+
+    closed = _FakeIppConnection(job_reply, read_error=http.client.RemoteDisconnected("closed"))
+    fresh = _FakeIppConnection(job_reply)
+    assert _ipp_client(closed, fresh).print_job(b"%PDF") == 5
+    assert closed.sent == 1 and fresh.sent == 1
+
+
+def test_ipp_does_not_resend_print_job_after_read_timeout():
+    job_reply = encode_request(0x0000, 1, [(TAG_INTEGER, "job-id", 5)])
+    slow = _FakeIppConnection(job_reply, read_error=TimeoutError("timed out"))
+    client = _ipp_client(slow, _FakeIppConnection(job_reply))
+
+    with pytest.raises(TimeoutError):
+        client.print_job(b"%PDF")
+
+    assert slow.sent == 1
+    client._connect.assert_not_called()
+
+    # Get-Job-Attributes mozna powtorzyc - nie tworzy nowego zlecenia.
+    state_reply = encode_request(0x0000, 2, [(TAG_ENUM, "job-state", JOB_STATE_COMPLETED)])
+    slow = _FakeIppConnection(state_reply, read_error=TimeoutError("timed out"))
+    assert _ipp_client(slow, _FakeIppConnection(state_reply)).job_state(5) == JOB_STATE_COMPLETED
+
+
+def test_labels_are_merged_into_single_ipp_job():
+    labels = [(base64.b64encode(_pdf()).decode("ascii"), "pdf") for _ in range(3)]
+    with StandInIppServer() as server:
+        printer = CupsPrinter(
+            printer_name="Zebra",
+            cups_server="127.0.0.1",
+            cups_port=server.port,
+            transport=TRANSPORT_IPP,
+        )
+        printer.print_labels_base64(labels)
+
+    assert len(server.jobs) == 1
+    assert len(PdfReader(io.BytesIO(server.jobs[0])).pages) == 3
+    assert len(PdfReader(io.BytesIO(merge_pdf_documents([_pdf(2), _pdf()]))).pages) == 3
+
+
+def test_job_window_waits_for_free_slot():
+    states = {1: [JOB_STATE_PROCESSING, JOB_STATE_COMPLETED], 2: [JOB_STATE_PROCESSING] * 3}
+    client = Mock(job_state=lambda job_id: states[job_id].pop(0))
+    sleeps = []
+    window = PrintJobWindow(2, sleep=sleeps.append)
+    window.track(1, JOB_STATE_PENDING)
+    window.track(2, JOB_STATE_PENDING)
+
+    window.wait_for_slot(client)
+
+    assert sleeps == [JOB_POLL_INTERVAL]
+    assert window.jobs == {2: JOB_STATE_PROCESSING}
+
+    stuck = PrintJobWindow(1, timeout=0, sleep=sleeps.append)
+    stuck.track(2, JOB_STATE_PENDING)
+    with pytest.raises(PrintCommandError, match="niezakończonych"):
+        stuck.wait_for_slot(client)
+
+
+def test_queue_prints_orders_in_merged_batches():
+    queue = [
+        {"order_id": order_id, "label_data": f"L-{order_id}-{n}", "ext": "pdf", "last_order_data": {}}
+        for order_id, count in (("1", 2), ("2", 1), ("3", 2))
+        for n in range(count)
+    ]
+    jobs = []
+
+    def print_labels(labels, order_ids):
+        jobs.append(order_ids)
+        if "3" in order_ids:
+            raise PrintCommandError("offline")
+
+    processor = PrintQueueProcessor(
+        logger=Mock(),
+        is_quiet_time=lambda: False,
+        save_queue=Mock(),
+        mark_as_printed=Mock(),
+        notify_messenger=Mock(),
+        retry=lambda func, *args, **kwargs: func(*args),
+        print_label=Mock(side_effect=AssertionError("druk pojedynczej etykiety")),
+        consume_order_stock=Mock(),
+        print_error_type=PrintCommandError,
+        errors_total=Mock(),
+        now=lambda: "teraz",
+        print_labels=print_labels,
+        merge_limit=3,
+    )
+    printed = {}
+
+    remaining = processor.process(queue, printed)
+
+    assert jobs == [["1", "2"], ["3"]]
+    assert printed == {"1": "teraz", "2": "teraz"}
+    assert [(item["order_id"], item["retry_count"]) for item in remaining] == [("3", 1), ("3", 1)]
+
+
+def test_corrupt_label_fails_only_its_order():
+    good = base64.b64encode(_pdf()).decode("ascii")
+    corrupt = base64.b64encode(b"%PDF-1.4 uszkodzony").decode("ascii")
+    queue = [
+        {"order_id": order_id, "label_data": label, "ext": "pdf", "last_order_data": {}}
+        for order_id, label in (("1", good), ("2", corrupt), ("3", good))
+    ]
+    jobs = []
+
+    processor = PrintQueueProcessor(
+        logger=Mock(),
+        is_quiet_time=lambda: False,
+        save_queue=Mock(),
+        mark_as_printed=Mock(),
+        notify_messenger=Mock(),
+        retry=lambda func, *args, **kwargs: func(*args),
+        print_label=Mock(side_effect=AssertionError("druk pojedynczej etykiety")),
+        consume_order_stock=Mock(),
+        print_error_type=PrintCommandError,
+        errors_total=Mock(),
+        now=lambda: "teraz",
+        print_labels=lambda labels, order_ids: jobs.append(
+            (order_ids, merge_pdf_documents([base64.b64decode(data) for data, _ in labels]))
+        ),
+        validate_label=check_label_document,
+    )
+    printed = {}
+
+    remaining = processor.process(queue, printed)
+
+    assert [order_ids for order_ids, _ in jobs] == [["1", "3"]]
+    assert printed == {"1": "teraz", "3": "teraz"}
+    assert [(item["order_id"], item["retry_count"]) for item in remaining] == [("2", 1)]
+
@@ -0,0 +1,183 @@
+"""Indeks dopasowania produktow: dopasowania bez zapytan i przyrostowe odswiezanie."""
+
+from types import SimpleNamespace
+
+from sqlalchemy import event, text
+
+from magazyn.db import get_session
+from magazyn.models.products import Product, ProductSize
+from magazyn.services.invoice_matching import match_invoice_rows
+from magazyn.services.order_sync import match_product_to_warehouse
+from magazyn.services.product_match_index import (
+    ProductMatchIndex,
+    get_product_match_index,
+)
+
+
+def _add_product(session, sizes=("M",), **fields):
+    product = Product(brand="Truelove", **fields)
+    session.add(product)
+    for size in sizes:
+        session.add(ProductSize(product=product, size=size))
+    session.flush()
+    return product
+
+
+def _count_selects(session, callback):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    bind = session.get_bind()
+    event.listen(bind, "before_cursor_execute", on_execute)
+    try:
+        result = callback()
+    finally:
+        event.remove(bind, "before_cursor_execute", on_execute)
+    return result, len(statements)
+
+
+def test_matches_by_name_series_and_color(app):
+    with get_session() as session:
+        lumen = _add_product(session, category="Szelki", series="Lumen", color="Czerwony")
+        _add_product(session, category="Szelki", series="Lumen", color="Czarny")
+
+    with get_session() as session:
+        exact = match_product_to_warehouse(
+            session, "Szelki dla psa Truelove Lumen", "czerwone", "m"
+        )
+        by_series = match_product_to_warehouse(
+            session, "Szelki Truelove Lumen Guard", "Czerwona", "M"
+        )
+
+        assert exact.product_id == lumen.id
+        assert by_series.product_id == lumen.id
+        assert match_product_to_warehouse(
+            session, "Szelki dla psa Truelove Lumen", "zielony", "M"
+        ) is None
+
+
+def test_repeated_match_runs_no_queries(app):
+    with get_session() as session:
+        _add_product(session, category="Szelki", series="Tropical", color="Zielony")
+
+    with get_session() as session:
+        index = get_product_match_index(session)
+        first, _ = _count_selects(
+            session, lambda: index.match("Szelki dla psa Truelove Tropical", "Zielony", "M")
+        )
+        again, selects = _count_selects(
+            session, lambda: get_product_match_index(session).match(
+                "Szelki dla psa Truelove Tropical", "Zielony", "M"
+            )
+        )
+
+    assert first is not None and again == first
+    assert selects == 0
+
+
+def test_orm_changes_refresh_only_touched_products(app):
+    with get_session() as session:
+        product = _add_product(session, category="Smycz", series="Active", color="Czarny")
+        product_id = product.id
+
+    with get_session() as session:
+        get_product_match_index(session)
+
+    with get_session() as session:
+        session.get(Product, product_id).color = "Niebieski"
+        new_product = _add_product(session, category="Obroża", series="Neon", color="Różowy")
+        new_id = new_product.id
+
+    with get_session() as session:
+        index = get_product_match_index(session)
+        assert index.match("Smycz dla psa Truelove Active", "niebieska", "M").product_id == product_id
+        assert index.match("Smycz dla psa Truelove Active", "czarna", "M") is None
+        assert index.match("Obroża dla psa Truelove Neon", "różowa", "M").product_id == new_id
+
+        session.delete(session.get(Product, new_id))
+
+    with get_session() as session:
+        assert get_product_match_index(session).match(
+            "Obroża dla psa Truelove Neon", "różowa", "M"
+        ) is None
+
+
+def test_product_added_by_other_process_matches_without_waiting(app):
+    with get_session() as session:
+        _add_product(session, category="Szelki", series="Active", color="Czarny")
+
+    with get_session() as session:
+        assert match_product_to_warehouse(
+            session, "Szelki dla psa Truelove Neon", "Czarny", "M"
+        ) is None
+
+    # Zapis z pominieciem ORM tego procesu - jak inny worker albo agent.
+    with get_session() as session:
+        product_id = session.execute(text(
+            "INSERT INTO products (category, brand, series, color)"
+            " VALUES ('Szelki', 'Truelove', 'Neon', 'Czarny') RETURNING id"
+        )).scalar_one()
+        session.execute(
+            text(
+                "INSERT INTO product_sizes (product_id, size, quantity, stock_value)"
+                " VALUES (:pid, 'M', 0, 0)"
+            ),
+            {"pid": product_id},
+        )
+
+    with get_session() as session:
+        matched = match_product_to_warehouse(
+            session, "Szelki dla psa Truelove Neon", "Czarny", "M"
+        )
+
+    assert matched is not None and matched.product_id == product_id
+
+
+def test_stock_changes_do_not_reload_index(app):
+    with get_session() as session:
+        product = _add_product(session, category="Szelki", series="Active", color="Czarny")
+        size_id = product.sizes[0].id
+
+    with get_session() as session:
+        get_product_match_index(session)
+
+    with get_session() as session:
+        session.get(ProductSize, size_id).quantity = 7
+
+    with get_session() as session:
+        _, selects = _count_selects(session, lambda: get_product_match_index(session))
+
+    assert selects == 0
+
+
+def test_invoice_rows_use_narrowed_candidates():
+    rows = [
+        SimpleNamespace(
+            ps_id=1, product_id=1, name="Szelki dla psa Truelove Tropical",
+            color="Zielony", size="M", barcode="5901", category="Szelki", series="Tropical",
+        ),
+        SimpleNamespace(
+            ps_id=2, product_id=2, name="Szelki dla psa Truelove Front Line Premium",
+            color="Czarny", size="L", barcode=None, category="Szelki", series="Front Line Premium",
+        ),
+    ]
+    index = ProductMatchIndex(rows)
+
+    assert [entry.ps_id for entry in index.sku_candidates("TL-SZ-frolin-prem-L-CZA")] == [2]
+    assert [entry.ps_id for entry in index.fuzzy_candidates("Szelki Tropical zielone")] == [1]
+
+    invoice_rows, product_sizes = match_invoice_rows(
+        [
+            {"EAN": "5901", "Nazwa": "x"},
+            {"SKU": "TL-SZ-frolin-prem-L-CZA", "Nazwa": "Szelki Front Line Premium"},
+            {"Nazwa": "Szelki Truelove Tropical", "Kolor": "zielony", "Rozmiar": "M"},
+        ],
+        product_sizes_provider=lambda: rows,
+    )
+
+    assert [row["match_type"] for row in invoice_rows] == ["ean", "sku", "fuzzy"]
+    assert [row["matched_ps_id"] for row in invoice_rows] == [1, 2, 1]
+    assert product_sizes[1]["name"] == "Szelki dla psa Truelove Front Line Premium"
@@ -0,0 +1,174 @@
+"""Zbiorcza kalkulacja zysku: te same liczby co sciezka per zamowienie."""
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from magazyn.db import get_session
+from magazyn.domain.financial import FinancialCalculator
+from magazyn.domain.profit_batch import load_order_cost_inputs
+from magazyn.models.allegro import AllegroOffer
+from magazyn.models.orders import Order, OrderProduct
+from magazyn.models.products import Product, ProductSize, PurchaseBatch, Sale
+
+START_TS = int(datetime(2026, 1, 1).timestamp())
+END_TS = int(datetime(2027, 1, 1).timestamp())
+
+
+def _size(db, name, size="M", *, quantity=0, stock_value=0):
+    product = Product(name=name, color="Czarny")
+    db.add(product)
+    db.flush()
+    product_size = ProductSize(
+        product_id=product.id, size=size, quantity=quantity, stock_value=stock_value
+    )
+    db.add(product_size)
+    db.flush()
+    return product_size
+
+
+def _order(db, order_id, index, lines, **fields):
+    fields.setdefault("payment_done", Decimal("150.00"))
+    db.add(Order(
+        order_id=order_id,
+        platform="allegro",
+        customer_name="Jan",
+        date_add=START_TS + index * 3600,
+        delivery_method="Allegro Paczkomaty InPost",
+        **fields,
+    ))
+    db.flush()
+    for line in lines:
+        db.add(OrderProduct(order_id=order_id, name="Produkt", **line))
+    db.flush()
+
+
+def _seed(db):
+    stocked = _size(db, "Szelki", quantity=4, stock_value=Decimal("130.00"))
+    delivered = _size(db, "Smycz")
+    for date, price in (("2026-01-10", "20.00"), ("2026-03-01", "27.50"), ("2026-02-01", "25.00")):
+        db.add(PurchaseBatch(
+            product_id=delivered.product_id, size="M", quantity=1, price=Decimal(price),
+            purchase_date=date,
+        ))
+    unknown_cost = _size(db, "Obroza")
+    via_offer = _size(db, "Kaganiec", quantity=2, stock_value=Decimal("41.00"))
+    db.add(AllegroOffer(
+        offer_id="777", title="Kaganiec", price=Decimal("60"), product_size_id=via_offer.id,
+    ))
+    db.flush()
+
+    _order(db, "allegro_1", 1, [
+        {"quantity": 2, "price_brutto": Decimal("70"), "product_size_id": stocked.id},
+        {"quantity": 1, "price_brutto": Decimal("30"), "product_size_id": delivered.id},
+    ])
+    _order(db, "allegro_2", 2, [
+        {"quantity": 1, "price_brutto": Decimal("60"), "auction_id": "777"},
+        {"quantity": 1, "price_brutto": Decimal("10"), "auction_id": "missing"},
+        {"quantity": 3, "price_brutto": Decimal("5"), "product_size_id": unknown_cost.id},
+    ])
+    # Wyslane: realny koszt z Sale, druga linia tego samego wariantu - szacunek,
+    # Sale bez linii (placeholder) doliczany.
+    _order(db, "allegro_3", 3, [
+        {"quantity": 1, "price_brutto": Decimal("70"), "product_size_id": stocked.id},
+        {"quantity": 1, "price_brutto": Decimal("70"), "product_size_id": stocked.id},
+    ])
+    for product_id, cost in ((stocked.product_id, "31.10"), (delivered.product_id, "12.00")):
+        db.add(Sale(
+            product_id=product_id, size="M", quantity=1, sale_date="2026-01-01",
+            purchase_cost=Decimal(cost), order_id="allegro_3",
+        ))
+    _order(
+        db, "allegro_4", 4,
+        [{"quantity": 2, "price_brutto": Decimal("45.50"), "product_size_id": delivered.id}],
+        payment_done=Decimal("0"), payment_method_cod=True, payment_method="Pobranie",
+    )
+    _order(db, "allegro_5", 5, [])
+    _order(
+        db, "manual_6", 6,
+        [{"quantity": 1, "price_brutto": Decimal("80"), "product_size_id": stocked.id}],
+        products_json='[{"name": "Szelki", "quantity": 1, "commission_fee": 9.5}]',
+    )
+    _order(
+        db, "allegro_7", 7,
+        [{"quantity": 1, "price_brutto": Decimal("80"), "product_size_id": stocked.id}],
+        real_profit_sale_price=Decimal("80"), real_profit_purchase_cost=Decimal("1"),
+        real_profit_packaging_cost=Decimal("0.16"), real_profit_allegro_fees=Decimal("2"),
+        real_profit_amount=Decimal("76.84"),
+    )
+
+
+def _count_statements(db, callback):
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    bind = db.get_bind()
+    event.listen(bind, "before_cursor_execute", on_execute)
+    try:
+        result = callback()
+    finally:
+        event.remove(bind, "before_cursor_execute", on_execute)
+    return result, len(statements)
+
+
+def test_batch_matches_per_order_calculation(app):
+    with get_session() as db:
+        _seed(db)
+
+    with get_session() as db:
+        calculator = FinancialCalculator(db, settings_store=None)
+        orders = db.query(Order).order_by(Order.order_id).all()
+        expected = {
+            order.order_id: calculator.calculate_order_profit(order) for order in orders
+        }
+        expected_costs = {
+            order.order_id: calculator.get_purchase_cost_for_order(order.order_id, with_source=True)
+            for order in orders
+        }
+
+    with get_session() as db:
+        calculator = FinancialCalculator(db, settings_store=None)
+        orders = db.query(Order).order_by(Order.order_id).all()
+        batched = calculator.calculate_order_profits(orders)
+        inputs = load_order_cost_inputs(db, [order.order_id for order in orders])
+
+    assert batched == expected
+    assert {
+        order_id: inputs.purchase_cost(order_id) for order_id in expected_costs
+    } == expected_costs
+    assert expected["allegro_1"].purchase_cost == Decimal("65.00") + Decimal("27.50")
+    assert expected_costs["allegro_3"] == (
+        Decimal("31.10") + Decimal("32.50") + Decimal("12.00"),
+        False,
+    )
+
+
+def test_period_summary_query_count_does_not_grow_with_orders(app):
+    with get_session() as db:
+        _seed(db)
+
+    def summary_statements():
+        with get_session() as db:
+            calculator = FinancialCalculator(db, settings_store=None)
+            return _count_statements(
+                db,
+                lambda: calculator.get_period_summary(START_TS, END_TS, include_fixed_costs=False),
+            )
+
+    small, small_statements = summary_statements()
+
+    with get_session() as db:
+        product_size = db.query(ProductSize).first()
+        for index in range(10, 60):
+            _order(db, f"allegro_{index}", index, [
+                {"quantity": 1, "price_brutto": Decimal("20"), "product_size_id": product_size.id},
+            ])
+
+    large, large_statements = summary_statements()
+
+    assert large.orders_count == small.orders_count + 50
+    assert large_statements == small_statements
+    assert small.total_revenue == Decimal("150.00") * 5 + Decimal("91.00") + Decimal("80")
@@ -0,0 +1,89 @@
+"""Harmonogram odswiezania zysku: backoff, zamrazanie i uniewaznianie zdarzeniami."""
+
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from magazyn.db import get_session
+from magazyn.models.orders import Order, OrderStatusLog
+from magazyn.models.returns import Return
+from magazyn.order_sync_scheduler import _refresh_order_profit_cache
+from magazyn.services import profit_schedule
+from magazyn.services.billing_ledger import store_billing_entries
+from magazyn.settings_store import settings_store
+
+NOW = datetime(2026, 10, 1, 12, 0)
+
+
+def _placed(days_ago: float) -> SimpleNamespace:
+    placed = NOW - timedelta(days=days_ago)
+    return SimpleNamespace(date_add=int(placed.replace(tzinfo=timezone.utc).timestamp()))
+
+
+def test_backoff_grows_with_age_and_status():
+    assert profit_schedule.next_check_at(_placed(0.1), "wyslano", now=NOW) == NOW + timedelta(minutes=15)
+    assert profit_schedule.next_check_at(_placed(10), "wyslano", now=NOW) == NOW + timedelta(hours=2)
+    assert profit_schedule.next_check_at(_placed(10), "dostarczono", now=NOW) == NOW + timedelta(hours=4)
+    assert profit_schedule.next_check_at(_placed(30), "zwrot", now=NOW) == NOW + timedelta(hours=16)
+    assert profit_schedule.next_check_at(_placed(40), "zwrot", now=NOW) == NOW + timedelta(days=1)
+    assert profit_schedule.next_check_at(_placed(46), "wyslano", now=NOW) == profit_schedule.FROZEN_AT
+    assert profit_schedule.next_check_at(
+        _placed(1), "wyslano", final=True, now=NOW
+    ) == profit_schedule.FROZEN_AT
+
+
+def _add_order(db, order_id, *, next_check=None):
+    db.add(Order(
+        order_id=order_id,
+        external_order_id=f"ext-{order_id}",
+        platform="allegro",
+        date_add=int(datetime.now().timestamp()) - 3600,
+        payment_done=Decimal("100.00"),
+        delivery_method="InPost",
+        payment_method_cod=False,
+        next_profit_check_at=next_check,
+    ))
+
+
+def _next_check(order_id):
+    with get_session() as db:
+        return db.get(Order, order_id).next_profit_check_at
+
+
+def test_cycle_touches_only_due_orders_and_events_reschedule(app, monkeypatch):
+    monkeypatch.setattr(settings_store, "get", lambda key, default=None: default)
+    monkeypatch.setattr(
+        "magazyn.domain.financial.FinancialCalculator._prefetch_order_billing_summaries",
+        lambda self, orders, access_token, trace_label=None: {},
+    )
+    later = datetime.utcnow() + timedelta(hours=3)
+    with get_session() as db:
+        _add_order(db, "allegro_due")
+        _add_order(db, "allegro_later", next_check=later)
+        _add_order(db, "allegro_billing", next_check=later)
+        _add_order(db, "allegro_return", next_check=later)
+
+    stats = _refresh_order_profit_cache(app)
+    assert stats["checked"] == 1
+    assert stats["due"] == 0
+    assert _next_check("allegro_due") > datetime.utcnow()
+    assert _refresh_order_profit_cache(app)["checked"] == 0
+
+    with get_session() as db:
+        db.add(OrderStatusLog(order_id="allegro_later", status="wyslano"))
+        db.add(Return(order_id="allegro_return", status="pending"))
+    store_billing_entries([{
+        "id": "bill-1",
+        "occurredAt": "2026-10-01T10:00:00Z",
+        "type": {"id": "SUC", "name": "Prowizja"},
+        "order": {"id": "ext-allegro_billing"},
+        "value": {"amount": "-12.30", "currency": "PLN"},
+    }])
+
+    with get_session() as db:
+        assert profit_schedule.update_queue_metrics(db)["due"] == 3
+
+    stats = _refresh_order_profit_cache(app)
+    assert stats["checked"] == 3
+    assert stats["due"] == 0
+    assert _next_check("allegro_later") > datetime.utcnow()
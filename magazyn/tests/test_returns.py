@@ -10,6 +10,7 @@ class TestCustomerReturnsPagination:
     """Zwroty Allegro sa sortowane od najstarszych - trzeba pobrac ostatnia strone."""
 
     def test_fetch_recent_returns_the_newest_page(self, monkeypatch):
+        from magazyn import http_transport
         from magazyn.services import return_allegro
 
         # Allegro zwraca count=103 i ignoruje sort - offset musi wskazac ogon listy.
@@ -26,7 +27,7 @@ class TestCustomerReturnsPagination:
                 resp.json.return_value = {"count": 103, "customerReturns": newest}
             return resp
 
-        monkeypatch.setattr(return_allegro.requests, "get", fake_get)
+        monkeypatch.setattr(http_transport.get_session(http_transport.ALLEGRO), "get", fake_get)
 
         result = return_allegro._fetch_recent_customer_returns(
             {}, return_allegro.logger, limit=100
@@ -39,6 +40,7 @@ class TestCustomerReturnsPagination:
         ]
 
     def test_fetch_recent_returns_fewer_than_limit(self, monkeypatch):
+        from magazyn import http_transport
         from magazyn.services import return_allegro
 
         calls = []
@@ -56,7 +58,7 @@ class TestCustomerReturnsPagination:
                 }
             return resp
 
-        monkeypatch.setattr(return_allegro.requests, "get", fake_get)
+        monkeypatch.setattr(http_transport.get_session(http_transport.ALLEGRO), "get", fake_get)
 
         result = return_allegro._fetch_recent_customer_returns(
             {}, return_allegro.logger, limit=100
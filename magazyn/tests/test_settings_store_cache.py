@@ -0,0 +1,97 @@
+"""Odczyty SettingsStore z migawki w pamieci (bez zapytan do bazy)."""
+
+import time
+
+from sqlalchemy import event, text
+
+import magazyn.db as db_module
+from magazyn.settings_store import settings_store
+
+
+class _QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _write_setting_externally(key, value):
+    """Zapis jak z innego procesu - z pominieciem SettingsStore.update()."""
+    with db_module.engine.connect() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO app_settings(key, value, updated_at) "
+                "VALUES (:key, :value, :now) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, "
+                "updated_at = excluded.updated_at"
+            ),
+            {"key": key, "value": value, "now": "2999-01-01 00:00:00.000000"},
+        )
+        conn.commit()
+
+
+def test_get_is_pure_memory_lookup(app, monkeypatch):
+    monkeypatch.setenv("SETTINGS_MAX_STALENESS_SECONDS", "60")
+    settings_store.reload()
+    settings_store.get("PRINTER_NAME")
+
+    calls = 1000
+    with _QueryCounter(db_module.engine) as counter:
+        start = time.perf_counter()
+        for _ in range(calls):
+            settings_store.get("PRINTER_NAME")
+            settings_store.get("COMMISSION_ALLEGRO")
+        cached_elapsed = time.perf_counter() - start
+    assert counter.count == 0
+
+    # Porownanie z dawnym zachowaniem: sprawdzenie wersji przy kazdym odczycie.
+    with _QueryCounter(db_module.engine) as counter:
+        start = time.perf_counter()
+        for _ in range(calls):
+            settings_store.invalidate()
+            settings_store.get("PRINTER_NAME")
+        uncached_elapsed = time.perf_counter() - start
+    assert counter.count >= calls
+    assert cached_elapsed < uncached_elapsed
+
+
+def test_external_change_visible_after_invalidate(app, monkeypatch):
+    monkeypatch.setenv("SETTINGS_MAX_STALENESS_SECONDS", "60")
+    settings_store.reload()
+    settings_store.update({"PRINTER_NAME": "local"})
+
+    _write_setting_externally("PRINTER_NAME", "remote")
+    assert settings_store.get("PRINTER_NAME") == "local"
+
+    settings_store.invalidate()
+    assert settings_store.get("PRINTER_NAME") == "remote"
+
+
+def test_external_change_visible_after_staleness_window(app, monkeypatch):
+    monkeypatch.setenv("SETTINGS_MAX_STALENESS_SECONDS", "0")
+    settings_store.reload()
+    settings_store.update({"PRINTER_NAME": "local"})
+
+    _write_setting_externally("PRINTER_NAME", "remote")
+
+    assert settings_store.get("PRINTER_NAME") == "remote"
+
+
+def test_unchanged_sqlite_file_skips_version_query(app, monkeypatch):
+    monkeypatch.setenv("SETTINGS_MAX_STALENESS_SECONDS", "0")
+    settings_store.reload()
+    settings_store.get("PRINTER_NAME")
+
+    with _QueryCounter(db_module.engine) as counter:
+        for _ in range(50):
+            settings_store.get("PRINTER_NAME")
+    assert counter.count == 0
@@ -0,0 +1,115 @@
+"""Wspoldzielony cache statystyk: wspolne wpisy, single-flight, tagi i LRU."""
+
+import threading
+import time
+
+import pytest
+
+from magazyn.services import stats_cache
+from magazyn.services.stats_cache import SharedStatsCache, TAG_BILLING, TAG_ORDERS
+
+
+OVERVIEW_KEY = "overview|2026-01-01|2026-01-31|day|all|all"
+COSTS_KEY = "allegro-costs|2026-01-01|2026-01-31|day|all|all"
+
+
+@pytest.fixture
+def worker_caches(app):
+    # Dwie fasady = dwa workery gunicorna korzystajace z jednego backendu.
+    first, second = SharedStatsCache(), SharedStatsCache()
+    first.clear()
+    yield first, second
+    first.clear()
+
+
+def _compute(cache, key, payload):
+    assert cache.get(key) is None
+    cache.set(key, payload, 60)
+
+
+def test_entry_is_shared_between_workers(worker_caches):
+    first, second = worker_caches
+
+    _compute(first, OVERVIEW_KEY, {"data": {"orders": 3}})
+
+    assert first.backend.name == "sqlite"
+    assert second.get(OVERVIEW_KEY) == {"data": {"orders": 3}}
+
+
+def test_concurrent_miss_waits_for_single_computation(worker_caches, monkeypatch):
+    first, second = worker_caches
+    monkeypatch.setattr(stats_cache, "POLL_INTERVAL", 0.01)
+    assert first.get(OVERVIEW_KEY) is None
+
+    def finish_computation():
+        time.sleep(0.2)
+        first.set(OVERVIEW_KEY, {"data": {"orders": 5}}, 60)
+
+    worker = threading.Thread(target=finish_computation)
+    worker.start()
+    # Drugi worker nie liczy rownolegle - czeka na wynik pierwszego.
+    assert second.get(OVERVIEW_KEY) == {"data": {"orders": 5}}
+    worker.join()
+
+
+def test_abandoned_computation_releases_lease(worker_caches, monkeypatch):
+    first, second = worker_caches
+    monkeypatch.setattr(stats_cache, "WAIT_SECONDS", 5.0)
+    assert first.get(OVERVIEW_KEY) is None
+
+    first.release_leases()
+
+    started = time.perf_counter()
+    assert second.get(OVERVIEW_KEY) is None
+    assert time.perf_counter() - started < 1.0
+
+
+def test_tag_invalidation_drops_only_dependent_entries(worker_caches):
+    first, second = worker_caches
+    _compute(first, OVERVIEW_KEY, {"data": "overview"})
+    _compute(first, COSTS_KEY, {"data": "costs"})
+
+    assert second.invalidate(TAG_BILLING) == 1
+
+    assert second.get(OVERVIEW_KEY) == {"data": "overview"}
+    assert second.get(COSTS_KEY) is None
+
+
+def test_result_computed_before_invalidation_is_not_stored(worker_caches):
+    first, second = worker_caches
+    assert first.get(OVERVIEW_KEY) is None
+
+    second.invalidate(TAG_ORDERS)
+    first.set(OVERVIEW_KEY, {"data": "stale"}, 60)
+
+    assert second.get(OVERVIEW_KEY) is None
+
+
+def test_least_recently_used_entry_is_evicted(app, monkeypatch):
+    monkeypatch.setenv("STATS_CACHE_MAX_ENTRIES", "2")
+    monkeypatch.setattr(stats_cache, "ACCESS_RESOLUTION", 0.0)
+    cache = SharedStatsCache()
+    cache.clear()
+    keys = [f"sales|2026-01-0{day}|2026-01-31|day|all|all" for day in (1, 2, 3)]
+
+    _compute(cache, keys[0], {"day": 1})
+    _compute(cache, keys[1], {"day": 2})
+    assert cache.get(keys[0]) == {"day": 1}
+    _compute(cache, keys[2], {"day": 3})
+
+    assert cache.get(keys[0]) == {"day": 1}
+    assert cache.get(keys[2]) == {"day": 3}
+    assert cache.get(keys[1]) is None
+
+
+def test_stats_endpoint_cache_metrics_exported(client, login):
+    from magazyn import stats as stats_module
+
+    stats_module._FAST_CACHE.clear()
+    client.get("/api/stats/overview")
+    second = client.get("/api/stats/overview")
+
+    assert second.get_json()["meta"]["cache"] == "hit"
+    metrics = client.get("/metrics").get_data(as_text=True)
+    assert 'magazyn_stats_cache_requests_total{endpoint="overview",result="hit"}' in metrics
+    assert "magazyn_stats_cache_compute_seconds_bucket" in metrics
@@ -0,0 +1,70 @@
+"""Strumieniowe eksporty statystyk: CSV, XLSX i NDJSON."""
+
+import csv
+from datetime import datetime
+from decimal import Decimal
+import io
+import json
+
+from openpyxl import load_workbook
+
+from magazyn.db import get_session
+from magazyn.models.orders import Order, OrderProduct
+from magazyn.services.stats_support import csv_chunks, ndjson_chunks
+
+URL = "/api/stats/orders/export?date_from=2026-03-01&date_to=2026-03-31"
+
+
+def _seed(app, count):
+    with app.app_context(), get_session() as db:
+        for index in range(count):
+            order_id = f"allegro_{index:04d}"
+            cod = index % 4 == 0
+            db.add(Order(
+                order_id=order_id, platform="allegro",
+                date_add=int(datetime(2026, 3, 1 + index % 28, 10).timestamp()),
+                payment_done=Decimal("0") if cod else Decimal("80.00"),
+                payment_method="Pobranie" if cod else "Przelew",
+                delivery_price=Decimal("12.50"), currency="PLN",
+            ))
+            db.flush()
+            db.add(OrderProduct(
+                order_id=order_id, name="Szelki", quantity=2, price_brutto=Decimal("35.00"),
+            ))
+
+
+def test_orders_export_streams_all_formats(client, app, login):
+    _seed(app, 30)
+
+    response = client.get(URL + "&format=csv")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert len(rows) == 30
+    assert rows[0]["order_id"] == "allegro_0000"
+    assert {row["revenue"] for row in rows} == {"82.50", "80.00"}
+
+    response = client.get(URL + "&format=ndjson&payment_type=cod")
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert len(lines) == 8
+    assert all(line["cod"] and line["revenue"] == 82.5 and line["items"] == 2 for line in lines)
+
+    response = client.get(URL + "&format=xlsx")
+    sheet = load_workbook(io.BytesIO(response.data), read_only=True).active
+    values = list(sheet.values)
+    assert values[0][0] == "order_id"
+    assert len(values) == 31
+
+    assert client.get(URL + "&format=pdf").get_json()["errors"][0]["code"] == "INVALID_EXPORT_FORMAT"
+
+
+def test_chunks_start_before_rows_are_exhausted():
+    def rows():
+        yield {"order_id": "a", "revenue": Decimal("1.50")}
+        raise AssertionError("kolejne wiersze nie powinny byc jeszcze czytane")
+
+    assert next(csv_chunks(rows())) == "order_id,revenue\r\na,1.50\r\n"
+    assert next(ndjson_chunks(rows())) == '{"order_id": "a", "revenue": 1.5}\n'
+    assert list(csv_chunks([])) == ["empty\r\n"]
@@ -0,0 +1,100 @@
+"""Agregacja kubelkow w bazie: zgodnosc z implementacja w Pythonie."""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from magazyn import stats as stats_module
+from magazyn.db import get_session
+from magazyn.models.orders import Order
+from magazyn.services.order_facts import ORDER_FACTS, get_order_facts
+from magazyn.services.stats_orders import (
+    aggregate_orders,
+    bucket_key,
+    fetch_orders,
+    is_cod,
+    order_products_map,
+    order_revenue,
+)
+from magazyn.services.stats_support import StatsFilters, choose_granularity
+from scripts.benchmarks.datagen import DatasetScale, generate_dataset
+
+SCALE = DatasetScale(orders=400, products=10, offers=20, days=120)
+ANCHOR = datetime(2026, 4, 2)
+
+
+def _python_rows(db, filters, group_by):
+    start_ts, end_ts = int(filters.date_from.timestamp()), int(filters.date_to.timestamp())
+    orders = fetch_orders(db, filters, start_ts, end_ts)
+    products = order_products_map(db, [order.order_id for order in orders])
+    grouped = defaultdict(lambda: [0, 0, Decimal("0"), 0])
+    for order in orders:
+        if group_by == "bucket":
+            key = bucket_key(order.date_add, filters.granularity)
+        else:
+            key = order.platform if group_by == "platform" else None
+        row = grouped[key]
+        row[0] += 1
+        row[1] += int(products.get(order.order_id, {}).get("qty", 0))
+        row[2] += order_revenue(order, products)
+        row[3] += int(is_cod(order))
+    return {key: tuple(row) for key, row in grouped.items()}
+
+
+def _push_down_rows(db, filters, group_by):
+    rows = aggregate_orders(
+        db, filters, int(filters.date_from.timestamp()), int(filters.date_to.timestamp()), group_by=group_by,
+    )
+    return {row.key: (row.orders, row.items, row.revenue, row.cod_orders) for row in rows if row.orders}
+
+
+def test_push_down_matches_python_buckets(app):
+    generate_dataset(SCALE, seed=11, anchor=ANCHOR)
+    with get_session() as db:
+        # Zamowienie bez linii, bez platformy i z pobraniem tylko w nazwie metody.
+        db.add(Order(
+            order_id="manual_1", date_add=int(datetime(2026, 3, 29, 23, 30).timestamp()),
+            payment_method="Za POBRANIEM", delivery_price=Decimal("12.99"),
+        ))
+
+    # Zakres obejmuje zmiane czasu (29.03) i niepelne tygodnie na brzegach.
+    date_from, date_to = ANCHOR - timedelta(days=100), ANCHOR + timedelta(days=1)
+    with get_session() as db:
+        for granularity in ("day", "week", "month"):
+            for platform in ("all", "allegro", "woo"):
+                for payment_type in ("all", "cod", "online"):
+                    filters = StatsFilters(date_from, date_to, granularity, platform, payment_type)
+                    expected = _python_rows(db, filters, "bucket")
+                    assert _push_down_rows(db, filters, "bucket") == expected, filters
+
+        filters = StatsFilters(date_from, date_to, "day", "all", "all")
+        assert _push_down_rows(db, filters, "platform") == _python_rows(db, filters, "platform")
+        totals = _push_down_rows(db, filters, None)
+        assert totals == _python_rows(db, filters, None)
+        assert totals[None][0] > 300
+        assert totals[None][3] > 0
+
+
+def test_sales_endpoint_same_cold_and_warm(client, app, login):
+    generate_dataset(SCALE, seed=5, anchor=ANCHOR)
+    url = "/api/stats/sales?date_from=2026-01-01&date_to=2026-04-01&granularity=auto"
+
+    ORDER_FACTS.clear()
+    stats_module._FAST_CACHE.clear()
+    cold = client.get(url).get_json()
+    assert not ORDER_FACTS.is_warm()
+
+    get_order_facts()
+    stats_module._FAST_CACHE.clear()
+    warm = client.get(url).get_json()
+
+    assert cold["filters"]["granularity"] == "week"
+    assert len(cold["data"]["series"]) == 14
+    assert cold["data"] == warm["data"]
+
+
+def test_granularity_follows_requested_range():
+    start = datetime(2026, 1, 1)
+    assert choose_granularity(start, start + timedelta(days=31)) == "day"
+    assert choose_granularity(start, start + timedelta(days=180)) == "week"
+    assert choose_granularity(start, start + timedelta(days=730)) == "month"
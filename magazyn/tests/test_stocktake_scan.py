@@ -10,11 +10,14 @@ Pokryte scenariusze:
 - Cofnij ostatni skan (undo) -> dekrementacja scanned_qty
 - Cofnij gdy brak skanu do cofniecia -> 400
 - barcode_endpoint w renderowanym HTML
+- Liczniki przyrostowe zamiast agregatow, idempotentny skan (scan_id)
+- Wsadowe skany z terminala (barcode_scan/batch) i aplikowanie rozbieznosci
+- Rownolegle skany: atomowy przyrost pozycji, klucz zapisany rownolegle
 """
 import json
 from magazyn.db import get_session
 from magazyn.models.products import Product, ProductSize
-from magazyn.models.stocktakes import Stocktake, StocktakeItem
+from magazyn.models.stocktakes import Stocktake, StocktakeItem, StocktakeScan
 
 
 # ---------------------------------------------------------------------------
@@ -344,3 +347,251 @@ class TestStocktakeScanView:
         )
         assert resp.status_code == 302
         assert "/login" in resp.headers["Location"]
+
+
+# ---------------------------------------------------------------------------
+# Liczniki przyrostowe i wsadowe skany z terminala
+# ---------------------------------------------------------------------------
+
+def _scan(client, stocktake_id, barcode, **extra):
+    return client.post(
+        f"/stocktake/{stocktake_id}/barcode_scan",
+        data=json.dumps({"barcode": barcode, **extra}),
+        content_type="application/json",
+    )
+
+
+def _scan_statements(client, stocktake_id, barcode):
+    import magazyn.db as db_module
+    from sqlalchemy import event
+
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_module.engine, "before_cursor_execute", on_execute)
+    try:
+        assert _scan(client, stocktake_id, barcode).status_code == 200
+    finally:
+        event.remove(db_module.engine, "before_cursor_execute", on_execute)
+    return statements
+
+
+class TestStocktakeCounters:
+
+    def test_liczniki_zgodne_z_pozycjami_bez_agregatow(self, client, app):
+        """Skan i undo przesuwaja liczniki; koszt skanu nie rosnie z liczba pozycji."""
+        _login(client, app)
+        with app.app_context():
+            with get_session() as db:
+                for index in range(300):
+                    _create_product_with_barcode(db, barcode=f"30000000{index:05d}", quantity=2)
+
+        resp = client.post("/stocktake/new")
+        stocktake_id = int(resp.headers["Location"].split("/")[-2])
+
+        first = _scan_statements(client, stocktake_id, "3000000000000")
+        second = _scan_statements(client, stocktake_id, "3000000000299")
+        assert len(first) == len(second)
+        assert not any("count(" in sql.lower() or "sum(" in sql.lower() for sql in second)
+
+        data = _scan(client, stocktake_id, "3000000000000").get_json()
+        assert (data["total_products"], data["scanned_products"], data["total_scanned"]) == (300, 2, 3)
+
+        client.post(f"/stocktake/{stocktake_id}/undo")
+        data = client.post(f"/stocktake/{stocktake_id}/undo").get_json()
+        assert (data["scanned_products"], data["total_scanned"]) == (1, 1)
+        with get_session() as db:
+            st = db.get(Stocktake, stocktake_id)
+            assert st.total_scanned == sum(item.scanned_qty for item in st.items)
+            assert st.scanned_products == sum(1 for item in st.items if item.scanned_qty > 0)
+
+    def test_ponowiony_skan_z_scan_id_nie_liczy_sie_drugi_raz(self, client, app):
+        _login(client, app)
+        with app.app_context():
+            with get_session() as db:
+                product, ps = _create_product_with_barcode(db, barcode="3100000000001")
+                st = _create_stocktake(db)
+                stocktake_id = st.id
+
+        first = _scan(client, stocktake_id, "3100000000001", scan_id="term-1").get_json()
+        retry = _scan(client, stocktake_id, "3100000000001", scan_id="term-1").get_json()
+
+        assert (first["scanned_qty"], first["duplicate"]) == (1, False)
+        assert (retry["scanned_qty"], retry["duplicate"], retry["total_scanned"]) == (1, True, 1)
+
+
+class TestStocktakeBatchScan:
+
+    def test_wsad_z_kluczami_idempotencji(self, client, app):
+        """Kolejka offline: statusy per skan, ponowienie wsadu niczego nie dolicza."""
+        _login(client, app)
+        with app.app_context():
+            with get_session() as db:
+                product, ps = _create_product_with_barcode(db, barcode="3200000000001", quantity=2)
+                _create_product_with_barcode(db, barcode="3200000000002", quantity=1, size="L")
+                st = _create_stocktake(db)
+                _create_stocktake_item(db, st.id, ps.id, expected_qty=2)
+                st.total_products = 1
+                stocktake_id = st.id
+
+        scans = [
+            {"scan_id": "a", "barcode": "3200000000001", "scanned_at": "2026-10-17T10:00:00"},
+            {"scan_id": "b", "barcode": "3200000000001", "scanned_at": "2026-10-17T10:00:05"},
+            {"scan_id": "b", "barcode": "3200000000001"},
+            {"scan_id": "c", "barcode": "3200000000002"},
+            {"scan_id": "d", "barcode": "9999999999999"},
+            {"barcode": "3200000000001"},
+        ]
+        url = f"/stocktake/{stocktake_id}/barcode_scan/batch"
+        resp = client.post(url, data=json.dumps({"scans": scans}), content_type="application/json")
+        assert resp.status_code == 200
+        data = resp.get_json()
+        assert [r["status"] for r in data["results"]] == [
+            "ok", "ok", "duplicate", "ok", "not_found", "invalid",
+        ]
+        assert data["results"][1]["scanned_qty"] == 2
+        assert (data["accepted"], data["duplicates"]) == (3, 1)
+        assert (data["total_products"], data["scanned_products"], data["total_scanned"]) == (2, 2, 3)
+
+        again = client.post(url, data=json.dumps({"scans": scans}), content_type="application/json").get_json()
+        assert again["accepted"] == 0
+        assert again["total_scanned"] == 3
+
+        with get_session() as db:
+            item = db.query(StocktakeItem).filter_by(stocktake_id=stocktake_id, product_size_id=ps.id).one()
+            assert item.scanned_qty == 2
+            assert item.scanned_at.isoformat() == "2026-10-17T10:00:05"
+
+    def test_wsad_odrzuca_puste_i_za_dlugie(self, client, app):
+        from magazyn.blueprints.stocktake import MAX_BATCH_SCANS
+
+        _login(client, app)
+        with app.app_context():
+            with get_session() as db:
+                stocktake_id = _create_stocktake(db).id
+
+        url = f"/stocktake/{stocktake_id}/barcode_scan/batch"
+        too_many = [{"scan_id": str(i), "barcode": "1"} for i in range(MAX_BATCH_SCANS + 1)]
+        assert client.post(url, json={"scans": []}).status_code == 400
+        assert client.post(url, json={"scans": too_many}).status_code == 400
+
+
+def test_apply_koryguje_tylko_rozbieznosci(client, app):
+    _login(client, app)
+    with app.app_context():
+        with get_session() as db:
+            _, short = _create_product_with_barcode(db, barcode="3300000000001", quantity=5)
+            _, exact = _create_product_with_barcode(db, barcode="3300000000002", quantity=2, size="L")
+            st = _create_stocktake(db, status="finished")
+            _create_stocktake_item(db, st.id, short.id, expected_qty=5, scanned_qty=3)
+            _create_stocktake_item(db, st.id, exact.id, expected_qty=2, scanned_qty=2)
+            stocktake_id, short_id, exact_id = st.id, short.id, exact.id
+
+    resp = client.post(f"/stocktake/{stocktake_id}/apply")
+    assert resp.status_code == 302
+
+    with get_session() as db:
+        assert db.get(ProductSize, short_id).quantity == 3
+        assert db.get(ProductSize, exact_id).quantity == 2
+        assert db.get(Stocktake, stocktake_id).status == "applied"
+
+
+class TestStocktakeConcurrentScans:
+
+    def test_rownolegly_skan_tej_samej_pozycji_nie_gubi_licznika(self, client, app):
+        """Pozycja wczytana przed skanem innego terminala - przyrost liczy baza."""
+        from collections import Counter
+        from datetime import datetime
+
+        from magazyn.blueprints.stocktake import _bump_counters, _increment_item
+
+        _login(client, app)
+        with get_session() as db:
+            _, ps = _create_product_with_barcode(db, barcode="3400000000001", quantity=4)
+            st = _create_stocktake(db)
+            _create_stocktake_item(db, st.id, ps.id, expected_qty=4)
+            st.total_products = 1
+            stocktake_id = st.id
+
+        with get_session() as db:
+            stale = db.query(StocktakeItem).filter_by(stocktake_id=stocktake_id).one()
+            assert stale.scanned_qty == 0
+            assert _scan(client, stocktake_id, "3400000000001").get_json()["scanned_qty"] == 1
+
+            tally = Counter()
+            assert _increment_item(db, stale, 1, datetime.now(), tally) == 1
+            assert stale.scanned_qty == 2
+            _bump_counters(db, db.get(Stocktake, stocktake_id), tally)
+
+        with get_session() as db:
+            st = db.get(Stocktake, stocktake_id)
+            assert (st.scanned_products, st.total_scanned) == (1, 2)
+            assert st.items[0].scanned_qty == 2
+
+    def test_klucz_zapisany_rownolegle_to_duplikat_nie_blad(self, client, app):
+        """Naruszenie uq_stocktake_scans_key -> duplikat, pozostale klucze przyjete."""
+        from datetime import datetime
+
+        from magazyn.blueprints.stocktake import _claim_scan_keys
+
+        _login(client, app)
+        with get_session() as db:
+            _, ps = _create_product_with_barcode(db, barcode="3500000000001")
+            st = _create_stocktake(db)
+            item = _create_stocktake_item(db, st.id, ps.id)
+            stocktake_id, item_id = st.id, item.id
+
+        # Skan "x" przyjety przez rownolegle zapytanie juz po sprawdzeniu kluczy.
+        with get_session() as db:
+            db.add(StocktakeScan(stocktake_id=stocktake_id, scan_key="x", barcode="3500000000001"))
+
+        now = datetime.now()
+        with get_session() as db:
+            claimed = _claim_scan_keys(db, stocktake_id, [
+                ("x", "3500000000001", now),
+                ("y", "3500000000001", now),
+            ])
+            claimed["y"].stocktake_item_id = item_id
+        assert set(claimed) == {"y"}
+
+        resp = _scan(client, stocktake_id, "3500000000001", scan_id="x")
+        assert resp.status_code == 200
+        assert resp.get_json()["duplicate"] is True
+        with get_session() as db:
+            assert db.query(StocktakeScan).filter_by(stocktake_id=stocktake_id).count() == 2
+
+    def test_duplikat_nie_zaklada_pozycji_spoza_listy(self, client, app):
+        """Klucz zajety przed skanem -> brak nowej pozycji i licznika produktow."""
+        _login(client, app)
+        with get_session() as db:
+            _create_product_with_barcode(db, barcode="3600000000001")
+            _create_product_with_barcode(db, barcode="3600000000002", size="L")
+            st = _create_stocktake(db)
+            stocktake_id = st.id
+        with get_session() as db:
+            db.add_all([
+                StocktakeScan(stocktake_id=stocktake_id, scan_key="x", barcode="3600000000001"),
+                StocktakeScan(stocktake_id=stocktake_id, scan_key="y", barcode="3600000000002"),
+            ])
+
+        resp = _scan(client, stocktake_id, "3600000000001", scan_id="x")
+        assert resp.status_code == 409
+        batch = client.post(
+            f"/stocktake/{stocktake_id}/barcode_scan/batch",
+            data=json.dumps({"scans": [
+                {"scan_id": "y", "barcode": "3600000000002"},
+                {"scan_id": "z", "barcode": "3600000000002"},
+            ]}),
+            content_type="application/json",
+        ).get_json()
+        assert [r["status"] for r in batch["results"]] == ["duplicate", "ok"]
+
+        with get_session() as db:
+            st = db.get(Stocktake, stocktake_id)
+            assert (st.total_products, st.scanned_products, st.total_scanned) == (1, 1, 1)
+            items = db.query(StocktakeItem).filter_by(stocktake_id=stocktake_id).all()
+            assert [item.scanned_qty for item in items] == [1]
+            scan = db.query(StocktakeScan).filter_by(stocktake_id=stocktake_id, scan_key="z").one()
+            assert scan.stocktake_item_id == items[0].id
@@ -56,7 +56,7 @@ def test_client_missing_keys():
         WFirmaClient(access_key="a", secret_key="")
 
 
-@patch("magazyn.wfirma_api.client.requests.post")
+@patch("requests.Session.post")
 def test_client_request_success(mock_post, client):
     """Poprawny request."""
     mock_resp = MagicMock()
@@ -71,7 +71,7 @@ def test_client_request_success(mock_post, client):
     assert result["invoices"][0]["invoice"]["id"] == 1
 
 
-@patch("magazyn.wfirma_api.client.requests.post")
+@patch("requests.Session.post")
 def test_client_request_api_error(mock_post, client):
     """Blad API zwrocony przez wFirma."""
     mock_resp = MagicMock()
@@ -85,7 +85,7 @@ def test_client_request_api_error(mock_post, client):
         client.request("invoices/add")
 
 
-@patch("magazyn.wfirma_api.client.requests.get")
+@patch("requests.Session.get")
 def test_client_download(mock_get, client):
     """Pobieranie pliku binarnego."""
     mock_resp = MagicMock()
@@ -11,9 +11,10 @@ import logging
 import time
 from typing import Optional
 
-import requests
 from requests.exceptions import RequestException
 
+from .. import http_transport
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_TIMEOUT = 15
@@ -114,14 +115,14 @@ class WFirmaClient:
             attempt += 1
             try:
                 if method.upper() == "GET":
-                    response = requests.get(
+                    response = http_transport.get_session(http_transport.WFIRMA).get(
                         url,
                         headers=self._headers,
                         params=params,
                         timeout=DEFAULT_TIMEOUT,
                     )
                 else:
-                    response = requests.post(
+                    response = http_transport.get_session(http_transport.WFIRMA).post(
                         url,
                         headers=self._headers,
                         params=params,
@@ -222,7 +223,7 @@ class WFirmaClient:
             params["company_id"] = self.company_id
 
         try:
-            response = requests.get(  # nosec B113
+            response = http_transport.get_session(http_transport.WFIRMA).get(  # nosec B113
                 url,
                 headers=self._headers,
                 params=params,
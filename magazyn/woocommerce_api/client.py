@@ -6,8 +6,7 @@ import logging
 from typing import Any, Optional
 from urllib.parse import urljoin
 
-import requests
-
+from .. import http_transport
 from ..settings_store import settings_store
 
 logger = logging.getLogger(__name__)
@@ -44,7 +43,7 @@ class WooClient:
         json: Optional[dict] = None,
     ) -> Any:
         url = urljoin(self.base_url, path.lstrip("/"))
-        response = requests.request(
+        response = http_transport.get_session(http_transport.WOOCOMMERCE).request(
             method,
             url,
             params=params,
@@ -7,6 +7,7 @@ from typing import Optional
 
 import requests
 
+from .. import http_transport
 from .client import WooClient, WooClientError
 
 logger = logging.getLogger(__name__)
@@ -28,7 +29,7 @@ def find_media_id_by_filename(client: WooClient, filename: str) -> Optional[int]
         return None
     media_url = client.base_url + "wp-json/wp/v2/media"
     try:
-        response = requests.get(
+        response = http_transport.get_session(http_transport.WOOCOMMERCE).get(
             media_url,
             auth=_wp_media_auth(client),
             params={"search": filename, "per_page": 20},
@@ -65,7 +66,7 @@ def get_product_image_ids(client: WooClient, woo_product_id: int) -> list[int]:
 
 def _set_media_alt(client: WooClient, media_id: int, alt_text: str) -> None:
     try:
-        requests.post(
+        http_transport.get_session(http_transport.WOOCOMMERCE).post(
             client.base_url + f"wp-json/wp/v2/media/{media_id}",
             auth=_wp_media_auth(client),
             json={"alt_text": alt_text},
@@ -113,7 +114,7 @@ def upload_product_image_from_url(
         content_type = "image/jpeg"
 
     media_url = client.base_url + "wp-json/wp/v2/media"
-    response = requests.post(
+    response = http_transport.get_session(http_transport.WOOCOMMERCE).post(
         media_url,
         auth=_wp_media_auth(client),
         headers={
@@ -11,6 +11,8 @@ import threading
 import time
 from typing import TYPE_CHECKING
 
+from .services.print_agent_wakeup import listen_for_wakeups
+
 if TYPE_CHECKING:
     from .label_agent import LabelAgent
 
@@ -114,3 +116,15 @@ class ReportWorker(BaseWorker):
 
     def _run(self) -> None:
         self.agent._send_periodic_reports()
+
+
+class PrintWakeupWorker(BaseWorker):
+    """Nasluchuje NOTIFY o nowych zamowieniach do druku i budzi petle agenta."""
+
+    def __init__(self, agent: LabelAgent):
+        super().__init__("print_wakeup", 5, agent)  # ponowne LISTEN po zerwaniu polaczenia
+
+    def _run(self) -> None:
+        if not listen_for_wakeups(self._stop_event):
+            # Bez LISTEN (SQLite) wystarcza sygnal w procesie.
+            self._stop_event.wait()
@@ -0,0 +1,25 @@
+"""Index orders.updated_at for incremental loads of the stats fact store.
+
+Revision ID: a8b9c0d1e2f3
+Revises: z7a8b9c0d1e2
+Create Date: 2026-10-16 20:00:00.000000
+
+Kolumnowy magazyn faktow (services/order_facts.py) dociaga zmienione
+zamowienia zapytaniem ``updated_at >= znacznik`` - bez indeksu byloby to
+pelne skanowanie tabeli przy kazdym odswiezeniu.
+"""
+from alembic import op
+
+
+revision = "a8b9c0d1e2f3"
+down_revision = "z7a8b9c0d1e2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("idx_orders_updated_at", "orders", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("idx_orders_updated_at", table_name="orders")
@@ -0,0 +1,48 @@
+"""Add denormalized current_status/current_status_at to orders.
+
+Revision ID: b9c0d1e2f3a4
+Revises: a8b9c0d1e2f3
+Create Date: 2026-10-17 09:00:00.000000
+
+Kolumny kopiuja ostatni wpis order_status_logs (wg timestamp, remis - id);
+dalej utrzymuje je listener services/order_current_status.py. Backfill
+liczy je z historii w jednym UPDATE, zanim powstanie indeks
+(current_status, date_add) dla filtrow po statusie.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "b9c0d1e2f3a4"
+down_revision = "a8b9c0d1e2f3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("orders", sa.Column("current_status", sa.String(), nullable=True))
+    op.add_column("orders", sa.Column("current_status_at", sa.DateTime(), nullable=True))
+    op.execute(
+        """
+        UPDATE orders SET
+            current_status = (
+                SELECT l.status FROM order_status_logs l
+                WHERE l.order_id = orders.order_id
+                ORDER BY l.timestamp DESC, l.id DESC
+                LIMIT 1
+            ),
+            current_status_at = (
+                SELECT MAX(l.timestamp) FROM order_status_logs l
+                WHERE l.order_id = orders.order_id
+            )
+        """
+    )
+    op.create_index(
+        "idx_orders_current_status_date_add", "orders", ["current_status", "date_add"]
+    )
+
+
+def downgrade():
+    op.drop_index("idx_orders_current_status_date_add", table_name="orders")
+    op.drop_column("orders", "current_status_at")
+    op.drop_column("orders", "current_status")
@@ -0,0 +1,60 @@
+"""Create order_search table with trigram/FTS search index.
+
+Revision ID: c0d1e2f3a4b5
+Revises: b9c0d1e2f3a4
+Create Date: 2026-10-17 12:00:00.000000
+
+Jeden znormalizowany dokument wyszukiwania na zamowienie. PostgreSQL
+indeksuje go GIN pg_trgm (LIKE '%...%' bez skanu sekwencyjnego), SQLite
+tabela FTS5 z tokenizerem trigram utrzymywana triggerami. Tabela startuje
+pusta - pierwszy cykl synchronizacji (krok order_search_index) albo
+scripts/ops/rebuild_order_search.py wypelnia ja z calej historii; do tego
+czasu zamowienia bez dokumentu wyszukiwane sa po staremu (ILIKE po kolumnach).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "c0d1e2f3a4b5"
+down_revision = "b9c0d1e2f3a4"
+branch_labels = None
+depends_on = None
+
+
+_SQLITE_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS order_search_fts "
+    "USING fts5(document, content='order_search', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS order_search_ai AFTER INSERT ON order_search BEGIN "
+    "INSERT INTO order_search_fts(rowid, document) VALUES (new.rowid, new.document); END",
+    "CREATE TRIGGER IF NOT EXISTS order_search_ad AFTER DELETE ON order_search BEGIN "
+    "INSERT INTO order_search_fts(order_search_fts, rowid, document) "
+    "VALUES ('delete', old.rowid, old.document); END",
+    "CREATE TRIGGER IF NOT EXISTS order_search_au AFTER UPDATE ON order_search BEGIN "
+    "INSERT INTO order_search_fts(order_search_fts, rowid, document) "
+    "VALUES ('delete', old.rowid, old.document); "
+    "INSERT INTO order_search_fts(rowid, document) VALUES (new.rowid, new.document); END",
+)
+
+
+def upgrade():
+    op.create_table(
+        "order_search",
+        sa.Column("order_id", sa.String(), primary_key=True),
+        sa.Column("document", sa.Text(), nullable=False),
+    )
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX idx_order_search_document_trgm "
+            "ON order_search USING gin (document gin_trgm_ops)"
+        )
+    elif dialect == "sqlite":
+        for statement in _SQLITE_FTS:
+            op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS order_search_fts")
+    op.drop_table("order_search")
@@ -0,0 +1,34 @@
+"""Move print agent schema (agent_state, printed_orders index) into Alembic.
+
+Revision ID: d1e2f3a4b5c6
+Revises: c0d1e2f3a4b5
+Create Date: 2026-10-17 15:00:00.000000
+
+Tabele agent_state dotad tworzyl agent (ensure_db w kazdej iteracji). Na
+istniejacych bazach juz jest - tworzymy ja tylko gdy jej brak. Indeks
+printed_orders(printed_at) obsluguje przyrostowa synchronizacje zbioru
+wydrukowanych i czyszczenie starych wpisow.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "d1e2f3a4b5c6"
+down_revision = "c0d1e2f3a4b5"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table("agent_state"):
+        op.create_table(
+            "agent_state",
+            sa.Column("key", sa.String(), primary_key=True),
+            sa.Column("value", sa.Text(), nullable=True),
+        )
+    op.create_index("idx_printed_orders_printed_at", "printed_orders", ["printed_at"])
+
+
+def downgrade():
+    op.drop_index("idx_printed_orders_printed_at", table_name="printed_orders")
+    op.drop_table("agent_state")
@@ -0,0 +1,45 @@
+"""Add label_files index of the on-disk label store and label_queue.label_sha256.
+
+Revision ID: e2f3a4b5c6d7
+Revises: d1e2f3a4b5c6
+Create Date: 2026-10-17 18:00:00.000000
+
+Etykiety PDF trafiaja do magazynu plikow adresowanego SHA-256; label_files
+mapuje klucz etykiety (shipment_id albo sha256:<hash>) na plik, a wpis
+kolejki trzyma tylko label_sha256 zamiast bajtow w label_pdf.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "e2f3a4b5c6d7"
+down_revision = "d1e2f3a4b5c6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "label_files",
+        sa.Column("label_key", sa.String(), primary_key=True),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("ext", sa.String(), nullable=False),
+        sa.Column("size_bytes", sa.Integer(), nullable=False),
+        sa.Column("order_id", sa.String(), nullable=True),
+        sa.Column("created_at", sa.String(), nullable=False),
+        sa.Column("last_used_at", sa.String(), nullable=False),
+    )
+    op.create_index("idx_label_files_sha256", "label_files", ["sha256"])
+    op.create_index("idx_label_files_order_id", "label_files", ["order_id"])
+    op.create_index("idx_label_files_last_used_at", "label_files", ["last_used_at"])
+    with op.batch_alter_table("label_queue") as batch_op:
+        batch_op.add_column(sa.Column("label_sha256", sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("label_queue") as batch_op:
+        batch_op.drop_column("label_sha256")
+    op.drop_index("idx_label_files_last_used_at", table_name="label_files")
+    op.drop_index("idx_label_files_order_id", table_name="label_files")
+    op.drop_index("idx_label_files_sha256", table_name="label_files")
+    op.drop_table("label_files")
@@ -0,0 +1,74 @@
+"""Add incremental summary counters to stocktakes and the stocktake_scans table.
+
+Revision ID: f3a4b5c6d7e8
+Revises: e2f3a4b5c6d7
+Create Date: 2026-10-17 20:00:00.000000
+
+Skan remanentu aktualizuje liczniki w wierszu stocktakes zamiast liczyc
+agregaty po stocktake_items; stocktake_scans trzyma klucze idempotencji
+skanow wysylanych wsadowo z terminala (ponowienie nie liczy sie drugi raz).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "f3a4b5c6d7e8"
+down_revision = "e2f3a4b5c6d7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("stocktakes") as batch_op:
+        batch_op.add_column(sa.Column("total_products", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("scanned_products", sa.Integer(), nullable=False, server_default="0"))
+        batch_op.add_column(sa.Column("total_scanned", sa.Integer(), nullable=False, server_default="0"))
+
+    op.execute(
+        """
+        UPDATE stocktakes SET
+            total_products = (
+                SELECT COUNT(*) FROM stocktake_items
+                WHERE stocktake_items.stocktake_id = stocktakes.id
+            ),
+            scanned_products = (
+                SELECT COUNT(*) FROM stocktake_items
+                WHERE stocktake_items.stocktake_id = stocktakes.id
+                  AND stocktake_items.scanned_qty > 0
+            ),
+            total_scanned = (
+                SELECT COALESCE(SUM(scanned_qty), 0) FROM stocktake_items
+                WHERE stocktake_items.stocktake_id = stocktakes.id
+            )
+        """
+    )
+
+    op.create_table(
+        "stocktake_scans",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "stocktake_id",
+            sa.Integer(),
+            sa.ForeignKey("stocktakes.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("scan_key", sa.String(), nullable=False),
+        sa.Column(
+            "stocktake_item_id",
+            sa.Integer(),
+            sa.ForeignKey("stocktake_items.id", ondelete="CASCADE"),
+            nullable=True,
+        ),
+        sa.Column("barcode", sa.String(), nullable=False),
+        sa.Column("scanned_at", sa.DateTime(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint("stocktake_id", "scan_key", name="uq_stocktake_scans_key"),
+    )
+
+
+def downgrade():
+    op.drop_table("stocktake_scans")
+    with op.batch_alter_table("stocktakes") as batch_op:
+        batch_op.drop_column("total_scanned")
+        batch_op.drop_column("scanned_products")
+        batch_op.drop_column("total_products")
@@ -0,0 +1,38 @@
+"""Create order_barcodes lookup table for label scanning.
+
+Revision ID: u2v3w4x5y6z7
+Revises: t1u2v3w4x5y6
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "u2v3w4x5y6z7"
+down_revision = "t1u2v3w4x5y6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "order_barcodes",
+        sa.Column("barcode", sa.String(), primary_key=True),
+        sa.Column("order_id", sa.String(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index(
+        "idx_order_barcodes_order_id", "order_barcodes", ["order_id"]
+    )
+
+
+def downgrade():
+    op.drop_index("idx_order_barcodes_order_id", table_name="order_barcodes")
+    op.drop_table("order_barcodes")
@@ -0,0 +1,35 @@
+"""Add row-level state columns and binary label storage to label_queue.
+
+Revision ID: v3w4x5y6z7a8
+Revises: u2v3w4x5y6z7
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "v3w4x5y6z7a8"
+down_revision = "u2v3w4x5y6z7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("label_queue") as batch_op:
+        batch_op.add_column(sa.Column("label_pdf", sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column("claimed_by", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("lease_until", sa.String(), nullable=True))
+        batch_op.add_column(sa.Column("updated_at", sa.String(), nullable=True))
+    op.create_index("idx_label_queue_status", "label_queue", ["status"])
+    op.create_index("idx_label_queue_order_id", "label_queue", ["order_id"])
+
+
+def downgrade():
+    op.drop_index("idx_label_queue_order_id", table_name="label_queue")
+    op.drop_index("idx_label_queue_status", table_name="label_queue")
+    with op.batch_alter_table("label_queue") as batch_op:
+        batch_op.drop_column("updated_at")
+        batch_op.drop_column("lease_until")
+        batch_op.drop_column("claimed_by")
+        batch_op.drop_column("label_pdf")
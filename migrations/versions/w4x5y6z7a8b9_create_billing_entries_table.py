@@ -0,0 +1,53 @@
+"""Create billing_entries ledger for Allegro billing.
+
+Revision ID: w4x5y6z7a8b9
+Revises: v3w4x5y6z7a8
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "w4x5y6z7a8b9"
+down_revision = "v3w4x5y6z7a8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "billing_entries",
+        sa.Column("entry_id", sa.String(length=64), primary_key=True),
+        sa.Column("occurred_at", sa.DateTime(), nullable=False),
+        sa.Column("type_id", sa.String(length=32), nullable=False),
+        sa.Column("type_name", sa.String(length=255), nullable=True),
+        sa.Column("order_id", sa.String(length=64), nullable=True),
+        sa.Column("offer_id", sa.String(length=64), nullable=True),
+        sa.Column("offer_name", sa.Text(), nullable=True),
+        sa.Column("campaign_id", sa.String(length=64), nullable=True),
+        sa.Column("campaign_name", sa.Text(), nullable=True),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("currency", sa.String(length=8), nullable=True),
+        sa.Column("raw", sa.Text(), nullable=True),
+        sa.Column(
+            "synced_at",
+            sa.DateTime(),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+    )
+    op.create_index("idx_billing_entries_order_id", "billing_entries", ["order_id"])
+    op.create_index("idx_billing_entries_occurred_at", "billing_entries", ["occurred_at"])
+    op.create_index(
+        "idx_billing_entries_type_occurred_at",
+        "billing_entries",
+        ["type_id", "occurred_at"],
+    )
+
+
+def downgrade():
+    op.drop_index("idx_billing_entries_type_occurred_at", table_name="billing_entries")
+    op.drop_index("idx_billing_entries_occurred_at", table_name="billing_entries")
+    op.drop_index("idx_billing_entries_order_id", table_name="billing_entries")
+    op.drop_table("billing_entries")
@@ -0,0 +1,43 @@
+"""Create unlogged stats_cache table shared by web workers (PostgreSQL).
+
+Revision ID: x5y6z7a8b9c0
+Revises: w4x5y6z7a8b9
+Create Date: 2026-10-16 14:00:00.000000
+
+Na SQLite cache statystyk trzyma wlasny plik obok bazy, wiec migracja
+dotyczy tylko PostgreSQL. Tabela UNLOGGED nie trafia do WAL - po awarii
+serwera jest pusta, co dla cache jest w porzadku.
+"""
+from alembic import op
+
+
+revision = "x5y6z7a8b9c0"
+down_revision = "w4x5y6z7a8b9"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute(
+        "CREATE UNLOGGED TABLE IF NOT EXISTS stats_cache ("
+        " cache_key TEXT PRIMARY KEY,"
+        " payload TEXT,"
+        " tags TEXT NOT NULL DEFAULT '',"
+        " size_bytes INTEGER NOT NULL DEFAULT 0,"
+        " expires_at DOUBLE PRECISION NOT NULL DEFAULT 0,"
+        " last_access DOUBLE PRECISION NOT NULL DEFAULT 0,"
+        " lease_token TEXT,"
+        " lease_until DOUBLE PRECISION)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS idx_stats_cache_last_access"
+        " ON stats_cache(last_access)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP TABLE IF EXISTS stats_cache")
@@ -0,0 +1,33 @@
+"""Add next_profit_check_at schedule column to orders.
+
+Revision ID: y6z7a8b9c0d1
+Revises: x5y6z7a8b9c0
+Create Date: 2026-10-16 16:00:00.000000
+
+Istniejace zamowienia dostaja NULL, czyli pierwszy cykl odswiezania zysku
+obejmie wszystkie niefinalne zamowienia (jak dotad), a kolejne juz tylko
+te, ktorych termin minal.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "y6z7a8b9c0d1"
+down_revision = "x5y6z7a8b9c0"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "orders",
+        sa.Column("next_profit_check_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "idx_orders_next_profit_check_at", "orders", ["next_profit_check_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("idx_orders_next_profit_check_at", table_name="orders")
+    op.drop_column("orders", "next_profit_check_at")
@@ -0,0 +1,46 @@
+"""Create order_daily_rollup table with pre-aggregated order stats.
+
+Revision ID: z7a8b9c0d1e2
+Revises: y6z7a8b9c0d1
+Create Date: 2026-10-16 18:00:00.000000
+
+Tabela startuje pusta - pierwszy cykl synchronizacji (krok
+order_rollup_check) albo scripts/ops/rebuild_order_rollup.py odbudowuje
+ja z calej historii zamowien. Do tego czasu odczyty (dashboard, raporty
+agenta) licza sumy wprost z tabel zamowien, a nie zwracaja zer; dzien
+zamowienia zalezy od lokalnej strefy procesu aplikacji, wiec odbudowa nie
+dzieje sie w SQL migracji.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "z7a8b9c0d1e2"
+down_revision = "y6z7a8b9c0d1"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    money = sa.Numeric(12, 2)
+    op.create_table(
+        "order_daily_rollup",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("platform", sa.String(), primary_key=True),
+        sa.Column("status_bucket", sa.String(), primary_key=True),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("awaiting_label", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("revenue", money, nullable=False),
+        sa.Column("items_value", money, nullable=False),
+        sa.Column("sale_price", money, nullable=False),
+        sa.Column("cost", money, nullable=False),
+        sa.Column("fees", money, nullable=False),
+        sa.Column("packaging", money, nullable=False),
+        sa.Column("profit", money, nullable=False),
+        sa.Column("profit_pending", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("order_daily_rollup")
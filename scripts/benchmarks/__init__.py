@@ -0,0 +1 @@
+"""Benchmarki wydajnościowe gorących ścieżek (uruchamiane z ``PYTHONPATH=.``)."""
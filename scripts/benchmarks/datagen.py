@@ -0,0 +1,404 @@
+"""Deterministyczny generator danych do benchmarków.
+
+``generate_dataset`` wypełnia pustą bazę katalogiem produktów, ofertami,
+zamówieniami (pozycje, historia statusów), wydrukowanymi etykietami oraz
+wpisami księgi billingowej Allegro. Ta sama skala i ziarno dają te same
+wiersze; daty liczone są względem ``anchor`` (domyślnie dzisiejsza północ),
+żeby dashboard i okna "ostatnie 7 dni" trafiały w dane.
+"""
+from __future__ import annotations
+
+import json
+import random
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import func, insert
+
+from magazyn.db import get_session
+from magazyn.models.allegro import AllegroOffer, BillingEntry
+from magazyn.models.orders import Order, OrderProduct, OrderStatusLog
+from magazyn.models.printing import PrintedOrder
+from magazyn.models.products import Product, ProductSize, PurchaseBatch
+from magazyn.services.order_barcodes import backfill_order_barcodes
+from magazyn.services.order_rollup import rebuild_order_rollup
+from magazyn.services.product_match_index import invalidate_product_match_index
+
+CATEGORIES = ("Szelki", "Smycz", "Obroża")
+SERIES = (
+    "Lumen", "Tropical", "Active", "Outdoor", "Classic", "Comfort", "Sport",
+    "Blossom", "Neon", "Adventure", "Handy", "Amor", "Dogi", "Front Line",
+    "Front Line Premium", "Reflective", "Easy Walk", "Active Pro+", "Premium",
+    "Standard",
+)
+COLORS = (
+    "Czarny", "Czerwony", "Niebieski", "Zielony", "Różowy", "Fioletowy",
+    "Pomarańczowy", "Szary", "Turkusowy", "Limonkowy", "Granatowy", "Brązowy",
+)
+OFFER_COLORS = {
+    "Czarny": "czarne", "Czerwony": "czerwone", "Niebieski": "niebieskie",
+    "Zielony": "zielone", "Różowy": "różowe", "Fioletowy": "fioletowe",
+    "Pomarańczowy": "pomarańczowe", "Szary": "szare", "Turkusowy": "turkusowe",
+    "Limonkowy": "limonkowe", "Granatowy": "granatowe", "Brązowy": "brązowe",
+}
+SIZES = ("XS", "S", "M", "L", "XL", "2XL")
+STATUS_FLOW = ("pobrano", "wydrukowano", "spakowano", "wyslano", "w_transporcie", "dostarczono")
+DELIVERY_METHODS = (
+    ("Allegro Paczkomaty InPost", "HB4", Decimal("8.99")),
+    ("Allegro Kurier DHL", "HLB", Decimal("12.99")),
+    ("Allegro One Box", "DXP", Decimal("7.49")),
+)
+COMMISSION_RATE = Decimal("0.123")
+TWOPLACES = Decimal("0.01")
+_CHUNK = 1000
+
+
+@dataclass(frozen=True)
+class DatasetScale:
+    """Rozmiar zbioru; domyślnie ok. rok sprzedaży małego sklepu."""
+
+    orders: int = 5000
+    products: int = 200
+    sizes_per_product: int = 4
+    offers: int = 1000
+    days: int = 365
+    max_items_per_order: int = 3
+    printed_ratio: float = 0.8
+    allegro_ratio: float = 0.75
+    woo_ratio: float = 0.15
+
+    @classmethod
+    def scaled(cls, factor: float) -> "DatasetScale":
+        base = cls()
+        return cls(
+            orders=max(1, int(base.orders * factor)),
+            products=max(1, int(base.products * factor)),
+            offers=max(1, int(base.offers * factor)),
+        )
+
+
+@dataclass
+class Dataset:
+    """Klucze wygenerowanych danych potrzebne benchmarkom."""
+
+    scale: DatasetScale
+    seed: int
+    anchor: datetime
+    counts: dict = field(default_factory=dict)
+    offer_payloads: list = field(default_factory=list)
+    barcodes: list = field(default_factory=list)
+    order_items: list = field(default_factory=list)
+
+    def describe(self) -> dict:
+        return {
+            "scale": asdict(self.scale),
+            "seed": self.seed,
+            "anchor": self.anchor.isoformat(),
+            "counts": dict(self.counts),
+        }
+
+
+def _insert(db, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), _CHUNK):
+        chunk = rows[start:start + _CHUNK]
+        if chunk:
+            db.execute(insert(model), chunk)
+
+
+def _money(value: float) -> Decimal:
+    return Decimal(str(value)).quantize(TWOPLACES)
+
+
+def _catalog(db, rng: random.Random, scale: DatasetScale) -> list[dict]:
+    combos = [(c, s, k) for c in CATEGORIES for s in SERIES for k in COLORS]
+    rng.shuffle(combos)
+    while len(combos) < scale.products:
+        combos.extend(combos[: scale.products - len(combos)])
+    products, sizes, batches, variants = [], [], [], []
+    ps_id = 0
+    for product_id, (category, series, color) in enumerate(combos[: scale.products], start=1):
+        products.append(
+            {
+                "id": product_id,
+                "_name": f"{category} dla psa Truelove {series}",
+                "category": category,
+                "brand": "Truelove",
+                "series": series,
+                "color": color,
+                "sizing_mode": "sized",
+            }
+        )
+        purchase_price = _money(rng.uniform(25, 120))
+        for size in SIZES[: scale.sizes_per_product]:
+            ps_id += 1
+            quantity = rng.randint(0, 30)
+            barcode = f"590{product_id:06d}{ps_id:04d}"
+            sizes.append(
+                {
+                    "id": ps_id,
+                    "product_id": product_id,
+                    "size": size,
+                    "quantity": quantity,
+                    "stock_value": purchase_price * quantity,
+                    "barcode": barcode,
+                }
+            )
+            batches.append(
+                {
+                    "product_id": product_id,
+                    "size": size,
+                    "quantity": quantity + rng.randint(5, 40),
+                    "price": purchase_price,
+                    "purchase_date": "2025-01-15",
+                    "barcode": barcode,
+                }
+            )
+            variants.append(
+                {
+                    "ps_id": ps_id,
+                    "product_id": product_id,
+                    "category": category,
+                    "series": series,
+                    "color": color,
+                    "size": size,
+                    "barcode": barcode,
+                    "name": f"{category} dla psa Truelove {series}",
+                    "price": _money(float(purchase_price) * rng.uniform(1.8, 2.6)),
+                }
+            )
+    _insert(db, Product, products)
+    _insert(db, ProductSize, sizes)
+    _insert(db, PurchaseBatch, batches)
+    return variants
+
+
+def _offers(db, rng: random.Random, scale: DatasetScale, variants: list[dict], anchor: datetime):
+    rows, payloads, by_variant = [], [], {}
+    for index in range(scale.offers):
+        variant = variants[index % len(variants)] if index < len(variants) else rng.choice(variants)
+        offer_id = str(17_000_000_000 + index)
+        title = (
+            f"{variant['name']} {OFFER_COLORS[variant['color']]} {variant['size']}"
+        )
+        rows.append(
+            {
+                "offer_id": offer_id,
+                "title": title,
+                "price": variant["price"],
+                "ean": variant["barcode"] if rng.random() < 0.4 else None,
+                "product_id": variant["product_id"],
+                "product_size_id": variant["ps_id"],
+                "synced_at": anchor.isoformat(),
+                "publication_status": "ACTIVE",
+            }
+        )
+        by_variant.setdefault(variant["ps_id"], offer_id)
+        payload = {
+            "id": offer_id,
+            "name": title,
+            "sellingMode": {"price": {"amount": str(variant["price"])}},
+            "publication": {"status": "ACTIVE"},
+        }
+        if rows[-1]["ean"]:
+            payload["ean"] = rows[-1]["ean"]
+        payloads.append(payload)
+    _insert(db, AllegroOffer, rows)
+    return payloads, by_variant
+
+
+def _order_platform(rng: random.Random, scale: DatasetScale) -> str:
+    roll = rng.random()
+    if roll < scale.allegro_ratio:
+        return "allegro"
+    if roll < scale.allegro_ratio + scale.woo_ratio:
+        return "woo"
+    return "manual"
+
+
+def _orders(
+    db,
+    rng: random.Random,
+    scale: DatasetScale,
+    variants: list[dict],
+    offer_by_variant: dict,
+    anchor: datetime,
+) -> tuple[dict, list, list]:
+    orders, items, logs, printed, billing = [], [], [], [], []
+    barcodes: list[str] = []
+    order_items: list[tuple] = []
+    start = anchor - timedelta(days=scale.days)
+    span = int((anchor - start).total_seconds())
+    recent_cutoff = anchor - timedelta(days=7)
+
+    for index in range(scale.orders):
+        platform = _order_platform(rng, scale)
+        order_id = f"{platform}_{index + 1:07d}"
+        created = start + timedelta(seconds=int(span * (index + rng.random()) / scale.orders))
+        external_id = f"{rng.getrandbits(128):032x}"
+        method, fee_type, delivery_price = rng.choice(DELIVERY_METHODS)
+        lines = [rng.choice(variants) for _ in range(rng.randint(1, scale.max_items_per_order))]
+        total = Decimal("0")
+        for line_no, variant in enumerate(lines, start=1):
+            quantity = 1 if rng.random() < 0.85 else 2
+            total += variant["price"] * quantity
+            items.append(
+                {
+                    "order_id": order_id,
+                    "order_product_id": index * 10 + line_no,
+                    "product_id": str(variant["product_id"]),
+                    "sku": f"TL-{variant['ps_id']}",
+                    "ean": variant["barcode"],
+                    "name": f"{variant['name']} {variant['color']} {variant['size']}",
+                    "quantity": quantity,
+                    "price_brutto": variant["price"],
+                    "auction_id": offer_by_variant.get(variant["ps_id"], ""),
+                    "attributes": json.dumps(
+                        {"Rozmiar": variant["size"], "Kolor": variant["color"]},
+                        ensure_ascii=False,
+                    ),
+                    "product_size_id": variant["ps_id"],
+                }
+            )
+            order_items.append(
+                (f"{variant['name']} {variant['color']}", variant["color"], variant["size"])
+            )
+
+        is_recent = created >= recent_cutoff
+        if is_recent:
+            depth = rng.choice((1, 1, 1, 2, 3))
+        else:
+            depth = rng.randint(3, len(STATUS_FLOW))
+        statuses = list(STATUS_FLOW[:depth])
+        if is_recent and depth == 1 and rng.random() < 0.1:
+            statuses.append("blad_druku")
+        waybill = None
+        if depth >= 2:
+            waybill = f"{rng.randint(10**23, 10**24 - 1)}"
+        cod = platform != "allegro" and rng.random() < 0.2
+        orders.append(
+            {
+                "order_id": order_id,
+                "external_order_id": external_id,
+                "customer_name": f"Klient {index + 1}",
+                "email": f"klient{index + 1}@example.com",
+                "user_login": f"klient_{index + 1}",
+                "platform": platform,
+                "date_add": int(created.timestamp()),
+                "date_confirmed": int(created.timestamp()),
+                "delivery_method": method,
+                "delivery_price": delivery_price,
+                "delivery_fullname": f"Klient {index + 1}",
+                "delivery_city": rng.choice(("Warszawa", "Kraków", "Gdańsk", "Poznań", "Łódź")),
+                "delivery_postcode": f"{rng.randint(0, 99):02d}-{rng.randint(0, 999):03d}",
+                "currency": "PLN",
+                "payment_method_cod": cod,
+                "payment_done": Decimal("0") if cod else total + delivery_price,
+                "delivery_package_nr": waybill,
+                "products_json": None,
+            }
+        )
+        for step, status in enumerate(statuses):
+            logs.append(
+                {
+                    "order_id": order_id,
+                    "status": status,
+                    "timestamp": created + timedelta(hours=6 * step),
+                    "tracking_number": waybill if status == "wyslano" else None,
+                }
+            )
+
+        if depth >= 2 and rng.random() < scale.printed_ratio:
+            order_data = {
+                "order_id": order_id,
+                "external_order_id": external_id,
+                "delivery_package_nr": waybill,
+                "package_ids": [f"pkg-{index + 1:08d}"],
+                "tracking_numbers": [waybill] if waybill else [],
+                "customer_name": f"Klient {index + 1}",
+                "products": [
+                    {"name": item["name"], "quantity": item["quantity"], "ean": item["ean"]}
+                    for item in items[-len(lines):]
+                ],
+            }
+            printed.append(
+                {
+                    "order_id": order_id,
+                    "printed_at": (created + timedelta(hours=6)).isoformat(),
+                    "last_order_data": json.dumps(order_data, ensure_ascii=False),
+                }
+            )
+            barcodes.append(waybill)
+
+        if platform == "allegro":
+            occurred = created + timedelta(hours=1)
+            commission = -(total * COMMISSION_RATE).quantize(TWOPLACES)
+            for suffix, type_id, amount in (
+                ("suc", "SUC", commission),
+                ("dlv", fee_type, -delivery_price),
+            ):
+                billing.append(
+                    {
+                        "entry_id": f"{external_id}-{suffix}",
+                        "occurred_at": occurred,
+                        "type_id": type_id,
+                        "type_name": type_id,
+                        "order_id": external_id,
+                        "amount": amount,
+                        "currency": "PLN",
+                    }
+                )
+
+    _insert(db, Order, orders)
+    _insert(db, OrderProduct, items)
+    _insert(db, OrderStatusLog, logs)
+    _insert(db, PrintedOrder, printed)
+    _insert(db, BillingEntry, billing)
+    backfill_order_barcodes(
+        db.connection(),
+        ((row["order_id"], json.loads(row["last_order_data"])) for row in printed),
+    )
+    rebuild_order_rollup(db.connection())
+    counts = {
+        "orders": len(orders),
+        "order_products": len(items),
+        "status_logs": len(logs),
+        "printed_orders": len(printed),
+        "billing_entries": len(billing),
+    }
+    return counts, barcodes, order_items
+
+
+def generate_dataset(
+    scale: DatasetScale = DatasetScale(),
+    *,
+    seed: int = 1,
+    anchor: Optional[datetime] = None,
+) -> Dataset:
+    """Wypełnij pustą bazę (skonfigurowaną przez ``configure_engine``) danymi."""
+    if anchor is None:
+        anchor = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    rng = random.Random(seed)
+    dataset = Dataset(scale=scale, seed=seed, anchor=anchor)
+
+    with get_session() as db:
+        if db.query(func.count(Order.order_id)).scalar():
+            raise RuntimeError("Generator wymaga pustej bazy (tabela orders zawiera dane)")
+        variants = _catalog(db, rng, scale)
+        dataset.offer_payloads, offer_by_variant = _offers(db, rng, scale, variants, anchor)
+        counts, dataset.barcodes, dataset.order_items = _orders(
+            db, rng, scale, variants, offer_by_variant, anchor
+        )
+
+    invalidate_product_match_index()
+    dataset.counts = {
+        "products": scale.products,
+        "product_sizes": len(variants),
+        "offers": len(dataset.offer_payloads),
+        **counts,
+    }
+    return dataset
+
+
+__all__ = ["Dataset", "DatasetScale", "generate_dataset"]
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Benchmark gorących ścieżek na syntetycznym zbiorze danych.
+
+Generuje deterministyczny zbiór (``datagen.generate_dataset``) w świeżej bazie
+SQLite (albo w pustej bazie PostgreSQL podanej przez ``--database-url``) i mierzy
+czas oraz liczbę zapytań SQL dla:
+
+- ``period_summary`` - ``FinancialCalculator.get_period_summary`` za cały okres,
+- ``dashboard`` - ``DashboardService.get_full_dashboard`` (API wyróżnień zaślepione),
+- ``orders_list`` - ``build_orders_list_context``: pierwsza strona, strona 20, wyszukiwanie,
+- ``barcode_scan`` - ``load_order_for_barcode`` dla próbki listów przewozowych,
+- ``match_product`` - ``match_product_to_warehouse`` dla próbki pozycji zamówień,
+- ``printable_orders`` - ``collect_printable_orders``,
+- ``stats_sales`` - ``/api/stats/sales`` (tygodniowo) i ``/api/stats/products`` za cały okres,
+  z pustym cache payloadów,
+- ``sync_offers`` - pełny ``sync_offers`` z zaślepionym API ofert Allegro.
+
+Wynik JSON (``--output``) można porównać z wcześniejszym przebiegiem (``--compare``):
+
+    PYTHONPATH=. python scripts/benchmarks/hot_paths.py --scale 1 --output before.json
+    PYTHONPATH=. python scripts/benchmarks/hot_paths.py --scale 1 --compare before.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+from sqlalchemy import event
+from werkzeug.datastructures import MultiDict
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+SAMPLE_SIZE = 200
+
+
+class QueryMeter:
+    """Licznik instrukcji SQL wykonanych na silniku."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = 0
+        self.selects = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            self.selects += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _build_cases(dataset) -> dict[str, Callable[[], object]]:
+    from flask import Flask
+
+    from magazyn.db import get_session
+    from magazyn.domain.dashboard import DashboardService
+    from magazyn.domain.financial import FinancialCalculator
+    from magazyn.services import allegro_promotions
+    from magazyn.services.order_list import build_orders_list_context
+    from magazyn.services.order_sync import match_product_to_warehouse
+    from magazyn.services.print_agent_orders import collect_printable_orders
+    from magazyn.services.scanning import load_order_for_barcode
+    from magazyn.services.stats_api_catalog import stats_products
+    from magazyn.services.stats_api_financial import stats_sales
+    from magazyn.services.stats_runtime import FAST_CACHE
+    from magazyn.settings_store import settings_store
+    import magazyn.allegro_sync as sync_mod
+
+    start_ts = int((dataset.anchor - timedelta(days=dataset.scale.days)).timestamp())
+    end_ts = int((dataset.anchor + timedelta(days=1)).timestamp())
+    barcodes = dataset.barcodes[:: max(1, len(dataset.barcodes) // SAMPLE_SIZE)][:SAMPLE_SIZE]
+    items = dataset.order_items[:: max(1, len(dataset.order_items) // SAMPLE_SIZE)][:SAMPLE_SIZE]
+    offers = dataset.offer_payloads
+
+    allegro_promotions.get_promotions_summary = lambda access_token=None: (
+        allegro_promotions.PromoSummary(error="benchmark")
+    )
+
+    def fetch_offers(token, offset=0, limit=100, **kwargs):
+        return {"offers": offers[offset:offset + limit], "totalCount": len(offers)}
+
+    sync_mod.allegro_api.fetch_offers = fetch_offers
+    sync_mod.settings_store = SimpleNamespace(get=lambda key, default=None: "bench-token")
+
+    def period_summary():
+        with get_session() as db:
+            return FinancialCalculator(db, settings_store).get_period_summary(
+                start_ts, end_ts, include_fixed_costs=True
+            )
+
+    def dashboard():
+        with get_session() as db:
+            return DashboardService(db, settings_store).get_full_dashboard()
+
+    def orders_list():
+        build_orders_list_context(MultiDict())
+        build_orders_list_context(MultiDict({"page": "20", "per_page": "50"}))
+        return build_orders_list_context(MultiDict({"search": "Klient 12"}))
+
+    def barcode_scan():
+        return [load_order_for_barcode(code)[0] for code in barcodes]
+
+    def match_product():
+        with get_session() as db:
+            return [match_product_to_warehouse(db, *item) for item in items]
+
+    def printable_orders():
+        return collect_printable_orders()
+
+    stats_app = Flask("hot_paths")
+    stats_range = (
+        f"date_from={datetime.fromtimestamp(start_ts):%Y-%m-%d}"
+        f"&date_to={dataset.anchor:%Y-%m-%d}"
+    )
+
+    def stats_endpoints():
+        responses = []
+        for endpoint, query in ((stats_sales, "granularity=week"), (stats_products, "")):
+            FAST_CACHE.clear()
+            with stats_app.test_request_context(f"/api/stats?{stats_range}&{query}"):
+                responses.append(endpoint())
+        return responses
+
+    return {
+        "period_summary": period_summary,
+        "dashboard": dashboard,
+        "orders_list": orders_list,
+        "barcode_scan": barcode_scan,
+        "match_product": match_product,
+        "printable_orders": printable_orders,
+        "stats_sales": stats_endpoints,
+        # Ostatni - zapisuje historię cen ofert.
+        "sync_offers": sync_mod.sync_offers,
+    }
+
+
+def _measure(engine, func: Callable[[], object], repeats: int) -> dict:
+    timings, statements, selects = [], [], []
+    for _ in range(repeats):
+        with QueryMeter(engine) as meter:
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+        statements.append(meter.statements)
+        selects.append(meter.selects)
+    return {
+        "runs": repeats,
+        "min_s": round(min(timings), 4),
+        "median_s": round(statistics.median(timings), 4),
+        "first_s": round(timings[0], 4),
+        "statements": statements[-1],
+        "selects": selects[-1],
+        "first_statements": statements[0],
+    }
+
+
+def _compare(report: dict, baseline_path: str) -> list[str]:
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    lines = [f"{'case':<18}{'median_s':>20}{'statements':>22}"]
+    for case, current in report["results"].items():
+        previous = baseline.get("results", {}).get(case)
+        if not previous:
+            continue
+        lines.append(
+            f"{case:<18}"
+            f"{previous['median_s']:>9.4f} -> {current['median_s']:<8.4f}"
+            f"{previous['statements']:>10} -> {current['statements']:<8}"
+        )
+    return lines
+
+
+def main() -> None:
+    from scripts.benchmarks.datagen import DatasetScale
+
+    defaults = DatasetScale()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="mnożnik domyślnej skali")
+    parser.add_argument("--orders", type=int, help="nadpisz liczbę zamówień")
+    parser.add_argument("--products", type=int, help="nadpisz liczbę produktów")
+    parser.add_argument("--offers", type=int, help="nadpisz liczbę ofert")
+    parser.add_argument("--days", type=int, default=defaults.days)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--cases", help="lista przypadków rozdzielona przecinkami")
+    parser.add_argument(
+        "--database-url",
+        help="pusta baza PostgreSQL (postgresql://...); domyślnie tymczasowy SQLite",
+    )
+    parser.add_argument("--output", help="zapisz wynik JSON do pliku")
+    parser.add_argument("--compare", help="porównaj z wcześniejszym wynikiem JSON")
+    parser.add_argument("--verbose", action="store_true", help="pokaż logi aplikacji")
+    args = parser.parse_args()
+    # Brak konfiguracji integracji (Woo, Allegro) daje ostrzeżenia przy każdym zamówieniu.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    scale = DatasetScale.scaled(args.scale)
+    scale = DatasetScale(
+        **{
+            **scale.__dict__,
+            "orders": args.orders or scale.orders,
+            "products": args.products or scale.products,
+            "offers": args.offers or scale.offers,
+            "days": args.days,
+        }
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        else:
+            os.environ.pop("DATABASE_URL", None)
+        os.environ["DB_PATH"] = str(db_path)
+
+        import magazyn.db as db_module
+        from magazyn.models.base import Base
+        from scripts.benchmarks.datagen import generate_dataset
+
+        db_module.configure_engine(str(db_path))
+        Base.metadata.create_all(db_module.engine)
+
+        started = time.perf_counter()
+        dataset = generate_dataset(scale, seed=args.seed)
+        generate_s = time.perf_counter() - started
+
+        cases = _build_cases(dataset)
+        selected = args.cases.split(",") if args.cases else list(cases)
+        results = {}
+        for name in selected:
+            results[name] = _measure(db_module.engine, cases[name], args.repeats)
+            print(f"{name}: {results[name]}", file=sys.stderr)
+        db_module.engine.dispose()
+
+    report = {
+        "benchmark": "hot_paths",
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "backend": "postgresql" if args.database_url else "sqlite",
+        "python": platform.python_version(),
+        "dataset": dataset.describe(),
+        "generate_s": round(generate_s, 3),
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+    if args.compare:
+        print("\n".join(_compare(report, args.compare)), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
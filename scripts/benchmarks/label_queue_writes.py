@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Porównanie wolumenu zapisów kolejki etykiet: pełne przepisanie vs zapis wierszowy.
+
+Symuluje zaległą kolejkę N etykiet (domyślnie 500) i kilka iteracji agenta,
+w których zmienia się status jednej etykiety. Mierzy liczbę instrukcji
+zapisujących, bajty parametrów przekazanych do bazy i czas zapisów.
+
+    python scripts/benchmarks/label_queue_writes.py --labels 500 --iterations 20
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import event, text
+
+import magazyn.db as db_module
+from magazyn.services.print_agent_storage import PrintAgentStorage
+
+LABEL_BYTES = 40_000
+
+
+class WriteMeter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = 0
+        self.param_bytes = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(" ", 1)[0].upper() not in ("INSERT", "UPDATE", "DELETE"):
+            return
+        self.statements += 1
+        rows = parameters if executemany else [parameters]
+        for row in rows:
+            values = row.values() if isinstance(row, dict) else row
+            for value in values or ():
+                if isinstance(value, (bytes, bytearray, memoryview)):
+                    self.param_bytes += len(value)
+                elif value is not None:
+                    self.param_bytes += len(str(value).encode("utf-8"))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _make_queue(labels: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    queue = []
+    for index in range(labels):
+        payload = b"%PDF-1.4\n" + rng.randbytes(LABEL_BYTES)
+        queue.append(
+            {
+                "order_id": f"BENCH-{index:05d}",
+                "label_data": base64.b64encode(payload).decode("ascii"),
+                "ext": "pdf",
+                "last_order_data": {"order_id": f"BENCH-{index:05d}", "products": []},
+                "queued_at": datetime(2026, 1, 1).isoformat(),
+                "status": "queued",
+            }
+        )
+    return queue
+
+
+def _legacy_save_queue(items: list[dict]) -> None:
+    """Dawny zapis: DELETE calej tabeli i INSERT kazdego wpisu (base64 w TEXT)."""
+    with db_module.db_connect() as conn:
+        conn.execute(text("DELETE FROM label_queue"))
+        for item in items:
+            conn.execute(
+                text(
+                    "INSERT INTO label_queue(order_id, label_data, ext, last_order_data,"
+                    " queued_at, status, retry_count)"
+                    " VALUES (:oid, :ldata, :ext, :odata, :qat, :st, :rc)"
+                ),
+                {
+                    "oid": item.get("order_id"),
+                    "ldata": item.get("label_data"),
+                    "ext": item.get("ext"),
+                    "odata": json.dumps(item.get("last_order_data", {}), default=str),
+                    "qat": item.get("queued_at"),
+                    "st": item.get("status", "queued"),
+                    "rc": item.get("retry_count", 0),
+                },
+            )
+
+
+def _run(variant: str, db_path: Path, labels: int, iterations: int, seed: int) -> dict:
+    db_module.configure_engine(str(db_path))
+    storage = PrintAgentStorage(
+        logger=logging.getLogger("bench"),
+        now=datetime.now,
+        handle_readonly_error=lambda action, exc: False,
+    )
+    storage.ensure_db()
+
+    if variant == "legacy":
+        queue = _make_queue(labels, seed)
+        _legacy_save_queue(queue)
+        save = _legacy_save_queue
+    else:
+        storage.save_queue(_make_queue(labels, seed))
+        queue = storage.load_queue()
+        save = storage.save_queue
+
+    start = time.perf_counter()
+    with WriteMeter(db_module.engine) as meter:
+        for iteration in range(iterations):
+            item = queue[iteration % len(queue)]
+            item["status"] = "in_progress"
+            save(queue)
+            item["status"] = "queued"
+            item["retry_count"] = item.get("retry_count", 0) + 1
+            save(queue)
+
+    elapsed = time.perf_counter() - start
+    db_module.engine.dispose()
+    return {
+        "variant": variant,
+        "labels": labels,
+        "iterations": iterations,
+        "write_statements": meter.statements,
+        "param_bytes": meter.param_bytes,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=500)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="zapisz wynik JSON do pliku")
+    args = parser.parse_args()
+
+    os.environ.pop("DATABASE_URL", None)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in ("legacy", "row_level"):
+            db_path = Path(tmp) / f"{variant}.db"
+            results.append(_run(variant, db_path, args.labels, args.iterations, args.seed))
+
+    legacy, row_level = results
+    report = {
+        "benchmark": "label_queue_writes",
+        "results": results,
+        "param_bytes_ratio": round(legacy["param_bytes"] / max(1, row_level["param_bytes"]), 1),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
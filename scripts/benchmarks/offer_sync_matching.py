@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""Pełny sync ofert Allegro: dopasowanie zapytaniami per oferta vs indeks produktów.
+
+Buduje syntetyczny katalog (domyślnie 300 produktów x 5 rozmiarów) i listę
+ofert (domyślnie 1000) z ziarnem losowania: część z EAN, część z dokładną
+nazwą, część dopasowywana po serii/kolorze oraz oferty bez odpowiednika.
+Następnie uruchamia ``sync_offers()`` z podmienionym API Allegro w dwóch
+wariantach i mierzy liczbę zapytań SELECT oraz czas.
+
+    PYTHONPATH=. python scripts/benchmarks/offer_sync_matching.py --products 300 --offers 1000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from sqlalchemy import event, func
+
+import magazyn.allegro_sync as sync_mod
+import magazyn.db as db_module
+from magazyn.models.base import Base
+from magazyn.models.products import Product, ProductSize
+from magazyn.services.product_match_index import (
+    _extract_series_from_name,
+    _normalize_color_key,
+    _normalized_name_keys,
+    _strip_diacritics_ord,
+    invalidate_product_match_index,
+)
+
+CATEGORIES = ("Szelki", "Smycz", "Obroża")
+SERIES = (
+    "Lumen", "Tropical", "Active", "Outdoor", "Classic", "Comfort", "Sport",
+    "Blossom", "Neon", "Adventure", "Handy", "Amor", "Dogi", "Front Line",
+    "Front Line Premium", "Reflective", "Easy Walk", "Active Pro+", "Premium",
+    "Standard",
+)
+COLORS = (
+    "Czarny", "Czerwony", "Niebieski", "Zielony", "Różowy", "Fioletowy",
+    "Pomarańczowy", "Szary", "Turkusowy", "Limonkowy", "Granatowy", "Brązowy",
+)
+OFFER_COLORS = {
+    "Czarny": "czarne", "Czerwony": "czerwone", "Niebieski": "niebieskie",
+    "Zielony": "zielone", "Różowy": "różowe", "Fioletowy": "fioletowe",
+    "Pomarańczowy": "pomarańczowe", "Szary": "szare", "Turkusowy": "turkusowe",
+    "Limonkowy": "limonkowe", "Granatowy": "granatowe", "Brązowy": "brązowe",
+}
+SIZES = ("XS", "S", "M", "L", "XL")
+
+
+class SelectMeter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements += 1
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def _seed_catalog(products: int, seed: int) -> list[tuple]:
+    rng = random.Random(seed)
+    combos = [(c, s, k) for c in CATEGORIES for s in SERIES for k in COLORS]
+    rng.shuffle(combos)
+    variants = []
+    with db_module.get_session() as session:
+        for index, (category, series, color) in enumerate(combos[:products]):
+            product = Product(category=category, brand="Truelove", series=series, color=color)
+            session.add(product)
+            for size in SIZES:
+                barcode = f"59{index:06d}{SIZES.index(size):02d}"
+                session.add(ProductSize(product=product, size=size, barcode=barcode))
+                variants.append((category, series, color, size, barcode))
+    return variants
+
+
+def _make_offers(variants: list[tuple], offers: int, seed: int) -> list[dict]:
+    rng = random.Random(seed + 1)
+    result = []
+    for index in range(offers):
+        category, series, color, size, barcode = rng.choice(variants)
+        kind = rng.random()
+        offer = {
+            "id": f"BENCH-{index:06d}",
+            "sellingMode": {"price": {"amount": f"{rng.randint(30, 250)}.00"}},
+        }
+        offer_color = OFFER_COLORS[color]
+        if kind < 0.3:
+            offer["ean"] = barcode
+            title = f"{category} dla psa Truelove {series} {offer_color} {size}"
+        elif kind < 0.7:
+            title = f"{category} dla psa Truelove {series} {offer_color} {size}"
+        elif kind < 0.9:
+            # Seria rozszerzona w tytule - dopasowanie po serii/kolorze/rozmiarze.
+            title = f"{category} Truelove {series} Guard {offer_color} {size}"
+        else:
+            title = f"{category} dla psa Truelove Nieznana {index} {offer_color} {size}"
+        offer["name"] = title
+        result.append(offer)
+    return result
+
+
+class _LegacyMatcher:
+    """Dawne dopasowanie: zapytania i normalizacja kandydatow per oferta."""
+
+    def __init__(self, session):
+        self.session = session
+
+    @staticmethod
+    def _entry(product_size):
+        return SimpleNamespace(ps_id=product_size.id, color=product_size.product.color or "")
+
+    def by_barcode(self, barcode):
+        product_size = (
+            self.session.query(ProductSize).filter(ProductSize.barcode == barcode).first()
+        )
+        return self._entry(product_size) if product_size else None
+
+    def by_name_and_size(self, name, size):
+        rows = (
+            self.session.query(ProductSize)
+            .join(Product)
+            .filter(Product.name == name, ProductSize.size == size)
+            .all()
+        )
+        return [self._entry(row) for row in rows]
+
+    def match(self, name, color, size):
+        color_norm = _normalize_color_key(color)
+        size_upper = size.upper()
+        name_keys = _normalized_name_keys(name)
+
+        def color_ok(product):
+            if not color_norm:
+                return True
+            return bool(product.color) and _normalize_color_key(product.color) == color_norm
+
+        def size_candidates():
+            return (
+                self.session.query(ProductSize)
+                .join(Product)
+                .filter(func.upper(ProductSize.size) == size_upper)
+                .all()
+            )
+
+        for product_size in size_candidates():
+            product = product_size.product
+            keys = _normalized_name_keys(product.name) | _normalized_name_keys(product._name)
+            if name_keys & keys and color_ok(product):
+                return self._entry(product_size)
+
+        series_norm = _strip_diacritics_ord(_extract_series_from_name(name)).lower()
+        candidates = size_candidates()
+        if series_norm:
+            for product_size in candidates:
+                db_series = _strip_diacritics_ord(product_size.product.series or "").lower()
+                if series_norm == db_series and color_ok(product_size.product):
+                    return self._entry(product_size)
+            for product_size in candidates:
+                db_series = _strip_diacritics_ord(product_size.product.series or "").lower()
+                if (
+                    db_series
+                    and (db_series in series_norm or series_norm in db_series)
+                    and color_ok(product_size.product)
+                ):
+                    return self._entry(product_size)
+        return None
+
+
+def _run(variant: str, db_path: Path, products: int, offers: int, seed: int) -> dict:
+    db_module.configure_engine(str(db_path))
+    Base.metadata.create_all(db_module.engine)
+    invalidate_product_match_index()
+    offer_list = _make_offers(_seed_catalog(products, seed), offers, seed)
+
+    def fake_fetch_offers(token, offset=0, limit=100, **kwargs):
+        page = offer_list[offset:offset + limit]
+        return {"offers": page, "totalCount": len(offer_list)}
+
+    sync_mod.allegro_api.fetch_offers = fake_fetch_offers
+    sync_mod.settings_store = SimpleNamespace(get=lambda key, default=None: "bench-token")
+    if variant == "legacy":
+        sync_mod.get_product_match_index = _LegacyMatcher
+    else:
+        from magazyn.services.product_match_index import get_product_match_index
+
+        sync_mod.get_product_match_index = get_product_match_index
+
+    start = time.perf_counter()
+    with SelectMeter(db_module.engine) as meter:
+        result = sync_mod.sync_offers()
+    elapsed = time.perf_counter() - start
+    db_module.engine.dispose()
+    return {
+        "variant": variant,
+        "products": products,
+        "offers": result["fetched"],
+        "matched": result["matched"],
+        "select_statements": meter.statements,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--offers", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="zapisz wynik JSON do pliku")
+    args = parser.parse_args()
+
+    os.environ.pop("DATABASE_URL", None)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in ("legacy", "index"):
+            db_path = Path(tmp) / f"{variant}.db"
+            results.append(_run(variant, db_path, args.products, args.offers, args.seed))
+
+    legacy, indexed = results
+    report = {
+        "benchmark": "offer_sync_matching",
+        "results": results,
+        "speedup": round(legacy["seconds"] / max(indexed["seconds"], 1e-9), 1),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
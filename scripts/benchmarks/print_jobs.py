@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Porównanie przepustowości druku: ``lp`` per etykieta vs IPP vs scalone zlecenia IPP.
+
+Drukuje N etykiet PDF (domyślnie 200) trzema ścieżkami ``CupsPrinter``:
+
+* ``lp`` - dawna ścieżka: plik tymczasowy i proces ``lp`` na każdą etykietę
+  (atrapa ``lp`` w katalogu tymczasowym na ``PATH``),
+* ``ipp`` - każda etykieta osobnym Print-Job na utrzymywanym połączeniu,
+* ``ipp_merged`` - serie po ``--batch`` etykiet scalone w jeden PDF.
+
+Zamiast CUPS działa lokalny serwer IPP w wątku; ``--job-ms`` symuluje stały
+koszt przyjęcia zlecenia przez spooler (taki sam dla ``lp`` i IPP).
+
+    python scripts/benchmarks/print_jobs.py --labels 200 --batch 20 --job-ms 5
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from pypdf import PdfWriter
+
+from magazyn.services.ipp import (
+    JOB_STATE_COMPLETED,
+    OP_PRINT_JOB,
+    TAG_ENUM,
+    TAG_INTEGER,
+    decode_message,
+    encode_request,
+)
+from magazyn.services.printing import TRANSPORT_IPP, TRANSPORT_LP, CupsPrinter
+
+
+class StandInIppServer:
+    """Lokalna atrapa serwera IPP: przyjmuje Print-Job, zlecenia od razu zakończone."""
+
+    def __init__(self, job_seconds: float = 0.0):
+        self.job_seconds = job_seconds
+        self.jobs: list[bytes] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_POST(self):  # noqa: N802 - nazwa z BaseHTTPRequestHandler
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                operation, request_id, attributes, document = decode_message(body)
+                if operation == OP_PRINT_JOB:
+                    server.jobs.append(document)
+                    time.sleep(server.job_seconds)
+                    reply = [(TAG_INTEGER, "job-id", len(server.jobs))]
+                else:
+                    reply = [(TAG_ENUM, "job-state", JOB_STATE_COMPLETED)]
+                payload = encode_request(0x0000, request_id, reply)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/ipp")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _label(index: int) -> str:
+    writer = PdfWriter()
+    writer.add_blank_page(width=298, height=420)
+    writer.add_metadata({"/Title": f"BENCH-{index:05d}"})
+    output = io.BytesIO()
+    writer.write(output)
+    return base64.b64encode(output.getvalue()).decode("ascii")
+
+
+def _install_fake_lp(directory: Path, job_seconds: float) -> None:
+    script = directory / "lp"
+    script.write_text(f"#!/bin/sh\ncat \"$@\" > /dev/null\nsleep {job_seconds}\n", encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    os.environ["PATH"] = f"{directory}{os.pathsep}{os.environ['PATH']}"
+
+
+def _run(variant: str, labels: list[str], batch: int, job_seconds: float) -> dict:
+    with StandInIppServer(job_seconds) as server:
+        transport = TRANSPORT_LP if variant == "lp" else TRANSPORT_IPP
+        printer = CupsPrinter(
+            printer_name="Bench",
+            cups_server="127.0.0.1" if transport == TRANSPORT_IPP else None,
+            cups_port=server.port if transport == TRANSPORT_IPP else None,
+            transport=transport,
+        )
+        start = time.perf_counter()
+        if variant == "ipp_merged":
+            for offset in range(0, len(labels), batch):
+                printer.print_labels_base64([(label, "pdf") for label in labels[offset:offset + batch]])
+        else:
+            for label in labels:
+                printer.print_label_base64(label, "pdf")
+        elapsed = time.perf_counter() - start
+        jobs = len(server.jobs) if transport == TRANSPORT_IPP else len(labels)
+    return {
+        "variant": variant,
+        "labels": len(labels),
+        "jobs": jobs,
+        "seconds": round(elapsed, 3),
+        "labels_per_second": round(len(labels) / elapsed, 1),
+        "jobs_per_second": round(jobs / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--labels", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20)
+    parser.add_argument("--job-ms", type=float, default=5.0, help="koszt przyjęcia zlecenia przez spooler")
+    parser.add_argument("--output", help="zapisz wynik JSON do pliku")
+    args = parser.parse_args()
+
+    labels = [_label(index) for index in range(args.labels)]
+    job_seconds = args.job_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        _install_fake_lp(Path(tmp), job_seconds)
+        results = [_run(variant, labels, args.batch, job_seconds) for variant in ("lp", "ipp", "ipp_merged")]
+
+    lp, _, merged = results
+    report = {
+        "benchmark": "print_jobs",
+        "results": results,
+        "labels_per_second_ratio": round(merged["labels_per_second"] / max(0.1, lp["labels_per_second"]), 1),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
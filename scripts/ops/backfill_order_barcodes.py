@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Zaindeksuj kody etykiet istniejacych zamowien w tabeli order_barcodes."""
+from __future__ import annotations
+
+import argparse
+
+from sqlalchemy import text
+
+from magazyn.db import db_connect
+from magazyn.factory import create_app
+from magazyn.services.order_barcodes import backfill_order_barcodes, order_barcode_entries
+from magazyn.services.scanning import parse_last_order_data
+
+
+def _records(conn):
+    # Najpierw kolejka, potem printed_orders od najstarszych - przy
+    # powtorzonym kodzie wygrywa ostatnio wydrukowane zamowienie.
+    for order_id, raw in conn.execute(
+        text("SELECT order_id, last_order_data FROM label_queue")
+    ):
+        yield order_id, parse_last_order_data(raw)
+    for order_id, raw in conn.execute(
+        text("SELECT order_id, last_order_data FROM printed_orders ORDER BY printed_at")
+    ):
+        yield order_id, parse_last_order_data(raw)
+
+
+def backfill(*, dry_run: bool = False) -> int:
+    with db_connect() as conn:
+        records = list(_records(conn))
+        if dry_run:
+            return sum(
+                len(order_barcode_entries(str(order_id), data))
+                for order_id, data in records
+                if order_id
+            )
+        return backfill_order_barcodes(conn, records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        count = backfill(dry_run=args.dry_run)
+    print(f"Indexed {count} barcodes")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,7 +6,8 @@ import sys
 from magazyn.db import get_session
 from magazyn.factory import create_app
 from magazyn.models.printing import PrintedOrder, ScanLog
-from magazyn.services.scanning import barcode_matches_order, parse_last_order_data
+from magazyn.services.order_barcodes import find_order_id_for_barcode
+from magazyn.services.scanning import parse_last_order_data
 from sqlalchemy import desc
 
 
@@ -42,18 +43,19 @@ def _run():
 
         for bc in failed:
             print(f"\n=== Barcode: {bc} ===")
-            found = False
-            for po in orders:
+            order_id = find_order_id_for_barcode(db, bc)
+            po = next((o for o in orders if o.order_id == order_id), None)
+            if po is not None:
                 data = parse_last_order_data(po.last_order_data)
-                if barcode_matches_order(data, bc):
-                    print(f"MATCH order_id={po.order_id}")
-                    print(f"  shipping={data.get('shipping')} courier={data.get('courier_code')}")
-                    print(f"  delivery_package_nr={data.get('delivery_package_nr')}")
-                    print(f"  tracking_numbers={data.get('tracking_numbers')}")
-                    print(f"  package_ids={data.get('package_ids')}")
-                    found = True
-            if not found:
-                print("No match in printed_orders")
+                print(f"MATCH order_id={po.order_id}")
+                print(f"  shipping={data.get('shipping')} courier={data.get('courier_code')}")
+                print(f"  delivery_package_nr={data.get('delivery_package_nr')}")
+                print(f"  tracking_numbers={data.get('tracking_numbers')}")
+                print(f"  package_ids={data.get('package_ids')}")
+            elif order_id:
+                print(f"MATCH order_id={order_id} (brak w printed_orders)")
+            else:
+                print("No match in order_barcodes")
 
         print("\n=== Ostatnie Orlen/DHL w printed_orders ===")
         orlen_dhl = []
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Odbuduj lub sprawdz dzienny rollup zamowien (tabela order_daily_rollup)."""
+from __future__ import annotations
+
+import argparse
+from datetime import date
+
+from magazyn.db import get_session
+from magazyn.factory import create_app
+from magazyn.services.order_rollup import check_order_rollup, rebuild_order_rollup
+
+
+def _day(value: str | None) -> date | None:
+    return date.fromisoformat(value) if value else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--start", help="pierwszy dzien (YYYY-MM-DD), domyslnie cala historia")
+    parser.add_argument("--end", help="ostatni dzien (YYYY-MM-DD), wlacznie")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="tylko porownaj rollup ze zrodlem (bez zapisu)",
+    )
+    parser.add_argument(
+        "--repair",
+        action="store_true",
+        help="z --check: przelicz dni z rozbieznosciami",
+    )
+    args = parser.parse_args()
+    start_day, end_day = _day(args.start), _day(args.end)
+
+    app = create_app()
+    with app.app_context(), get_session() as db:
+        if args.check:
+            mismatches = check_order_rollup(db, start_day, end_day, repair=args.repair)
+            for item in mismatches:
+                print(
+                    f"{item.day} {item.platform or '-'} {item.status_bucket} "
+                    f"{item.measure}: stored={item.stored} expected={item.expected}"
+                )
+            print(f"Mismatches: {len(mismatches)}" + (" (repaired)" if args.repair and mismatches else ""))
+            return
+        rows = rebuild_order_rollup(db, start_day, end_day)
+    print(f"Rebuilt {rows} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
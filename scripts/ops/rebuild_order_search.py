@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Odbuduj indeks wyszukiwania zamowien (tabela order_search)."""
+from __future__ import annotations
+
+import argparse
+
+from magazyn.db import get_session
+from magazyn.factory import create_app
+from magazyn.services.order_search import ensure_order_search, rebuild_order_search
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--missing",
+        action="store_true",
+        help="tylko dopisz dokumenty zamowien, ktore ich nie maja",
+    )
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context(), get_session() as db:
+        if args.missing:
+            indexed = ensure_order_search(db)["indexed"]
+        else:
+            indexed = rebuild_order_search(db)
+    print(f"Indexed {indexed} orders")
+
+
+if __name__ == "__main__":
+    main()